@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse en flux des handshakes TCP vers le port CI (24005) dans une capture pcap/pcapng
+Remplace la lecture manuelle SYN / SYN-ACK / RST dans Wireshark
+"""
+
+import struct
+
+from diagnostic_ci import GuideDiagnosticCI
+from lecteur_capture import (PROTO_TCP, TCP_ACK, TCP_FIN, TCP_RST, TCP_SYN,
+                             LecteurCapture, adresse_texte, entete_ip, entete_tcp,
+                             localiser_ip)
+
+ISSUE_ETABLIE = "établie"
+ISSUE_REFUSEE = "refusée"
+ISSUE_SANS_REPONSE = "sans réponse"
+ISSUE_INCOMPLETE = "incomplète"
+ISSUE_EN_COURS = "déjà établie"
+
+# Un flux inactif depuis plus longtemps est clos et agrégé (mémoire constante)
+INACTIVITE_FLUX_S = 120
+_PERIODE_PURGE_S = 10
+# Segments sans SYN d'un flux tout juste clos (dernier ACK du FIN/FIN/ACK, retransmissions) : ignorés (TIME_WAIT)
+TIME_WAIT_S = 60
+
+_PORTS = struct.Struct(">HH")
+
+# Événements transmis au rappel optionnel de l'analyseur
+EVENEMENT_CONNEXION = "connexion"
+EVENEMENT_DECONNEXION = "déconnexion"
+
+
+def _posterieur_ou_egal(a, b):
+    """Comparaison de numéros de séquence TCP modulo 2^32 (a >= b)."""
+    return ((a - b) & 0xFFFFFFFF) < 0x80000000
+
+
+class _Flux:
+    """État d'une connexion moniteur → centrale."""
+
+    __slots__ = ("syn", "syn_ack", "ack", "rst_moniteur", "rst_centrale", "fin",
+                 "retransmissions", "seq_max_moniteur", "seq_max_centrale",
+                 "ts_syn", "rtt", "dernier_ts", "octets")
+
+    def __init__(self, ts):
+        self.syn = 0
+        self.syn_ack = 0
+        self.ack = False
+        self.rst_moniteur = 0
+        self.rst_centrale = 0
+        self.fin = 0
+        self.retransmissions = 0
+        self.seq_max_moniteur = None
+        self.seq_max_centrale = None
+        self.ts_syn = None
+        self.rtt = None
+        self.dernier_ts = ts
+        self.octets = 0
+
+    def issue(self):
+        """Issue du handshake pour ce flux."""
+        if self.syn and self.syn_ack and self.ack:
+            return ISSUE_ETABLIE
+        if self.syn and self.rst_centrale and not self.syn_ack:
+            return ISSUE_REFUSEE
+        if self.syn and not self.syn_ack:
+            return ISSUE_SANS_REPONSE
+        if not self.syn:
+            return ISSUE_EN_COURS
+        return ISSUE_INCOMPLETE
+
+
+def _stats_moniteur_vides():
+    return {
+        "tentatives": 0,
+        ISSUE_ETABLIE: 0,
+        ISSUE_REFUSEE: 0,
+        ISSUE_SANS_REPONSE: 0,
+        ISSUE_INCOMPLETE: 0,
+        ISSUE_EN_COURS: 0,
+        "rst": 0,
+        "retransmissions": 0,
+        "octets": 0,
+        "rtt_somme": 0.0,
+        "rtt_nb": 0,
+        "rtt_max": 0.0,
+    }
+
+
+class AnalyseurHandshake:
+    """Analyseur des connexions TCP vers le port CI, par moniteur (côté client).
+
+    `rappel(ts, moniteur, evenement)` est appelé à chaque connexion établie et à chaque
+    clôture (FIN/RST) d'une connexion établie ; `moniteur` est l'adresse brute.
+    """
+
+    def __init__(self, port=None, inactivite=INACTIVITE_FLUX_S, rappel=None):
+        self.port = port if port is not None else GuideDiagnosticCI().get_ci_port()
+        self.inactivite = inactivite
+        self.rappel = rappel
+        self.flux = {}
+        self.clos = {}
+        self.moniteurs = {}
+        self.paquets = 0
+        self.paquets_ci = 0
+        self._prochaine_purge = None
+
+    def traiter_segment(self, ts, src, dst, sport, dport, seq, flags, charge):
+        """Intègre un segment TCP déjà filtré sur le port CI."""
+        self.paquets_ci += 1
+        vers_centrale = dport == self.port
+        if vers_centrale:
+            cle = (src, sport, dst)
+        else:
+            cle = (dst, dport, src)
+
+        flux = self.flux.get(cle)
+        if flux is None:
+            clos = self.clos.pop(cle, None)
+            if clos is not None and not flags & TCP_SYN and ts - clos < TIME_WAIT_S:
+                # Fin de la clôture d'un flux déjà compté : pas une connexion « déjà établie »
+                self.clos[cle] = clos
+                return
+            if flags & TCP_RST:
+                # RST isolé (ex. doublon après clôture) : compté sans ouvrir de flux
+                self._stats(cle[0])["rst"] += 1
+                return
+            flux = self.flux[cle] = _Flux(ts)
+        flux.dernier_ts = ts
+        flux.octets += charge
+
+        longueur_seq = charge + (1 if flags & (TCP_SYN | TCP_FIN) else 0)
+        if vers_centrale:
+            if flags & TCP_SYN and not flags & TCP_ACK:
+                flux.syn += 1
+                if flux.syn > 1:
+                    flux.retransmissions += 1
+                else:
+                    flux.ts_syn = ts
+            elif flags & TCP_RST:
+                flux.rst_moniteur += 1
+            elif flags & TCP_ACK and flux.syn_ack and not flux.ack:
+                flux.ack = True
+                if self.rappel is not None:
+                    self.rappel(ts, cle[0], EVENEMENT_CONNEXION)
+            if longueur_seq and not flags & TCP_SYN:
+                fin_seq = (seq + longueur_seq) & 0xFFFFFFFF
+                if flux.seq_max_moniteur is not None and _posterieur_ou_egal(flux.seq_max_moniteur, fin_seq):
+                    flux.retransmissions += 1
+                else:
+                    flux.seq_max_moniteur = fin_seq
+        else:
+            if flags & TCP_SYN and flags & TCP_ACK:
+                flux.syn_ack += 1
+                if flux.syn_ack > 1:
+                    flux.retransmissions += 1
+                elif flux.ts_syn is not None:
+                    flux.rtt = ts - flux.ts_syn
+            elif flags & TCP_RST:
+                flux.rst_centrale += 1
+            if longueur_seq and not flags & TCP_SYN:
+                fin_seq = (seq + longueur_seq) & 0xFFFFFFFF
+                if flux.seq_max_centrale is not None and _posterieur_ou_egal(flux.seq_max_centrale, fin_seq):
+                    flux.retransmissions += 1
+                else:
+                    flux.seq_max_centrale = fin_seq
+
+        if flags & TCP_FIN:
+            flux.fin += 1
+        # Une nouvelle tentative après RST/FIN ouvre un nouveau flux
+        if flags & TCP_RST or flux.fin >= 2:
+            # Connexion établie dans la capture, ou déjà ouverte à son début
+            if self.rappel is not None and (flux.ack or not (flux.syn or flux.syn_ack)):
+                self.rappel(ts, cle[0], EVENEMENT_DECONNEXION)
+            self._clore(cle, flux)
+
+        if self._prochaine_purge is None:
+            self._prochaine_purge = ts + _PERIODE_PURGE_S
+        elif ts >= self._prochaine_purge:
+            self.purger(ts)
+            self._prochaine_purge = ts + _PERIODE_PURGE_S
+
+    def _stats(self, moniteur):
+        stats = self.moniteurs.get(moniteur)
+        if stats is None:
+            stats = self.moniteurs[moniteur] = _stats_moniteur_vides()
+        return stats
+
+    def _clore(self, cle, flux):
+        del self.flux[cle]
+        self.clos[cle] = flux.dernier_ts
+        stats = self._stats(cle[0])
+        issue = flux.issue()
+        stats[issue] += 1
+        if flux.syn:
+            stats["tentatives"] += 1
+        stats["rst"] += flux.rst_moniteur + flux.rst_centrale
+        stats["retransmissions"] += flux.retransmissions
+        stats["octets"] += flux.octets
+        if flux.rtt is not None:
+            stats["rtt_somme"] += flux.rtt
+            stats["rtt_nb"] += 1
+            stats["rtt_max"] = max(stats["rtt_max"], flux.rtt)
+
+    def purger(self, ts):
+        """Clôt les flux inactifs depuis plus de `inactivite` secondes."""
+        limite = ts - self.inactivite
+        for cle in [c for c, f in self.flux.items() if f.dernier_ts < limite]:
+            self._clore(cle, self.flux[cle])
+        limite = ts - TIME_WAIT_S
+        for cle in [c for c, clos in self.clos.items() if clos < limite]:
+            del self.clos[cle]
+
+    def analyser_fichier(self, chemin):
+        """Parcourt une capture en un seul passage et retourne le rapport par moniteur."""
+        port = self.port
+        traiter = self.traiter_segment
+        with LecteurCapture(chemin) as lecteur:
+            donnees = lecteur.donnees
+            for ts, linktype, debut, longueur in lecteur.paquets():
+                self.paquets += 1
+                ip, version = localiser_ip(donnees, linktype, debut, longueur)
+                if ip < 0:
+                    continue
+                fin = debut + longueur
+                if version == 4 and ip + 24 <= fin:
+                    # Filtrage rapide protocole/ports avant tout décodage complet
+                    if donnees[ip + 9] != PROTO_TCP:
+                        continue
+                    l4 = ip + (donnees[ip] & 0x0F) * 4
+                    if l4 + 4 <= fin and port not in _PORTS.unpack_from(donnees, l4):
+                        continue
+                ipv = entete_ip(donnees, ip, version, fin)
+                if ipv is None or ipv[0] != PROTO_TCP:
+                    continue
+                tcp = entete_tcp(donnees, ipv[4], ipv[5], fin)
+                if tcp is None or (tcp[0] != port and tcp[1] != port):
+                    continue
+                traiter(ts, ipv[1], ipv[2], tcp[0], tcp[1], tcp[2], tcp[4], tcp[5])
+        return self.rapport()
+
+    def rapport(self):
+        """Clôt les flux restants et retourne les statistiques par moniteur (IP texte)."""
+        for cle in list(self.flux):
+            self._clore(cle, self.flux[cle])
+        rapport = {}
+        for brute, stats in self.moniteurs.items():
+            ligne = {k: v for k, v in stats.items() if not k.startswith("rtt_")}
+            ligne["rtt_handshake_ms"] = (
+                round(1000 * stats["rtt_somme"] / stats["rtt_nb"], 3) if stats["rtt_nb"] else None
+            )
+            ligne["rtt_handshake_max_ms"] = round(1000 * stats["rtt_max"], 3) if stats["rtt_nb"] else None
+            rapport[adresse_texte(brute)] = ligne
+        return rapport
+
+
+def evaluer_reponses(stats):
+    """Déduit les réponses de l'étape 5 (Wireshark) pour un moniteur, None s'il est absent de la capture."""
+    if stats is None or not (stats["tentatives"] or stats[ISSUE_EN_COURS]):
+        return {"q_tentatives_wireshark": "Non"}
+    reponses = {"q_tentatives_wireshark": "Oui"}
+    if stats[ISSUE_ETABLIE] or stats[ISSUE_EN_COURS]:
+        reponses["q_handshake"] = "Oui"
+    else:
+        reponses["q_handshake"] = "Non"
+        reponses["q_rst"] = "Oui" if stats["rst"] else "Non"
+    return reponses
+
+
+def enregistrer_dans_donnees(rapport, donnees_collectees, ip_moniteur=None):
+    """Reporte le résultat de l'analyse dans donnees_collectees (moniteur ciblé ou total)."""
+    if ip_moniteur:
+        stats = rapport.get(ip_moniteur)
+        if stats is None:
+            donnees_collectees['Capture 24005'] = "aucune tentative du moniteur"
+            return
+        lignes = [stats]
+    else:
+        lignes = list(rapport.values())
+        donnees_collectees['Capture 24005 - moniteurs'] = len(rapport)
+    donnees_collectees['Capture 24005 - établies'] = sum(s[ISSUE_ETABLIE] for s in lignes)
+    donnees_collectees['Capture 24005 - refusées'] = sum(s[ISSUE_REFUSEE] for s in lignes)
+    donnees_collectees['Capture 24005 - sans réponse'] = sum(s[ISSUE_SANS_REPONSE] for s in lignes)
+    donnees_collectees['Capture 24005 - RST'] = sum(s["rst"] for s in lignes)
+    donnees_collectees['Capture 24005 - retransmissions'] = sum(s["retransmissions"] for s in lignes)
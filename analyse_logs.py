@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse en flux des logs du service CI (fichiers texte, journalctl short/short-iso ou json, .gz, entrée standard)
+Lignes classées par signature d'erreur, modèles extraits automatiquement pour les erreurs inconnues
+"""
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+TAILLE_BLOC = 8 << 20            # lecture par blocs de 8 Mo, coupés en fin de ligne
+TAILLE_MIN_PARALLELE = 64 << 20  # en dessous, un seul processus suffit
+LONGUEUR_MODELE = 160            # octets du message retenus pour un modèle
+MODELES_MAX = 5000               # au-delà, les nouvelles erreurs inconnues sont regroupées
+SIMILARITE_MODELES = 0.6         # part de mots identiques pour fusionner deux modèles
+AUTRES = "Autres erreurs"
+
+# Signatures connues : (clé, libellé, expression sur le message en minuscules, ancres)
+# Chaque alternative de l'expression contient une ancre ou un mot de gravité : le préfiltre retient
+# ainsi les lignes de la signature même sans « error » ni « fail » (« Connection reset by peer »)
+SIGNATURES = (
+    ("connexion_refusee", "Connexion refusée", r"connection refused|connexion refus(?:é|e)e|econnrefused", ("refus",)),
+    ("timeout", "Délai dépassé (timeout)", r"timed? ?out\b|etimedout|d(?:é|e)lai (?:d(?:é|e)pass|expir)",
+     ("timeout", "time out", "timedout", "timed out", "délai", "delai")),
+    ("connexion_reinitialisee", "Connexion réinitialisée (reset, broken pipe)",
+     r"connection reset|reset by peer|econnreset|broken pipe|epipe|connexion r(?:é|e)initialis",
+     ("reset", "broken pipe", "epipe", "initialis")),
+    ("hote_injoignable", "Hôte ou réseau injoignable",
+     r"no route to host|network is unreachable|host unreachable|ehostunreach|enetunreach|injoignable",
+     ("unreach", "no route", "injoignable")),
+    ("authentification", "Échec d'authentification",
+     r"auth\w*\s+(?:fail|error|denied|refus|invalid|(?:é|e)chou)|(?:invalid|bad|wrong)\s+(?:credentials|password|token)"
+     r"|unauthori[sz]ed|(?:(?:é|e)chec|failure)\s+(?:d'|de l'|of\s+)?auth",
+     ("denied", "invalid", "chou", "credentials", "password", "token", "unauthori")),
+    ("licence", "Licence expirée ou dépassée", r"licen[cs]e\w*\W+(?:\w+\W+)?(?:expir|invalid|exceed|d(?:é|e)pass|limit)",
+     ("licen",)),
+    ("port_occupe", "Port déjà utilisé (bind)", r"address already in use|eaddrinuse|bind\w*\W+fail|d(?:é|e)j(?:à|a) utilis",
+     ("in use", "eaddrinuse", "utilis")),
+    ("ressources", "Ressources épuisées (mémoire, descripteurs, disque)",
+     r"out of memory|cannot allocate|enomem|too many open files|emfile|no space left|enospc|m(?:é|e)moire insuffisante",
+     ("memory", "allocate", "enomem", "open files", "emfile", "no space", "enospc", "moire insuffisante")),
+    ("protocole", "Erreur de protocole ou trame invalide",
+     r"protocol\w*\s+error|invalid\s+(?:frame|message|packet|header)|malformed|checksum|crc\s+error|trame\s+invalide",
+     ("invalid", "malformed", "checksum", "trame")),
+    ("moniteur_inconnu", "Moniteur ou station inconnu",
+     r"unknown\s+(?:station|device|monitor|terminal|client)|(?:station|moniteur|terminal)\s+inconnu|not\s+registered"
+     r"|non\s+enregistr",
+     ("unknown", "inconnu", "registered", "enregistr")),
+    ("file_saturee", "File ou tampon saturé", r"(?:queue|buffer|tampon)\w*\s+(?:\w+\s+)?(?:full|overflow|satur|plein)|overrun",
+     ("full", "overflow", "satur", "plein", "overrun")),
+    ("certificat_tls", "Erreur TLS ou certificat",
+     r"(?:ssl|tls)\w*\s+(?:handshake\s+)?(?:error|fail|alert)|certificat\w*\s+(?:verify\s+failed|expir|invalid|has\s+expired)",
+     ("alert", "certificat")),
+    ("resolution_dns", "Résolution de nom impossible",
+     r"name or service not known|could not resolve|name resolution|nxdomain|getaddrinfo",
+     ("not known", "resol", "nxdomain", "getaddrinfo")),
+    ("plantage", "Plantage du service (crash, exception)",
+     r"segmentation fault|sigsegv|core dumped|traceback|panic|exception|abort",
+     ("segmentation", "sigsegv", "core dump", "traceback", "panic", "exception", "abort")),
+)
+
+# Mots de gravité : avec les ancres des signatures, seules les lignes qui en contiennent un sont décodées
+MOTS_CLES = ("err", "fail", "fatal", "crit", "exception", "refus", "timeout", "timed out", "échec", "échou")
+# Mots entiers : « interrupted », « deferred » ou « referrer » ne sont pas des erreurs.
+# Bornes sur les lettres seules (« read_error », « err42 » comptent) ; \b ne voit pas « é » en octets,
+# d'où les octets UTF-8 de « é » ajoutés aux bornes
+_GRAVITE = re.compile(
+    rb"(?<![a-z\xa9])(?:err(?:or|eur|no)?s?|fail(?:s|ed|ure|ures|ing)?|fatal|crit(?:ical|ique)?|exceptions?"
+    rb"|refus(?:e|ed|al|\xc3\xa9e?s?)?|timed? ?out|timedout|(?:\xc3\xa9|e)ch(?:ecs?|ou(?:e|\xc3\xa9)e?s?))(?![a-z\xc3])"
+)
+
+# En-tête horodaté (ISO, journalctl short-iso ou syslog) suivi de « hôte processus[pid]: »
+_ENTETE = re.compile(
+    rb"(?P<minute>\d{4}-\d\d-\d\d[T ]\d\d:\d\d|[A-Z][a-z]{2} [ \d]\d \d\d:\d\d)[\d:.,]*(?:Z|[+-]\d\d:?\d\d)?\s+"
+    rb"(?:(?:\S+\s+)?[\w.@/-]+(?:\[\d+\])?:\s+)?"
+)
+_IPV4 = re.compile(rb"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])")
+_MASQUES = (
+    (re.compile(rb"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?(?![\d.])"), b"<IP>"),
+    (re.compile(rb"\b0x[0-9a-fA-F]+\b|\b[0-9a-fA-F]{8,}\b"), b"<HEX>"),
+    (re.compile(rb"\"[^\"]*\"|'[^']*'"), b"<*>"),
+    (re.compile(rb"\d+"), b"<N>"),
+)
+_IP_EXCLUES = (b"0.0.0.0", b"255.255.255.255")
+
+
+class AnalyseurLogs:
+    """Compteurs par signature, par moniteur (IP citée) et par tranche de temps, en un seul passage.
+
+    Chaque bloc est mis en minuscules puis parcouru par une seule expression (arbre des mots de
+    gravité et des ancres de signature) ; seules les lignes candidates passent par les expressions
+    régulières complètes. Les erreurs sans
+    signature connue sont réduites à un modèle (IP, nombres, identifiants masqués).
+    """
+
+    def __init__(self, signatures=SIGNATURES, mots_cles=MOTS_CLES, ip_centrale=None, tranche_min=1,
+                 modeles_max=MODELES_MAX):
+        self.signatures = tuple(signatures)
+        self.mots_cles = tuple(mots_cles)
+        self.ip_centrale = ip_centrale
+        self.tranche_min = tranche_min
+        self.modeles_max = modeles_max
+        self.libelles = {cle: libelle for cle, libelle, _, _ in self.signatures}
+        self._groupes = {f"s{i}": cle for i, (cle, _, _, _) in enumerate(self.signatures)}
+        self._motif = re.compile("|".join(f"(?P<s{i}>{motif})" for i, (_, _, motif, _) in enumerate(self.signatures))
+                                 .encode())
+        # bytes.lower() ne touche pas aux lettres accentuées : « Échec » est cherché tel quel
+        mots = self.mots_cles + tuple(ancre for *_, ancres in self.signatures for ancre in ancres)
+        self._prefiltre = re.compile(_arbre({forme.encode().lower() for mot in mots
+                                             for forme in (mot.lower(), mot.upper())}))
+        self._exclues = set(_IP_EXCLUES) | ({ip_centrale.encode()} if ip_centrale else set())
+        self._tranches_cache = {}
+        self.fichiers = []
+        self.octets = 0
+        self.lignes = 0
+        self.lignes_erreur = 0
+        self.duree_s = 0.0
+        self.occurrences = Counter()
+        self.par_moniteur = Counter()
+        self.signature_moniteur = Counter()
+        self.tranches = {}
+        self.bornes = {}
+        self.exemples = {}
+        self.modeles = {}
+
+    # Lecture
+
+    def analyser_fichiers(self, chemins, processus=1):
+        """Analyse des fichiers (ou « - » pour l'entrée standard) ; les gros fichiers sont répartis sur `processus`."""
+        debut = time.perf_counter()
+        for chemin in chemins:
+            self.fichiers.append(chemin)
+            if chemin == "-":
+                self.analyser_flux(sys.stdin.buffer)
+            elif chemin.endswith(".gz"):
+                with gzip.open(chemin, "rb") as flux:
+                    self.analyser_flux(flux)
+            elif processus > 1 and os.path.getsize(chemin) >= TAILLE_MIN_PARALLELE:
+                plages = _decouper(chemin, processus)
+                parametres = (self.signatures, self.mots_cles, self.ip_centrale, self.tranche_min, self.modeles_max)
+                with ProcessPoolExecutor(max_workers=len(plages)) as pool:
+                    for partiel in pool.map(_analyser_part, [(chemin, a, b, parametres) for a, b in plages]):
+                        self.fusionner(partiel)
+            else:
+                with open(chemin, "rb") as f:
+                    try:
+                        donnees = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except ValueError:
+                        # Fichier vide : mmap refuse une longueur nulle
+                        continue
+                    with donnees:
+                        self.analyser_plage(donnees, 0, len(donnees))
+        self.duree_s += time.perf_counter() - debut
+        return self.rapport()
+
+    def analyser_plage(self, donnees, debut, fin):
+        """Parcourt donnees[debut:fin] (fichier projeté en mémoire) par blocs coupés en fin de ligne."""
+        if hasattr(donnees, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            donnees.madvise(mmap.MADV_SEQUENTIAL)
+        # Pages déjà lues rendues au fur et à mesure : la mémoire reste celle d'un bloc
+        liberer = hasattr(donnees, "madvise") and hasattr(mmap, "MADV_DONTNEED")
+        page = debut - debut % mmap.PAGESIZE
+        position = debut
+        while position < fin:
+            limite = min(fin, position + TAILLE_BLOC)
+            if limite < fin:
+                coupure = donnees.rfind(b"\n", position, limite)
+                limite = coupure + 1 if coupure >= 0 else limite
+            self.traiter_bloc(donnees[position:limite])
+            position = limite
+            if liberer and limite - limite % mmap.PAGESIZE > page:
+                donnees.madvise(mmap.MADV_DONTNEED, page, limite - limite % mmap.PAGESIZE - page)
+                page = limite - limite % mmap.PAGESIZE
+
+    def analyser_flux(self, flux):
+        """Parcourt un flux binaire (entrée standard, gzip) par blocs, la ligne coupée est reportée."""
+        reste = b""
+        while True:
+            bloc = flux.read(TAILLE_BLOC)
+            if not bloc:
+                break
+            bloc = reste + bloc
+            coupure = bloc.rfind(b"\n") + 1
+            reste = bloc[coupure:]
+            if coupure:
+                self.traiter_bloc(bloc[:coupure])
+        if reste:
+            self.traiter_bloc(reste + b"\n")
+
+    def traiter_bloc(self, bloc):
+        """Lignes complètes : repère les lignes contenant un mot de gravité ou une ancre, puis les classe."""
+        self.octets += len(bloc)
+        self.lignes += bloc.count(b"\n")
+        minuscules = bloc.lower()
+        cherche = self._prefiltre.search
+        trouve = cherche(minuscules)
+        while trouve is not None:
+            i = trouve.start()
+            debut = minuscules.rfind(b"\n", 0, i) + 1
+            fin = minuscules.find(b"\n", i)
+            if fin < 0:
+                fin = len(minuscules)
+            self.traiter_ligne(bloc[debut:fin], minuscules[debut:fin])
+            trouve = cherche(minuscules, fin)
+
+    # Classement d'une ligne
+
+    def traiter_ligne(self, ligne, minuscules=None):
+        """Classe une ligne (signature ou modèle) et met à jour les compteurs ; ignorée si ce n'est pas une erreur."""
+        if minuscules is None:
+            minuscules = ligne.lower()
+        if ligne[:1] == b"{":
+            message, tranche = self._ligne_json(ligne)
+            if message is None:
+                return
+            minuscules = message.lower()
+        else:
+            entete = _ENTETE.match(ligne)
+            if entete is None:
+                message, tranche = ligne, None
+            else:
+                message, tranche = ligne[entete.end():], self._tranche(entete.group("minute"))
+                minuscules = minuscules[entete.end():]
+        if not minuscules.isascii():
+            minuscules = message.decode("utf-8", "replace").lower().encode()
+        signature = self._motif.search(minuscules)
+        if signature is not None:
+            cle = self._groupes[signature.lastgroup]
+        elif _GRAVITE.search(minuscules):
+            cle = self._modele(message)
+        else:
+            return
+        self.lignes_erreur += 1
+        self.occurrences[cle] += 1
+        if cle not in self.exemples:
+            self.exemples[cle] = message[:300].decode("utf-8", "replace").strip()
+        for ip in set(_IPV4.findall(message)) - self._exclues:
+            if not ip.startswith(b"127."):
+                ip = ip.decode()
+                self.par_moniteur[ip] += 1
+                self.signature_moniteur[cle, ip] += 1
+        if tranche is not None:
+            compteurs = self.tranches.get(tranche)
+            if compteurs is None:
+                compteurs = self.tranches[tranche] = Counter()
+            compteurs[cle] += 1
+            bornes = self.bornes.get(cle)
+            if bornes is None:
+                self.bornes[cle] = [tranche, tranche]
+            else:
+                bornes[1] = tranche
+
+    def _ligne_json(self, ligne):
+        # journalctl -o json : MESSAGE (texte ou liste d'octets) et __REALTIME_TIMESTAMP en µs
+        try:
+            entree = json.loads(ligne)
+        except ValueError:
+            return ligne, None
+        message = entree.get("MESSAGE")
+        if message is None:
+            return None, None
+        message = bytes(message) if isinstance(message, list) else str(message).encode()
+        horodatage = entree.get("__REALTIME_TIMESTAMP")
+        if not horodatage:
+            return message, None
+        return message, self._tranche(time.strftime("%Y-%m-%d %H:%M", time.localtime(int(horodatage) / 1e6)).encode())
+
+    def _tranche(self, minute):
+        tranche = self._tranches_cache.get(minute)
+        if tranche is None:
+            texte = minute.decode().replace("T", " ")
+            if self.tranche_min > 1:
+                texte = f"{texte[:-2]}{int(texte[-2:]) // self.tranche_min * self.tranche_min:02d}"
+            tranche = self._tranches_cache[minute] = texte
+        return tranche
+
+    def _modele(self, message):
+        gabarit = message[:LONGUEUR_MODELE]
+        for motif, jeton in _MASQUES:
+            gabarit = motif.sub(jeton, gabarit)
+        cle = self.modeles.get(gabarit)
+        if cle is None:
+            if len(self.modeles) >= self.modeles_max:
+                return AUTRES
+            cle = self.modeles[gabarit] = gabarit.decode("utf-8", "replace").strip()
+        return cle
+
+    # Fusion (processus parallèles) et restitution
+
+    def fusionner(self, autre):
+        """Ajoute les compteurs d'un analyseur partiel (plage suivante du même fichier ou autre fichier)."""
+        self.octets += autre.octets
+        self.lignes += autre.lignes
+        self.lignes_erreur += autre.lignes_erreur
+        self.occurrences.update(autre.occurrences)
+        self.par_moniteur.update(autre.par_moniteur)
+        self.signature_moniteur.update(autre.signature_moniteur)
+        for tranche, compteurs in autre.tranches.items():
+            self.tranches.setdefault(tranche, Counter()).update(compteurs)
+        for cle, (premiere, derniere) in autre.bornes.items():
+            if cle in self.bornes:
+                self.bornes[cle][1] = derniere
+            else:
+                self.bornes[cle] = [premiere, derniere]
+        for cle, exemple in autre.exemples.items():
+            self.exemples.setdefault(cle, exemple)
+        for gabarit, cle in autre.modeles.items():
+            self.modeles.setdefault(gabarit, cle)
+
+    def _regrouper_modeles(self):
+        """Fusionne les modèles de même longueur qui ne diffèrent que par quelques mots (« <*> »)."""
+        correspondance = {}
+        groupes = {}
+        for cle in sorted(set(self.modeles.values()), key=lambda c: -self.occurrences[c]):
+            mots = cle.split()
+            representants = groupes.setdefault((len(mots), mots[0] if mots else ""), [])
+            for representant in representants:
+                communs = sum(a == b for a, b in zip(representant[0], mots))
+                if communs >= SIMILARITE_MODELES * len(mots):
+                    representant[0] = [a if a == b else "<*>" for a, b in zip(representant[0], mots)]
+                    representant[1].append(cle)
+                    break
+            else:
+                representants.append([mots, [cle]])
+        for representants in groupes.values():
+            for mots, cles in representants:
+                for cle in cles:
+                    correspondance[cle] = " ".join(mots)
+        return correspondance
+
+    def libelle(self, cle):
+        return self.libelles.get(cle) or cle
+
+    def rapport(self, nb_moniteurs=50):
+        """Signatures triées par occurrences, moniteurs les plus cités et chronologie par tranche."""
+        modeles = self._regrouper_modeles()
+        renommer = lambda cle: modeles.get(cle, cle)
+        occurrences = Counter()
+        for cle, n in self.occurrences.items():
+            occurrences[renommer(cle)] += n
+        par_signature = {}
+        for (cle, ip), n in self.signature_moniteur.items():
+            par_signature.setdefault(renommer(cle), Counter())[ip] += n
+        bornes = {}
+        for cle, (premiere, derniere) in self.bornes.items():
+            cle = renommer(cle)
+            if cle in bornes:
+                bornes[cle] = [min(bornes[cle][0], premiere), max(bornes[cle][1], derniere)]
+            else:
+                bornes[cle] = [premiere, derniere]
+        exemples = {}
+        for cle, exemple in self.exemples.items():
+            exemples.setdefault(renommer(cle), exemple)
+
+        signatures = []
+        for cle, n in occurrences.most_common():
+            moniteurs = par_signature.get(cle, Counter())
+            signatures.append({
+                "signature": cle if cle in self.libelles else "modele",
+                "libelle": self.libelle(cle),
+                "occurrences": n,
+                "part_pct": round(100 * n / self.lignes_erreur, 1),
+                "premiere": bornes.get(cle, (None, None))[0],
+                "derniere": bornes.get(cle, (None, None))[1],
+                "moniteurs": len(moniteurs),
+                "principaux_moniteurs": ", ".join(f"{ip} ({k})" for ip, k in moniteurs.most_common(3)),
+                "exemple": exemples.get(cle, ""),
+            })
+        tranches = []
+        for tranche, compteurs in self.tranches.items():
+            ligne = {"tranche": tranche, "total": sum(compteurs.values())}
+            for cle, n in compteurs.items():
+                libelle = self.libelle(renommer(cle))
+                ligne[libelle] = ligne.get(libelle, 0) + n
+            tranches.append(ligne)
+        moniteurs = []
+        for ip, n in self.par_moniteur.most_common(nb_moniteurs):
+            principale = max(((cle, k) for (cle, autre), k in self.signature_moniteur.items() if autre == ip),
+                             key=lambda c: c[1])
+            moniteurs.append({"moniteur": ip, "occurrences": n, "signature_principale": self.libelle(renommer(principale[0]))})
+        pic = max(tranches, key=lambda t: t["total"]) if tranches else None
+        return {
+            "fichiers": list(self.fichiers),
+            "octets": self.octets,
+            "lignes": self.lignes,
+            "lignes_erreur": self.lignes_erreur,
+            "duree_s": round(self.duree_s, 3),
+            "debit_mo_s": round(self.octets / self.duree_s / 1e6, 1) if self.duree_s else None,
+            "signatures": signatures,
+            "modeles": len(set(modeles.values())),
+            "moniteurs": moniteurs,
+            "moniteurs_cites": len(self.par_moniteur),
+            "tranches": tranches,
+            "tranche_min": self.tranche_min,
+            "pic": {"tranche": pic["tranche"], "total": pic["total"]} if pic else None,
+        }
+
+
+def _arbre(mots):
+    """Expression équivalente à l'alternative des mots, factorisée par préfixes communs.
+
+    Le moteur ne tente qu'une branche par octet au lieu de chaque mot à chaque position.
+    """
+    arbre = {}
+    for mot in mots:
+        noeud = arbre
+        for octet in mot:
+            noeud = noeud.setdefault(octet, {})
+        noeud[None] = {}
+
+    def rendu(noeud):
+        if None in noeud:
+            # Un mot s'arrête ici : la suite n'ajoute aucune ligne candidate
+            return b""
+        branches = [re.escape(bytes([octet])) + rendu(suite) for octet, suite in sorted(noeud.items())]
+        return branches[0] if len(branches) == 1 else b"(?:" + b"|".join(branches) + b")"
+
+    return rendu(arbre)
+
+
+def _decouper(chemin, nombre):
+    """Plages [début, fin) d'un fichier, coupées en fin de ligne, une par processus."""
+    taille = os.path.getsize(chemin)
+    bornes = [0]
+    with open(chemin, "rb") as f:
+        for i in range(1, nombre):
+            f.seek(max(bornes[-1], taille * i // nombre))
+            f.readline()
+            bornes.append(min(f.tell(), taille))
+    bornes.append(taille)
+    return [(a, b) for a, b in zip(bornes, bornes[1:]) if b > a]
+
+
+def _analyser_part(parametres):
+    chemin, debut, fin, (signatures, mots_cles, ip_centrale, tranche_min, modeles_max) = parametres
+    analyseur = AnalyseurLogs(signatures, mots_cles, ip_centrale, tranche_min, modeles_max)
+    with open(chemin, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as donnees:
+        analyseur.analyser_plage(donnees, debut, fin)
+    return analyseur
+
+
+def charger_signatures(chemin):
+    """Signatures supplémentaires JSON [{"cle", "libelle", "motif", "mots_cles": [...]}], placées avant les signatures fournies.
+
+    Le motif s'applique au message en minuscules ; `mots_cles` sont ses ancres : chaque alternative du motif
+    doit en contenir une, sauf si la ligne porte déjà un mot de gravité.
+    """
+    with open(chemin, encoding="utf-8") as f:
+        entrees = json.load(f)
+    signatures = tuple((e["cle"], e.get("libelle", e["cle"]), e["motif"], tuple(e.get("mots_cles", ()))) for e in entrees)
+    for _, _, motif, _ in signatures:
+        re.compile(motif)
+    return signatures + SIGNATURES, MOTS_CLES
+
+
+def evaluer_reponses(rapport, nb_signatures=3):
+    """Réponses de l'étape 6 : q_logs_erreur et type_erreur (signatures les plus fréquentes)."""
+    if not rapport["lignes"]:
+        return {}
+    if not rapport["lignes_erreur"]:
+        return {"q_logs_erreur": "Non"}
+    return {
+        "q_logs_erreur": "Oui",
+        "type_erreur": ", ".join(f"{s['libelle']} ({s['occurrences']})" for s in rapport["signatures"][:nb_signatures]),
+    }
+
+
+def enregistrer_dans_donnees(rapport, donnees_collectees):
+    """Reporte le résultat de l'analyse des logs dans donnees_collectees."""
+    donnees_collectees['Logs CI - lignes en erreur'] = f"{rapport['lignes_erreur']} / {rapport['lignes']}"
+    if rapport["signatures"]:
+        donnees_collectees['Logs CI - signatures'] = ", ".join(
+            f"{s['libelle']} ({s['occurrences']})" for s in rapport["signatures"][:5])
+    if rapport["moniteurs"]:
+        donnees_collectees['Logs CI - moniteurs les plus cités'] = ", ".join(
+            f"{m['moniteur']} ({m['occurrences']})" for m in rapport["moniteurs"][:5])
+    if rapport["pic"]:
+        donnees_collectees['Logs CI - pic'] = f"{rapport['pic']['tranche']} ({rapport['pic']['total']} erreurs)"
+
+
+def main(argv=None):
+    """Point d'entrée : analyse de logs du service CI en ligne de commande."""
+    parser = argparse.ArgumentParser(
+        description="Signatures d'erreur des logs du service CI",
+        epilog="Exemple : journalctl -u <service_ci> -o short-iso --since -1d | python analyse_logs.py -"
+    )
+    parser.add_argument("fichiers", nargs="+", help="Fichiers de logs (.gz accepté) ou « - » pour l'entrée standard")
+    parser.add_argument("--ip-centrale", help="IP de la centrale, exclue des moniteurs cités")
+    parser.add_argument("--tranche", type=int, default=1, help="Tranche de temps en minutes (1 à 60)")
+    parser.add_argument("--signatures", help="Signatures supplémentaires (JSON)")
+    parser.add_argument("-p", "--processus", type=int, default=1, help="Processus pour les gros fichiers (un cœur chacun)")
+    parser.add_argument("--top", type=int, default=10, help="Signatures et moniteurs affichés")
+    parser.add_argument("--json", help="Rapport complet exporté en JSON")
+    args = parser.parse_args(argv)
+
+    signatures, mots_cles = charger_signatures(args.signatures) if args.signatures else (SIGNATURES, MOTS_CLES)
+    analyseur = AnalyseurLogs(signatures, mots_cles, args.ip_centrale, max(1, min(60, args.tranche)))
+    try:
+        rapport = analyseur.analyser_fichiers(args.fichiers, args.processus)
+    except OSError as e:
+        print(f"❌ Lecture impossible : {e}")
+        return 2
+
+    print(f"📜 {rapport['lignes']} lignes, {rapport['octets'] / 1e6:.1f} Mo en {rapport['duree_s']} s "
+          f"({rapport['debit_mo_s']} Mo/s) : {rapport['lignes_erreur']} en erreur, {rapport['modeles']} modèle(s) extrait(s)")
+    for s in rapport["signatures"][:args.top]:
+        print(f"   {s['occurrences']:>9}  {s['part_pct']:>5} %  {s['libelle'][:70]:<70} {s['principaux_moniteurs']}")
+    if rapport["moniteurs"]:
+        print("   Moniteurs les plus cités : " + ", ".join(
+            f"{m['moniteur']} ({m['occurrences']})" for m in rapport["moniteurs"][:args.top]))
+    if rapport["pic"]:
+        print(f"   Pic : {rapport['pic']['tranche']} ({rapport['pic']['total']} erreurs)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+    return 1 if rapport["lignes_erreur"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse en flux du trafic multicast et IGMP d'une capture pcap/pcapng
+Index par groupe : émetteurs, période et gigue des annonces, joins/leaves IGMP, querier
+"""
+
+import math
+import struct
+
+from lecteur_capture import (PROTO_IGMP, PROTO_UDP, LecteurCapture, adresse_texte,
+                             localiser_ip, ports_udp)
+
+IGMP_QUERY = 0x11
+IGMP_V1_REPORT = 0x12
+IGMP_V2_REPORT = 0x16
+IGMP_V2_LEAVE = 0x17
+IGMP_V3_REPORT = 0x22
+
+# Types d'enregistrements IGMPv3 (RFC 3376)
+_V3_JOIN = (2, 4)        # MODE_IS_EXCLUDE, CHANGE_TO_EXCLUDE_MODE
+_V3_LEAVE = 3            # CHANGE_TO_INCLUDE_MODE (sans source = leave)
+_V3_ALLOW = 5
+
+_V3_ENREGISTREMENT = struct.Struct(">BBH4s")
+_U16 = struct.Struct(">H")
+
+
+class _Emetteur:
+    """Statistiques d'inter-arrivée d'un émetteur sur un groupe (Welford)."""
+
+    __slots__ = ("paquets", "octets", "premier_ts", "dernier_ts", "nb_ecarts", "moyenne", "m2")
+
+    def __init__(self, ts):
+        self.paquets = 0
+        self.octets = 0
+        self.premier_ts = ts
+        self.dernier_ts = None
+        self.nb_ecarts = 0
+        self.moyenne = 0.0
+        self.m2 = 0.0
+
+    def ajouter(self, ts, octets):
+        self.paquets += 1
+        self.octets += octets
+        if self.dernier_ts is not None:
+            ecart = ts - self.dernier_ts
+            self.nb_ecarts += 1
+            delta = ecart - self.moyenne
+            self.moyenne += delta / self.nb_ecarts
+            self.m2 += delta * (ecart - self.moyenne)
+        self.dernier_ts = ts
+
+    def gigue(self):
+        """Écart-type des inter-arrivées (s)."""
+        return math.sqrt(self.m2 / self.nb_ecarts) if self.nb_ecarts > 1 else 0.0
+
+
+class _Groupe:
+    """Index d'un groupe multicast : émetteurs, ports et événements IGMP."""
+
+    __slots__ = ("emetteurs", "ports", "joins", "leaves", "membres")
+
+    def __init__(self):
+        self.emetteurs = {}
+        self.ports = set()
+        self.joins = 0
+        self.leaves = 0
+        self.membres = set()
+
+
+class AnalyseurMulticast:
+    """Analyseur multicast/IGMP en un seul passage, mémoire proportionnelle au nombre de groupes."""
+
+    def __init__(self):
+        self.groupes = {}
+        self.queriers = {}
+        self.requetes_generales = 0
+        self.requetes_groupe = 0
+        self.paquets = 0
+        self.paquets_multicast = 0
+        self.paquets_igmp = 0
+        self.premier_ts = None
+        self.dernier_ts = None
+
+    def _groupe(self, groupe):
+        g = self.groupes.get(groupe)
+        if g is None:
+            g = self.groupes[groupe] = _Groupe()
+        return g
+
+    def traiter_donnees(self, ts, src, dst, octets, port=None):
+        """Intègre un paquet de données multicast (non IGMP)."""
+        self.paquets_multicast += 1
+        groupe = self._groupe(dst)
+        emetteur = groupe.emetteurs.get(src)
+        if emetteur is None:
+            emetteur = groupe.emetteurs[src] = _Emetteur(ts)
+        emetteur.ajouter(ts, octets)
+        if port is not None and len(groupe.ports) < 16:
+            groupe.ports.add(port)
+
+    def traiter_igmp(self, ts, src, donnees, debut, fin):
+        """Intègre un message IGMP (v1/v2/v3)."""
+        self.paquets_igmp += 1
+        if debut + 8 > fin:
+            return
+        type_igmp = donnees[debut]
+        groupe = donnees[debut + 4:debut + 8]
+        if type_igmp == IGMP_QUERY:
+            querier = self.queriers.get(src)
+            if querier is None:
+                querier = self.queriers[src] = {"requetes": 0, "premier_ts": ts, "dernier_ts": ts,
+                                                "version": 3 if fin - debut >= 12 else 2}
+            querier["requetes"] += 1
+            querier["dernier_ts"] = ts
+            if groupe == b"\x00\x00\x00\x00":
+                self.requetes_generales += 1
+            else:
+                self.requetes_groupe += 1
+        elif type_igmp in (IGMP_V1_REPORT, IGMP_V2_REPORT):
+            g = self._groupe(groupe)
+            g.joins += 1
+            g.membres.add(src)
+        elif type_igmp == IGMP_V2_LEAVE:
+            g = self._groupe(groupe)
+            g.leaves += 1
+            g.membres.discard(src)
+        elif type_igmp == IGMP_V3_REPORT:
+            self._traiter_igmpv3(src, donnees, debut, fin)
+
+    def _traiter_igmpv3(self, src, donnees, debut, fin):
+        nb = _U16.unpack_from(donnees, debut + 6)[0]
+        pos = debut + 8
+        for _ in range(nb):
+            if pos + 8 > fin:
+                break
+            type_enr, aux, nb_sources, groupe = _V3_ENREGISTREMENT.unpack_from(donnees, pos)
+            g = self._groupe(groupe)
+            if type_enr in _V3_JOIN or (type_enr == _V3_ALLOW and nb_sources):
+                g.joins += 1
+                g.membres.add(src)
+            elif type_enr == _V3_LEAVE and nb_sources == 0:
+                g.leaves += 1
+                g.membres.discard(src)
+            pos += 8 + 4 * nb_sources + 4 * aux
+
+    def analyser_fichier(self, chemin):
+        """Parcourt une capture en un seul passage et retourne le rapport."""
+        with LecteurCapture(chemin) as lecteur:
+            donnees = lecteur.donnees
+            for ts, linktype, debut, longueur in lecteur.paquets():
+                self.paquets += 1
+                if self.premier_ts is None:
+                    self.premier_ts = ts
+                self.dernier_ts = ts
+                ip, version = localiser_ip(donnees, linktype, debut, longueur)
+                if ip < 0:
+                    continue
+                fin = debut + longueur
+                if version == 4:
+                    if ip + 20 > fin:
+                        continue
+                    protocole = donnees[ip + 9]
+                    premier_octet = donnees[ip + 16]
+                    if protocole != PROTO_IGMP and not 224 <= premier_octet <= 239:
+                        continue
+                    l4 = ip + (donnees[ip] & 0x0F) * 4
+                    src = donnees[ip + 12:ip + 16]
+                    if protocole == PROTO_IGMP:
+                        # Longueur IGMP bornée par l'en-tête IP : le bourrage Ethernet (trame de 60 octets)
+                        # ferait passer une requête v2 de 8 octets pour une requête v3
+                        longueur_ip = _U16.unpack_from(donnees, ip + 2)[0]
+                        self.traiter_igmp(ts, src, donnees, l4, min(fin, ip + longueur_ip) if longueur_ip else fin)
+                        continue
+                    octets = _U16.unpack_from(donnees, ip + 2)[0]
+                    dst = donnees[ip + 16:ip + 20]
+                else:
+                    if ip + 40 > fin or donnees[ip + 24] != 0xFF:
+                        continue
+                    protocole = donnees[ip + 6]
+                    l4 = ip + 40
+                    src = donnees[ip + 8:ip + 24]
+                    dst = donnees[ip + 24:ip + 40]
+                    octets = 40 + _U16.unpack_from(donnees, ip + 4)[0]
+                port = None
+                if protocole == PROTO_UDP:
+                    ports = ports_udp(donnees, l4, fin)
+                    if ports is not None:
+                        port = ports[1]
+                self.traiter_donnees(ts, src, dst, octets, port)
+        return self.rapport()
+
+    def rapport(self):
+        """Rapport par groupe (IP texte), querier et compteurs IGMP."""
+        groupes = {}
+        for brute, g in self.groupes.items():
+            emetteurs = {}
+            for src, e in g.emetteurs.items():
+                emetteurs[adresse_texte(src)] = {
+                    "paquets": e.paquets,
+                    "octets": e.octets,
+                    "periode_s": round(e.moyenne, 3) if e.nb_ecarts else None,
+                    "gigue_s": round(e.gigue(), 3),
+                }
+            periodes = [e["periode_s"] for e in emetteurs.values() if e["periode_s"] is not None]
+            groupes[adresse_texte(brute)] = {
+                "paquets": sum(e["paquets"] for e in emetteurs.values()),
+                "emetteurs": emetteurs,
+                "ports_udp": sorted(g.ports),
+                "periode_s": round(sum(periodes) / len(periodes), 3) if periodes else None,
+                "gigue_max_s": max((e["gigue_s"] for e in emetteurs.values()), default=0.0),
+                "joins": g.joins,
+                "leaves": g.leaves,
+                "membres": sorted(adresse_texte(m) for m in g.membres),
+            }
+        return {
+            "groupes": groupes,
+            "queriers": {adresse_texte(ip): q for ip, q in self.queriers.items()},
+            "requetes_generales": self.requetes_generales,
+            "requetes_groupe": self.requetes_groupe,
+            "paquets": self.paquets,
+            "paquets_multicast": self.paquets_multicast,
+            "paquets_igmp": self.paquets_igmp,
+            "duree_s": round(self.dernier_ts - self.premier_ts, 3) if self.paquets else 0.0,
+        }
+
+
+def groupes_actifs(rapport, limite=10):
+    """Groupes ayant reçu du trafic de données, du plus au moins actif."""
+    actifs = [(ip, g) for ip, g in rapport["groupes"].items() if g["paquets"]]
+    actifs.sort(key=lambda item: item[1]["paquets"], reverse=True)
+    return [ip for ip, _ in actifs[:limite]]
+
+
+def evaluer_reponses(rapport):
+    """Déduit les réponses de l'étape 7 (multicast) depuis le rapport."""
+    groupes = groupes_actifs(rapport)
+    reponses = {
+        "q_multicast_visible": "Oui" if groupes else "Non",
+        "q_querier": "Oui" if rapport["queriers"] else "Non",
+    }
+    if groupes:
+        reponses["groupes_multicast"] = ", ".join(groupes)
+    return reponses
+
+
+def enregistrer_dans_donnees(rapport, donnees_collectees):
+    """Reporte le résultat de l'analyse multicast dans donnees_collectees."""
+    groupes = groupes_actifs(rapport)
+    if groupes:
+        donnees_collectees['Groupes multicast'] = ", ".join(groupes)
+    donnees_collectees['IGMP Querier'] = ", ".join(rapport["queriers"]) or "absent"
+    joins = sum(g["joins"] for g in rapport["groupes"].values())
+    leaves = sum(g["leaves"] for g in rapport["groupes"].values())
+    donnees_collectees['IGMP joins/leaves'] = f"{joins} / {leaves}"
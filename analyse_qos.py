@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistiques DSCP/QoS vectorisées sur une capture pcap/pcapng
+Les en-têtes IPv4/TCP/UDP sont décodés en colonnes NumPy puis agrégés avec pandas
+"""
+
+import socket
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from diagnostic_ci import GuideDiagnosticCI
+from lecteur_capture import (LINKTYPE_ETHERNET, LINKTYPE_IPV4, LINKTYPE_LINUX_SLL,
+                             LINKTYPE_LINUX_SLL2, LINKTYPE_LOOP, LINKTYPE_NULL, LINKTYPE_RAW,
+                             PROTO_TCP, PROTO_UDP, TCP_ACK, TCP_FIN, TCP_RST, TCP_SYN,
+                             LecteurCapture)
+
+# EF (46) pour la voix ; ajuster selon la politique QoS du site
+DSCP_ATTENDUS_DEFAUT = (46,)
+SEUIL_MAL_MARQUES = 0.01
+SEUIL_WINDOW_FULL = 0.01
+TRANCHE_DEFAUT_S = 10
+
+
+def _u16(buf, pos):
+    return (buf[pos].astype(np.uint32) << 8) | buf[pos + 1]
+
+
+def _u32(buf, pos):
+    return ((buf[pos].astype(np.uint32) << 24) | (buf[pos + 1].astype(np.uint32) << 16)
+            | (buf[pos + 2].astype(np.uint32) << 8) | buf[pos + 3])
+
+
+def _localiser_ipv4(buf, linktype, debut, fin):
+    """Décalage de l'en-tête IPv4 de chaque paquet (-1 si non IPv4), calculé par type de lien."""
+    ip = np.full(len(debut), -1, dtype=np.int64)
+
+    masque = (linktype == LINKTYPE_ETHERNET) & (fin - debut >= 18)
+    if masque.any():
+        d = debut[masque]
+        ethertype = _u16(buf, d + 12)
+        vlan = (ethertype == 0x8100) | (ethertype == 0x88A8)
+        decalage = np.where(vlan, 18, 14)
+        ethertype = np.where(vlan, _u16(buf, d + 16), ethertype)
+        ip[masque] = np.where(ethertype == 0x0800, d + decalage, -1)
+
+    masque = (linktype == LINKTYPE_LINUX_SLL) & (fin - debut >= 16)
+    if masque.any():
+        d = debut[masque]
+        ip[masque] = np.where(_u16(buf, d + 14) == 0x0800, d + 16, -1)
+
+    masque = (linktype == LINKTYPE_LINUX_SLL2) & (fin - debut >= 20)
+    if masque.any():
+        d = debut[masque]
+        ip[masque] = np.where(_u16(buf, d) == 0x0800, d + 20, -1)
+
+    for types, saut in (((LINKTYPE_RAW, LINKTYPE_IPV4), 0), ((LINKTYPE_NULL, LINKTYPE_LOOP), 4)):
+        masque = np.isin(linktype, types) & (fin - debut > saut)
+        if masque.any():
+            d = debut[masque] + saut
+            ip[masque] = np.where(buf[d] >> 4 == 4, d, -1)
+
+    ip[(ip >= 0) & (ip + 20 > fin)] = -1
+    return ip
+
+
+def _facteur_echelle(entete):
+    """Option TCP window scale d'un en-tête SYN (octets bruts), -1 si absente."""
+    pos = 20
+    limite = min((entete[12] >> 4) * 4, len(entete))
+    while pos < limite:
+        kind = entete[pos]
+        if kind == 0:
+            break
+        if kind == 1:
+            pos += 1
+            continue
+        if pos + 1 >= limite:
+            break
+        longueur = entete[pos + 1]
+        if kind == 3 and longueur == 3 and pos + 2 < limite:
+            return min(entete[pos + 2], 14)
+        if longueur < 2:
+            break
+        pos += longueur
+    return -1
+
+
+def extraire_colonnes(chemin):
+    """Décode les en-têtes IPv4/TCP/UDP d'une capture en DataFrame colonnaire.
+
+    Un seul passage Python relève les positions des paquets ; tout le décodage
+    des champs se fait ensuite par indexation vectorisée dans le fichier projeté.
+    """
+    horodatages = array("d")
+    linktypes = array("H")
+    debuts = array("q")
+    longueurs = array("q")
+    with LecteurCapture(chemin) as lecteur:
+        for ts, linktype, debut, longueur in lecteur.paquets():
+            horodatages.append(ts)
+            linktypes.append(linktype)
+            debuts.append(debut)
+            longueurs.append(longueur)
+
+        buf = np.frombuffer(lecteur.donnees, dtype=np.uint8) if len(horodatages) else np.zeros(0, np.uint8)
+        ts = np.frombuffer(horodatages, dtype=np.float64)
+        debut = np.frombuffer(debuts, dtype=np.int64)
+        fin = debut + np.frombuffer(longueurs, dtype=np.int64)
+        ip = _localiser_ipv4(buf, np.frombuffer(linktypes, dtype=np.uint16), debut, fin)
+
+        garde = ip >= 0
+        ts, ip, fin = ts[garde], ip[garde], fin[garde]
+        colonnes = {
+            "ts": ts,
+            "src": _u32(buf, ip + 12),
+            "dst": _u32(buf, ip + 16),
+            "proto": buf[ip + 9],
+            "dscp": buf[ip + 1] >> 2,
+            "ecn": buf[ip + 1] & 0x03,
+            "longueur": _u16(buf, ip + 2),
+        }
+        ihl = (buf[ip] & 0x0F).astype(np.int64) * 4
+        l4 = ip + ihl
+        non_fragment = (_u16(buf, ip + 6) & 0x1FFF) == 0
+        tcp = (colonnes["proto"] == PROTO_TCP) & non_fragment & (l4 + 20 <= fin)
+        udp = (colonnes["proto"] == PROTO_UDP) & non_fragment & (l4 + 8 <= fin)
+        ports = tcp | udp
+
+        n = len(ts)
+        sport = np.zeros(n, np.uint16)
+        dport = np.zeros(n, np.uint16)
+        sport[ports] = _u16(buf, l4[ports])
+        dport[ports] = _u16(buf, l4[ports] + 2)
+        seq = np.zeros(n, np.uint32)
+        ack = np.zeros(n, np.uint32)
+        flags = np.zeros(n, np.uint8)
+        fenetre = np.zeros(n, np.uint32)
+        charge = np.zeros(n, np.int64)
+        echelle = np.full(n, -1, np.int8)
+        if tcp.any():
+            t = l4[tcp]
+            seq[tcp] = _u32(buf, t + 4)
+            ack[tcp] = _u32(buf, t + 8)
+            flags[tcp] = buf[t + 13]
+            fenetre[tcp] = _u16(buf, t + 14)
+            charge[tcp] = colonnes["longueur"][tcp] - ihl[tcp] - (buf[t + 12] >> 4).astype(np.int64) * 4
+            # Les SYN sont rares : leurs options sont lues une à une
+            for i in np.flatnonzero(tcp & ((flags & TCP_SYN) != 0)):
+                echelle[i] = _facteur_echelle(lecteur.donnees[l4[i]:min(fin[i], l4[i] + 60)])
+        # Aucune vue sur le fichier projeté ne doit survivre à sa fermeture
+        del buf
+
+    colonnes.update(sport=sport, dport=dport, seq=seq, ack=ack, flags=flags,
+                    fenetre=fenetre, charge=np.maximum(charge, 0), echelle=echelle)
+    return pd.DataFrame(colonnes)
+
+
+def _ip_texte(valeurs):
+    """Convertit une colonne d'IPv4 entières en texte (une conversion par adresse distincte)."""
+    uniques, inverse = np.unique(np.asarray(valeurs, dtype=np.uint32), return_inverse=True)
+    textes = np.array([socket.inet_ntoa(int(u).to_bytes(4, "big")) for u in uniques], dtype=object)
+    return textes[inverse]
+
+
+def histogramme_dscp_flux(df):
+    """Histogramme DSCP par flux (src, dst, proto, ports) : une colonne par valeur DSCP."""
+    if df.empty:
+        return pd.DataFrame()
+    histo = (df.groupby(["src", "dst", "proto", "sport", "dport", "dscp"], sort=False)
+               .size().unstack("dscp", fill_value=0))
+    histo.columns = [f"dscp_{c}" for c in histo.columns]
+    histo = histo.reset_index()
+    histo["src"] = _ip_texte(histo["src"])
+    histo["dst"] = _ip_texte(histo["dst"])
+    return histo
+
+
+def sessions_ci(df, port=None):
+    """Sous-ensemble TCP du port CI, avec identifiant de session et sens (1 = moniteur → centrale)."""
+    port = port if port is not None else GuideDiagnosticCI().get_ci_port()
+    ci = df[(df["proto"] == PROTO_TCP) & ((df["dport"] == port) | (df["sport"] == port))].copy()
+    vers_centrale = (ci["dport"] == port).to_numpy()
+    ci["sens"] = vers_centrale.astype(np.int8)
+    ci["moniteur"] = np.where(vers_centrale, ci["src"], ci["dst"])
+    ci["port_moniteur"] = np.where(vers_centrale, ci["sport"], ci["dport"])
+    ci["centrale"] = np.where(vers_centrale, ci["dst"], ci["src"])
+    ci["session"] = ci.groupby(["moniteur", "port_moniteur", "centrale"], sort=False).ngroup()
+    return ci
+
+
+def marquer_window_full(ci):
+    """Ajoute les colonnes window_full et zero_window aux segments CI (équivalent tcp.analysis.*).
+
+    Un segment de données remplit la fenêtre lorsque seq + longueur atteint
+    le dernier ACK + fenêtre annoncés par le pair, facteur d'échelle inclus.
+    """
+    ci = ci.sort_values("ts", kind="stable")
+    flags = ci["flags"].to_numpy()
+    ci["zero_window"] = ((ci["fenetre"] == 0) & ((flags & (TCP_SYN | TCP_FIN | TCP_RST)) == 0)
+                         & ((flags & TCP_ACK) != 0))
+
+    # Facteur d'échelle : valable seulement si annoncé dans les deux sens
+    echelle = ci[ci["echelle"] >= 0].groupby(["session", "sens"])["echelle"].first()
+    sens_annonces = echelle.groupby(level="session").size()
+    echelle = echelle[echelle.index.get_level_values("session").isin(sens_annonces[sens_annonces == 2].index)]
+
+    pairs = ci[(flags & TCP_ACK) != 0][["ts", "session", "sens", "ack", "fenetre"]].copy()
+    pairs["sens"] = 1 - pairs["sens"]
+    # Le facteur appliqué à la fenêtre est celui annoncé par l'émetteur du ACK
+    cle = pd.MultiIndex.from_arrays([pairs["session"], 1 - pairs["sens"]], names=["session", "sens"])
+    facteur = echelle.reindex(cle).fillna(0).to_numpy(np.int64)
+    pairs["fenetre_pair"] = pairs["fenetre"].to_numpy(np.int64) << facteur
+    pairs = pairs.rename(columns={"ack": "ack_pair"}).drop(columns="fenetre")
+
+    donnees = ci[ci["charge"] > 0][["ts", "session", "sens", "seq", "charge"]].reset_index()
+    fusion = pd.merge_asof(donnees, pairs, on="ts", by=["session", "sens"],
+                           allow_exact_matches=False, direction="backward")
+    connu = fusion["ack_pair"].notna().to_numpy()
+    fin_seq = fusion["seq"].to_numpy(np.int64) + fusion["charge"].to_numpy(np.int64)
+    en_vol = (fin_seq - fusion["ack_pair"].fillna(0).to_numpy(np.int64)) & 0xFFFFFFFF
+    fenetre_pair = fusion["fenetre_pair"].fillna(0).to_numpy(np.int64)
+    plein = connu & (fenetre_pair > 0) & (en_vol >= fenetre_pair) & (en_vol < 0x80000000)
+
+    ci["window_full"] = False
+    ci.loc[fusion["index"].to_numpy()[plein], "window_full"] = True
+    return ci
+
+
+def statistiques_sessions(ci, dscp_attendus=DSCP_ATTENDUS_DEFAUT):
+    """Histogramme DSCP et ratio de paquets mal marqués par session 24005."""
+    if ci.empty:
+        return pd.DataFrame()
+    ci = ci.assign(mal_marque=~ci["dscp"].isin(dscp_attendus))
+    groupe = ci.groupby(["session", "moniteur", "port_moniteur", "centrale"], sort=False)
+    stats = groupe.agg(paquets=("ts", "size"), debut=("ts", "min"), fin=("ts", "max"),
+                       mal_marques=("mal_marque", "sum"), window_full=("window_full", "sum"),
+                       zero_window=("zero_window", "sum"))
+    histo = ci.groupby(["session", "sens", "dscp"]).size().unstack(["sens", "dscp"], fill_value=0)
+    histo.columns = [f"{'m→c' if sens else 'c→m'}_dscp_{dscp}" for sens, dscp in histo.columns]
+    stats = stats.reset_index().merge(histo, left_on="session", right_index=True, how="left")
+    stats["ratio_mal_marques"] = (stats["mal_marques"] / stats["paquets"]).round(4)
+    stats["moniteur"] = _ip_texte(stats["moniteur"])
+    stats["centrale"] = _ip_texte(stats["centrale"])
+    return stats
+
+
+def statistiques_tranches(df, ci, taille_s=TRANCHE_DEFAUT_S, dscp_attendus=DSCP_ATTENDUS_DEFAUT):
+    """Par tranche de temps : volume, paquets CI mal marqués et taux de window_full."""
+    if df.empty:
+        return pd.DataFrame()
+    origine = df["ts"].min()
+    total = df.groupby(((df["ts"] - origine) // taille_s).astype(np.int64)).size().rename("paquets")
+    tranches = pd.DataFrame(total)
+    if not ci.empty:
+        tranche_ci = ((ci["ts"] - origine) // taille_s).astype(np.int64)
+        groupe = ci.assign(mal_marque=~ci["dscp"].isin(dscp_attendus),
+                           donnees=ci["charge"] > 0).groupby(tranche_ci)
+        tranches = tranches.join(groupe.agg(paquets_ci=("ts", "size"), mal_marques=("mal_marque", "sum"),
+                                            segments=("donnees", "sum"), window_full=("window_full", "sum"),
+                                            zero_window=("zero_window", "sum")))
+        tranches = tranches.fillna(0)
+        tranches["ratio_mal_marques"] = (tranches["mal_marques"] / tranches["paquets_ci"].where(tranches["paquets_ci"] > 0)).fillna(0).round(4)
+        tranches["taux_window_full"] = (tranches["window_full"] / tranches["segments"].where(tranches["segments"] > 0)).fillna(0).round(4)
+    tranches.index = pd.to_datetime(origine + tranches.index * taille_s, unit="s")
+    tranches.index.name = "tranche"
+    return tranches
+
+
+def analyser_qos(chemin, port=None, dscp_attendus=DSCP_ATTENDUS_DEFAUT, taille_tranche_s=TRANCHE_DEFAUT_S):
+    """Analyse complète : colonnes, histogrammes par flux et par session 24005, tranches de temps."""
+    df = extraire_colonnes(chemin)
+    ci = marquer_window_full(sessions_ci(df, port))
+    mal_marques = int((~ci["dscp"].isin(dscp_attendus)).sum()) if not ci.empty else 0
+    segments = int((ci["charge"] > 0).sum()) if not ci.empty else 0
+    return {
+        "paquets_ipv4": len(df),
+        "paquets_ci": len(ci),
+        "dscp_global": df["dscp"].value_counts().sort_index().to_dict(),
+        "ratio_mal_marques": round(mal_marques / len(ci), 4) if len(ci) else 0.0,
+        "taux_window_full": round(int(ci["window_full"].sum()) / segments, 4) if segments else 0.0,
+        "zero_window": int(ci["zero_window"].sum()) if not ci.empty else 0,
+        "flux": histogramme_dscp_flux(df),
+        "sessions": statistiques_sessions(ci, dscp_attendus),
+        "tranches": statistiques_tranches(df, ci, taille_tranche_s, dscp_attendus),
+    }
+
+
+def evaluer_reponses(rapport, seuil_mal_marques=SEUIL_MAL_MARQUES, seuil_window_full=SEUIL_WINDOW_FULL):
+    """Déduit q_dscp et q_congestion depuis le rapport (sans trafic CI : pas de réponse)."""
+    if not rapport["paquets_ci"]:
+        return {}
+    congestion = rapport["taux_window_full"] > seuil_window_full or rapport["zero_window"] > 0
+    return {
+        "q_dscp": "Oui" if rapport["ratio_mal_marques"] <= seuil_mal_marques else "Non",
+        "q_congestion": "Oui" if congestion else "Non",
+    }
+
+
+def enregistrer_dans_donnees(rapport, donnees_collectees):
+    """Reporte le résumé QoS dans donnees_collectees."""
+    donnees_collectees['Paquets CI analysés'] = rapport["paquets_ci"]
+    if rapport["paquets_ci"]:
+        donnees_collectees['CI mal marqués (%)'] = round(100 * rapport["ratio_mal_marques"], 2)
+        donnees_collectees['CI window_full (%)'] = round(100 * rapport["taux_window_full"], 2)
+        donnees_collectees['CI zero_window'] = rapport["zero_window"]
@@ -5,9 +5,47 @@ Application Streamlit pour le Guide de Diagnostic Réseau CI
 """
 
 import streamlit as st
-import json
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
 from datetime import datetime
+from functools import wraps
 from diagnostic_ci import GuideDiagnosticCI
+from arbre_diagnostic import formater, graphe
+from scanner_ci import ETAT_OUVERT, ETAT_REFUSE, ETAT_TIMEOUT, resumer_scan
+from scanner_ci import enregistrer_dans_donnees as enregistrer_scan
+from echantillonneur_latence import evaluer_reponses
+from echantillonneur_latence import enregistrer_dans_donnees as enregistrer_latence
+from lecteur_capture import ErreurCapture
+from analyse_handshake import evaluer_reponses as evaluer_handshake
+from analyse_handshake import enregistrer_dans_donnees as enregistrer_handshake
+from analyse_multicast import evaluer_reponses as evaluer_multicast
+from analyse_multicast import enregistrer_dans_donnees as enregistrer_multicast
+from analyse_qos import evaluer_reponses as evaluer_qos
+from analyse_qos import enregistrer_dans_donnees as enregistrer_qos
+from parseur_switch import analyser_sortie, fiche_moniteur
+from parseur_switch import evaluer_reponses as evaluer_cli_switch
+from parseur_switch import enregistrer_dans_donnees as enregistrer_cli_switch
+from taux_interfaces import MoteurCompteurs, horodatage_sortie
+from taux_interfaces import evaluer_reponses as evaluer_taux_erreurs
+from taux_interfaces import enregistrer_dans_donnees as enregistrer_taux_erreurs
+from conflits_ip import DetecteurConflits
+from conflits_ip import evaluer_reponses as evaluer_conflits
+from conflits_ip import enregistrer_dans_donnees as enregistrer_conflits
+from plan_adressage import enregistrer_dans_donnees as enregistrer_plan
+from sonde_applicative import ETAT_REPOND, resumer_sondes
+from sonde_applicative import evaluer_reponses as evaluer_sonde
+from sonde_applicative import enregistrer_dans_donnees as enregistrer_sonde
+from table_sockets import evaluer_reponses as evaluer_sockets
+from table_sockets import enregistrer_dans_donnees as enregistrer_sockets
+from analyse_logs import evaluer_reponses as evaluer_logs
+from analyse_logs import enregistrer_dans_donnees as enregistrer_logs
+from reconnexions_ci import evaluer_reponses as evaluer_reconnexions
+from reconnexions_ci import enregistrer_dans_donnees as enregistrer_reconnexions
 
 # Configuration de la page
 st.set_page_config(
@@ -51,14 +89,131 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def graphe_diagnostic():
+    """Arbre de diagnostic compilé, partagé par toutes les sessions du processus."""
+    return graphe()
+
+@st.cache_data
+def libelles_etapes():
+    """Libellés du menu de navigation (contenu statique)."""
+    return [etape.menu for etape in graphe_diagnostic().etapes]
+
+def chronometrer(fonction):
+    """Mesure la durée de rendu d'une fonction et l'agrège dans la session."""
+    @wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        debut = time.perf_counter()
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            duree_ms = (time.perf_counter() - debut) * 1000
+            mesures = st.session_state.setdefault('temps_rendu', {})
+            mesure = mesures.setdefault(fonction.__name__, {"appels": 0, "dernier_ms": 0.0, "total_ms": 0.0, "max_ms": 0.0})
+            mesure["appels"] += 1
+            mesure["dernier_ms"] = round(duree_ms, 2)
+            mesure["total_ms"] = round(mesure["total_ms"] + duree_ms, 2)
+            mesure["max_ms"] = round(max(mesure["max_ms"], duree_ms), 2)
+    return enveloppe
+
+def chemin_journal():
+    """Journal JSONL de la session si CI_DOSSIER_JOURNAUX est défini, sinon historique en mémoire."""
+    dossier = os.environ.get("CI_DOSSIER_JOURNAUX")
+    if not dossier:
+        return None
+    return os.path.join(dossier, f"session_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+
+@st.cache_resource
+def archive_rapports():
+    """Archive SQLite des rapports (CI_ARCHIVE), ouverte une fois par processus."""
+    chemin = os.environ.get("CI_ARCHIVE")
+    if not chemin or not os.path.exists(chemin):
+        return None
+    from archive_rapports import ArchiveRapports
+    return ArchiveRapports(chemin)
+
+@st.cache_resource
+def plan_adressage(chemin, mtime):
+    """Plan d'adressage indexé, chargé une fois par fichier (et par version du fichier)."""
+    from plan_adressage import PlanAdressage
+    return PlanAdressage.depuis_fichier(chemin)
+
+def plan_courant():
+    """Plan d'adressage désigné par CI_PLAN_ADRESSAGE, ou None."""
+    chemin = os.environ.get("CI_PLAN_ADRESSAGE")
+    if not chemin or not os.path.exists(chemin):
+        return None
+    return plan_adressage(chemin, os.path.getmtime(chemin))
+
+@st.cache_resource
+def executeur_taches():
+    """Pool des vérifications en arrière-plan, partagé par toutes les sessions du processus."""
+    from taches_fond import ExecuteurTaches
+    return ExecuteurTaches()
+
+def lancer_tache(nom, cle, fonction, *args, **kwargs):
+    """Soumet fonction(guide, *args) en arrière-plan, ou rejoint la même vérification déjà lancée."""
+    tache = executeur_taches().soumettre(cle, fonction, *args, **kwargs)
+    st.session_state.taches[nom] = tache
+    return tache
+
+def tache_terminee(nom, erreurs=()):
+    """Résultat de la tâche `nom` à sa première lecture une fois terminée ; sinon None (progression affichée)."""
+    tache = st.session_state.taches.get(nom)
+    if tache is None or st.session_state.taches_lues.get(nom) == tache.id:
+        return None
+    if not tache.terminee():
+        suivre_tache(nom)
+        return None
+    st.session_state.taches_lues[nom] = tache.id
+    if tache.erreur is not None:
+        message = next((message for classe, message in erreurs if isinstance(tache.erreur, classe)), "Vérification en échec")
+        st.error(f"{message} : {tache.erreur}")
+        return None
+    # Les étapes journalisées par la tâche rejoignent l'historique de cette session
+    for entree in tache.historique:
+        st.session_state.diagnostic.log_etape(entree["etape"], entree["reponse"], entree["action"])
+    return tache.resultat
+
+def _suivre_tache(nom):
+    tache = st.session_state.taches[nom]
+    if tache.terminee():
+        st.rerun()
+    texte = f"⏳ En cours depuis {tache.ecoule():.0f} s"
+    if tache.abonnes > 1:
+        texte += f" (partagée par {tache.abonnes} demandes)"
+    progression = tache.progression()
+    if progression is None:
+        st.info(texte)
+    else:
+        st.progress(progression, text=texte)
+    if not hasattr(st, "fragment"):
+        st.button("🔄 Actualiser", key=f"actualiser_{nom}")
+
+# Seule la progression est réexécutée chaque seconde ; la fin de la tâche relance toute la page
+suivre_tache = st.fragment(run_every=1)(_suivre_tache) if hasattr(st, "fragment") else _suivre_tache
+
+def cle_fichier(chemin):
+    """Identifie une capture par chemin, date de modification et taille (cache des analyses)."""
+    try:
+        infos = os.stat(chemin)
+    except OSError:
+        return (chemin,)
+    return (chemin, infos.st_mtime_ns, infos.st_size)
+
 def initialiser_session():
     """Initialise les variables de session."""
     if 'diagnostic' not in st.session_state:
-        st.session_state.diagnostic = GuideDiagnosticCI()
+        st.session_state.diagnostic = GuideDiagnosticCI(chemin_journal())
     if 'etape_actuelle' not in st.session_state:
         st.session_state.etape_actuelle = 0
     if 'donnees_collectees' not in st.session_state:
         st.session_state.donnees_collectees = {}
+    if 'temps_rendu' not in st.session_state:
+        st.session_state.temps_rendu = {}
+    if 'taches' not in st.session_state:
+        st.session_state.taches = {}
+        st.session_state.taches_lues = {}
 
 def afficher_entete():
     """Affiche l'en-tête de l'application."""
@@ -78,22 +233,13 @@ def afficher_entete():
     # Avertissement important
     st.warning("⚠️ **LIMITATION IMPORTANTE** : Les moniteurs ne permettent PAS l'exécution de commandes réseau. Toutes les commandes sont à exécuter depuis la **centrale de surveillance**.")
 
+@chronometrer
 def afficher_sidebar():
     """Affiche la barre latérale avec navigation."""
     with st.sidebar:
         st.header("📋 Navigation")
         
-        etapes = [
-            "0️⃣ Configuration Initiale",
-            "1️⃣ Découverte LLDP",
-            "2️⃣ Couche Physique",
-            "3️⃣ Couche IP",
-            "4️⃣ Connectivité",
-            "5️⃣ Port CI (24005)",
-            "6️⃣ Couche Applicative",
-            "7️⃣ Trafic Multicast",
-            "8️⃣ QoS et Priorisation"
-        ]
+        etapes = libelles_etapes()
         
         etape_selectionnee = st.radio(
             "Sélectionner une étape",
@@ -109,725 +255,715 @@ def afficher_sidebar():
         # Résumé des données collectées
         if st.session_state.donnees_collectees:
             st.subheader("📊 Données collectées")
-            for cle, valeur in st.session_state.donnees_collectees.items():
-                st.text(f"{cle}: {valeur}")
+            st.text("\n".join(f"{cle}: {valeur}" for cle, valeur in st.session_state.donnees_collectees.items()))
         
         st.markdown("---")
         
         # Boutons d'action
         if st.button("🔄 Réinitialiser", use_container_width=True):
+            for chemin in st.session_state.get('televersements', {}).values():
+                supprimer_televersement(chemin)
             st.session_state.clear()
             st.rerun()
         
         if st.button("💾 Exporter rapport", use_container_width=True):
             exporter_rapport()
 
-def etape_configuration_initiale():
-    """Étape 0: Configuration initiale."""
-    st.header("0️⃣ Configuration Initiale du Moniteur")
-    
-    st.info("Cette étape vérifie la configuration de base du moniteur avant le diagnostic réseau.")
-    
-    with st.expander("📋 Informations sur cette étape", expanded=True):
-        st.markdown("""
-        **Points vérifiés :**
-        - Configuration du label ou port mapping
-        - Assignation dans la centrale
-        - Activation des fonctionnalités
-        """)
-    
-    # Question 1: Label/Port mapping
-    col1, col2 = st.columns(2)
-    with col1:
-        label_config = st.radio(
-            "Avez-vous configuré un label sur le moniteur ou utilisez-vous le port mapping ?",
-            ["Oui", "Non"],
-            key="q_label_config"
-        )
-    
-    if label_config == "Non":
-        st.error("⚠️ **ACTION REQUISE:** Configuration du label nécessaire")
-        with st.expander("📝 Détails de la correction"):
-            st.markdown("""
-            1. Configurer un label unique sur le moniteur
-            2. OU activer le port mapping automatique
-            3. Vérifier que le label ne conflit pas avec un autre équipement
-            """)
-        
-        with col2:
-            auto_mapping = st.radio(
-                "Le port mapping automatique est-il activé sur la centrale ?",
-                ["Oui", "Non"],
-                key="q_auto_mapping"
-            )
-        
-        if auto_mapping == "Non":
-            st.error("Configuration nécessaire côté centrale pour la découverte automatique")
-    
-    # Question 2: Assignation
-    assignation = st.radio(
-        "Le moniteur est-il correctement assigné/déclaré dans l'application centrale ?",
-        ["Oui", "Non"],
-        key="q_assignation"
-    )
-    
-    if assignation == "Non":
-        st.error("⚠️ **ACTION REQUISE:** Assignation du moniteur dans la centrale")
-        with st.expander("📝 Détails de la correction"):
-            st.markdown("""
-            1. Ajouter le moniteur dans l'interface de gestion
-            2. Associer le bon label/adresse au moniteur
-            3. Vérifier les droits/autorisations du moniteur
-            4. Sauvegarder et appliquer la configuration
-            """)
-        
-        statut = st.radio(
-            "Le moniteur apparaît-il comme 'En ligne' dans l'interface de la centrale ?",
-            ["Oui", "Non"],
-            key="q_statut_interface"
-        )
-    
-    # Question 3: Fonctionnalités
-    fonctionnalites = st.radio(
-        "Toutes les fonctionnalités du moniteur sont-elles activées (appel, diffusion, etc.) ?",
-        ["Oui", "Non"],
-        key="q_fonctionnalites"
-    )
-    
-    if fonctionnalites == "Non":
-        st.warning("Vérifier la configuration des fonctionnalités - Activer les services nécessaires")
-    
-    # Navigation
-    if st.button("➡️ Étape suivante : Découverte LLDP", use_container_width=True):
-        st.session_state.etape_actuelle = 1
-        st.rerun()
+        if archive_rapports() is not None:
+            st.checkbox("🗄️ Historique des diagnostics", key='vue_historique')
+        st.checkbox("⏱️ Mode debug", key='mode_debug')
 
-def etape_lldp():
-    """Étape 1: Découverte LLDP."""
-    st.header("1️⃣ Découverte LLDP - Topologie Réseau")
-    
-    st.info("LLDP permet d'identifier la topologie réseau et la configuration du port switch.")
-    
-    with st.expander("🔍 Commandes LLDP utiles", expanded=False):
-        st.code("""
-# Vérifier LLDP sur le switch
-show lldp neighbors
-show lldp neighbors detail
-
-# Activer LLDP (Cisco)
-lldp run
-
-# Informations du port
-show lldp interface <interface>
-        """, language="bash")
-    
-    # Question LLDP activé
-    lldp_active = st.radio(
-        "LLDP est-il activé sur le switch connecté au moniteur ?",
-        ["Oui", "Non"],
-        key="q_lldp_active"
-    )
-    
-    if lldp_active == "Non":
-        st.warning("⚠️ Activer LLDP sur le switch : `lldp run`")
-    else:
-        # Moniteur visible
-        lldp_visible = st.radio(
-            "Le moniteur est-il visible dans 'show lldp neighbors' sur le switch ?",
-            ["Oui", "Non"],
-            key="q_lldp_visible"
+def afficher_debug():
+    """Panneau de debug : temps de rendu mesurés pour cette session, vérifications en cours."""
+    en_cours = executeur_taches().en_cours()
+    if en_cours:
+        st.caption("⏳ Vérifications en arrière-plan (toutes sessions) : "
+                   + ", ".join(f"{tache.cle[0]} {tache.ecoule():.0f} s" for tache in en_cours))
+    with st.expander("⏱️ Temps de rendu", expanded=True):
+        mesures = st.session_state.temps_rendu
+        if not mesures:
+            st.info("Aucune mesure pour le moment")
+            return
+        st.dataframe(
+            [
+                {
+                    "Fonction": nom,
+                    "Appels": mesure["appels"],
+                    "Dernier (ms)": mesure["dernier_ms"],
+                    "Moyenne (ms)": round(mesure["total_ms"] / mesure["appels"], 2),
+                    "Max (ms)": mesure["max_ms"],
+                }
+                for nom, mesure in mesures.items()
+            ],
+            use_container_width=True,
+            hide_index=True
         )
-        
-        if lldp_visible == "Non":
-            st.error("⚠️ Moniteur non découvert par LLDP")
-            with st.expander("📝 Actions correctives"):
-                st.markdown("""
-                1. Vérifier que LLDP est activé sur le moniteur
-                2. Contrôler la connectivité physique
-                3. Attendre la synchronisation LLDP (30s-2min)
-                4. Vérifier avec: `show lldp neighbors detail`
-                """)
+
+def afficher_elements(elements):
+    """Affiche une liste d'éléments compilés de l'arbre de diagnostic."""
+    valeurs = st.session_state
+    for element in elements:
+        if element.si_renseigne and not valeurs.get(element.si_renseigne):
+            continue
+        type_element = element.type
+
+        if type_element == "question":
+            reponse = st.radio(element.texte, element.options, key=element.id)
+            branche = element.branches.get(reponse)
+            if branche:
+                afficher_elements(branche)
+        elif type_element == "message":
+            getattr(st, element.niveau)(element.texte)
+        elif type_element == "code":
+            with st.expander(element.titre, expanded=element.ouvert):
+                contenu = formater(element.contenu, valeurs) if element.gabarit else element.contenu
+                st.code(contenu, language=element.langage)
+        elif type_element == "details":
+            with st.expander(element.titre, expanded=element.ouvert):
+                st.markdown(formater(element.texte, valeurs) if element.gabarit else element.texte)
+        elif type_element == "markdown":
+            st.markdown(element.texte)
+        elif type_element == "sous_titre":
+            st.subheader(element.texte)
+        elif type_element == "saisie":
+            afficher_saisie(element)
+        elif type_element == "automatisation":
+            AUTOMATISATIONS[element.hook]()
+
+def afficher_saisie(element):
+    """Champs de saisie d'un élément ; les valeurs renseignées alimentent donnees_collectees."""
+    colonnes = st.columns(element.colonnes) if element.colonnes > 1 else None
+    saisies = []
+    for champ in element.champs:
+        if colonnes is not None:
+            with colonnes[champ.get("colonne", 0)]:
+                valeur = st.text_input(champ["texte"], key=champ["id"])
         else:
-            # Collecte d'informations LLDP
-            st.subheader("📋 Informations LLDP collectées")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                device_name = st.text_input("Nom/Hostname du moniteur", key="lldp_device")
-                port_switch = st.text_input("Port switch connecté (ex: Gi0/1)", key="lldp_port")
-            
-            with col2:
-                vlan_natif = st.text_input("VLAN natif du port", key="lldp_vlan")
-                capabilities = st.text_input("Capabilities LLDP", key="lldp_cap")
-            
-            if device_name:
-                st.session_state.donnees_collectees['LLDP Device'] = device_name
-            if port_switch:
-                st.session_state.donnees_collectees['Port Switch'] = port_switch
-            if vlan_natif:
-                st.session_state.donnees_collectees['VLAN'] = vlan_natif
-    
+            valeur = st.text_input(champ["texte"], key=champ["id"])
+        saisies.append((champ, valeur))
+
+    for champ, valeur in saisies:
+        if valeur and champ.get("donnee"):
+            st.session_state.donnees_collectees[champ["donnee"]] = valeur
+
+def afficher_etape(numero):
+    """Affiche une étape de l'arbre compilé, puis les boutons de navigation."""
+    etape = graphe_diagnostic().etape(numero)
+    st.header(etape.titre)
+    afficher_elements(etape.elements)
+
     # Navigation
+    if numero == 0:
+        if st.button(f"➡️ Étape suivante : {etape.suivante}", use_container_width=True):
+            st.session_state.etape_actuelle = 1
+            st.rerun()
+        return
+
     col1, col2 = st.columns(2)
     with col1:
         if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 0
+            st.session_state.etape_actuelle = numero - 1
             st.rerun()
     with col2:
-        if st.button("➡️ Étape suivante : Couche Physique", use_container_width=True):
-            st.session_state.etape_actuelle = 2
+        libelle = f"➡️ Étape suivante : {etape.suivante}" if etape.suivante else "✅ Voir la synthèse"
+        if st.button(libelle, use_container_width=True):
+            st.session_state.etape_actuelle = numero + 1
             st.rerun()
 
+@chronometrer
+def etape_configuration_initiale():
+    """Étape 0: Configuration initiale."""
+    afficher_etape(0)
+
+@chronometrer
+def etape_lldp():
+    """Étape 1: Découverte LLDP."""
+    afficher_etape(1)
+
+@chronometrer
 def etape_physique():
     """Étape 2: Couche Physique."""
-    st.header("2️⃣ Couche Physique - Connectivité de base")
-    
-    with st.expander("🔍 Commandes de vérification", expanded=False):
-        st.code("""
-# État de l'interface
-show interface <interface> status
-show interface <interface>
-
-# Erreurs d'interface
-show interface <interface> | include error
-
-# Nettoyer les compteurs
-clear counters <interface>
-        """, language="bash")
-    
-    # Question Link
-    link_up = st.radio(
-        "Le moniteur est-il alimenté et le voyant Link est-il vert/actif ?",
-        ["Oui", "Non"],
-        key="q_link_up"
-    )
-    
-    if link_up == "Non":
-        st.error("⚠️ **PROBLÈME PHYSIQUE DÉTECTÉ**")
-        with st.expander("📝 Actions correctives urgentes"):
-            st.markdown("""
-            1. Tester un autre câble réseau
-            2. Changer de port sur le switch
-            3. Vérifier l'alimentation du moniteur
-            4. Contrôler les LEDs du switch
-            5. Vérifier les informations LLDP si disponibles
-            """)
-    else:
-        # Erreurs d'interface
-        erreurs = st.radio(
-            "Le device status du port switch indique-t-il des erreurs ?",
-            ["Oui", "Non"],
-            key="q_erreurs_interface"
-        )
-        
-        if erreurs == "Oui":
-            st.warning("Analyser les erreurs d'interface (CRC, collisions, runts)")
-        
-        # Vitesse du lien
-        vitesse = st.radio(
-            "Le link est-il à la bonne vitesse (100M/1G) ?",
-            ["Oui", "Non"],
-            key="q_vitesse"
-        )
-        
-        if vitesse == "Non":
-            st.warning("Problème de négociation de vitesse - Forcer speed/duplex si nécessaire")
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 1
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : Couche IP", use_container_width=True):
-            st.session_state.etape_actuelle = 3
-            st.rerun()
+    afficher_etape(2)
 
+@chronometrer
 def etape_ip():
     """Étape 3: Couche IP."""
-    st.header("3️⃣ Couche Réseau (IP) - Configuration réseau")
-    
-    with st.expander("🔍 Commandes réseau", expanded=False):
-        st.code("""
-# DHCP
-show ip dhcp binding
-show ip dhcp lease
-
-# ARP
-show ip arp
-arp -a
-
-# Routing
-show ip route
-        """, language="bash")
-    
-    # Collecte IP moniteur
-    st.subheader("📋 Informations réseau du moniteur")
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        ip_moniteur = st.text_input("Adresse IP du moniteur", key="ip_moniteur")
-        subnet = st.text_input("Sous-réseau (ex: 192.168.1.0/24)", key="subnet")
-    
-    with col2:
-        gateway = st.text_input("Passerelle par défaut", key="gateway")
-    
-    if ip_moniteur:
-        st.session_state.donnees_collectees['IP Moniteur'] = ip_moniteur
-    if gateway:
-        st.session_state.donnees_collectees['Gateway'] = gateway
-    
-    # Question IP valide
-    ip_valide = st.radio(
-        "Le moniteur a-t-il une adresse IP valide (pas 169.254.x.x) ?",
-        ["Oui", "Non"],
-        key="q_ip_valide"
-    )
-    
-    if ip_valide == "Non":
-        st.error("⚠️ **PROBLÈME D'ATTRIBUTION IP**")
-        with st.expander("📝 Actions correctives"):
-            st.markdown("""
-            1. Vérifier le serveur DHCP: `show ip dhcp binding`
-            2. Contrôler la configuration IP statique du moniteur
-            3. Vérifier les VLANs: `show vlan brief`
-            4. Tester depuis un autre device sur le même segment
-            """)
-    else:
-        # Test passerelle
-        ping_gw = st.radio(
-            "Le moniteur peut-il pinger sa passerelle par défaut ?",
-            ["Oui", "Non"],
-            key="q_ping_gw"
-        )
-        
-        if ping_gw == "Non":
-            st.error("⚠️ **PROBLÈME DE PASSERELLE**")
-            with st.expander("📝 Diagnostic passerelle"):
-                st.markdown("""
-                1. Vérifier la table de routage: `show ip route`
-                2. Contrôler les VLANs: `show vlan id <vlan>`
-                3. Tester depuis un autre équipement du même VLAN
-                4. Vérifier l'interface SVI: `show ip interface vlan<X>`
-                """)
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 2
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : Connectivité", use_container_width=True):
-            st.session_state.etape_actuelle = 4
-            st.rerun()
+    afficher_etape(3)
 
+@chronometrer
 def etape_connectivite():
     """Étape 4: Connectivité."""
-    st.header("4️⃣ Connectivité Moniteur ↔ Centrale")
-    
-    # Collecte IP centrale
-    ip_centrale = st.text_input("Adresse IP de la centrale CI", key="ip_centrale")
-    if ip_centrale:
-        st.session_state.donnees_collectees['IP Centrale'] = ip_centrale
-    
-    with st.expander("🔍 Tests de connectivité", expanded=False):
-        if ip_centrale:
-            st.code(f"""
-# Test ping
-ping {ip_centrale}
-ping {ip_centrale} -t
-
-# Traceroute
-tracert {ip_centrale}
-
-# Test MTU
-ping {ip_centrale} -f -l 1472
-            """, language="bash")
-    
-    # Question ping centrale
-    ping_centrale = st.radio(
-        "Le moniteur peut-il pinger l'IP de la centrale ?",
-        ["Oui", "Non"],
-        key="q_ping_centrale"
-    )
-    
-    if ping_centrale == "Non":
-        st.error("⚠️ **PROBLÈME DE CONNECTIVITÉ**")
-        with st.expander("📝 Diagnostic approfondi"):
-            st.markdown(f"""
-            1. Traceroute: `tracert {ip_centrale or 'IP_CENTRALE'}`
-            2. Vérifier les ACLs: `show ip access-list`
-            3. Contrôler les firewalls intermédiaires
-            4. Vérifier les routes: `show ip route`
-            """)
-    else:
-        # Test latence
-        latence_ok = st.radio(
-            "La latence ping est-elle correcte (<10ms en LAN, <50ms en WAN) ?",
-            ["Oui", "Non"],
-            key="q_latence"
-        )
-        
-        if latence_ok == "Non":
-            st.warning("⚠️ Latence élevée détectée")
-            
-            pertes = st.radio(
-                "Y a-t-il des pertes de paquets dans le ping ?",
-                ["Oui", "Non"],
-                key="q_pertes"
-            )
-            
-            if pertes == "Oui":
-                st.error("Pertes de paquets - Vérifier la charge réseau et les erreurs d'interface")
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 3
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : Port CI", use_container_width=True):
-            st.session_state.etape_actuelle = 5
-            st.rerun()
+    afficher_etape(4)
 
+@chronometrer
 def etape_port_ci():
     """Étape 5: Port CI 24005."""
-    st.header("5️⃣ Port CI 24005 - Service et Connexion TCP")
-    
-    st.warning("⚠️ **TESTS DEPUIS LA CENTRALE UNIQUEMENT** - Le moniteur ne permet pas l'exécution de commandes")
-    
-    with st.expander("🔍 Commandes de test (depuis la centrale)", expanded=False):
-        st.code("""
-# Vérifier écoute du service
-netstat -an | grep 24005
-ss -tlnp | grep 24005
-
-# Test local
-telnet localhost 24005
-
-# PowerShell
-Get-NetTCPConnection -LocalPort 24005
-        """, language="bash")
-    
-    # Service écoute
-    service_ecoute = st.radio(
-        "Le service CI écoute-t-il sur le port 24005 sur la centrale ?",
-        ["Oui", "Non"],
-        key="q_service_ecoute"
-    )
-    
-    if service_ecoute == "Non":
-        st.error("⚠️ **SERVICE CI NON ACTIF**")
-        with st.expander("📝 Actions correctives urgentes"):
-            st.markdown("""
-            1. Vérifier service: `systemctl status <service_ci>`
-            2. Contrôler config port dans fichier conf
-            3. Examiner logs: `journalctl -u <service>`
-            4. Redémarrer si nécessaire
-            5. Vérifier bind address (0.0.0.0 vs IP spécifique)
-            """)
-    else:
-        # Analyse Wireshark
-        st.subheader("🔬 Analyse Wireshark")
-        
-        with st.expander("Filtres Wireshark recommandés"):
-            st.code("""
-# Filtre de base
-tcp.port == 24005
-
-# Handshake TCP
-tcp.port == 24005 and (tcp.flags.syn == 1 or tcp.flags.reset == 1)
-
-# Connexions refusées
-tcp.port == 24005 and tcp.flags.reset == 1
-
-# Retransmissions
-tcp.analysis.retransmission
-            """)
-        
-        tentatives = st.radio(
-            "Une capture Wireshark montre-t-elle des tentatives de connexion du moniteur ?",
-            ["Oui", "Non"],
-            key="q_tentatives_wireshark"
-        )
-        
-        if tentatives == "Non":
-            st.error("⚠️ Moniteur ne tente pas de connexion")
-            st.markdown("""
-            **Causes possibles:**
-            - Moniteur hors tension
-            - Problème réseau en amont
-            - Configuration moniteur incorrecte
-            - IP centrale mal configurée
-            """)
-        else:
-            handshake_ok = st.radio(
-                "Le handshake TCP s'établit-il correctement (SYN → SYN-ACK → ACK) ?",
-                ["Oui", "Non"],
-                key="q_handshake"
-            )
-            
-            if handshake_ok == "Non":
-                rst_packets = st.radio(
-                    "Y a-t-il des paquets TCP RST (reset) ?",
-                    ["Oui", "Non"],
-                    key="q_rst"
-                )
-                
-                if rst_packets == "Oui":
-                    st.error("Connexion activement refusée - Vérifier firewall/ACL")
-                else:
-                    st.error("Pas de SYN-ACK - Le paquet SYN n'arrive pas ou pas de réponse")
-            else:
-                comm_app = st.radio(
-                    "La communication applicative s'établit-elle après le TCP ?",
-                    ["Oui", "Non"],
-                    key="q_comm_app"
-                )
-                
-                if comm_app == "Non":
-                    st.warning("Problème couche applicative - Vérifier authentification")
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 4
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : Couche Applicative", use_container_width=True):
-            st.session_state.etape_actuelle = 6
-            st.rerun()
+    afficher_etape(5)
 
+@chronometrer
 def etape_applicative():
     """Étape 6: Couche Applicative."""
-    st.header("6️⃣ Couche Applicative - Service CI")
-    
-    with st.expander("🔍 Commandes de vérification service", expanded=False):
-        st.code("""
-# État du service
-systemctl status <service_ci>
-journalctl -u <service_ci> -f
-
-# Processus
-ps aux | grep ci
-
-# Ports écoutés
-netstat -tlnp | grep 24005
-
-# Ressources
-top
-df -h
-        """, language="bash")
-    
-    service_repond = st.radio(
-        "Le service CI répond-il aux requêtes applicatives ?",
-        ["Oui", "Non"],
-        key="q_service_repond"
-    )
-    
-    if service_repond == "Non":
-        st.error("⚠️ **PROBLÈME APPLICATIF DÉTECTÉ**")
-        
-        logs_erreur = st.radio(
-            "Y a-t-il des erreurs dans les logs de l'application CI ?",
-            ["Oui", "Non"],
-            key="q_logs_erreur"
-        )
-        
-        if logs_erreur == "Oui":
-            type_erreur = st.text_input("Type d'erreur observé dans les logs", key="type_erreur")
-            if type_erreur:
-                st.session_state.donnees_collectees['Type erreur'] = type_erreur
-        
-        ressources_ok = st.radio(
-            "Les ressources système sont-elles suffisantes (CPU < 80%, RAM libre) ?",
-            ["Oui", "Non"],
-            key="q_ressources"
-        )
-        
-        if ressources_ok == "Non":
-            st.error("⚠️ Ressources système insuffisantes")
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 5
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : Trafic Multicast", use_container_width=True):
-            st.session_state.etape_actuelle = 7
-            st.rerun()
+    afficher_etape(6)
 
+@chronometrer
 def etape_multicast():
     """Étape 7: Trafic Multicast."""
-    st.header("7️⃣ Trafic Multicast - Découverte Automatique")
-    
-    st.info("Le multicast est souvent utilisé pour la découverte automatique des moniteurs")
-    
-    with st.expander("🔬 Filtres Wireshark Multicast", expanded=False):
-        st.code("""
-# Multicast général
-ip.dst >= 224.0.0.0 and ip.dst <= 239.255.255.255
+    afficher_etape(7)
 
-# IGMP
-igmp
+@chronometrer
+def etape_qos():
+    """Étape 8: QoS."""
+    afficher_etape(8)
 
-# Découverte CI
-udp and ip.dst >= 224.0.0.0
-        """)
-    
-    with st.expander("🔍 Commandes réseau multicast", expanded=False):
-        st.code("""
-# IGMP Snooping
-show ip igmp snooping
-show ip igmp snooping groups
-
-# IGMP Querier
-show ip igmp snooping querier
-
-# Table multicast
-show mac address-table multicast
-
-# PIM (si routage)
-show ip pim neighbor
-show ip mroute
-        """, language="bash")
-    
-    multicast_visible = st.radio(
-        "Du trafic multicast est-il visible en Wireshark ?",
-        ["Oui", "Non"],
-        key="q_multicast_visible"
-    )
-    
-    if multicast_visible == "Non":
-        st.error("⚠️ **PROBLÈME MULTICAST**")
-        
-        igmp_snooping = st.radio(
-            "IGMP Snooping est-il activé sur les switches ?",
-            ["Oui", "Non"],
-            key="q_igmp_snooping"
-        )
-        
-        if igmp_snooping == "Oui":
-            querier_ok = st.radio(
-                "Un IGMP Querier est-il présent et actif ?",
-                ["Oui", "Non"],
-                key="q_querier"
+def afficher_mesure_latence():
+    """Mesure automatique de latence/pertes par RTT de connexion TCP sur le port 24005."""
+    ip_centrale = st.session_state.get('ip_centrale')
+    with st.expander("📈 Mesure automatique de latence et de pertes", expanded=False):
+        if not ip_centrale:
+            st.info("Renseigner l'adresse IP de la centrale pour lancer la mesure")
+            return
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            nb = st.number_input("Nombre d'échantillons", 1, 3600, 20, key="mesure_nb")
+        with col2:
+            intervalle = st.number_input("Intervalle (s)", 0.05, 60.0, 0.5, step=0.05, key="mesure_intervalle")
+        with col3:
+            wan = st.checkbox("Lien WAN (seuil 50 ms)", key="mesure_wan")
+
+        if st.button("📡 Mesurer", use_container_width=True):
+            lancer_tache("mesure_latence", ("latence", ip_centrale, int(nb), float(intervalle)),
+                         GuideDiagnosticCI.mesurer_latence, ip_centrale, int(nb), float(intervalle),
+                         duree_estimee=int(nb) * float(intervalle))
+        resume = tache_terminee("mesure_latence")
+        if resume is not None:
+            reponses = evaluer_reponses(resume, wan=wan)
+            # Pré-remplit les questions avant leur création dans ce run
+            st.session_state.update(reponses)
+            enregistrer_latence(resume, st.session_state.donnees_collectees)
+            st.session_state.mesure_latence = resume
+            st.session_state.diagnostic.log_etape(
+                "Mesure latence", f"p95={resume['p95_ms']} ms, pertes={resume['pertes_pct']}%",
+                "" if reponses["q_latence"] == "Oui" and reponses["q_pertes"] == "Non"
+                else "Vérifier la charge réseau et les erreurs d'interface"
             )
-            
-            if querier_ok == "Non":
-                st.error("⚠️ Configurer un Querier IGMP")
-    else:
-        groupes = st.text_input("Groupes multicast observés (ex: 224.1.1.1)", key="groupes_multicast")
-        if groupes:
-            st.session_state.donnees_collectees['Groupes multicast'] = groupes
-        
-        contenu_ok = st.radio(
-            "Le contenu des paquets multicast semble-t-il correct ?",
-            ["Oui", "Non"],
-            key="q_contenu_multicast"
+
+        if st.session_state.get('mesure_latence'):
+            resume = st.session_state.mesure_latence
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("p50 (ms)", resume["p50_ms"])
+            col2.metric("p95 (ms)", resume["p95_ms"])
+            col3.metric("Jitter (ms)", resume["jitter_ms"])
+            col4.metric("Pertes (%)", resume["pertes_pct"])
+
+def afficher_scan_port_ci():
+    """Scan automatique du port CI sur une liste d'IP ou de plages CIDR."""
+    with st.expander("🛰️ Scan automatique du port 24005", expanded=False):
+        st.caption("Connexions TCP concurrentes depuis la machine qui exécute l'application")
+        cibles = st.text_area(
+            "IP ou plages CIDR des moniteurs (une par ligne ou séparées par des virgules)",
+            value=st.session_state.donnees_collectees.get('IP Moniteur', ''),
+            key="scan_cibles"
         )
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 6
-            st.rerun()
-    with col2:
-        if st.button("➡️ Étape suivante : QoS", use_container_width=True):
-            st.session_state.etape_actuelle = 8
-            st.rerun()
+        col1, col2 = st.columns(2)
+        with col1:
+            concurrence = st.number_input("Connexions simultanées", 1, 10000, 2000, key="scan_concurrence")
+        with col2:
+            timeout = st.number_input("Timeout par hôte (s)", 0.1, 10.0, 1.0, step=0.1, key="scan_timeout")
 
-def etape_qos():
-    """Étape 8: QoS."""
-    st.header("8️⃣ QoS et Priorisation - Qualité de Service")
-    
-    with st.expander("🔍 Commandes QoS", expanded=False):
-        st.code("""
-# Configuration QoS
-show policy-map
-show class-map
-
-# Par interface
-show policy-map interface <int>
-
-# Statistiques
-show policy-map interface <int> statistics
-show interface <int> | include drops
-
-# Utilisation
-show interface | include load
-        """, language="bash")
-    
-    with st.expander("🔬 Filtres Wireshark QoS", expanded=False):
-        st.code("""
-# Marquage DSCP
-ip.dsfield.dscp != 0
+        if st.button("🚀 Lancer le scan", use_container_width=True) and cibles.strip():
+            cibles = " ".join(cibles.replace(",", " ").split())
+            lancer_tache("scan_port_ci", ("scan", cibles, int(concurrence), float(timeout)),
+                         GuideDiagnosticCI.scanner_port_ci, cibles, concurrence=int(concurrence), timeout=float(timeout))
+        resultats = tache_terminee("scan_port_ci", [(ValueError, "Cible invalide")])
+        if resultats is not None:
+            enregistrer_scan(resultats, st.session_state.donnees_collectees)
+            st.session_state.scan_resultats = resultats
 
-# Trafic prioritaire
-ip.dsfield.dscp >= 32
+        if st.session_state.get('scan_resultats'):
+            resume = resumer_scan(st.session_state.scan_resultats)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Ouverts", resume[ETAT_OUVERT])
+            col2.metric("Refusés", resume[ETAT_REFUSE])
+            col3.metric("Timeouts", resume[ETAT_TIMEOUT])
+            st.dataframe(st.session_state.scan_resultats, use_container_width=True)
 
-# Congestion
-tcp.analysis.window_full
-        """)
-    
-    qos_active = st.radio(
-        "Des politiques QoS sont-elles configurées sur le réseau ?",
-        ["Oui", "Non"],
-        key="q_qos_active"
-    )
-    
-    if qos_active == "Oui":
-        dscp_ok = st.radio(
-            "Le marquage DSCP est-il correct sur les paquets CI ?",
-            ["Oui", "Non"],
-            key="q_dscp"
+def afficher_sonde_applicative():
+    """Sonde applicative : la centrale envoie-t-elle ou accepte-t-elle des données après le handshake ?"""
+    with st.expander("💬 Sonde applicative du port 24005", expanded=False):
+        st.caption("Handshake TCP puis attente de données applicatives de la centrale")
+        cibles = st.text_area(
+            "Centrales (IP ou ip:port, une par ligne ou séparées par des virgules)",
+            value=st.session_state.donnees_collectees.get('IP Centrale', ''),
+            key="sonde_cibles"
         )
-        
-        if dscp_ok == "Non":
-            st.warning("⚠️ Problème de marquage QoS")
-        
-        congestion = st.radio(
-            "Y a-t-il des signes de congestion réseau ?",
-            ["Oui", "Non"],
-            key="q_congestion"
-        )
-        
-        if congestion == "Oui":
-            st.error("⚠️ Congestion détectée")
-            
-            perf_ci = st.radio(
-                "Les performances du CI sont-elles dégradées pendant les pics ?",
-                ["Oui", "Non"],
-                key="q_perf_ci"
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            message = st.text_input("Message à envoyer (optionnel)", key="sonde_message")
+        with col2:
+            delai = st.number_input("Délai de réponse (s)", 0.1, 30.0, 3.0, step=0.5, key="sonde_delai")
+        with col3:
+            repetitions = st.number_input("Mesures par cible", 1, 100, 3, key="sonde_repetitions")
+
+        if st.button("💬 Sonder", use_container_width=True) and cibles.strip():
+            cibles = " ".join(cibles.replace(",", " ").split())
+            contenu = message.encode() + b"\n" if message else None
+            lancer_tache("sonde_applicative", ("sonde", cibles, contenu, float(delai), int(repetitions)),
+                         GuideDiagnosticCI.sonder_applicatif, cibles, contenu, float(delai), int(repetitions),
+                         duree_estimee=float(delai) * int(repetitions))
+        resultats = tache_terminee("sonde_applicative", [(ValueError, "Cible invalide")])
+        if resultats is not None:
+            # Pré-remplit q_comm_app (étape 5) et q_service_repond (étape 6)
+            st.session_state.update(evaluer_sonde(resultats, st.session_state.donnees_collectees.get('IP Centrale')))
+            enregistrer_sonde(resultats, st.session_state.donnees_collectees)
+            st.session_state.sonde_resultats = resultats
+
+        if st.session_state.get('sonde_resultats'):
+            resume = resumer_sondes(st.session_state.sonde_resultats)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Réponses", f"{resume[ETAT_REPOND]}/{resume['total']}")
+            col2.metric("Premier octet p50 (ms)", resume["ttfb_mediane_ms"])
+            col3.metric("Connexions réutilisées", resume["reutilisees"])
+            st.dataframe(st.session_state.sonde_resultats, use_container_width=True)
+
+@st.cache_resource
+def table_sockets_locale():
+    """Lecteur de la table des sockets de cette machine (processus propriétaires gardés entre les relevés)."""
+    from table_sockets import TableSockets
+    return TableSockets()
+
+def afficher_releve_sockets(table):
+    """Écoute, comptes par état et constats d'un relevé de la table des sockets."""
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("En écoute", len(table["ecoute"]))
+    col2.metric("ESTABLISHED", table["entrantes"]["ESTABLISHED"])
+    col3.metric("SYN_RECV", table["entrantes"]["SYN_RECV"])
+    col4.metric("TIME_WAIT", table["entrantes"]["TIME_WAIT"])
+    col5.metric("Moniteurs connectés", table["moniteurs_connectes"])
+    for niveau, message in table["constats"]:
+        (st.error if niveau == "error" else st.warning)(message)
+    if table["ecoute"]:
+        st.dataframe(table["ecoute"], use_container_width=True, hide_index=True)
+    st.caption(f"{table['sockets']} sockets lues via {table['source']} en {table['duree_ms']} ms")
+
+def _suivre_sockets():
+    afficher_releve_sockets(table_sockets_locale().lire())
+
+suivre_sockets = st.fragment(run_every=1)(_suivre_sockets) if hasattr(st, "fragment") else _suivre_sockets
+
+def afficher_table_sockets():
+    """Sockets du port 24005 lues dans le noyau, lorsque l'application s'exécute sur la centrale."""
+    with st.expander("🔌 Sockets du port 24005 sur cette machine", expanded=False):
+        st.caption("Remplace netstat / ss lorsque l'application tourne sur la centrale (Linux)")
+        if not os.path.exists("/proc/net/tcp"):
+            st.info("Table des sockets disponible uniquement sous Linux")
+            return
+        col1, col2 = st.columns(2)
+        with col1:
+            lire = st.button("🔌 Lire la table des sockets", use_container_width=True)
+        with col2:
+            st.checkbox("Relevé chaque seconde", key="sockets_suivi")
+
+        if lire:
+            table = st.session_state.diagnostic.lire_table_sockets()
+            # Pré-remplit q_service_ecoute (étape 5)
+            st.session_state.update(evaluer_sockets(table))
+            enregistrer_sockets(table, st.session_state.donnees_collectees)
+            st.session_state.table_sockets = table
+
+        if st.session_state.get('sockets_suivi'):
+            suivre_sockets()
+        elif st.session_state.get('table_sockets'):
+            afficher_releve_sockets(st.session_state.table_sockets)
+
+@st.cache_resource
+def detecteur_reconnexions_local():
+    """Détecteur alimenté par la table des sockets de cette machine, partagé par les sessions."""
+    from reconnexions_ci import DetecteurReconnexions
+    return DetecteurReconnexions(), threading.Lock()
+
+def afficher_etat_reconnexions(etat):
+    """Taux de reconnexion, moniteurs instables et tempête éventuelle."""
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Connexions établies", "-" if etat["connexions_actives"] is None else etat["connexions_actives"])
+    col2.metric(f"Connexions / min ({etat['fenetre_s']:g} s)", etat["connexions_par_min"])
+    col3.metric("Moniteurs instables", len(etat["instables"]))
+    col4.metric("Tempêtes", etat["tempetes"])
+    if etat["tempete"]:
+        st.error(f"🌩️ Tempête de reconnexions en cours : {etat['moniteurs_recents']} moniteurs reconnectés récemment")
+    if etat["instables"]:
+        st.warning(f"Moniteurs qui se reconnectent en boucle : {', '.join(etat['instables'][:20])}")
+    if etat["moniteurs"]:
+        st.dataframe(etat["moniteurs"], use_container_width=True, hide_index=True)
+
+def _relever_reconnexions():
+    detecteur, verrou = detecteur_reconnexions_local()
+    with verrou:
+        detecteur.observer(table_sockets_locale().connexions())
+        return detecteur.etat()
+
+def _suivre_reconnexions():
+    afficher_etat_reconnexions(_relever_reconnexions())
+
+suivre_reconnexions = (st.fragment(run_every=1)(_suivre_reconnexions) if hasattr(st, "fragment")
+                       else _suivre_reconnexions)
+
+def afficher_reconnexions():
+    """Moniteurs qui se reconnectent en boucle : suivi sur la centrale ou capture."""
+    with st.expander("🔁 Reconnexions répétées sur le port 24005", expanded=False):
+        st.caption("Sur la centrale : différence des connexions établies chaque seconde ; sinon à partir d'une capture")
+        sur_linux = os.path.exists("/proc/net/tcp")
+        chemin = choisir_capture("capture_reconnexions")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("🔎 Analyser la capture", key="reconnexions_capture", use_container_width=True) and chemin:
+                lancer_tache("reconnexions", ("reconnexions",) + cle_fichier(chemin),
+                             GuideDiagnosticCI.suivre_reconnexions, capture=chemin, processus=True, ttl=3600)
+        with col2:
+            if st.button("🔁 Observer 10 s", disabled=not sur_linux, use_container_width=True):
+                lancer_tache("reconnexions", ("reconnexions", "local"),
+                             GuideDiagnosticCI.suivre_reconnexions, duree=10, duree_estimee=10)
+        with col3:
+            st.checkbox("Suivi chaque seconde", key="reconnexions_suivi", disabled=not sur_linux)
+
+        etat = tache_terminee("reconnexions", [((OSError, ErreurCapture), "Relevé impossible")])
+        if st.session_state.get('reconnexions_suivi'):
+            # Le suivi ne modifie pas les réponses : elles sont reportées à la demande
+            suivre_reconnexions()
+            if st.button("📋 Reporter dans le diagnostic", use_container_width=True):
+                etat = _relever_reconnexions()
+        if etat is not None:
+            ip_moniteur = st.session_state.donnees_collectees.get('IP Moniteur')
+            # Pré-remplit q_reconnexions (étape 5)
+            st.session_state.update(evaluer_reconnexions(etat, ip_moniteur))
+            enregistrer_reconnexions(etat, st.session_state.donnees_collectees, ip_moniteur)
+            st.session_state.etat_reconnexions = etat
+
+        if not st.session_state.get('reconnexions_suivi') and st.session_state.get('etat_reconnexions'):
+            afficher_etat_reconnexions(st.session_state.etat_reconnexions)
+
+def choisir_capture(cle):
+    """Sélection d'une capture pcap/pcapng : chemin sur le serveur ou fichier téléversé."""
+    return choisir_fichier(cle, "de la capture sur le serveur (.pcap / .pcapng)", "une capture", ["pcap", "pcapng", "cap"])
+
+def choisir_fichier(cle, libelle, libelle_televersement, types, prefixe="ci_capture_"):
+    """Sélection d'un fichier à analyser : chemin sur le serveur ou fichier téléversé."""
+    chemin = st.text_input(f"Chemin {libelle}", key=f"{cle}_chemin")
+    fichier = st.file_uploader(f"... ou téléverser {libelle_televersement}", type=types, key=f"{cle}_fichier")
+    # Copies sur disque des téléversements de la session, supprimées quand le fichier change ou au reset
+    televersements = st.session_state.setdefault('televersements', {})
+    if fichier is None:
+        supprimer_televersement(televersements.pop(cle, None))
+        return chemin.strip() or None
+    # Le lecteur projette le fichier en mémoire : le téléversement est écrit sur disque, une seule fois
+    # et sous un nom stable, pour que les analyses du même fichier partagent leur cache
+    identifiant = getattr(fichier, "file_id", None) or f"{fichier.name}:{fichier.size}"
+    chemin = os.path.join(tempfile.gettempdir(), prefixe + hashlib.sha1(identifiant.encode()).hexdigest()[:16]
+                          + os.path.splitext(fichier.name)[1])
+    if televersements.get(cle) != chemin:
+        supprimer_televersement(televersements.pop(cle, None))
+    if not os.path.exists(chemin):
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(chemin), delete=False) as tmp:
+            shutil.copyfileobj(fichier, tmp)
+        os.replace(tmp.name, chemin)
+    televersements[cle] = chemin
+    return chemin
+
+def supprimer_televersement(chemin):
+    """Supprime la copie disque d'un téléversement ; une analyse en cours garde son fichier ouvert."""
+    if chemin:
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+
+def afficher_analyse_handshake():
+    """Analyse automatique des handshakes 24005 dans une capture."""
+    with st.expander("🤖 Analyse automatique d'une capture", expanded=False):
+        chemin = choisir_capture("capture_tcp")
+        if st.button("🔎 Analyser la capture", use_container_width=True) and chemin:
+            lancer_tache("analyse_handshake", ("handshake",) + cle_fichier(chemin),
+                         GuideDiagnosticCI.analyser_capture_tcp, chemin, processus=True, ttl=3600)
+        rapport = tache_terminee("analyse_handshake", [((OSError, ErreurCapture), "Capture illisible")])
+        if rapport is not None:
+            ip_moniteur = st.session_state.donnees_collectees.get('IP Moniteur')
+            enregistrer_handshake(rapport, st.session_state.donnees_collectees, ip_moniteur)
+            if ip_moniteur:
+                st.session_state.update(evaluer_handshake(rapport.get(ip_moniteur)))
+            st.session_state.analyse_handshake = rapport
+
+        if st.session_state.get('analyse_handshake'):
+            st.dataframe(
+                [{"moniteur": ip, **stats} for ip, stats in st.session_state.analyse_handshake.items()],
+                use_container_width=True
             )
-    else:
-        problemes_perf = st.radio(
-            "Y a-t-il des problèmes de performance ou de latence ?",
-            ["Oui", "Non"],
-            key="q_problemes_perf"
-        )
-        
-        if problemes_perf == "Oui":
-            st.warning("💡 Considérer l'implémentation de la QoS pour le trafic CI")
-    
-    # Navigation
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("⬅️ Étape précédente", use_container_width=True):
-            st.session_state.etape_actuelle = 7
-            st.rerun()
-    with col2:
-        if st.button("✅ Voir la synthèse", use_container_width=True):
-            st.session_state.etape_actuelle = 9
-            st.rerun()
 
+def afficher_analyse_logs():
+    """Signatures d'erreur des logs du service CI, pré-remplit q_logs_erreur et type_erreur."""
+    with st.expander("🤖 Analyse automatique des logs du service CI", expanded=False):
+        st.caption("Export `journalctl -u <service_ci> -o short-iso` ou `-o json`, fichier de log, .gz")
+        chemin = choisir_fichier("logs_ci", "du fichier de logs sur le serveur", "un fichier de logs",
+                                 ["log", "txt", "json", "gz"], prefixe="ci_logs_")
+        if st.button("🔎 Analyser les logs", use_container_width=True) and chemin:
+            lancer_tache("analyse_logs", ("logs",) + cle_fichier(chemin),
+                         GuideDiagnosticCI.analyser_logs, [chemin],
+                         st.session_state.donnees_collectees.get('IP Centrale'), processus=True, ttl=3600)
+        rapport = tache_terminee("analyse_logs", [(OSError, "Logs illisibles")])
+        if rapport is not None:
+            st.session_state.update(evaluer_logs(rapport))
+            enregistrer_logs(rapport, st.session_state.donnees_collectees)
+            st.session_state.analyse_logs = rapport
+
+        if st.session_state.get('analyse_logs'):
+            rapport = st.session_state.analyse_logs
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Lignes en erreur", rapport["lignes_erreur"])
+            col2.metric("Signatures", len(rapport["signatures"]))
+            col3.metric("Moniteurs cités", rapport["moniteurs_cites"])
+            col4.metric("Débit (Mo/s)", rapport["debit_mo_s"])
+            if rapport["pic"]:
+                st.caption(f"Pic : {rapport['pic']['tranche']} ({rapport['pic']['total']} erreurs)")
+            st.dataframe(rapport["signatures"], use_container_width=True, hide_index=True)
+            if rapport["moniteurs"]:
+                st.dataframe(rapport["moniteurs"], use_container_width=True, hide_index=True)
+            if len(rapport["tranches"]) > 1:
+                st.bar_chart([{"tranche": t["tranche"], "erreurs": t["total"]} for t in rapport["tranches"]],
+                             x="tranche", y="erreurs")
+
+def afficher_analyse_multicast():
+    """Analyse automatique du trafic multicast/IGMP dans une capture."""
+    with st.expander("🤖 Analyse automatique d'une capture multicast", expanded=False):
+        chemin = choisir_capture("capture_multicast")
+        if st.button("🔎 Analyser le multicast", use_container_width=True) and chemin:
+            lancer_tache("analyse_multicast", ("multicast",) + cle_fichier(chemin),
+                         GuideDiagnosticCI.analyser_capture_multicast, chemin, processus=True, ttl=3600)
+        rapport = tache_terminee("analyse_multicast", [((OSError, ErreurCapture), "Capture illisible")])
+        if rapport is not None:
+            st.session_state.update(evaluer_multicast(rapport))
+            enregistrer_multicast(rapport, st.session_state.donnees_collectees)
+            st.session_state.analyse_multicast = rapport
+
+        if st.session_state.get('analyse_multicast'):
+            rapport = st.session_state.analyse_multicast
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Groupes", len(rapport["groupes"]))
+            col2.metric("Paquets multicast", rapport["paquets_multicast"])
+            col3.metric("Queriers IGMP", len(rapport["queriers"]))
+            st.dataframe(
+                [{"groupe": ip, "emetteurs": len(g["emetteurs"]), **{k: v for k, v in g.items() if k != "emetteurs"}}
+                 for ip, g in rapport["groupes"].items()],
+                use_container_width=True
+            )
+
+def afficher_analyse_qos():
+    """Statistiques DSCP/QoS automatiques sur une capture."""
+    with st.expander("🤖 Analyse automatique DSCP / congestion", expanded=False):
+        chemin = choisir_capture("capture_qos")
+        col1, col2 = st.columns(2)
+        with col1:
+            dscp = st.text_input("DSCP attendus pour le trafic CI", "46", key="qos_dscp_attendus")
+        with col2:
+            tranche = st.number_input("Tranche de temps (s)", 1, 3600, 10, key="qos_tranche")
+
+        if st.button("🔎 Analyser la QoS", use_container_width=True) and chemin:
+            try:
+                dscp_attendus = tuple(int(v) for v in dscp.replace(",", " ").split())
+            except ValueError as e:
+                st.error(f"Valeur DSCP invalide : {e}")
+            else:
+                lancer_tache("analyse_qos", ("qos", dscp_attendus, int(tranche)) + cle_fichier(chemin),
+                             GuideDiagnosticCI.analyser_capture_qos, chemin, dscp_attendus, int(tranche),
+                             processus=True, ttl=3600)
+        rapport = tache_terminee("analyse_qos", [((OSError, ErreurCapture), "Capture illisible")])
+        if rapport is not None:
+            st.session_state.update(evaluer_qos(rapport))
+            enregistrer_qos(rapport, st.session_state.donnees_collectees)
+            st.session_state.analyse_qos = rapport
+
+        if st.session_state.get('analyse_qos'):
+            rapport = st.session_state.analyse_qos
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Paquets CI", rapport["paquets_ci"])
+            col2.metric("Mal marqués", f"{100 * rapport['ratio_mal_marques']:.2f}%")
+            col3.metric("window_full", f"{100 * rapport['taux_window_full']:.2f}%")
+            if not rapport["sessions"].empty:
+                st.dataframe(rapport["sessions"], use_container_width=True)
+            if "taux_window_full" in rapport["tranches"]:
+                st.line_chart(rapport["tranches"][["ratio_mal_marques", "taux_window_full"]])
+
+# Vérifications automatiques référencées par l'arbre (éléments "automatisation")
+def afficher_analyse_cli_switch():
+    """Analyse des sorties CLI du switch (LLDP, interfaces, VLAN) collées ou téléversées."""
+    with st.expander("🤖 Analyse automatique des sorties du switch", expanded=False):
+        st.caption("show lldp neighbors detail, show interface <interface>, show vlan brief ou show tech complet")
+        texte = st.text_area("Sortie CLI collée", height=150, key='sortie_cli_switch')
+        fichiers = st.file_uploader("... ou téléverser des fichiers de sortie", type=["txt", "log"],
+                                    accept_multiple_files=True, key='fichiers_cli_switch')
+        ip_moniteur = st.text_input("IP ou nom du moniteur (si plusieurs voisins LLDP)", key='cli_switch_moniteur')
+        if st.button("🔎 Analyser les sorties", use_container_width=True) and (texte or fichiers):
+            sorties = [texte] + [f.getvalue().decode("utf-8", errors="replace") for f in fichiers or []]
+            resultat = analyser_sortie("\n".join(sorties))
+            filtre = ip_moniteur.strip()
+            if filtre[:1].isdigit():
+                fiche = fiche_moniteur(resultat, ip_moniteur=filtre)
+            else:
+                fiche = fiche_moniteur(resultat, nom=filtre or None)
+            st.session_state.update(evaluer_cli_switch(resultat, fiche))
+            enregistrer_cli_switch(fiche, st.session_state.donnees_collectees)
+            st.session_state.analyse_cli_switch = {"resultat": resultat, "fiche": fiche}
+            st.session_state.diagnostic.log_etape(
+                "Analyse sorties switch",
+                f"{len(resultat['lldp'])} voisins LLDP, {len(resultat['interfaces'])} interfaces, {len(resultat['vlans'])} VLAN",
+                "" if fiche else "Préciser l'IP ou le nom du moniteur"
+            )
+
+        if st.session_state.get('analyse_cli_switch'):
+            analyse = st.session_state.analyse_cli_switch
+            resultat = analyse["resultat"]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Voisins LLDP", len(resultat["lldp"]))
+            col2.metric("Interfaces", len(resultat["interfaces"]))
+            col3.metric("VLAN", len(resultat["vlans"]))
+            if analyse["fiche"]:
+                st.json(analyse["fiche"])
+            elif resultat["lldp"]:
+                st.warning("Moniteur non identifié parmi les voisins LLDP")
+                st.dataframe(resultat["lldp"], use_container_width=True)
+
+def afficher_taux_erreurs_interfaces():
+    """Taux d'erreurs du port switch à partir de relevés 'show interface' successifs."""
+    with st.expander("🤖 Évolution des erreurs d'interface (relevés successifs)", expanded=False):
+        st.caption("Un fichier par relevé de 'show interface' ; inclure 'show clock' pour l'horodatage")
+        fichiers = st.file_uploader("Relevés", type=["txt", "log"], accept_multiple_files=True, key='releves_interfaces')
+        col1, col2 = st.columns(2)
+        with col1:
+            interface = st.text_input("Port switch", value=st.session_state.donnees_collectees.get('Port Switch', ""),
+                                      key='releves_port')
+        with col2:
+            intervalle = st.number_input("Intervalle entre relevés sans 'show clock' (s)", 1, 3600, 60,
+                                         key='releves_intervalle')
+        if st.button("📈 Calculer les taux", use_container_width=True) and fichiers:
+            moteur = MoteurCompteurs()
+            debut = time.time()
+            for i, fichier in enumerate(fichiers):
+                texte = fichier.getvalue().decode("utf-8", errors="replace")
+                moteur.ingerer_sortie(texte, horodatage_sortie(texte) or debut + i * intervalle)
+            etat = moteur.chercher(interface, st.session_state.donnees_collectees.get('Switch')) if interface else None
+            st.session_state.update(evaluer_taux_erreurs(etat))
+            enregistrer_taux_erreurs(etat, st.session_state.donnees_collectees)
+            st.session_state.taux_erreurs = {"etat": etat, "actifs": moteur.rapport(), "ports": len(moteur.ports)}
+            st.session_state.diagnostic.log_etape(
+                "Taux d'erreurs interfaces",
+                f"{len(fichiers)} relevés, {len(moteur.alertes)} ports en hausse",
+                "Analyser les erreurs d'interface (CRC, collisions, runts)" if etat and etat["tendance"] != "stable" else ""
+            )
+
+        if st.session_state.get('taux_erreurs'):
+            taux = st.session_state.taux_erreurs
+            if taux["etat"]:
+                st.metric(f"Port {taux['etat']['interface']}", taux["etat"]["tendance"],
+                          f"{taux['etat']['erreurs_fenetre']} erreurs sur {taux['etat']['fenetre_s']:.0f} s",
+                          delta_color="off")
+            st.write(f"{len(taux['actifs'])} port(s) avec erreurs actives sur {taux['ports']}")
+            if taux["actifs"]:
+                st.dataframe(taux["actifs"], use_container_width=True)
+
+def afficher_conflits_ip():
+    """Conflits IP/ARP/DHCP et adresses APIPA sur l'ensemble du parc."""
+    with st.expander("🤖 Conflits IP / ARP / DHCP sur le parc", expanded=False):
+        st.caption("show ip arp, show ip dhcp binding et logs (MACFLAP) des routeurs/switchs, un ou plusieurs fichiers")
+        texte = st.text_area("Sorties CLI collées", height=120, key='sortie_conflits_ip')
+        fichiers = st.file_uploader("... ou téléverser des fichiers", type=["txt", "log"],
+                                    accept_multiple_files=True, key='fichiers_conflits_ip')
+        inventaire = st.text_input("Inventaire des moniteurs sur le serveur (CSV/JSON, optionnel)", key='inventaire_conflits_ip')
+        if st.button("🔎 Rechercher les conflits", use_container_width=True) and (texte or fichiers or inventaire):
+            detecteur = DetecteurConflits([st.session_state.subnet] if st.session_state.get('subnet') else ())
+            try:
+                if inventaire.strip():
+                    from diagnostic_lot import charger_inventaire
+                    detecteur.ajouter_inventaire(charger_inventaire(inventaire.strip()))
+            except (OSError, ValueError) as e:
+                st.error(f"Inventaire illisible : {e}")
+            detecteur.ajouter_sortie(texte)
+            for fichier in fichiers or []:
+                detecteur.ajouter_sortie(fichier.getvalue().decode("utf-8", errors="replace"))
+            rapport = detecteur.rapport()
+            ip_moniteur = st.session_state.get('ip_moniteur')
+            st.session_state.update(evaluer_conflits(rapport, ip_moniteur))
+            enregistrer_conflits(rapport, st.session_state.donnees_collectees, ip_moniteur)
+            st.session_state.conflits_ip = rapport
+            st.session_state.diagnostic.log_etape(
+                "Conflits IP parc",
+                f"{len(rapport['ip_dupliquees'])} IP dupliquées, {len(rapport['apipa'])} APIPA, "
+                f"{len(rapport['mac_instables'])} MAC instables",
+                "Corriger les conflits d'adresses" if rapport["ip_dupliquees"] else ""
+            )
+
+        if st.session_state.get('conflits_ip'):
+            rapport = st.session_state.conflits_ip
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("IP dupliquées", len(rapport["ip_dupliquees"]))
+            col2.metric("MAC instables", len(rapport["mac_instables"]))
+            col3.metric("APIPA", len(rapport["apipa"]))
+            col4.metric("Passerelles hors réseau", len(rapport["passerelles_hors_reseau"]))
+            for titre, cle in (("IP dupliquées", "ip_dupliquees"), ("MAC instables", "mac_instables"),
+                               ("Adresses APIPA", "apipa"), ("Passerelles / IP hors sous-réseau", "passerelles_hors_reseau")):
+                if rapport[cle]:
+                    st.write(f"**{titre}**")
+                    st.dataframe([{k: (", ".join(v) if isinstance(v, (list, dict)) else v) for k, v in ligne.items()}
+                                  for ligne in rapport[cle]], use_container_width=True)
+
+def afficher_validation_plan():
+    """Validation de l'IP, du masque, de la passerelle et du VLAN saisis contre le plan d'adressage."""
+    plan = plan_courant()
+    ip_moniteur = st.session_state.get('ip_moniteur')
+    if plan is None or not ip_moniteur:
+        return
+    # VLAN (étape 1) et centrale (étape 4) : valeurs reportées dans donnees_collectees
+    donnees = st.session_state.donnees_collectees
+    validation = plan.valider_moniteur(
+        ip_moniteur, st.session_state.get('subnet'), st.session_state.get('gateway'),
+        donnees.get('VLAN'), donnees.get('IP Centrale')
+    )
+    enregistrer_plan(validation, donnees)
+    if not validation["constats"]:
+        st.success(f"✅ Conforme au plan d'adressage ({validation['reseau']} {validation.get('nom', '')})")
+    for niveau, message in validation["constats"]:
+        getattr(st, niveau)(f"Plan d'adressage : {message}")
+
+def afficher_route_centrale_plan():
+    """Joignabilité de la centrale depuis le sous-réseau du moniteur selon le plan d'adressage."""
+    plan = plan_courant()
+    ip_centrale = st.session_state.get('ip_centrale')
+    # Les champs de l'étape 3 ne sont plus en session ici : valeur reportée dans donnees_collectees
+    entree = plan.chercher(st.session_state.donnees_collectees.get('IP Moniteur')) if plan is not None else None
+    if entree is None or not ip_centrale:
+        return
+    constats = plan.verifier_route(entree, ip_centrale)
+    if not constats:
+        st.success(f"✅ Route autorisée de {entree['texte']} vers la centrale {ip_centrale}")
+    for niveau, message in constats:
+        getattr(st, niveau)(f"Plan d'adressage : {message}")
+
+AUTOMATISATIONS = {
+    "mesure_latence": afficher_mesure_latence,
+    "scan_port_ci": afficher_scan_port_ci,
+    "sonde_applicative": afficher_sonde_applicative,
+    "sonde_service": afficher_sonde_applicative,
+    "table_sockets": afficher_table_sockets,
+    "sockets_service": afficher_table_sockets,
+    "analyse_handshake": afficher_analyse_handshake,
+    "reconnexions": afficher_reconnexions,
+    "analyse_logs": afficher_analyse_logs,
+    "analyse_multicast": afficher_analyse_multicast,
+    "analyse_qos": afficher_analyse_qos,
+    "analyse_cli_switch": afficher_analyse_cli_switch,
+    "taux_erreurs_interfaces": afficher_taux_erreurs_interfaces,
+    "conflits_ip": afficher_conflits_ip,
+    "validation_plan": afficher_validation_plan,
+    "route_centrale_plan": afficher_route_centrale_plan,
+}
+
+@chronometrer
 def afficher_synthese():
     """Affiche la synthèse du diagnostic."""
     st.header("📊 Synthèse du Diagnostic")
@@ -873,22 +1009,46 @@ def afficher_synthese():
     if st.button("📥 Télécharger le rapport JSON", use_container_width=True):
         exporter_rapport()
 
+@chronometrer
+def afficher_historique():
+    """Historique des diagnostics archivés (requêtes indexées SQLite)."""
+    archive = archive_rapports()
+    st.header("🗄️ Historique des diagnostics")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        ip_moniteur = st.text_input("IP Moniteur", key='histo_moniteur')
+        equipement = st.text_input("Switch (LLDP Device)", key='histo_switch')
+    with col2:
+        port_switch = st.text_input("Port switch", key='histo_port')
+        vlan = st.text_input("VLAN", key='histo_vlan')
+    with col3:
+        etape = st.selectbox("Étape atteinte", [None] + list(range(9)), key='histo_etape')
+        etape_en_echec = st.selectbox("Étape en échec", [None] + list(range(9)), key='histo_etape_echec')
+        depuis = st.date_input("Depuis", value=None, key='histo_depuis')
+    
+    debut = time.perf_counter()
+    lignes = archive.rechercher(
+        ip_moniteur.strip(), equipement.strip(), port_switch.strip(), vlan.strip(), etape,
+        depuis.isoformat() if depuis else None, limite=200, etape_en_echec=etape_en_echec
+    )
+    duree_ms = (time.perf_counter() - debut) * 1000
+    st.caption(f"{len(lignes)} rapport(s) sur {len(archive)} - requête en {duree_ms:.1f} ms")
+    if lignes:
+        st.dataframe(lignes, use_container_width=True, hide_index=True)
+
 def exporter_rapport():
     """Exporte le rapport de diagnostic en JSON."""
-    rapport = {
-        "diagnostic_ci": {
-            "port": 24005,
-            "timestamp": datetime.now().isoformat(),
-            "donnees_collectees": st.session_state.donnees_collectees,
-            "etape_finale": st.session_state.etape_actuelle
-        }
-    }
-    
-    json_str = json.dumps(rapport, indent=2, ensure_ascii=False)
+    flux = io.StringIO()
+    st.session_state.diagnostic.ecrire_rapport(flux, {
+        "donnees_collectees": st.session_state.donnees_collectees,
+        "etape_finale": st.session_state.etape_actuelle,
+        "etape_en_echec": st.session_state.diagnostic.evaluer_reponses(st.session_state)["etape_en_echec"],
+        "temps_rendu": st.session_state.temps_rendu
+    })
     
     st.download_button(
         label="📥 Télécharger le rapport",
-        data=json_str,
+        data=flux.getvalue(),
         file_name=f"diagnostic_ci_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
         mime="application/json"
     )
@@ -915,6 +1075,8 @@ def main():
     
     # Affichage de l'étape actuelle
     etape_fonction = etapes_fonctions.get(st.session_state.etape_actuelle, afficher_synthese)
+    if st.session_state.get('vue_historique'):
+        etape_fonction = afficher_historique
     etape_fonction()
     
     # Footer
@@ -925,5 +1087,8 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    if st.session_state.get('mode_debug'):
+        afficher_debug()
+
 if __name__ == "__main__":
     main()
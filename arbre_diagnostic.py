@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arbre de décision du diagnostic CI, décrit sous forme de données
+Étapes, questions, branches, remèdes et commandes Wireshark/CLI. L'arbre est compilé
+une seule fois en graphe indexé, parcouru par l'application Streamlit, par
+GuideDiagnosticCI (ligne de commande) et par l'évaluation sans interface.
+
+Types d'éléments :
+    message       niveau (info/warning/error/success) + texte
+    markdown      texte libre
+    sous_titre    texte
+    code          expander contenant un bloc de code (titre, contenu, langage, ouvert)
+    details       expander contenant du markdown (titre, texte, ouvert)
+    question      id (clé du widget), texte, options, si = {réponse: [éléments]}
+    saisie        champs = [{id, texte, donnee, colonne}], colonnes
+    automatisation  hook = nom d'une vérification automatique fournie par l'interface
+Clés communes optionnelles : si_renseigne (n'afficher que si la valeur existe),
+gabarit (texte formaté avec les valeurs saisies, ex. {ip_centrale}).
+"""
+
+from functools import lru_cache
+
+OUI_NON = ("Oui", "Non")
+
+GUIDES_WIRESHARK = {
+    "connexion_tcp": {
+        "titre": "ANALYSE CONNEXION TCP CI",
+        "filtres": [
+            ("Connexions CI", "tcp.port == {port}"),
+            ("Handshake TCP", "tcp.port == {port} and (tcp.flags.syn == 1 or tcp.flags.ack == 1)"),
+            ("Connexions refusées", "tcp.port == {port} and tcp.flags.reset == 1"),
+            ("Timeouts", "tcp.analysis.retransmission or tcp.analysis.fast_retransmission")
+        ]
+    },
+    "multicast": {
+        "titre": "ANALYSE TRAFIC MULTICAST",
+        "filtres": [
+            ("Multicast général", "ip.dst >= 224.0.0.0 and ip.dst <= 239.255.255.255"),
+            ("IGMP", "igmp"),
+            ("Découverte CI", "udp and ip.dst >= 224.0.0.0"),
+            ("Annonces périodiques", "udp.srcport == 67 or udp.dstport == 67")
+        ]
+    },
+    "qos": {
+        "titre": "ANALYSE QoS ET DSCP",
+        "filtres": [
+            ("Marquage DSCP", "ip.dsfield.dscp != 0"),
+            ("Trafic prioritaire", "ip.dsfield.dscp >= 32"),
+            ("Paquets droppés", "icmp.type == 11 or icmp.type == 3"),
+            ("Congestion", "tcp.analysis.window_full")
+        ]
+    }
+}
+
+ETAPES = [
+    {
+        "numero": 0,
+        "menu": "0️⃣ Configuration Initiale",
+        "titre": "0️⃣ Configuration Initiale du Moniteur",
+        "suivante": "Découverte LLDP",
+        "elements": [
+            {"type": "message", "niveau": "info",
+             "texte": "Cette étape vérifie la configuration de base du moniteur avant le diagnostic réseau."},
+            {"type": "details", "titre": "📋 Informations sur cette étape", "ouvert": True, "texte": """
+        **Points vérifiés :**
+        - Configuration du label ou port mapping
+        - Assignation dans la centrale
+        - Activation des fonctionnalités
+        """},
+            {"type": "question", "id": "q_label_config",
+             "texte": "Avez-vous configuré un label sur le moniteur ou utilisez-vous le port mapping ?",
+             "si": {"Non": [
+                 {"type": "message", "niveau": "error", "texte": "⚠️ **ACTION REQUISE:** Configuration du label nécessaire"},
+                 {"type": "details", "titre": "📝 Détails de la correction", "texte": """
+            1. Configurer un label unique sur le moniteur
+            2. OU activer le port mapping automatique
+            3. Vérifier que le label ne conflit pas avec un autre équipement
+            """},
+                 {"type": "question", "id": "q_auto_mapping",
+                  "texte": "Le port mapping automatique est-il activé sur la centrale ?",
+                  "si": {"Non": [
+                      {"type": "message", "niveau": "error",
+                       "texte": "Configuration nécessaire côté centrale pour la découverte automatique"},
+                  ]}},
+             ]}},
+            {"type": "question", "id": "q_assignation",
+             "texte": "Le moniteur est-il correctement assigné/déclaré dans l'application centrale ?",
+             "si": {"Non": [
+                 {"type": "message", "niveau": "error", "texte": "⚠️ **ACTION REQUISE:** Assignation du moniteur dans la centrale"},
+                 {"type": "details", "titre": "📝 Détails de la correction", "texte": """
+            1. Ajouter le moniteur dans l'interface de gestion
+            2. Associer le bon label/adresse au moniteur
+            3. Vérifier les droits/autorisations du moniteur
+            4. Sauvegarder et appliquer la configuration
+            """},
+                 {"type": "question", "id": "q_statut_interface",
+                  "texte": "Le moniteur apparaît-il comme 'En ligne' dans l'interface de la centrale ?"},
+             ]}},
+            {"type": "question", "id": "q_fonctionnalites",
+             "texte": "Toutes les fonctionnalités du moniteur sont-elles activées (appel, diffusion, etc.) ?",
+             "si": {"Non": [
+                 {"type": "message", "niveau": "warning",
+                  "texte": "Vérifier la configuration des fonctionnalités - Activer les services nécessaires"},
+             ]}},
+        ],
+    },
+    {
+        "numero": 1,
+        "menu": "1️⃣ Découverte LLDP",
+        "titre": "1️⃣ Découverte LLDP - Topologie Réseau",
+        "suivante": "Couche Physique",
+        "elements": [
+            {"type": "message", "niveau": "info",
+             "texte": "LLDP permet d'identifier la topologie réseau et la configuration du port switch."},
+            {"type": "code", "titre": "🔍 Commandes LLDP utiles", "langage": "bash", "contenu": """
+# Vérifier LLDP sur le switch
+show lldp neighbors
+show lldp neighbors detail
+
+# Activer LLDP (Cisco)
+lldp run
+
+# Informations du port
+show lldp interface <interface>
+        """},
+            {"type": "automatisation", "hook": "analyse_cli_switch"},
+            {"type": "question", "id": "q_lldp_active",
+             "texte": "LLDP est-il activé sur le switch connecté au moniteur ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "warning", "texte": "⚠️ Activer LLDP sur le switch : `lldp run`"},
+                 ],
+                 "Oui": [
+                     {"type": "question", "id": "q_lldp_visible",
+                      "texte": "Le moniteur est-il visible dans 'show lldp neighbors' sur le switch ?",
+                      "si": {
+                          "Non": [
+                              {"type": "message", "niveau": "error", "texte": "⚠️ Moniteur non découvert par LLDP"},
+                              {"type": "details", "titre": "📝 Actions correctives", "texte": """
+                1. Vérifier que LLDP est activé sur le moniteur
+                2. Contrôler la connectivité physique
+                3. Attendre la synchronisation LLDP (30s-2min)
+                4. Vérifier avec: `show lldp neighbors detail`
+                """},
+                          ],
+                          "Oui": [
+                              {"type": "sous_titre", "texte": "📋 Informations LLDP collectées"},
+                              {"type": "saisie", "colonnes": 2, "champs": [
+                                  {"id": "lldp_device", "texte": "Nom/Hostname du moniteur", "donnee": "LLDP Device", "colonne": 0},
+                                  {"id": "lldp_port", "texte": "Port switch connecté (ex: Gi0/1)", "donnee": "Port Switch", "colonne": 0},
+                                  {"id": "lldp_vlan", "texte": "VLAN natif du port", "donnee": "VLAN", "colonne": 1},
+                                  {"id": "lldp_cap", "texte": "Capabilities LLDP", "colonne": 1},
+                              ]},
+                          ],
+                      }},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 2,
+        "menu": "2️⃣ Couche Physique",
+        "titre": "2️⃣ Couche Physique - Connectivité de base",
+        "suivante": "Couche IP",
+        "elements": [
+            {"type": "code", "titre": "🔍 Commandes de vérification", "langage": "bash", "contenu": """
+# État de l'interface
+show interface <interface> status
+show interface <interface>
+
+# Erreurs d'interface
+show interface <interface> | include error
+
+# Nettoyer les compteurs
+clear counters <interface>
+        """},
+            {"type": "automatisation", "hook": "taux_erreurs_interfaces"},
+            {"type": "question", "id": "q_link_up",
+             "texte": "Le moniteur est-il alimenté et le voyant Link est-il vert/actif ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME PHYSIQUE DÉTECTÉ**"},
+                     {"type": "details", "titre": "📝 Actions correctives urgentes", "texte": """
+            1. Tester un autre câble réseau
+            2. Changer de port sur le switch
+            3. Vérifier l'alimentation du moniteur
+            4. Contrôler les LEDs du switch
+            5. Vérifier les informations LLDP si disponibles
+            """},
+                 ],
+                 "Oui": [
+                     {"type": "question", "id": "q_erreurs_interface",
+                      "texte": "Le device status du port switch indique-t-il des erreurs ?",
+                      "si": {"Oui": [
+                          {"type": "message", "niveau": "warning",
+                           "texte": "Analyser les erreurs d'interface (CRC, collisions, runts)"},
+                      ]}},
+                     {"type": "question", "id": "q_vitesse",
+                      "texte": "Le link est-il à la bonne vitesse (100M/1G) ?",
+                      "si": {"Non": [
+                          {"type": "message", "niveau": "warning",
+                           "texte": "Problème de négociation de vitesse - Forcer speed/duplex si nécessaire"},
+                      ]}},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 3,
+        "menu": "3️⃣ Couche IP",
+        "titre": "3️⃣ Couche Réseau (IP) - Configuration réseau",
+        "suivante": "Connectivité",
+        "elements": [
+            {"type": "code", "titre": "🔍 Commandes réseau", "langage": "bash", "contenu": """
+# DHCP
+show ip dhcp binding
+show ip dhcp lease
+
+# ARP
+show ip arp
+arp -a
+
+# Routing
+show ip route
+        """},
+            {"type": "sous_titre", "texte": "📋 Informations réseau du moniteur"},
+            {"type": "saisie", "colonnes": 2, "champs": [
+                {"id": "ip_moniteur", "texte": "Adresse IP du moniteur", "donnee": "IP Moniteur", "colonne": 0},
+                {"id": "subnet", "texte": "Sous-réseau (ex: 192.168.1.0/24)", "colonne": 0},
+                {"id": "gateway", "texte": "Passerelle par défaut", "donnee": "Gateway", "colonne": 1},
+            ]},
+            {"type": "automatisation", "hook": "conflits_ip"},
+            {"type": "automatisation", "hook": "validation_plan"},
+            {"type": "question", "id": "q_ip_valide",
+             "texte": "Le moniteur a-t-il une adresse IP valide (pas 169.254.x.x) ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME D'ATTRIBUTION IP**"},
+                     {"type": "details", "titre": "📝 Actions correctives", "texte": """
+            1. Vérifier le serveur DHCP: `show ip dhcp binding`
+            2. Contrôler la configuration IP statique du moniteur
+            3. Vérifier les VLANs: `show vlan brief`
+            4. Tester depuis un autre device sur le même segment
+            """},
+                 ],
+                 "Oui": [
+                     {"type": "question", "id": "q_ping_gw",
+                      "texte": "Le moniteur peut-il pinger sa passerelle par défaut ?",
+                      "si": {"Non": [
+                          {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME DE PASSERELLE**"},
+                          {"type": "details", "titre": "📝 Diagnostic passerelle", "texte": """
+                1. Vérifier la table de routage: `show ip route`
+                2. Contrôler les VLANs: `show vlan id <vlan>`
+                3. Tester depuis un autre équipement du même VLAN
+                4. Vérifier l'interface SVI: `show ip interface vlan<X>`
+                """},
+                      ]}},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 4,
+        "menu": "4️⃣ Connectivité",
+        "titre": "4️⃣ Connectivité Moniteur ↔ Centrale",
+        "suivante": "Port CI",
+        "elements": [
+            {"type": "saisie", "colonnes": 1, "champs": [
+                {"id": "ip_centrale", "texte": "Adresse IP de la centrale CI", "donnee": "IP Centrale", "colonne": 0},
+            ]},
+            {"type": "automatisation", "hook": "route_centrale_plan"},
+            {"type": "code", "titre": "🔍 Tests de connectivité", "langage": "bash", "si_renseigne": "ip_centrale",
+             "gabarit": True, "contenu": """
+# Test ping
+ping {ip_centrale}
+ping {ip_centrale} -t
+
+# Traceroute
+tracert {ip_centrale}
+
+# Test MTU
+ping {ip_centrale} -f -l 1472
+            """},
+            {"type": "automatisation", "hook": "mesure_latence"},
+            {"type": "question", "id": "q_ping_centrale",
+             "texte": "Le moniteur peut-il pinger l'IP de la centrale ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME DE CONNECTIVITÉ**"},
+                     {"type": "details", "titre": "📝 Diagnostic approfondi", "gabarit": True, "texte": """
+            1. Traceroute: `tracert {ip_centrale}`
+            2. Vérifier les ACLs: `show ip access-list`
+            3. Contrôler les firewalls intermédiaires
+            4. Vérifier les routes: `show ip route`
+            """},
+                 ],
+                 "Oui": [
+                     {"type": "question", "id": "q_latence",
+                      "texte": "La latence ping est-elle correcte (<10ms en LAN, <50ms en WAN) ?",
+                      "si": {"Non": [
+                          {"type": "message", "niveau": "warning", "texte": "⚠️ Latence élevée détectée"},
+                          {"type": "question", "id": "q_pertes",
+                           "texte": "Y a-t-il des pertes de paquets dans le ping ?",
+                           "si": {"Oui": [
+                               {"type": "message", "niveau": "error",
+                                "texte": "Pertes de paquets - Vérifier la charge réseau et les erreurs d'interface"},
+                           ]}},
+                      ]}},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 5,
+        "menu": "5️⃣ Port CI (24005)",
+        "titre": "5️⃣ Port CI 24005 - Service et Connexion TCP",
+        "suivante": "Couche Applicative",
+        "elements": [
+            {"type": "message", "niveau": "warning",
+             "texte": "⚠️ **TESTS DEPUIS LA CENTRALE UNIQUEMENT** - Le moniteur ne permet pas l'exécution de commandes"},
+            {"type": "code", "titre": "🔍 Commandes de test (depuis la centrale)", "langage": "bash", "contenu": """
+# Vérifier écoute du service
+netstat -an | grep 24005
+ss -tlnp | grep 24005
+
+# Test local
+telnet localhost 24005
+
+# PowerShell
+Get-NetTCPConnection -LocalPort 24005
+        """},
+            {"type": "automatisation", "hook": "table_sockets"},
+            {"type": "automatisation", "hook": "scan_port_ci"},
+            {"type": "automatisation", "hook": "sonde_applicative"},
+            {"type": "question", "id": "q_service_ecoute",
+             "texte": "Le service CI écoute-t-il sur le port 24005 sur la centrale ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "error", "texte": "⚠️ **SERVICE CI NON ACTIF**"},
+                     {"type": "details", "titre": "📝 Actions correctives urgentes", "texte": """
+            1. Vérifier service: `systemctl status <service_ci>`
+            2. Contrôler config port dans fichier conf
+            3. Examiner logs: `journalctl -u <service>`
+            4. Redémarrer si nécessaire
+            5. Vérifier bind address (0.0.0.0 vs IP spécifique)
+            """},
+                 ],
+                 "Oui": [
+                     {"type": "sous_titre", "texte": "🔬 Analyse Wireshark"},
+                     {"type": "code", "titre": "Filtres Wireshark recommandés", "contenu": """
+# Filtre de base
+tcp.port == 24005
+
+# Handshake TCP
+tcp.port == 24005 and (tcp.flags.syn == 1 or tcp.flags.reset == 1)
+
+# Connexions refusées
+tcp.port == 24005 and tcp.flags.reset == 1
+
+# Retransmissions
+tcp.analysis.retransmission
+            """},
+                     {"type": "automatisation", "hook": "analyse_handshake"},
+                     {"type": "automatisation", "hook": "reconnexions"},
+                     {"type": "question", "id": "q_tentatives_wireshark",
+                      "texte": "Une capture Wireshark montre-t-elle des tentatives de connexion du moniteur ?",
+                      "si": {
+                          "Non": [
+                              {"type": "message", "niveau": "error", "texte": "⚠️ Moniteur ne tente pas de connexion"},
+                              {"type": "markdown", "texte": """
+            **Causes possibles:**
+            - Moniteur hors tension
+            - Problème réseau en amont
+            - Configuration moniteur incorrecte
+            - IP centrale mal configurée
+            """},
+                          ],
+                          "Oui": [
+                              {"type": "question", "id": "q_handshake",
+                               "texte": "Le handshake TCP s'établit-il correctement (SYN → SYN-ACK → ACK) ?",
+                               "si": {
+                                   "Non": [
+                                       {"type": "question", "id": "q_rst",
+                                        "texte": "Y a-t-il des paquets TCP RST (reset) ?",
+                                        "si": {
+                                            "Oui": [
+                                                {"type": "message", "niveau": "error",
+                                                 "texte": "Connexion activement refusée - Vérifier firewall/ACL"},
+                                            ],
+                                            "Non": [
+                                                {"type": "message", "niveau": "error",
+                                                 "texte": "Pas de SYN-ACK - Le paquet SYN n'arrive pas ou pas de réponse"},
+                                            ],
+                                        }},
+                                   ],
+                                   "Oui": [
+                                       {"type": "question", "id": "q_comm_app",
+                                        "texte": "La communication applicative s'établit-elle après le TCP ?",
+                                        "si": {"Non": [
+                                            {"type": "message", "niveau": "warning",
+                                             "texte": "Problème couche applicative - Vérifier authentification"},
+                                        ]}},
+                                       {"type": "question", "id": "q_reconnexions",
+                                        "texte": "Le moniteur se reconnecte-t-il en boucle (connexions / déconnexions répétées) ?",
+                                        "si": {"Oui": [
+                                            {"type": "message", "niveau": "warning",
+                                             "texte": "Connexion instable - Vérifier keepalive, timeouts applicatifs et charge de la centrale"},
+                                            {"type": "markdown", "texte": """
+            **Causes fréquentes:**
+            - Câble ou port défaillant, négociation duplex (étape 2)
+            - Adresse IP en conflit avec un autre équipement
+            - Timeout applicatif ou keepalive plus court qu'un équipement intermédiaire (firewall, NAT)
+            - Centrale saturée ou redémarrée : tous les moniteurs se reconnectent en même temps
+            """},
+                                        ]}},
+                                   ],
+                               }},
+                          ],
+                      }},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 6,
+        "menu": "6️⃣ Couche Applicative",
+        "titre": "6️⃣ Couche Applicative - Service CI",
+        "suivante": "Trafic Multicast",
+        "elements": [
+            {"type": "code", "titre": "🔍 Commandes de vérification service", "langage": "bash", "contenu": """
+# État du service
+systemctl status <service_ci>
+journalctl -u <service_ci> -f
+
+# Processus
+ps aux | grep ci
+
+# Ports écoutés
+netstat -tlnp | grep 24005
+
+# Ressources
+top
+df -h
+        """},
+            {"type": "automatisation", "hook": "sockets_service"},
+            {"type": "automatisation", "hook": "sonde_service"},
+            {"type": "question", "id": "q_service_repond",
+             "texte": "Le service CI répond-il aux requêtes applicatives ?",
+             "si": {"Non": [
+                 {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME APPLICATIF DÉTECTÉ**"},
+                 {"type": "automatisation", "hook": "analyse_logs"},
+                 {"type": "question", "id": "q_logs_erreur",
+                  "texte": "Y a-t-il des erreurs dans les logs de l'application CI ?",
+                  "si": {"Oui": [
+                      {"type": "saisie", "colonnes": 1, "champs": [
+                          {"id": "type_erreur", "texte": "Type d'erreur observé dans les logs", "donnee": "Type erreur", "colonne": 0},
+                      ]},
+                  ]}},
+                 {"type": "question", "id": "q_ressources",
+                  "texte": "Les ressources système sont-elles suffisantes (CPU < 80%, RAM libre) ?",
+                  "si": {"Non": [
+                      {"type": "message", "niveau": "error", "texte": "⚠️ Ressources système insuffisantes"},
+                  ]}},
+             ]}},
+        ],
+    },
+    {
+        "numero": 7,
+        "menu": "7️⃣ Trafic Multicast",
+        "titre": "7️⃣ Trafic Multicast - Découverte Automatique",
+        "suivante": "QoS",
+        "elements": [
+            {"type": "message", "niveau": "info",
+             "texte": "Le multicast est souvent utilisé pour la découverte automatique des moniteurs"},
+            {"type": "code", "titre": "🔬 Filtres Wireshark Multicast", "contenu": """
+# Multicast général
+ip.dst >= 224.0.0.0 and ip.dst <= 239.255.255.255
+
+# IGMP
+igmp
+
+# Découverte CI
+udp and ip.dst >= 224.0.0.0
+        """},
+            {"type": "code", "titre": "🔍 Commandes réseau multicast", "langage": "bash", "contenu": """
+# IGMP Snooping
+show ip igmp snooping
+show ip igmp snooping groups
+
+# IGMP Querier
+show ip igmp snooping querier
+
+# Table multicast
+show mac address-table multicast
+
+# PIM (si routage)
+show ip pim neighbor
+show ip mroute
+        """},
+            {"type": "automatisation", "hook": "analyse_multicast"},
+            {"type": "question", "id": "q_multicast_visible",
+             "texte": "Du trafic multicast est-il visible en Wireshark ?",
+             "si": {
+                 "Non": [
+                     {"type": "message", "niveau": "error", "texte": "⚠️ **PROBLÈME MULTICAST**"},
+                     {"type": "question", "id": "q_igmp_snooping",
+                      "texte": "IGMP Snooping est-il activé sur les switches ?",
+                      "si": {"Oui": [
+                          {"type": "question", "id": "q_querier",
+                           "texte": "Un IGMP Querier est-il présent et actif ?",
+                           "si": {"Non": [
+                               {"type": "message", "niveau": "error", "texte": "⚠️ Configurer un Querier IGMP"},
+                           ]}},
+                      ]}},
+                 ],
+                 "Oui": [
+                     {"type": "saisie", "colonnes": 1, "champs": [
+                         {"id": "groupes_multicast", "texte": "Groupes multicast observés (ex: 224.1.1.1)",
+                          "donnee": "Groupes multicast", "colonne": 0},
+                     ]},
+                     {"type": "question", "id": "q_contenu_multicast",
+                      "texte": "Le contenu des paquets multicast semble-t-il correct ?"},
+                 ],
+             }},
+        ],
+    },
+    {
+        "numero": 8,
+        "menu": "8️⃣ QoS et Priorisation",
+        "titre": "8️⃣ QoS et Priorisation - Qualité de Service",
+        "suivante": None,
+        "elements": [
+            {"type": "code", "titre": "🔍 Commandes QoS", "langage": "bash", "contenu": """
+# Configuration QoS
+show policy-map
+show class-map
+
+# Par interface
+show policy-map interface <int>
+
+# Statistiques
+show policy-map interface <int> statistics
+show interface <int> | include drops
+
+# Utilisation
+show interface | include load
+        """},
+            {"type": "code", "titre": "🔬 Filtres Wireshark QoS", "contenu": """
+# Marquage DSCP
+ip.dsfield.dscp != 0
+
+# Trafic prioritaire
+ip.dsfield.dscp >= 32
+
+# Congestion
+tcp.analysis.window_full
+        """},
+            {"type": "automatisation", "hook": "analyse_qos"},
+            {"type": "question", "id": "q_qos_active",
+             "texte": "Des politiques QoS sont-elles configurées sur le réseau ?",
+             "si": {
+                 "Oui": [
+                     {"type": "question", "id": "q_dscp",
+                      "texte": "Le marquage DSCP est-il correct sur les paquets CI ?",
+                      "si": {"Non": [
+                          {"type": "message", "niveau": "warning", "texte": "⚠️ Problème de marquage QoS"},
+                      ]}},
+                     {"type": "question", "id": "q_congestion",
+                      "texte": "Y a-t-il des signes de congestion réseau ?",
+                      "si": {"Oui": [
+                          {"type": "message", "niveau": "error", "texte": "⚠️ Congestion détectée"},
+                          {"type": "question", "id": "q_perf_ci",
+                           "texte": "Les performances du CI sont-elles dégradées pendant les pics ?"},
+                      ]}},
+                 ],
+                 "Non": [
+                     {"type": "question", "id": "q_problemes_perf",
+                      "texte": "Y a-t-il des problèmes de performance ou de latence ?",
+                      "si": {"Oui": [
+                          {"type": "message", "niveau": "warning",
+                           "texte": "💡 Considérer l'implémentation de la QoS pour le trafic CI"},
+                      ]}},
+                 ],
+             }},
+        ],
+    },
+]
+
+
+class Element:
+    """Élément compilé de l'arbre (question, message, bloc de code, saisie...)."""
+
+    __slots__ = ("type", "id", "etape", "texte", "niveau", "titre", "contenu", "langage",
+                 "ouvert", "options", "branches", "champs", "colonnes", "hook",
+                 "si_renseigne", "gabarit", "parent", "rang")
+
+    def __init__(self, donnees, etape, parent):
+        self.type = donnees["type"]
+        self.id = donnees.get("id")
+        self.etape = etape
+        self.texte = donnees.get("texte", "")
+        self.niveau = donnees.get("niveau")
+        self.titre = donnees.get("titre", "")
+        self.contenu = donnees.get("contenu", "")
+        self.langage = donnees.get("langage")
+        self.ouvert = donnees.get("ouvert", False)
+        self.options = tuple(donnees.get("options", OUI_NON))
+        self.branches = {}
+        self.champs = tuple(donnees.get("champs", ()))
+        self.colonnes = donnees.get("colonnes", 1)
+        self.hook = donnees.get("hook")
+        self.si_renseigne = donnees.get("si_renseigne")
+        self.gabarit = donnees.get("gabarit", False)
+        self.parent = parent
+        self.rang = None
+
+    def __repr__(self):
+        return f"<Element {self.type} {self.id or self.titre or self.texte[:30]!r} étape {self.etape}>"
+
+
+class _Valeurs(dict):
+    """Contexte de formatage des gabarits : une valeur absente devient son nom en majuscules."""
+
+    def __missing__(self, cle):
+        return cle.upper()
+
+
+def formater(texte, valeurs):
+    """Remplace les {cle} d'un gabarit par les valeurs saisies."""
+    return texte.format_map(_Valeurs((k, v) for k, v in valeurs.items() if v))
+
+
+class Etape:
+    """Étape compilée : éléments de premier niveau et questions indexées."""
+
+    __slots__ = ("numero", "menu", "titre", "suivante", "elements", "questions")
+
+    def __init__(self, donnees):
+        self.numero = donnees["numero"]
+        self.menu = donnees["menu"]
+        self.titre = donnees["titre"]
+        self.suivante = donnees.get("suivante")
+        self.elements = ()
+        self.questions = []
+
+
+class GrapheDiagnostic:
+    """Arbre de décision compilé : index des questions, des champs et des automatisations."""
+
+    def __init__(self, etapes):
+        self.etapes = []
+        self.noeuds = {}
+        self.champs = {}
+        self.hooks = {}
+        for donnees in etapes:
+            etape = Etape(donnees)
+            etape.elements = self._compiler(donnees["elements"], etape, None)
+            self.etapes.append(etape)
+        for rang, noeud in enumerate(self.noeuds.values()):
+            noeud.rang = rang
+
+    def _compiler(self, elements, etape, parent):
+        compiles = []
+        for donnees in elements:
+            element = Element(donnees, etape.numero, parent)
+            if element.type == "question":
+                if element.id in self.noeuds:
+                    raise ValueError(f"Question dupliquée dans l'arbre : {element.id}")
+                self.noeuds[element.id] = element
+                etape.questions.append(element)
+                element.branches = {
+                    reponse: self._compiler(sous_elements, etape, (element, reponse))
+                    for reponse, sous_elements in donnees.get("si", {}).items()
+                }
+            elif element.type == "saisie":
+                for champ in element.champs:
+                    self.champs[champ["id"]] = (etape.numero, champ)
+            elif element.type == "automatisation":
+                self.hooks[element.hook] = etape.numero
+            compiles.append(element)
+        return tuple(compiles)
+
+    def etape(self, numero):
+        """Retourne l'étape compilée de numéro donné."""
+        return self.etapes[numero]
+
+    def chemin(self, id_question):
+        """Réponses requises pour atteindre une question : [(id parent, réponse), ...]."""
+        chemin = []
+        parent = self.noeuds[id_question].parent
+        while parent is not None:
+            chemin.append((parent[0].id, parent[1]))
+            parent = parent[0].parent
+        return chemin[::-1]
+
+    def evaluer(self, reponses, etapes=None):
+        """Parcourt l'arbre pour un jeu de réponses, sans interface.
+
+        Retourne le parcours suivi, les constats (messages error/warning atteints),
+        les questions atteintes mais sans réponse, et la première étape en échec.
+        """
+        parcours = []
+        constats = []
+        manquantes = []
+        etape_en_echec = None
+        for etape in self.etapes:
+            if etapes is not None and etape.numero not in etapes:
+                continue
+            pile = list(reversed(etape.elements))
+            while pile:
+                element = pile.pop()
+                if element.type == "question":
+                    reponse = reponses.get(element.id)
+                    if reponse is None:
+                        manquantes.append(element.id)
+                        continue
+                    parcours.append((etape.numero, element.id, reponse))
+                    branche = element.branches.get(reponse)
+                    if branche:
+                        pile.extend(reversed(branche))
+                elif element.type == "message" and element.niveau in ("error", "warning"):
+                    constats.append((etape.numero, element.niveau, element.texte))
+                    if element.niveau == "error" and etape_en_echec is None:
+                        etape_en_echec = etape.numero
+        return {
+            "parcours": parcours,
+            "constats": constats,
+            "manquantes": manquantes,
+            "etape_en_echec": etape_en_echec,
+        }
+
+
+@lru_cache(maxsize=1)
+def graphe():
+    """Graphe compilé une seule fois par processus."""
+    return GrapheDiagnostic(ETAPES)
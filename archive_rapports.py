@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive SQLite des rapports de diagnostic exportés (diagnostic_ci_*.json)
+Ingestion incrémentale en masse et requêtes indexées par moniteur, switch, VLAN, étape et date
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sqlite3
+import sys
+
+MOTIF_RAPPORT = "diagnostic_ci_*.json"
+TAILLE_LOT = 1000
+
+# Colonne SQLite -> clé de donnees_collectees
+COLONNES_DONNEES = {
+    "ip_moniteur": "IP Moniteur",
+    "ip_centrale": "IP Centrale",
+    "equipement": "LLDP Device",
+    "port_switch": "Port Switch",
+    "vlan": "VLAN",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fichiers (
+    chemin TEXT PRIMARY KEY,
+    taille INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rapports (
+    id INTEGER PRIMARY KEY,
+    fichier TEXT NOT NULL UNIQUE,
+    timestamp TEXT,
+    port INTEGER,
+    etape INTEGER,
+    etape_en_echec INTEGER,
+    ip_moniteur TEXT,
+    ip_centrale TEXT,
+    equipement TEXT,
+    port_switch TEXT,
+    vlan TEXT,
+    recommandations TEXT,
+    donnees TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rapports_moniteur ON rapports (ip_moniteur, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rapports_switch ON rapports (equipement, port_switch, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rapports_port_switch ON rapports (port_switch, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rapports_vlan ON rapports (vlan, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rapports_etape ON rapports (etape, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rapports_timestamp ON rapports (timestamp);
+"""
+# Après la migration des archives créées sans la colonne etape_en_echec
+INDEX_ECHEC = "CREATE INDEX IF NOT EXISTS idx_rapports_echec ON rapports (etape_en_echec, timestamp)"
+
+_INSERTION_RAPPORT = (
+    "INSERT OR REPLACE INTO rapports (fichier, timestamp, port, etape, etape_en_echec, ip_moniteur, ip_centrale, "
+    "equipement, port_switch, vlan, recommandations, donnees) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERTION_FICHIER = "INSERT OR REPLACE INTO fichiers (chemin, taille, mtime_ns) VALUES (?, ?, ?)"
+
+
+def lister_rapports(chemins, motif=MOTIF_RAPPORT):
+    """Fichiers de rapport (chemin, stat) sous une liste de fichiers ou dossiers, récursivement."""
+    a_parcourir = list(chemins)
+    while a_parcourir:
+        chemin = a_parcourir.pop()
+        if os.path.isfile(chemin):
+            yield os.path.abspath(chemin), os.stat(chemin)
+            continue
+        with os.scandir(chemin) as entrees:
+            for entree in entrees:
+                if entree.is_dir(follow_symlinks=False):
+                    a_parcourir.append(entree.path)
+                elif fnmatch.fnmatch(entree.name, motif):
+                    yield os.path.abspath(entree.path), entree.stat()
+
+
+def ligne_rapport(fichier, rapport):
+    """Ligne de la table rapports depuis un rapport exporté (GuideDiagnosticCI ou application).
+
+    etape : étape atteinte (etape_finale) ; etape_en_echec : première étape en échec du parcours.
+    """
+    contenu = rapport.get("diagnostic_ci", {})
+    donnees = contenu.get("donnees_collectees") or {}
+    etape = contenu.get("etape_finale")
+    echec = contenu.get("etape_en_echec")
+    return (
+        fichier,
+        contenu.get("timestamp"),
+        contenu.get("port"),
+        int(etape) if etape is not None else None,
+        int(echec) if echec is not None else None,
+        *(str(donnees[cle]) if donnees.get(cle) not in (None, "") else None for cle in COLONNES_DONNEES.values()),
+        json.dumps(contenu.get("recommandations") or [], ensure_ascii=False),
+        json.dumps(donnees, ensure_ascii=False),
+    )
+
+
+class ArchiveRapports:
+    """Archive SQLite des rapports : ingestion incrémentale et requêtes indexées."""
+
+    def __init__(self, chemin_base="diagnostics_ci.sqlite"):
+        self.chemin_base = chemin_base
+        self.connexion = sqlite3.connect(chemin_base, check_same_thread=False)
+        self.connexion.row_factory = sqlite3.Row
+        self.connexion.execute("PRAGMA journal_mode=WAL")
+        self.connexion.execute("PRAGMA synchronous=NORMAL")
+        self.connexion.executescript(SCHEMA)
+        colonnes = {ligne[1] for ligne in self.connexion.execute("PRAGMA table_info(rapports)")}
+        if "etape_en_echec" not in colonnes:
+            # Archive antérieure : colonne ajoutée, rapports relus à la prochaine ingestion
+            with self.connexion:
+                self.connexion.execute("ALTER TABLE rapports ADD COLUMN etape_en_echec INTEGER")
+                self.connexion.execute("DELETE FROM fichiers")
+        self.connexion.execute(INDEX_ECHEC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def fermer(self):
+        self.connexion.close()
+
+    def ingerer(self, chemins, progression=None):
+        """Charge les rapports non encore archivés (ou modifiés depuis) ; retourne les compteurs."""
+        connus = {
+            chemin: (taille, mtime_ns)
+            for chemin, taille, mtime_ns in self.connexion.execute("SELECT chemin, taille, mtime_ns FROM fichiers")
+        }
+        compteurs = {"ajoutes": 0, "ignores": 0, "erreurs": 0}
+        rapports, fichiers = [], []
+        for fichier, stat in lister_rapports(chemins):
+            if connus.get(fichier) == (stat.st_size, stat.st_mtime_ns):
+                compteurs["ignores"] += 1
+                continue
+            fichiers.append((fichier, stat.st_size, stat.st_mtime_ns))
+            try:
+                with open(fichier, encoding="utf-8") as f:
+                    rapports.append(ligne_rapport(fichier, json.load(f)))
+            except (OSError, ValueError, TypeError, AttributeError):
+                # Mémorisé dans fichiers : ignoré tant qu'il n'est pas modifié
+                compteurs["erreurs"] += 1
+                continue
+            if len(rapports) >= TAILLE_LOT:
+                compteurs["ajoutes"] += self._inserer(rapports, fichiers)
+                rapports, fichiers = [], []
+                if progression:
+                    progression(compteurs)
+        if fichiers:
+            compteurs["ajoutes"] += self._inserer(rapports, fichiers)
+        if progression:
+            progression(compteurs)
+        return compteurs
+
+    def _inserer(self, rapports, fichiers):
+        with self.connexion:
+            self.connexion.executemany(_INSERTION_RAPPORT, rapports)
+            self.connexion.executemany(_INSERTION_FICHIER, fichiers)
+        return len(rapports)
+
+    def rechercher(self, ip_moniteur=None, equipement=None, port_switch=None, vlan=None,
+                   etape=None, depuis=None, jusqu_a=None, limite=500, etape_en_echec=None):
+        """Rapports correspondant aux filtres, du plus récent au plus ancien.
+
+        depuis / jusqu_a : bornes ISO (ex: "2024-05-01"), comparées au timestamp du rapport.
+        """
+        conditions, parametres = [], []
+        for colonne, valeur in (("ip_moniteur", ip_moniteur), ("equipement", equipement),
+                                ("port_switch", port_switch), ("vlan", vlan), ("etape", etape),
+                                ("etape_en_echec", etape_en_echec)):
+            if valeur not in (None, ""):
+                conditions.append(f"{colonne} = ?")
+                parametres.append(valeur)
+        if depuis:
+            conditions.append("timestamp >= ?")
+            parametres.append(depuis)
+        if jusqu_a:
+            conditions.append("timestamp < ?")
+            parametres.append(jusqu_a)
+        requete = (
+            "SELECT timestamp, ip_moniteur, ip_centrale, equipement, port_switch, vlan, etape, etape_en_echec, fichier "
+            "FROM rapports"
+        )
+        if conditions:
+            requete += " WHERE " + " AND ".join(conditions)
+        requete += " ORDER BY timestamp DESC LIMIT ?"
+        parametres.append(int(limite))
+        return [dict(ligne) for ligne in self.connexion.execute(requete, parametres)]
+
+    def compter_par_etape(self, depuis=None, jusqu_a=None):
+        """Nombre de rapports par étape finale sur une période."""
+        requete = "SELECT etape, COUNT(*) FROM rapports WHERE timestamp >= ? AND timestamp < ? GROUP BY etape"
+        return dict(self.connexion.execute(requete, (depuis or "", jusqu_a or "9999")).fetchall())
+
+    def rapport(self, fichier):
+        """Données collectées et recommandations complètes d'un rapport archivé."""
+        ligne = self.connexion.execute(
+            "SELECT recommandations, donnees FROM rapports WHERE fichier = ?", (fichier,)
+        ).fetchone()
+        if ligne is None:
+            return None
+        return {"recommandations": json.loads(ligne["recommandations"]), "donnees_collectees": json.loads(ligne["donnees"])}
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM rapports").fetchone()[0]
+
+
+def main(argv=None):
+    """Point d'entrée : ingestion ou recherche en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Archive SQLite des rapports de diagnostic CI")
+    parser.add_argument("--base", default="diagnostics_ci.sqlite", help="Base SQLite")
+    sous_commandes = parser.add_subparsers(dest="commande", required=True)
+
+    ingestion = sous_commandes.add_parser("ingerer", help="Charge les rapports diagnostic_ci_*.json")
+    ingestion.add_argument("chemins", nargs="+", help="Fichiers ou dossiers de rapports")
+
+    recherche = sous_commandes.add_parser("rechercher", help="Recherche dans l'archive")
+    recherche.add_argument("--moniteur", help="IP du moniteur")
+    recherche.add_argument("--switch", help="Équipement (LLDP Device)")
+    recherche.add_argument("--port-switch", help="Port switch (ex: Gi0/1)")
+    recherche.add_argument("--vlan", help="VLAN")
+    recherche.add_argument("--etape", type=int, help="Étape atteinte")
+    recherche.add_argument("--etape-echec", type=int, help="Première étape en échec")
+    recherche.add_argument("--depuis", help="Date ISO de début (incluse)")
+    recherche.add_argument("--jusqu-a", help="Date ISO de fin (exclue)")
+    recherche.add_argument("--limite", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    with ArchiveRapports(args.base) as archive:
+        if args.commande == "ingerer":
+            compteurs = archive.ingerer(args.chemins)
+            print(f"✅ {compteurs['ajoutes']} rapports ajoutés, {compteurs['ignores']} déjà archivés, "
+                  f"{compteurs['erreurs']} illisibles ({len(archive)} au total)")
+            return 0
+        lignes = archive.rechercher(args.moniteur, args.switch, args.port_switch, args.vlan,
+                                    args.etape, args.depuis, args.jusqu_a, args.limite, args.etape_echec)
+        for ligne in lignes:
+            print(f"{ligne['timestamp']}  {ligne['ip_moniteur'] or '-':<15}  {ligne['equipement'] or '-'} "
+                  f"{ligne['port_switch'] or '-'}  VLAN {ligne['vlan'] or '-'}  étape {ligne['etape']}"
+                  + (f"  échec étape {ligne['etape_en_echec']}" if ligne["etape_en_echec"] is not None else ""))
+        print(f"📊 {len(lignes)} rapport(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
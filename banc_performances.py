@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Banc de performances : rendu des étapes, historique/export et analyses sur parcs synthétiques
+Résultats JSON comparés à une référence pour détecter les régressions avant déploiement
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TAILLES_DEFAUT = (10, 1000, 100000)
+TOLERANCE_DEFAUT = 0.25       # +25 % sur la médiane
+PLANCHER_MS = 1.0             # écarts absolus plus faibles ignorés (bruit de mesure)
+DUREE_CIBLE_S = 0.5           # répétitions jusqu'à cette durée cumulée...
+REPETITIONS_MAX = 20          # ... dans cette limite
+PORTS_PAR_SWITCH = 48
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+# Générateurs de données synthétiques : parc de n moniteurs déterministe
+
+def flotte(n):
+    """Parc de n moniteurs : IP, MAC, switch/port, VLAN, passerelle."""
+    moniteurs = []
+    for i in range(n):
+        reseau = i // 250
+        moniteurs.append({
+            "ip_moniteur": f"10.{reseau // 256}.{reseau % 256}.{i % 250 + 1}",
+            "mac": f"00a0.{i >> 16 & 0xFFFF:04x}.{i & 0xFFFF:04x}",
+            "switch": f"sw-{i // PORTS_PAR_SWITCH:05d}",
+            "port_switch": f"Gi1/0/{i % PORTS_PAR_SWITCH + 1}",
+            "vlan": str(100 + reseau % 100),
+            "sous_reseau": f"10.{reseau // 256}.{reseau % 256}.0/24",
+            "passerelle": f"10.{reseau // 256}.{reseau % 256}.254",
+            "ip_centrale": "10.250.0.10",
+        })
+    return moniteurs
+
+
+def sortie_arp(moniteurs):
+    lignes = ["rtr#show ip arp", "Protocol  Address          Age (min)  Hardware Addr   Type   Interface"]
+    for m in moniteurs:
+        lignes.append(f"Internet  {m['ip_moniteur']:<16} {5:>4}   {m['mac']}  ARPA   Vlan{m['vlan']}")
+    return "\n".join(lignes) + "\nrtr#\n"
+
+
+def sortie_interfaces(moniteurs, crc=0):
+    """Sorties 'show interfaces' par switch, concaténées avec leur invite."""
+    blocs = []
+    for debut in range(0, len(moniteurs), PORTS_PAR_SWITCH):
+        groupe = moniteurs[debut:debut + PORTS_PAR_SWITCH]
+        blocs.append(f"{groupe[0]['switch']}#show interfaces")
+        for rang, m in enumerate(groupe):
+            erreurs = crc * (rang % 7 == 0)
+            blocs.append(
+                f"GigabitEthernet{m['port_switch'][2:]} is up, line protocol is up (connected)\n"
+                f"  Hardware is Gigabit Ethernet, address is {m['mac']} (bia {m['mac']})\n"
+                "     reliability 255/255, txload 1/255, rxload 1/255\n"
+                "  Full-duplex, 100Mb/s, media type is 10/100/1000BaseTX\n"
+                "     123456 packets input, 45678901 bytes, 0 no buffer\n"
+                "     0 runts, 0 giants, 0 throttles\n"
+                f"     {erreurs} input errors, {erreurs} CRC, 0 frame, 0 overrun, 0 ignored\n"
+                "     654321 packets output, 98765432 bytes, 0 underruns\n"
+                "     0 output errors, 0 collisions, 1 interface resets"
+            )
+    return "\n".join(blocs) + "\n"
+
+
+def ecrire_capture_handshakes(chemin, moniteurs, port=24005):
+    """Capture pcap (IPv4 brut) : un handshake SYN / SYN-ACK / ACK par moniteur vers la centrale."""
+    centrale = bytes(int(x) for x in "10.250.0.10".split("."))
+    ip = struct.Struct(">BBHHHBBH4s4s")
+    tcp = struct.Struct(">HHIIBBHHH")
+    enregistrement = struct.Struct("<IIII")
+    with open(chemin, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 101))
+        ts = 1_700_000_000.0
+        for i, m in enumerate(moniteurs):
+            moniteur = bytes(int(x) for x in m["ip_moniteur"].split("."))
+            sport = 40000 + i % 20000
+            for src, dst, sp, dp, seq, flags in ((moniteur, centrale, sport, port, 1000, 0x02),
+                                                  (centrale, moniteur, port, sport, 5000, 0x12),
+                                                  (moniteur, centrale, sport, port, 1001, 0x10)):
+                paquet = ip.pack(0x45, 0, 40, i & 0xFFFF, 0, 64, 6, 0, src, dst) + tcp.pack(sp, dp, seq, 0, 0x50, flags, 64240, 0, 0)
+                sec = int(ts)
+                f.write(enregistrement.pack(sec, int((ts - sec) * 1e6), len(paquet), len(paquet)))
+                f.write(paquet)
+                ts += 0.0005
+
+
+# Bancs : nom → préparation(taille, dossier) retournant la fonction mesurée
+
+def _banc_log_etape(taille, dossier, journal=False):
+    from diagnostic_ci import GuideDiagnosticCI
+
+    def executer():
+        guide = GuideDiagnosticCI(os.path.join(dossier, f"journal_{time.perf_counter_ns()}.jsonl") if journal else None)
+        for i in range(taille):
+            guide.log_etape(f"Étape {i % 9}", "Oui" if i % 3 else "Non", "Vérifier le câblage" if i % 5 == 0 else "")
+        if journal:
+            guide.journal.fermer()
+    return executer
+
+
+def _guide_historique(taille, dossier, journal=False):
+    from diagnostic_ci import GuideDiagnosticCI
+    guide = GuideDiagnosticCI(os.path.join(dossier, "export.jsonl") if journal else None)
+    for i in range(taille):
+        guide.log_etape(f"Étape {i % 9}", "Oui" if i % 3 else "Non", "Vérifier le câblage" if i % 5 == 0 else "")
+    return guide
+
+
+def _banc_exporter_rapport(taille, dossier, journal=False):
+    guide = _guide_historique(taille, dossier, journal)
+    donnees = {"IP Moniteur": "10.0.0.1", "IP Centrale": "10.250.0.10", "VLAN": "20"}
+    chemin = os.path.join(dossier, "diagnostic_ci_banc.json")
+
+    def executer():
+        with contextlib.redirect_stdout(io.StringIO()):
+            guide.exporter_rapport(chemin, donnees, 5)
+    return executer
+
+
+def _banc_get_historique(taille, dossier):
+    guide = _guide_historique(taille, dossier)
+    return guide.get_historique
+
+
+def _banc_cli_interfaces(taille, dossier):
+    from parseur_switch import analyser_sortie
+    texte = sortie_interfaces(flotte(taille))
+    return lambda: analyser_sortie(texte)
+
+
+def _banc_taux_interfaces(taille, dossier):
+    from taux_interfaces import MoteurCompteurs
+    moniteurs = flotte(taille)
+    releves = [sortie_interfaces(moniteurs, crc) for crc in (0, 5, 12)]
+
+    def executer():
+        moteur = MoteurCompteurs()
+        for ts, texte in enumerate(releves):
+            moteur.ingerer_sortie(texte, ts * 60.0)
+        moteur.rapport()
+    return executer
+
+
+def _banc_conflits_arp(taille, dossier):
+    from conflits_ip import DetecteurConflits
+    texte = sortie_arp(flotte(taille))
+
+    def executer():
+        detecteur = DetecteurConflits()
+        detecteur.ajouter_sortie(texte)
+        detecteur.rapport()
+    return executer
+
+
+def _banc_plan_adressage(taille, dossier):
+    from plan_adressage import PlanAdressage
+    moniteurs = flotte(taille)
+    plan = PlanAdressage([
+        {"reseau": m["sous_reseau"], "vlan": m["vlan"], "passerelle": m["passerelle"], "routes": "10.250.0.0/16"}
+        for m in moniteurs[::250]
+    ])
+    return lambda: plan.valider_inventaire(moniteurs)
+
+
+def _banc_capture_handshake(taille, dossier):
+    from analyse_handshake import AnalyseurHandshake
+    chemin = os.path.join(dossier, f"handshakes_{taille}.pcap")
+    ecrire_capture_handshakes(chemin, flotte(taille))
+    return lambda: AnalyseurHandshake().analyser_fichier(chemin)
+
+
+BANCS = {
+    "log_etape": _banc_log_etape,
+    "log_etape_journal": lambda taille, dossier: _banc_log_etape(taille, dossier, journal=True),
+    "get_historique": _banc_get_historique,
+    "exporter_rapport": _banc_exporter_rapport,
+    "exporter_rapport_journal": lambda taille, dossier: _banc_exporter_rapport(taille, dossier, journal=True),
+    "cli_interfaces": _banc_cli_interfaces,
+    "taux_interfaces": _banc_taux_interfaces,
+    "conflits_arp": _banc_conflits_arp,
+    "plan_adressage": _banc_plan_adressage,
+    "capture_handshake": _banc_capture_handshake,
+}
+
+
+def mesurer(fonction):
+    """Exécute la fonction jusqu'à DUREE_CIBLE_S cumulées ; durées en ms."""
+    durees = []
+    while len(durees) < REPETITIONS_MAX and (not durees or sum(durees) < DUREE_CIBLE_S * 1000):
+        debut = time.perf_counter()
+        fonction()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return {"median_ms": round(statistics.median(durees), 3), "min_ms": round(min(durees), 3),
+            "repetitions": len(durees)}
+
+
+def mesurer_rendu(repetitions=5):
+    """Durée d'exécution du script Streamlit pour chaque étape (AppTest, sans navigateur)."""
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP, default_timeout=60).run()
+    etapes = len(app.sidebar.radio[0].options)
+    resultats = {}
+    for etape in range(etapes):
+        durees = []
+        for _ in range(repetitions):
+            app.sidebar.radio[0].set_value(etape)
+            debut = time.perf_counter()
+            app.run()
+            durees.append((time.perf_counter() - debut) * 1000)
+        if app.exception:
+            raise RuntimeError(f"Étape {etape} : {app.exception[0].message}")
+        resultats[f"rendu_etape_{etape}"] = {"median_ms": round(statistics.median(durees), 3),
+                                             "min_ms": round(min(durees), 3), "repetitions": repetitions}
+    return resultats
+
+
+def executer_bancs(tailles=TAILLES_DEFAUT, filtre="*", rendu=True, progression=print):
+    """Exécute les bancs retenus par le filtre (motif fnmatch) ; retourne le document de résultats."""
+    resultats = {}
+    with tempfile.TemporaryDirectory(prefix="banc_ci_") as dossier:
+        for nom, preparer in BANCS.items():
+            if not fnmatch.fnmatch(nom, filtre):
+                continue
+            for taille in tailles:
+                fonction = preparer(taille, dossier)
+                cle = f"{nom}[{taille}]"
+                resultats[cle] = {"taille": taille, **mesurer(fonction)}
+                progression(f"{cle:<36} {resultats[cle]['median_ms']:>12.3f} ms")
+    if rendu and fnmatch.fnmatch("rendu_etape_0", filtre):
+        for cle, mesure in mesurer_rendu().items():
+            resultats[cle] = mesure
+            progression(f"{cle:<36} {mesure['median_ms']:>12.3f} ms")
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "processeur": platform.processor() or platform.machine(),
+        "resultats": resultats,
+    }
+
+
+def comparer(document, reference, tolerance=TOLERANCE_DEFAUT, plancher_ms=PLANCHER_MS):
+    """Écarts de médiane par banc commun aux deux documents ; régression au-delà de la tolérance."""
+    lignes = []
+    for cle, mesure in document["resultats"].items():
+        ancienne = reference["resultats"].get(cle)
+        if ancienne is None:
+            continue
+        avant, apres = ancienne["median_ms"], mesure["median_ms"]
+        ecart = (apres - avant) / avant if avant else 0.0
+        lignes.append({
+            "banc": cle, "reference_ms": avant, "mesure_ms": apres, "ecart_pct": round(100 * ecart, 1),
+            "regression": ecart > tolerance and apres - avant > plancher_ms,
+        })
+    return lignes
+
+
+def main(argv=None):
+    """Point d'entrée : exécution des bancs, enregistrement JSON et comparaison à la référence."""
+    parser = argparse.ArgumentParser(description="Banc de performances du guide de diagnostic CI")
+    parser.add_argument("--tailles", default=",".join(map(str, TAILLES_DEFAUT)), help="Tailles de parc (moniteurs)")
+    parser.add_argument("--filtre", default="*", help="Motif des bancs à exécuter (ex: 'export*')")
+    parser.add_argument("--sans-rendu", action="store_true", help="Ne pas mesurer le rendu Streamlit")
+    parser.add_argument("-o", "--sortie", default="banc_resultats.json", help="Fichier JSON des résultats")
+    parser.add_argument("--reference", help="Résultats de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAUT, help="Hausse tolérée (0.25 = +25 %%)")
+    args = parser.parse_args(argv)
+
+    tailles = [int(t) for t in args.tailles.replace(",", " ").split()]
+    document = executer_bancs(tailles, args.filtre, not args.sans_rendu)
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    print(f"✅ Résultats sauvegardés: {args.sortie}")
+
+    if not args.reference:
+        return 0
+    with open(args.reference, encoding="utf-8") as f:
+        reference = json.load(f)
+    lignes = comparer(document, reference, args.tolerance)
+    regressions = [ligne for ligne in lignes if ligne["regression"]]
+    for ligne in lignes:
+        print(f"{'🚨' if ligne['regression'] else '  '} {ligne['banc']:<36} {ligne['reference_ms']:>12.3f} → "
+              f"{ligne['mesure_ms']:>12.3f} ms ({ligne['ecart_pct']:+.1f} %)")
+    print(f"📊 {len(lignes)} bancs comparés à {args.reference} ({reference.get('date')}), {len(regressions)} régression(s)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection à l'échelle du parc des conflits IP/ARP/DHCP et des adresses APIPA
+Index par IP, MAC et sous-réseau construits en un passage : coût linéaire, sans comparaison deux à deux
+"""
+
+import argparse
+import re
+import socket
+import sys
+
+from parseur_switch import analyser_sortie
+
+APIPA_DEBUT = 0xA9FE0000      # 169.254.0.0/16
+APIPA_MASQUE = 0xFFFF0000
+
+# Log Cisco : %SW_MATM-4-MACFLAP_NOTIF: Host 0011.2233.4455 in vlan 20 is flapping between port Gi1/0/1 and port Gi1/0/2
+MACFLAP = re.compile(
+    r"%SW_MATM-4-MACFLAP_NOTIF: Host (?P<mac>[0-9a-f.]+) in vlan (?P<vlan>\d+) "
+    r"is flapping between port (?P<port1>\S+) and port (?P<port2>\S+)",
+    re.IGNORECASE
+)
+_SEPARATEURS_MAC = re.compile(r"[.:\-\s]")
+_SVI = re.compile(r"(?:Vl|BDI)\d", re.IGNORECASE)
+
+
+def ip_entier(texte):
+    """Adresse IPv4 texte -> entier ; None si invalide."""
+    try:
+        return int.from_bytes(socket.inet_aton(texte.strip()), "big")
+    except (OSError, AttributeError):
+        return None
+
+
+def ip_texte(entier):
+    return socket.inet_ntoa(entier.to_bytes(4, "big"))
+
+
+def normaliser_mac(texte):
+    """MAC au format Cisco aabb.ccdd.eeff ; accepte ':', '-', '.', et les Client-ID DHCP (préfixe 01)."""
+    brut = _SEPARATEURS_MAC.sub("", texte or "").lower()
+    if len(brut) == 14 and brut.startswith("01"):
+        brut = brut[2:]
+    if len(brut) != 12 or any(c not in "0123456789abcdef" for c in brut):
+        return None
+    return f"{brut[0:4]}.{brut[4:8]}.{brut[8:12]}"
+
+
+def reseau_entier(texte):
+    """'10.1.20.0/24' ou '10.1.20.0/255.255.255.0' -> (réseau, longueur de préfixe) ; None si invalide."""
+    adresse, _, prefixe = (texte or "").strip().partition("/")
+    debut = ip_entier(adresse)
+    if debut is None:
+        return None
+    if not prefixe:
+        longueur = 32
+    elif "." in prefixe:
+        masque = ip_entier(prefixe)
+        if masque is None:
+            return None
+        longueur = bin(masque).count("1")
+    elif prefixe.isdigit() and int(prefixe) <= 32:
+        longueur = int(prefixe)
+    else:
+        return None
+    masque = (0xFFFFFFFF << (32 - longueur)) & 0xFFFFFFFF
+    return debut & masque, longueur
+
+
+class IndexSousReseaux:
+    """Sous-réseaux indexés par longueur de préfixe : recherche du plus spécifique en O(nb de longueurs)."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def ajouter(self, texte):
+        reseau = reseau_entier(texte)
+        if reseau is None:
+            return None
+        debut, longueur = reseau
+        self.tables.setdefault(longueur, {})[debut] = reseau
+        return reseau
+
+    def chercher(self, ip):
+        """Sous-réseau (début, longueur) le plus spécifique contenant l'IP entière, ou None."""
+        for longueur in sorted(self.tables, reverse=True):
+            masque = (0xFFFFFFFF << (32 - longueur)) & 0xFFFFFFFF
+            reseau = self.tables[longueur].get(ip & masque)
+            if reseau is not None:
+                return reseau
+        return None
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+
+def contient(reseau, ip):
+    debut, longueur = reseau
+    masque = (0xFFFFFFFF << (32 - longueur)) & 0xFFFFFFFF
+    return ip & masque == debut
+
+
+def reseau_texte(reseau):
+    return f"{ip_texte(reseau[0])}/{reseau[1]}"
+
+
+class DetecteurConflits:
+    """Agrège ARP, baux DHCP, inventaire et logs MACFLAP, puis rapporte les conflits en un passage."""
+
+    def __init__(self, sous_reseaux=()):
+        self.macs_par_ip = {}
+        self.interfaces_par_mac = {}
+        self.flaps = {}
+        self.moniteurs = []
+        self.moniteurs_par_ip = {}
+        self.sous_reseaux = IndexSousReseaux()
+        for reseau in sous_reseaux:
+            self.sous_reseaux.ajouter(reseau)
+        self.entrees = 0
+
+    def _observer(self, ip, mac, source):
+        self.entrees += 1
+        ip = ip_entier(ip)
+        if ip is None:
+            return
+        macs = self.macs_par_ip.get(ip)
+        if macs is None:
+            macs = self.macs_par_ip[ip] = {}
+        sources = macs.get(mac)
+        if sources is None:
+            macs[mac] = {source}
+        else:
+            sources.add(source)
+
+    def ajouter_arp(self, enregistrements):
+        """Entrées 'show ip arp' du parseur (les entrées Incomplete sont ignorées).
+
+    Les adresses du switch et les SVI ne comptent pas dans la recherche de MAC sur plusieurs interfaces.
+    """
+        for entree in enregistrements:
+            mac = normaliser_mac(entree["mac"])
+            if mac is None:
+                continue
+            self._observer(entree["ip"], mac, f"arp:{entree['switch'] or '?'}")
+            # Adresse propre du switch (âge « - ») ou interface VLAN d'un switch L3 : la même MAC
+            # sert pour chaque SVI, ce n'est pas une MAC qui se déplace
+            if entree.get("age") == "-" or _SVI.match(entree.get("interface") or ""):
+                continue
+            if entree.get("interface"):
+                interfaces = self.interfaces_par_mac.setdefault(mac, {})
+                interfaces.setdefault(entree["switch"], set()).add(entree["interface"])
+
+    def ajouter_dhcp(self, enregistrements):
+        """Baux 'show ip dhcp binding' du parseur."""
+        for bail in enregistrements:
+            mac = normaliser_mac(bail["client"])
+            if mac is not None:
+                self._observer(bail["ip"], mac, f"dhcp:{bail['switch'] or '?'}")
+
+    def ajouter_inventaire(self, moniteurs):
+        """Moniteurs de l'inventaire (ip_moniteur, mac, sous_reseau, passerelle optionnels)."""
+        for moniteur in moniteurs:
+            self.moniteurs.append(moniteur)
+            if moniteur.get("sous_reseau"):
+                self.sous_reseaux.ajouter(moniteur["sous_reseau"])
+            self._observer(moniteur["ip_moniteur"], normaliser_mac(moniteur.get("mac")) or "", "inventaire")
+            ip = ip_entier(moniteur["ip_moniteur"])
+            if ip is not None:
+                self.moniteurs_par_ip[ip] = self.moniteurs_par_ip.get(ip, 0) + 1
+
+    def ajouter_journal(self, texte, switch=None):
+        """Messages MACFLAP_NOTIF d'un log switch."""
+        for flap in MACFLAP.finditer(texte):
+            mac = normaliser_mac(flap.group("mac"))
+            cle = (mac, flap.group("vlan"))
+            ports = self.flaps.setdefault(cle, {"occurrences": 0, "ports": set(), "switchs": set()})
+            ports["occurrences"] += 1
+            ports["ports"].update((flap.group("port1"), flap.group("port2")))
+            if switch:
+                ports["switchs"].add(switch)
+
+    def ajouter_sortie(self, texte):
+        """Sortie CLI brute : ARP, baux DHCP et messages MACFLAP."""
+        resultat = analyser_sortie(texte)
+        self.ajouter_arp(resultat["arp"])
+        self.ajouter_dhcp(resultat["dhcp"])
+        switchs = {entree["switch"] for entree in resultat["arp"] + resultat["dhcp"]}
+        self.ajouter_journal(texte, switchs.pop() if len(switchs) == 1 else None)
+
+    def ajouter_fichiers(self, chemins):
+        for chemin in chemins:
+            with open(chemin, encoding="utf-8", errors="replace") as f:
+                self.ajouter_sortie(f.read())
+
+    def rapport(self):
+        """IP dupliquées, MAC instables, adresses APIPA et passerelles hors sous-réseau."""
+        dupliquees, apipa = [], []
+        for ip, macs in self.macs_par_ip.items():
+            reelles = [mac for mac in macs if mac]
+            moniteurs = self.moniteurs_par_ip.get(ip, 0)
+            if len(reelles) > 1 or moniteurs > 1:
+                dupliquees.append({
+                    "ip": ip_texte(ip),
+                    "macs": {mac: sorted(macs[mac]) for mac in reelles},
+                    "moniteurs_inventaire": moniteurs,
+                })
+            if ip & APIPA_MASQUE == APIPA_DEBUT:
+                apipa.append({"ip": ip_texte(ip), "sources": sorted(set().union(*macs.values())),
+                              "macs": reelles})
+
+        instables = []
+        for (mac, vlan), flap in self.flaps.items():
+            instables.append({"mac": mac, "vlan": vlan, "ports": sorted(flap["ports"]),
+                              "switchs": sorted(flap["switchs"]), "occurrences": flap["occurrences"],
+                              "origine": "MACFLAP"})
+        for mac, par_switch in self.interfaces_par_mac.items():
+            for switch, interfaces in par_switch.items():
+                if len(interfaces) > 1:
+                    instables.append({"mac": mac, "vlan": None, "ports": sorted(interfaces),
+                                      "switchs": [switch], "occurrences": None, "origine": "ARP"})
+
+        hors_reseau = []
+        for moniteur in self.moniteurs:
+            ip = ip_entier(moniteur["ip_moniteur"])
+            if ip is None:
+                continue
+            reseau = reseau_entier(moniteur.get("sous_reseau")) if moniteur.get("sous_reseau") else None
+            if reseau is None:
+                reseau = self.sous_reseaux.chercher(ip)
+            if reseau is None:
+                continue
+            constat = None
+            passerelle = ip_entier(moniteur.get("passerelle") or "")
+            if not contient(reseau, ip):
+                constat = "IP hors du sous-réseau"
+            elif passerelle is not None and not contient(reseau, passerelle):
+                constat = "passerelle hors du sous-réseau"
+            if constat:
+                hors_reseau.append({"ip_moniteur": moniteur["ip_moniteur"], "passerelle": moniteur.get("passerelle"),
+                                    "sous_reseau": reseau_texte(reseau), "constat": constat})
+
+        return {
+            "ip_dupliquees": dupliquees,
+            "mac_instables": instables,
+            "apipa": apipa,
+            "passerelles_hors_reseau": hors_reseau,
+            "entrees": self.entrees,
+            "ips": len(self.macs_par_ip),
+            "ips_vues": {ip_texte(ip) for ip, macs in self.macs_par_ip.items() if any(macs)},
+        }
+
+
+def evaluer_reponses(rapport, ip_moniteur):
+    """Réponse de l'étape 3 (IP valide) pour un moniteur : ni APIPA, ni en conflit.
+
+    Sans conflit, rien n'est conclu si l'IP n'apparaît dans aucune table ARP ni aucun bail DHCP.
+    """
+    if not ip_moniteur:
+        return {}
+    ip_moniteur = ip_moniteur.strip()
+    en_defaut = {e["ip"] for e in rapport["apipa"]} | {e["ip"] for e in rapport["ip_dupliquees"]}
+    if ip_moniteur in en_defaut:
+        return {"q_ip_valide": "Non"}
+    if ip_moniteur not in rapport["ips_vues"]:
+        return {}
+    return {"q_ip_valide": "Oui"}
+
+
+def enregistrer_dans_donnees(rapport, donnees_collectees, ip_moniteur=None):
+    """Reporte les conflits du parc (et ceux du moniteur) dans donnees_collectees."""
+    donnees_collectees['Conflits IP (parc)'] = len(rapport["ip_dupliquees"])
+    donnees_collectees['Adresses APIPA (parc)'] = len(rapport["apipa"])
+    if ip_moniteur:
+        for conflit in rapport["ip_dupliquees"]:
+            if conflit["ip"] == ip_moniteur.strip():
+                donnees_collectees['Conflit IP moniteur'] = ", ".join(conflit["macs"])
+
+
+def main(argv=None):
+    """Point d'entrée : sorties CLI et inventaire en argument, conflits en sortie."""
+    parser = argparse.ArgumentParser(description="Conflits IP/ARP/DHCP et adresses APIPA sur le parc")
+    parser.add_argument("sorties", nargs="*", help="Sorties CLI (show ip arp, show ip dhcp binding, logs)")
+    parser.add_argument("--inventaire", help="Inventaire CSV/JSON des moniteurs")
+    parser.add_argument("--sous-reseau", action="append", default=[], help="Sous-réseau déclaré (répétable)")
+    args = parser.parse_args(argv)
+
+    detecteur = DetecteurConflits(args.sous_reseau)
+    if args.inventaire:
+        from diagnostic_lot import charger_inventaire
+        detecteur.ajouter_inventaire(charger_inventaire(args.inventaire))
+    detecteur.ajouter_fichiers(args.sorties)
+    rapport = detecteur.rapport()
+
+    for conflit in rapport["ip_dupliquees"]:
+        print(f"🚨 IP dupliquée {conflit['ip']} : " + ", ".join(f"{mac} ({'/'.join(s)})" for mac, s in conflit["macs"].items())
+              + (f" - {conflit['moniteurs_inventaire']} moniteurs dans l'inventaire" if conflit["moniteurs_inventaire"] > 1 else ""))
+    for flap in rapport["mac_instables"]:
+        print(f"⚠️  MAC instable {flap['mac']} ({flap['origine']}) : {', '.join(flap['ports'])}")
+    for entree in rapport["apipa"]:
+        print(f"⚠️  APIPA {entree['ip']} ({', '.join(entree['sources'])})")
+    for moniteur in rapport["passerelles_hors_reseau"]:
+        print(f"⚠️  {moniteur['ip_moniteur']} : {moniteur['constat']} {moniteur['sous_reseau']} "
+              f"(passerelle {moniteur['passerelle'] or '-'})")
+    print(f"📊 {rapport['entrees']} entrées, {rapport['ips']} IP distinctes")
+    return 1 if rapport["ip_dupliquees"] or rapport["apipa"] or rapport["passerelles_hors_reseau"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
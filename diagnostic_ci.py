@@ -6,25 +6,40 @@ Classe de diagnostic pour utilisation en ligne de commande ou avec Streamlit
 """
 
 import json
+import sys
 from datetime import datetime
 
+from arbre_diagnostic import GUIDES_WIRESHARK, formater, graphe
+from historique_compact import HistoriqueCompact
+
 class GuideDiagnosticCI:
     """Classe principale pour le diagnostic réseau CI."""
     
-    def __init__(self):
-        self.historique_parcours = []
+    def __init__(self, journal=None, capacite_historique=None):
+        # capacite_historique : ne garder que les N dernières étapes en mémoire (processus de longue durée)
+        self.historique_parcours = HistoriqueCompact(capacite_historique)
         self.recommandations_finales = []
         self.CI_PORT = 24005
+        self.journal = None
+        if journal is not None:
+            from journal_diagnostic import JournalDiagnostic
+            self.journal = JournalDiagnostic(journal)
+        self.donnees_collectees = {}
+        self.interactif = True
+        # Fichiers et options des vérifications automatiques en ligne de commande (None : désactivées)
+        self.sources_automatisation = None
         
     def log_etape(self, etape, reponse, action_recommandee=""):
         """Enregistre chaque étape du parcours diagnostic."""
-        entry = {
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
-            "etape": etape,
-            "reponse": reponse,
-            "action": action_recommandee
-        }
-        self.historique_parcours.append(entry)
+        if self.journal is not None:
+            self.journal.ajouter({
+                "timestamp": datetime.now().strftime("%H:%M:%S"),
+                "etape": etape,
+                "reponse": reponse,
+                "action": action_recommandee
+            })
+        else:
+            self.historique_parcours.ajouter(etape, reponse, action_recommandee)
     
     def afficher_titre(self, titre):
         """Affiche un titre formaté."""
@@ -42,43 +57,13 @@ class GuideDiagnosticCI:
     
     def afficher_wireshark_guide(self, contexte):
         """Affiche les filtres Wireshark selon le contexte."""
-        guides = {
-            "connexion_tcp": {
-                "titre": "ANALYSE CONNEXION TCP CI",
-                "filtres": [
-                    ("Connexions CI", f"tcp.port == {self.CI_PORT}"),
-                    ("Handshake TCP", f"tcp.port == {self.CI_PORT} and (tcp.flags.syn == 1 or tcp.flags.ack == 1)"),
-                    ("Connexions refusées", f"tcp.port == {self.CI_PORT} and tcp.flags.reset == 1"),
-                    ("Timeouts", "tcp.analysis.retransmission or tcp.analysis.fast_retransmission")
-                ]
-            },
-            "multicast": {
-                "titre": "ANALYSE TRAFIC MULTICAST",
-                "filtres": [
-                    ("Multicast général", "ip.dst >= 224.0.0.0 and ip.dst <= 239.255.255.255"),
-                    ("IGMP", "igmp"),
-                    ("Découverte CI", "udp and ip.dst >= 224.0.0.0"),
-                    ("Annonces périodiques", "udp.srcport == 67 or udp.dstport == 67")
-                ]
-            },
-            "qos": {
-                "titre": "ANALYSE QoS ET DSCP",
-                "filtres": [
-                    ("Marquage DSCP", "ip.dsfield.dscp != 0"),
-                    ("Trafic prioritaire", "ip.dsfield.dscp >= 32"),
-                    ("Paquets droppés", "icmp.type == 11 or icmp.type == 3"),
-                    ("Congestion", "tcp.analysis.window_full")
-                ]
-            }
-        }
-        
-        if contexte in guides:
-            guide = guides[contexte]
+        if contexte in GUIDES_WIRESHARK:
+            guide = GUIDES_WIRESHARK[contexte]
             print(f"\n🔬 {guide['titre']}")
             print("-" * 50)
             for nom, filtre in guide['filtres']:
                 print(f"📌 {nom}:")
-                print(f"   {filtre}")
+                print(f"   {filtre.format(port=self.CI_PORT)}")
     
     def poser_question(self, question, options=None):
         """Pose une question avec validation de réponse."""
@@ -91,31 +76,406 @@ class GuideDiagnosticCI:
                 return reponse
             print(f"⚠️  Réponse invalide. Choisissez parmi: {', '.join(options)}")
     
+    def parcourir_etape(self, numero, valeurs=None):
+        """Parcourt une étape de l'arbre de diagnostic en ligne de commande."""
+        etape = graphe().etape(numero)
+        valeurs = valeurs if valeurs is not None else {}
+        self.afficher_titre(etape.titre)
+        self._parcourir_elements(etape.elements, etape, valeurs)
+        return valeurs
+
+    def _parcourir_elements(self, elements, etape, valeurs):
+        for element in elements:
+            if element.si_renseigne and not valeurs.get(element.si_renseigne):
+                continue
+            if element.type == "question":
+                options = [option.upper() for option in element.options]
+                if element.id in valeurs and str(valeurs[element.id]).upper() in options:
+                    # Réponse fournie (fichier de réponses ou vérification automatique)
+                    reponse = element.options[options.index(str(valeurs[element.id]).upper())]
+                    print(f"\n❓ {element.texte} → {reponse}")
+                elif not self.interactif:
+                    print(f"\n⏭️  {element.texte} (sans réponse)")
+                    continue
+                else:
+                    reponse = element.options[options.index(self.poser_question(element.texte, options))]
+                valeurs[element.id] = reponse
+                self.log_etape(f"{etape.numero} - {element.texte}", reponse)
+                self._parcourir_elements(element.branches.get(reponse, ()), etape, valeurs)
+            elif element.type == "message" and element.niveau in ("error", "warning"):
+                self.afficher_action(element.texte, urgent=element.niveau == "error")
+                self.recommandations_finales.append(element.texte)
+            elif element.type == "message":
+                print(f"\nℹ️  {element.texte}")
+            elif element.type in ("details", "markdown"):
+                texte = formater(element.texte, valeurs) if element.gabarit else element.texte
+                print(f"\n{element.titre}" if element.titre else "", texte.rstrip())
+            elif element.type == "code":
+                contenu = formater(element.contenu, valeurs) if element.gabarit else element.contenu
+                print(f"\n{element.titre}:{contenu.rstrip()}")
+            elif element.type == "saisie":
+                for champ in element.champs:
+                    if champ["id"] not in valeurs and self.interactif:
+                        valeurs[champ["id"]] = input(f"\n✏️  {champ['texte']}: ").strip()
+                    if valeurs.get(champ["id"]) and champ.get("donnee"):
+                        self.donnees_collectees[champ["donnee"]] = valeurs[champ["id"]]
+            elif element.type == "automatisation" and self.sources_automatisation is not None:
+                self.executer_automatisation(element.hook, valeurs)
+
+    def executer_automatisation(self, hook, valeurs):
+        """Vérification automatique associée à un point de l'arbre ; ses réponses complètent `valeurs`."""
+        methode = getattr(self, f"_auto_{hook}", None)
+        if methode is None:
+            return {}
+        try:
+            reponses = methode(valeurs, self.sources_automatisation) or {}
+        except Exception as e:
+            print(f"\n⚠️  Vérification automatique {hook} impossible : {e}")
+            return {}
+        for id_question, reponse in reponses.items():
+            if id_question not in valeurs:
+                valeurs[id_question] = reponse
+                print(f"\n🤖 {hook} : {id_question} = {reponse}")
+        return reponses
+
+    # Vérifications automatiques : mêmes analyses que les panneaux de l'application
+
+    def _auto_analyse_cli_switch(self, valeurs, sources):
+        if not sources.get("sorties_switch"):
+            return None
+        from parseur_switch import enregistrer_dans_donnees, evaluer_reponses
+        resultat, fiche = self.analyser_sorties_switch(sources["sorties_switch"], valeurs.get("ip_moniteur"))
+        enregistrer_dans_donnees(fiche, self.donnees_collectees)
+        return evaluer_reponses(resultat, fiche)
+
+    def _auto_taux_erreurs_interfaces(self, valeurs, sources):
+        if len(sources.get("sorties_switch") or ()) < 2 or not valeurs.get("lldp_port"):
+            return None
+        from taux_interfaces import enregistrer_dans_donnees, evaluer_reponses
+        etat = self.suivre_erreurs_interfaces(sources["sorties_switch"]).chercher(valeurs["lldp_port"])
+        enregistrer_dans_donnees(etat, self.donnees_collectees)
+        return evaluer_reponses(etat)
+
+    def _auto_conflits_ip(self, valeurs, sources):
+        if not sources.get("sorties_switch") or not valeurs.get("ip_moniteur"):
+            return None
+        from conflits_ip import enregistrer_dans_donnees, evaluer_reponses
+        sous_reseaux = [valeurs["subnet"]] if valeurs.get("subnet") else ()
+        rapport = self.detecter_conflits_ip(sources["sorties_switch"], sources.get("inventaire"), sous_reseaux)
+        enregistrer_dans_donnees(rapport, self.donnees_collectees, valeurs["ip_moniteur"])
+        return evaluer_reponses(rapport, valeurs["ip_moniteur"])
+
+    def _auto_validation_plan(self, valeurs, sources):
+        if not sources.get("plan") or not valeurs.get("ip_moniteur"):
+            return None
+        from plan_adressage import enregistrer_dans_donnees
+        validation = self.valider_plan_adressage(sources["plan"], valeurs["ip_moniteur"], valeurs.get("subnet"),
+                                                 valeurs.get("gateway"), valeurs.get("lldp_vlan"))
+        enregistrer_dans_donnees(validation, self.donnees_collectees)
+        return None
+
+    def _auto_route_centrale_plan(self, valeurs, sources):
+        if not sources.get("plan") or not valeurs.get("ip_moniteur") or not valeurs.get("ip_centrale"):
+            return None
+        from plan_adressage import PlanAdressage
+        if not isinstance(sources["plan"], PlanAdressage):
+            sources["plan"] = PlanAdressage.depuis_fichier(sources["plan"])
+        entree = sources["plan"].chercher(valeurs["ip_moniteur"])
+        for niveau, message in sources["plan"].verifier_route(entree, valeurs["ip_centrale"]) if entree else ():
+            self.afficher_action(message, urgent=niveau == "error")
+        return None
+
+    def _auto_mesure_latence(self, valeurs, sources):
+        if not valeurs.get("ip_centrale"):
+            return None
+        from echantillonneur_latence import enregistrer_dans_donnees, evaluer_reponses
+        resume = self.mesurer_latence(valeurs["ip_centrale"], nb_echantillons=10, intervalle=0.2)
+        enregistrer_dans_donnees(resume, self.donnees_collectees)
+        print(f"\n📈 Latence p50/p95 {resume['p50_ms']} / {resume['p95_ms']} ms, pertes {resume['pertes_pct']} %")
+        return evaluer_reponses(resume, wan=sources.get("wan", False))
+
+    def _auto_scan_port_ci(self, valeurs, sources):
+        if not valeurs.get("ip_centrale"):
+            return None
+        from scanner_ci import enregistrer_dans_donnees
+        resultats = self.scanner_port_ci([valeurs["ip_centrale"]])
+        enregistrer_dans_donnees(resultats, self.donnees_collectees)
+        print(f"\n🛰️  Port {self.CI_PORT} de {valeurs['ip_centrale']} : {resultats[0]['etat']} {resultats[0]['detail']}")
+        return None
+
+    def _auto_sonde_applicative(self, valeurs, sources):
+        if not valeurs.get("ip_centrale") or "q_service_repond" in valeurs:
+            return None
+        from sonde_applicative import enregistrer_dans_donnees, evaluer_reponses
+        resultats = self.sonder_applicatif([valeurs["ip_centrale"]], sources.get("message"), repetitions=3)
+        enregistrer_dans_donnees(resultats, self.donnees_collectees)
+        return evaluer_reponses(resultats, valeurs["ip_centrale"])
+
+    _auto_sonde_service = _auto_sonde_applicative
+
+    def _auto_table_sockets(self, valeurs, sources):
+        # La table des sockets n'a de sens que lue sur la centrale elle-même
+        if not sources.get("sur_centrale"):
+            return None
+        from table_sockets import enregistrer_dans_donnees, evaluer_reponses
+        table = self.lire_table_sockets()
+        enregistrer_dans_donnees(table, self.donnees_collectees)
+        for niveau, message in table["constats"]:
+            self.afficher_action(message, urgent=niveau == "error")
+        return evaluer_reponses(table)
+
+    _auto_sockets_service = _auto_table_sockets
+
+    def _auto_analyse_handshake(self, valeurs, sources):
+        if not sources.get("capture"):
+            return None
+        from analyse_handshake import enregistrer_dans_donnees, evaluer_reponses
+        rapport = self.analyser_capture_tcp(sources["capture"])
+        ip_moniteur = valeurs.get("ip_moniteur")
+        enregistrer_dans_donnees(rapport, self.donnees_collectees, ip_moniteur)
+        return evaluer_reponses(rapport[ip_moniteur]) if ip_moniteur in rapport else None
+
+    def _auto_analyse_logs(self, valeurs, sources):
+        if not sources.get("logs"):
+            return None
+        from analyse_logs import enregistrer_dans_donnees, evaluer_reponses
+        rapport = self.analyser_logs(sources["logs"], valeurs.get("ip_centrale"))
+        enregistrer_dans_donnees(rapport, self.donnees_collectees)
+        print(f"\n📜 Logs : {rapport['lignes_erreur']} lignes en erreur sur {rapport['lignes']} "
+              f"({rapport['debit_mo_s']} Mo/s)")
+        return evaluer_reponses(rapport)
+
+    def _auto_reconnexions(self, valeurs, sources):
+        if not sources.get("capture") and not sources.get("sur_centrale"):
+            return None
+        from reconnexions_ci import enregistrer_dans_donnees, evaluer_reponses
+        if sources.get("capture"):
+            etat = self.suivre_reconnexions(capture=sources["capture"])
+        else:
+            print(f"\n🔁 Suivi des reconnexions sur le port {self.CI_PORT} pendant 10 s...")
+            etat = self.suivre_reconnexions(duree=10)
+        enregistrer_dans_donnees(etat, self.donnees_collectees, valeurs.get("ip_moniteur"))
+        return evaluer_reponses(etat, valeurs.get("ip_moniteur"))
+
+    def _auto_analyse_multicast(self, valeurs, sources):
+        if not sources.get("capture"):
+            return None
+        from analyse_multicast import enregistrer_dans_donnees, evaluer_reponses
+        rapport = self.analyser_capture_multicast(sources["capture"])
+        enregistrer_dans_donnees(rapport, self.donnees_collectees)
+        return evaluer_reponses(rapport)
+
+    def _auto_analyse_qos(self, valeurs, sources):
+        if not sources.get("capture"):
+            return None
+        from analyse_qos import enregistrer_dans_donnees, evaluer_reponses
+        rapport = self.analyser_capture_qos(sources["capture"])
+        enregistrer_dans_donnees(rapport, self.donnees_collectees)
+        return evaluer_reponses(rapport)
+
+    def evaluer_reponses(self, reponses, etapes=None):
+        """Évalue un jeu de réponses sur l'arbre de diagnostic, sans interaction."""
+        return graphe().evaluer(reponses, etapes)
+    
     def get_ci_port(self):
         """Retourne le numéro de port CI."""
         return self.CI_PORT
-    
+
+    def lire_table_sockets(self, port=None):
+        """Écoute et connexions du port CI lues directement dans le noyau (à lancer sur la centrale)."""
+        from table_sockets import TableSockets
+        table = TableSockets(port or self.CI_PORT).lire()
+        entrantes = table["entrantes"]
+        self.log_etape(
+            f"Table sockets port {table['port']}",
+            f"{len(table['ecoute'])} écoute(s), {entrantes['ESTABLISHED']} ESTABLISHED, "
+            f"{entrantes['SYN_RECV']} SYN_RECV, {entrantes['TIME_WAIT']} TIME_WAIT",
+            "; ".join(message for _, message in table["constats"])
+        )
+        return table
+
+    def suivre_reconnexions(self, duree=10, intervalle=1.0, capture=None, fenetre=60.0, seuil=3):
+        """Moniteurs qui se reconnectent en boucle : instantanés de la table des sockets (sur la centrale) ou capture."""
+        import time
+        from reconnexions_ci import DetecteurReconnexions
+        detecteur = DetecteurReconnexions(fenetre, seuil)
+        if capture:
+            detecteur.ingerer_capture(capture, self.CI_PORT)
+        else:
+            from table_sockets import TableSockets
+            table = TableSockets(self.CI_PORT)
+            for _ in range(max(2, int(duree / intervalle) + 1)):
+                if detecteur.instantanes:
+                    time.sleep(intervalle)
+                detecteur.observer(table.connexions())
+        etat = detecteur.etat()
+        self.log_etape(
+            f"Reconnexions port {self.CI_PORT}",
+            f"{etat['connexions_par_min']} connexions/min, {len(etat['instables'])} moniteur(s) instable(s)"
+            + (", tempête de reconnexions" if etat["tempetes"] else ""),
+            f"Moniteurs instables : {', '.join(etat['instables'][:10])}" if etat["instables"] else ""
+        )
+        return etat
+
+    def analyser_logs(self, chemins, ip_centrale=None, processus=1):
+        """Signatures d'erreur des logs du service CI (fichiers, .gz, exports journalctl), par moniteur et par minute."""
+        from analyse_logs import AnalyseurLogs
+        rapport = AnalyseurLogs(ip_centrale=ip_centrale).analyser_fichiers(chemins, processus)
+        principales = ", ".join(s["libelle"] for s in rapport["signatures"][:3])
+        self.log_etape(
+            "Analyse logs CI",
+            f"{rapport['lignes_erreur']} lignes en erreur sur {rapport['lignes']}" + (f" : {principales}" if principales else ""),
+            f"Moniteurs les plus cités : {', '.join(m['moniteur'] for m in rapport['moniteurs'][:5])}"
+            if rapport["moniteurs"] else ""
+        )
+        return rapport
+
+    def mesurer_latence(self, ip, nb_echantillons=20, intervalle=0.5):
+        """Latence et pertes vers `ip` par RTT de connexion TCP sur le port CI."""
+        from echantillonneur_latence import EchantillonneurLatence
+        return EchantillonneurLatence(self, intervalle=intervalle).echantillonner([ip], nb_echantillons=nb_echantillons)[ip]
+
+    def scanner_port_ci(self, cibles, concurrence=2000, timeout=1.0):
+        """Teste la joignabilité du port CI sur une liste d'IP ou de plages CIDR."""
+        from scanner_ci import ScannerPortCI
+        return ScannerPortCI(self, concurrence=concurrence, timeout=timeout).scanner(cibles)
+
+    def sonder_applicatif(self, cibles, message=None, delai=3.0, repetitions=1):
+        """Vérifie qu'après le handshake la centrale envoie ou accepte des données applicatives."""
+        from sonde_applicative import SondeApplicative
+        return SondeApplicative(self, delai=delai, message=message).sonder(cibles, repetitions)
+
+    def surveiller(self, moniteurs, intervalle=10.0, port_metriques=9105, duree=None):
+        """Surveillance continue du port CI du parc, métriques Prometheus sur 127.0.0.1:port_metriques."""
+        import asyncio
+        from surveillance_ci import SurveillanceCI, cibles_inventaire
+        surveillance = SurveillanceCI(cibles_inventaire(moniteurs), self, intervalle=intervalle)
+        asyncio.run(surveillance.executer_async(port_metriques=port_metriques, duree=duree))
+        return surveillance.resume()
+
+    def analyser_capture_tcp(self, chemin):
+        """Analyse les handshakes TCP vers le port CI dans une capture pcap/pcapng."""
+        from analyse_handshake import AnalyseurHandshake
+        rapport = AnalyseurHandshake(self.CI_PORT).analyser_fichier(chemin)
+        self.log_etape("Analyse capture TCP", f"{len(rapport)} moniteurs observés dans {chemin}")
+        return rapport
+
+    def analyser_capture_multicast(self, chemin):
+        """Analyse le trafic multicast et IGMP d'une capture pcap/pcapng."""
+        from analyse_multicast import AnalyseurMulticast
+        rapport = AnalyseurMulticast().analyser_fichier(chemin)
+        self.log_etape(
+            "Analyse capture multicast",
+            f"{len(rapport['groupes'])} groupes, {len(rapport['queriers'])} querier(s)",
+            "" if rapport["queriers"] else "Configurer un Querier IGMP"
+        )
+        return rapport
+
+    def analyser_capture_qos(self, chemin, dscp_attendus=(46,), taille_tranche_s=10):
+        """Statistiques DSCP et congestion (window_full) d'une capture, par flux et session CI."""
+        from analyse_qos import analyser_qos
+        rapport = analyser_qos(chemin, self.CI_PORT, dscp_attendus, taille_tranche_s)
+        self.log_etape(
+            "Analyse capture QoS",
+            f"{rapport['paquets_ci']} paquets CI, {100 * rapport['ratio_mal_marques']:.1f}% mal marqués",
+            "Vérifier le marquage DSCP" if rapport["ratio_mal_marques"] else ""
+        )
+        return rapport
+
+    def analyser_sorties_switch(self, chemins, ip_moniteur=None):
+        """Analyse des fichiers de sorties CLI switch (LLDP, interfaces, VLAN) et fiche du moniteur."""
+        from parseur_switch import analyser_fichiers, fiche_moniteur
+        resultat = analyser_fichiers(chemins)
+        fiche = fiche_moniteur(resultat, ip_moniteur=ip_moniteur)
+        self.log_etape(
+            "Analyse sorties switch",
+            f"{len(resultat['lldp'])} voisins LLDP, {len(resultat['interfaces'])} interfaces",
+            "" if fiche else "Moniteur non identifié parmi les voisins LLDP"
+        )
+        return resultat, fiche
+
+    def suivre_erreurs_interfaces(self, chemins, fenetre=10):
+        """Taux d'erreurs par port depuis des fichiers de relevés 'show interface' successifs."""
+        from taux_interfaces import MoteurCompteurs
+        moteur = MoteurCompteurs(fenetre)
+        moteur.ingerer_fichiers(chemins)
+        self.log_etape(
+            "Taux d'erreurs interfaces",
+            f"{len(moteur.ports)} ports, {len(moteur.alertes)} en hausse",
+            "Analyser les erreurs d'interface (CRC, collisions, runts)" if moteur.alertes else ""
+        )
+        return moteur
+
+    def detecter_conflits_ip(self, chemins, inventaire=None, sous_reseaux=()):
+        """IP dupliquées, MAC instables, APIPA et passerelles hors sous-réseau sur le parc."""
+        from conflits_ip import DetecteurConflits
+        detecteur = DetecteurConflits(sous_reseaux)
+        if inventaire:
+            from diagnostic_lot import charger_inventaire
+            detecteur.ajouter_inventaire(charger_inventaire(inventaire))
+        detecteur.ajouter_fichiers(chemins)
+        rapport = detecteur.rapport()
+        self.log_etape(
+            "Conflits IP parc",
+            f"{len(rapport['ip_dupliquees'])} IP dupliquées, {len(rapport['apipa'])} APIPA",
+            "Corriger les conflits d'adresses" if rapport["ip_dupliquees"] else ""
+        )
+        return rapport
+
+    def valider_plan_adressage(self, plan, ip_moniteur, sous_reseau=None, passerelle=None, vlan=None, ip_centrale=None):
+        """Valide l'adressage d'un moniteur contre un plan (chemin ou PlanAdressage)."""
+        from plan_adressage import PlanAdressage
+        if not isinstance(plan, PlanAdressage):
+            plan = PlanAdressage.depuis_fichier(plan)
+        validation = plan.valider_moniteur(ip_moniteur, sous_reseau, passerelle, vlan, ip_centrale)
+        for niveau, message in validation["constats"]:
+            self.afficher_action(message, urgent=niveau == "error")
+        self.log_etape("Plan d'adressage", validation["reseau"] or "hors plan",
+                       "; ".join(message for _, message in validation["constats"]))
+        return validation
+
     def get_historique(self):
-        """Retourne l'historique du parcours diagnostic."""
-        return self.historique_parcours
+        """Retourne l'historique du parcours diagnostic (liste de dicts, comme avant le journal)."""
+        if self.journal is not None:
+            return list(self.journal.lire())
+        return list(self.historique_parcours)
+
+    def ecrire_rapport(self, flux, supplements=None):
+        """Écrit le rapport JSON dans un flux texte ; le parcours est recopié ligne à ligne."""
+        entete = {
+            "port": self.CI_PORT,
+            "timestamp": datetime.now().isoformat(),
+            "recommandations": self.recommandations_finales
+        }
+        if supplements:
+            entete.update(supplements)
+        flux.write('{"diagnostic_ci": ' + json.dumps(entete, ensure_ascii=False)[:-1] + ', "parcours": [\n')
+        if self.journal is not None:
+            lignes = self.journal.lignes()
+        else:
+            lignes = self.historique_parcours.lignes()
+        separateur = ""
+        for ligne in lignes:
+            flux.write(separateur + ligne)
+            separateur = ",\n"
+        flux.write("\n]}}\n")
     
-    def exporter_rapport(self, filename=None):
-        """Exporte le rapport de diagnostic en JSON."""
+    def exporter_rapport(self, filename=None, donnees_collectees=None, etape_finale=None, etape_en_echec=None):
+        """Exporte le rapport de diagnostic en JSON.
+
+        etape_finale : étape atteinte par le parcours ; etape_en_echec : première étape en échec.
+        """
         if filename is None:
             filename = f"diagnostic_ci_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
         try:
-            rapport = {
-                "diagnostic_ci": {
-                    "port": self.CI_PORT,
-                    "timestamp": datetime.now().isoformat(),
-                    "parcours": self.historique_parcours,
-                    "recommandations": self.recommandations_finales
-                }
-            }
+            supplements = None
+            if donnees_collectees is not None:
+                supplements = {"donnees_collectees": donnees_collectees, "etape_finale": etape_finale,
+                               "etape_en_echec": etape_en_echec}
             
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(rapport, f, indent=2, ensure_ascii=False)
+                self.ecrire_rapport(f, supplements)
             
             print(f"✅ Rapport sauvegardé: {filename}")
             return filename
@@ -123,14 +483,106 @@ class GuideDiagnosticCI:
             print(f"❌ Erreur sauvegarde: {e}")
             return None
 
+def charger_reponses(chemin=None, paires=()):
+    """Réponses {id: valeur} depuis un fichier JSON et/ou des paires 'id=valeur'."""
+    reponses = {}
+    if chemin:
+        with open(chemin, encoding="utf-8") as f:
+            reponses.update(json.load(f))
+    for paire in paires:
+        cle, _, valeur = paire.partition("=")
+        reponses[cle.strip()] = valeur.strip()
+    return reponses
+
+
+def lister_identifiants():
+    """Identifiants des questions et des champs de saisie, par étape, pour écrire un fichier de réponses."""
+    arbre = graphe()
+    for etape in arbre.etapes:
+        print(f"\n{etape.numero} - {etape.titre}")
+        for id_champ, (numero, champ) in arbre.champs.items():
+            if numero == etape.numero:
+                print(f"   {id_champ:<24} saisie    {champ['texte']}")
+        for question in etape.questions:
+            print(f"   {question.id:<24} {'/'.join(question.options):<9} {question.texte}")
 
-def main():
-    """Fonction principale pour utilisation en ligne de commande."""
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande : parcours de l'arbre, interactif ou sur fichier de réponses."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Guide de diagnostic réseau CI (port 24005) en ligne de commande",
+        epilog="Interface graphique : streamlit run app.py"
+    )
+    parser.add_argument("--etapes", help="Étapes à parcourir (ex: 3,4,5) ; toutes par défaut")
+    parser.add_argument("-r", "--reponses", help="Fichier JSON {id: valeur} de réponses et de saisies")
+    parser.add_argument("--reponse", action="append", default=[], metavar="ID=VALEUR", help="Réponse ou saisie (répétable)")
+    parser.add_argument("--non-interactif", action="store_true", help="Ne rien demander : questions sans réponse ignorées")
+    parser.add_argument("--lister", action="store_true", help="Lister les identifiants de questions et de saisies")
+    automatisation = parser.add_argument_group("vérifications automatiques")
+    automatisation.add_argument("--auto", action="store_true", help="Lancer les vérifications automatiques de l'arbre")
+    automatisation.add_argument("--capture", help="Capture pcap/pcapng (handshake, reconnexions, multicast, QoS)")
+    automatisation.add_argument("--sortie-switch", action="append", default=[], metavar="FICHIER",
+                                help="Sortie CLI switch/routeur (répétable ; plusieurs relevés pour les taux d'erreurs)")
+    automatisation.add_argument("--logs", action="append", default=[], metavar="FICHIER",
+                                help="Logs du service CI (répétable ; .gz, export journalctl -o short-iso ou json)")
+    automatisation.add_argument("--inventaire", help="Inventaire CSV/JSON des moniteurs (conflits IP)")
+    automatisation.add_argument("--plan", help="Plan d'adressage CSV/JSON")
+    automatisation.add_argument("--message", help="Message applicatif envoyé par la sonde 24005")
+    automatisation.add_argument("--wan", action="store_true", help="Lien WAN (seuil de latence 50 ms)")
+    automatisation.add_argument("--sur-centrale", action="store_true",
+                                help="Exécution sur la centrale : sockets et reconnexions du port CI")
+    parser.add_argument("--journal", help="Journal JSONL de l'historique")
+    parser.add_argument("-o", "--rapport", help="Rapport JSON exporté en fin de parcours")
+    args = parser.parse_args(argv)
+
+    if args.lister:
+        lister_identifiants()
+        return 0
+
+    guide = GuideDiagnosticCI(args.journal)
+    guide.interactif = not args.non_interactif
+    if args.auto or args.capture or args.sortie_switch or args.plan or args.logs:
+        guide.sources_automatisation = {
+            "capture": args.capture, "sorties_switch": args.sortie_switch, "inventaire": args.inventaire,
+            "plan": args.plan, "wan": args.wan, "message": args.message.encode() + b"\n" if args.message else None,
+            "sur_centrale": args.sur_centrale, "logs": args.logs,
+        }
+    try:
+        valeurs = charger_reponses(args.reponses, args.reponse)
+    except (OSError, ValueError) as e:
+        print(f"❌ Réponses illisibles : {e}")
+        return 2
+    arbre = graphe()
+    inconnus = [cle for cle in valeurs if cle not in arbre.noeuds and cle not in arbre.champs]
+    if inconnus:
+        print(f"⚠️  Identifiants inconnus ignorés : {', '.join(inconnus)} (voir --lister)")
+
+    etapes = [int(n) for n in args.etapes.replace(",", " ").split()] if args.etapes else range(len(arbre.etapes))
     print("🔧 GUIDE DE DIAGNOSTIC RÉSEAU - CENTRAL D'INTERPHONIE (CI)")
-    print("="*70)
-    print("Cette classe est conçue pour être utilisée avec l'interface Streamlit")
-    print("Lancez 'streamlit run app.py' pour l'interface graphique")
-    print("="*70)
+    etape_finale = None
+    try:
+        for numero in etapes:
+            etape_finale = numero
+            guide.parcourir_etape(numero, valeurs)
+    except (EOFError, KeyboardInterrupt):
+        print("\n⏹️  Parcours interrompu")
+
+    bilan = guide.evaluer_reponses(valeurs, set(etapes))
+    guide.afficher_titre("Bilan")
+    for numero, niveau, texte in bilan["constats"]:
+        print(f"{'🚨' if niveau == 'error' else '⚠️ '} [{numero}] {texte}")
+    if bilan["etape_en_echec"] is not None:
+        print(f"\n➡️  Première étape en échec : {arbre.etape(bilan['etape_en_echec']).titre}")
+    elif not bilan["constats"]:
+        print("✅ Aucun problème relevé")
+    if args.rapport:
+        guide.exporter_rapport(args.rapport, guide.donnees_collectees, etape_finale, bilan["etape_en_echec"])
+    if guide.journal is not None:
+        guide.journal.fermer()
+    return 1 if bilan["etape_en_echec"] is not None else 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
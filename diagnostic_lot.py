@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Diagnostic CI en lot (sans interface) sur un inventaire de moniteurs
+Exécute toutes les vérifications automatisables par moniteur dans un pool de threads
+et produit un rapport consolidé (pandas)
+
+Usage : python diagnostic_lot.py inventaire.csv -o rapport.csv [--capture capture.pcapng]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from diagnostic_ci import GuideDiagnosticCI
+from scanner_ci import ETAT_OUVERT, ETAT_REFUSE, ScannerPortCI
+from echantillonneur_latence import EchantillonneurLatence, evaluer_reponses as evaluer_latence
+
+# Colonnes de l'inventaire (alias acceptés → nom normalisé)
+COLONNES_INVENTAIRE = {
+    "ip_moniteur": ("ip_moniteur", "ip", "ip moniteur", "moniteur"),
+    "switch": ("switch", "lldp device", "hostname_switch"),
+    "port_switch": ("port_switch", "port", "port switch", "interface"),
+    "vlan": ("vlan",),
+    "ip_centrale": ("ip_centrale", "centrale", "ip centrale", "central"),
+    "sous_reseau": ("sous_reseau", "subnet", "sous-réseau"),
+    "passerelle": ("passerelle", "gateway"),
+    "mac": ("mac", "adresse mac", "mac moniteur"),
+}
+
+# Correspondance avec les clés de donnees_collectees de l'application
+CLES_DONNEES = {
+    "ip_moniteur": "IP Moniteur",
+    "switch": "LLDP Device",
+    "port_switch": "Port Switch",
+    "vlan": "VLAN",
+    "ip_centrale": "IP Centrale",
+    "passerelle": "Gateway",
+}
+
+
+def charger_inventaire(chemin):
+    """Charge un inventaire CSV ou JSON et normalise les noms de colonnes."""
+    if chemin.lower().endswith(".json"):
+        df = pd.read_json(chemin, dtype=str)
+    else:
+        df = pd.read_csv(chemin, dtype=str, sep=None, engine="python")
+    renommage = {}
+    for colonne in df.columns:
+        nom = colonne.strip().lower()
+        for normalise, alias in COLONNES_INVENTAIRE.items():
+            if nom in alias:
+                renommage[colonne] = normalise
+    df = df.rename(columns=renommage)
+    if "ip_moniteur" not in df.columns:
+        raise ValueError(f"{chemin}: colonne IP moniteur absente (attendu : {', '.join(COLONNES_INVENTAIRE['ip_moniteur'])})")
+    df = df.fillna("")
+    return [{k: str(v).strip() for k, v in ligne.items()} for ligne in df.to_dict("records")]
+
+
+class DiagnosticLot:
+    """Exécute les vérifications automatisables pour chaque moniteur d'un inventaire."""
+
+    def __init__(self, threads=32, timeout=1.0, echantillons=5, capture=None, dossier_rapports=None, plan=None):
+        self.threads = threads
+        self.timeout = timeout
+        self.echantillons = echantillons
+        self.capture = capture
+        self.dossier_rapports = dossier_rapports
+        self.plan = plan
+        self._centrales = {}
+        self._verrou = threading.Lock()
+        self._rapport_capture = None
+
+    def verifier_ip(self, moniteur, resultat):
+        """Étape 3 : adresse valide (pas APIPA), passerelle dans le sous-réseau."""
+        try:
+            ip = ipaddress.ip_address(moniteur["ip_moniteur"])
+        except ValueError:
+            resultat["q_ip_valide"] = "Non"
+            resultat["detail_ip"] = "adresse invalide"
+            return
+        if ip.is_link_local or ip.is_unspecified:
+            resultat["q_ip_valide"] = "Non"
+            resultat["detail_ip"] = "adresse APIPA (169.254.x.x)" if ip.is_link_local else "adresse non définie"
+            return
+        resultat["q_ip_valide"] = "Oui"
+        sous_reseau = moniteur.get("sous_reseau")
+        passerelle = moniteur.get("passerelle")
+        if sous_reseau:
+            try:
+                reseau = ipaddress.ip_network(sous_reseau, strict=False)
+            except ValueError:
+                resultat["detail_ip"] = f"sous-réseau invalide : {sous_reseau}"
+                return
+            if ip not in reseau:
+                resultat["q_ip_valide"] = "Non"
+                resultat["detail_ip"] = f"IP hors du sous-réseau {reseau}"
+            elif passerelle:
+                try:
+                    dans_reseau = ipaddress.ip_address(passerelle) in reseau
+                except ValueError:
+                    dans_reseau = False
+                if not dans_reseau:
+                    resultat["q_ping_gw"] = "Non"
+                    resultat["detail_ip"] = f"passerelle {passerelle} hors du sous-réseau {reseau}"
+
+    def verifier_centrale(self, ip_centrale, guide):
+        """Étapes 4 et 5 côté centrale : une seule mesure par centrale, partagée entre les moniteurs."""
+        with self._verrou:
+            evenement = self._centrales.get(ip_centrale)
+            proprietaire = evenement is None
+            if proprietaire:
+                evenement = self._centrales[ip_centrale] = {"pret": threading.Event()}
+        if not proprietaire:
+            evenement["pret"].wait()
+            return evenement.get("resultat", {})
+
+        resultat = {}
+        try:
+            ipaddress.ip_address(ip_centrale)
+        except ValueError:
+            resultat["q_ping_centrale"] = "Non"
+            resultat["detail_centrale"] = f"IP centrale invalide : {ip_centrale}"
+        else:
+            try:
+                scan = asyncio.run(ScannerPortCI(guide, timeout=self.timeout).tester_hote(ip_centrale))
+                resultat["etat_port_centrale"] = scan["etat"]
+                resultat["q_service_ecoute"] = "Oui" if scan["etat"] == ETAT_OUVERT else "Non"
+                if self.echantillons:
+                    echantillonneur = EchantillonneurLatence(guide, intervalle=0.2, timeout=self.timeout)
+                    resume = echantillonneur.echantillonner([ip_centrale], self.echantillons)[ip_centrale]
+                    resultat["q_ping_centrale"] = "Non" if resume["perdus"] == resume["envoyes"] else "Oui"
+                    resultat.update(evaluer_latence(resume))
+                    resultat["latence_p95_ms"] = resume["p95_ms"]
+                    resultat["pertes_pct"] = resume["pertes_pct"]
+            except Exception as e:
+                # Les autres moniteurs de cette centrale attendent ce résultat : il doit toujours exister
+                resultat = {"detail_centrale": str(e), "q_service_ecoute": "Non"}
+        finally:
+            evenement["resultat"] = resultat
+            evenement["pret"].set()
+        return resultat
+
+    def verifier_capture(self, ip_moniteur, resultat):
+        """Étape 5 côté capture : handshake du moniteur vers le port CI."""
+        from analyse_handshake import ISSUE_ETABLIE, evaluer_reponses
+        stats = self._rapport_capture.get(ip_moniteur)
+        resultat.update(evaluer_reponses(stats))
+        if stats:
+            resultat["capture_etablies"] = stats[ISSUE_ETABLIE]
+            resultat["capture_rst"] = stats["rst"]
+            resultat["capture_retransmissions"] = stats["retransmissions"]
+
+    def diagnostiquer(self, moniteur):
+        """Toutes les vérifications automatisables d'un moniteur ; retourne une ligne du rapport.
+
+        Une exception est reportée dans la colonne « erreur » de la ligne, avec les vérifications déjà faites :
+        le reste du lot continue.
+        """
+        guide = GuideDiagnosticCI()
+        debut = time.perf_counter()
+        resultat = dict(moniteur)
+        erreurs = []
+        try:
+            self._verifier(moniteur, resultat, guide)
+        except Exception as e:
+            erreurs.append(f"{type(e).__name__}: {e}")
+
+        resultat["etape_en_echec"] = etape_en_echec(resultat)
+        resultat["duree_s"] = round(time.perf_counter() - debut, 3)
+        if self.dossier_rapports:
+            try:
+                self._exporter(guide, resultat)
+            except Exception as e:
+                erreurs.append(f"rapport individuel non écrit : {e}")
+        if erreurs:
+            resultat["erreur"] = " ; ".join(erreurs)
+        return resultat
+
+    def _verifier(self, moniteur, resultat, guide):
+        """Étapes 3 à 5 ; chaque vérification complète `resultat` au fur et à mesure."""
+        self.verifier_ip(moniteur, resultat)
+        guide.log_etape("3 - Couche IP", resultat["q_ip_valide"], resultat.get("detail_ip", ""))
+        if self.plan is not None:
+            resultat.update(self.plan.valider_inventaire([moniteur])[0])
+
+        if resultat["q_ip_valide"] == "Oui":
+            scan = asyncio.run(ScannerPortCI(guide, timeout=self.timeout).tester_hote(moniteur["ip_moniteur"]))
+            # Un RST prouve aussi que l'hôte répond
+            resultat["moniteur_joignable"] = "Oui" if scan["etat"] in (ETAT_OUVERT, ETAT_REFUSE) else "Non"
+            guide.log_etape("Joignabilité moniteur", resultat["moniteur_joignable"])
+
+        if moniteur.get("ip_centrale"):
+            resultat.update(self.verifier_centrale(moniteur["ip_centrale"], guide))
+            guide.log_etape("4 - Connectivité", resultat.get("q_ping_centrale", ""))
+            guide.log_etape("5 - Port CI", resultat.get("etat_port_centrale", ""))
+
+        if self._rapport_capture is not None:
+            self.verifier_capture(moniteur["ip_moniteur"], resultat)
+
+    def _exporter(self, guide, resultat):
+        """Rapport JSON individuel, au format de GuideDiagnosticCI.exporter_rapport."""
+        guide.recommandations_finales = [f"Étape en échec : {resultat['etape_en_echec']}"] if resultat["etape_en_echec"] is not None else []
+        nom = f"diagnostic_ci_{time.strftime('%Y%m%d_%H%M%S')}_{resultat['ip_moniteur'].replace(':', '_')}.json"
+        donnees = {CLES_DONNEES[k]: resultat[k] for k in CLES_DONNEES if resultat.get(k)}
+        guide.exporter_rapport(os.path.join(self.dossier_rapports, nom), donnees,
+                               etape_en_echec=resultat["etape_en_echec"])
+
+    def executer(self, moniteurs, progression=None):
+        """Diagnostique tous les moniteurs et retourne le rapport consolidé (DataFrame)."""
+        if self.capture:
+            from analyse_handshake import AnalyseurHandshake
+            self._rapport_capture = AnalyseurHandshake().analyser_fichier(self.capture)
+        if self.dossier_rapports:
+            os.makedirs(self.dossier_rapports, exist_ok=True)
+
+        lignes = []
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            for i, ligne in enumerate(pool.map(self.diagnostiquer, moniteurs), 1):
+                lignes.append(ligne)
+                if progression is not None:
+                    progression(i, len(moniteurs))
+        return pd.DataFrame(lignes)
+
+
+def etape_en_echec(resultat):
+    """Première étape du parcours en échec (numérotation de l'application), None si tout est OK."""
+    if resultat.get("q_ip_valide") == "Non" or resultat.get("q_ping_gw") == "Non":
+        return 3
+    if resultat.get("q_ping_centrale") == "Non" or resultat.get("q_latence") == "Non":
+        return 4
+    if (resultat.get("q_service_ecoute") == "Non" or resultat.get("q_tentatives_wireshark") == "Non"
+            or resultat.get("q_handshake") == "Non"):
+        return 5
+    return None
+
+
+def verifier_sortie(chemin):
+    """Message d'erreur si le rapport ne pourra pas être écrit (à vérifier avant de sonder le parc), sinon None."""
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".xls":
+        return "format .xls non pris en charge, utiliser .xlsx"
+    if extension == ".xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return "openpyxl requis pour un rapport .xlsx (pip install openpyxl)"
+    return None
+
+
+def ecrire_rapport(df, chemin):
+    """Écrit le rapport consolidé en CSV, JSON ou Excel selon l'extension."""
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == ".json":
+        df.to_json(chemin, orient="records", force_ascii=False, indent=2)
+    elif extension == ".xlsx":
+        df.to_excel(chemin, index=False, engine="openpyxl")
+    else:
+        df.to_csv(chemin, index=False)
+    return chemin
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande du diagnostic en lot."""
+    parser = argparse.ArgumentParser(description="Diagnostic CI en lot sur un inventaire de moniteurs")
+    parser.add_argument("inventaire", help="Fichier CSV ou JSON (ip_moniteur, switch, port_switch, vlan, ip_centrale)")
+    parser.add_argument("-o", "--sortie", default=f"rapport_lot_{time.strftime('%Y%m%d_%H%M%S')}.csv",
+                        help="Rapport consolidé (.csv, .json ou .xlsx)")
+    parser.add_argument("--capture", help="Capture pcap/pcapng à analyser pour les handshakes 24005")
+    parser.add_argument("--rapports", help="Dossier des rapports JSON individuels par moniteur")
+    parser.add_argument("--plan", help="Plan d'adressage CSV/JSON (reseau, vlan, passerelle, routes) à vérifier")
+    parser.add_argument("--threads", type=int, default=32, help="Taille du pool de threads (défaut: 32)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Timeout TCP par test en secondes (défaut: 1)")
+    parser.add_argument("--echantillons", type=int, default=5,
+                        help="Échantillons de latence par centrale, 0 pour désactiver (défaut: 5)")
+    args = parser.parse_args(argv)
+
+    erreur = verifier_sortie(args.sortie)
+    if erreur:
+        print(f"❌ Rapport {args.sortie} : {erreur}")
+        return 2
+    moniteurs = charger_inventaire(args.inventaire)
+    print(f"🔧 Diagnostic en lot de {len(moniteurs)} moniteurs")
+    plan = None
+    if args.plan:
+        from plan_adressage import PlanAdressage
+        plan = PlanAdressage.depuis_fichier(args.plan)
+    lot = DiagnosticLot(args.threads, args.timeout, args.echantillons, args.capture, args.rapports, plan)
+
+    def progression(fait, total):
+        if fait == total or fait % 100 == 0:
+            print(f"   {fait}/{total} moniteurs traités", file=sys.stderr)
+
+    df = lot.executer(moniteurs, progression)
+    ecrire_rapport(df, args.sortie)
+    en_echec = df["etape_en_echec"].notna().sum() if len(df) else 0
+    en_erreur = df["erreur"].notna().sum() if "erreur" in df else 0
+    print(f"✅ Rapport sauvegardé: {args.sortie} ({en_echec} moniteurs en échec"
+          + (f", {en_erreur} diagnostics interrompus par une erreur" if en_erreur else "") + ")")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Échantillonneur de latence et de pertes par RTT de connexion TCP sur le port CI
+Mémoire bornée par cible : tampon circulaire + histogramme logarithmique
+"""
+
+import asyncio
+import math
+import time
+from array import array
+
+from diagnostic_ci import GuideDiagnosticCI
+from scanner_ci import ETAT_OUVERT, ETAT_REFUSE, ScannerPortCI
+
+SEUIL_LATENCE_LAN_MS = 10
+SEUIL_LATENCE_WAN_MS = 50
+
+# Histogramme logarithmique : 0.01 ms à ~100 s, 20 classes par décade (~12% de résolution)
+_HISTO_MIN_MS = 0.01
+_HISTO_CLASSES_PAR_DECADE = 20
+_HISTO_NB_CLASSES = 7 * _HISTO_CLASSES_PAR_DECADE + 1
+
+
+class TamponCirculaire:
+    """Tampon circulaire de flottants à capacité fixe, adossé à un array."""
+
+    __slots__ = ("capacite", "_donnees", "_index", "_taille")
+
+    def __init__(self, capacite, typecode="f"):
+        self.capacite = capacite
+        self._donnees = array(typecode, bytes(array(typecode).itemsize * capacite))
+        self._index = 0
+        self._taille = 0
+
+    def ajouter(self, valeur):
+        """Ajoute une valeur en écrasant la plus ancienne si le tampon est plein."""
+        self._donnees[self._index] = valeur
+        self._index = (self._index + 1) % self.capacite
+        if self._taille < self.capacite:
+            self._taille += 1
+
+    def __len__(self):
+        return self._taille
+
+    def valeurs(self):
+        """Retourne les valeurs de la plus ancienne à la plus récente."""
+        if self._taille < self.capacite:
+            return self._donnees[:self._taille].tolist()
+        return self._donnees[self._index:].tolist() + self._donnees[:self._index].tolist()
+
+    def derniere(self):
+        """Retourne la valeur la plus récente (None si vide)."""
+        if not self._taille:
+            return None
+        return self._donnees[self._index - 1]
+
+
+def percentile(valeurs_triees, p):
+    """Percentile par rang le plus proche sur une liste déjà triée."""
+    if not valeurs_triees:
+        return None
+    rang = max(0, math.ceil(p / 100 * len(valeurs_triees)) - 1)
+    return valeurs_triees[rang]
+
+
+class StatistiquesLatence:
+    """Statistiques incrémentales de RTT et de pertes pour une cible."""
+
+    __slots__ = ("cible", "fenetre", "histogramme", "envoyes", "perdus",
+                 "minimum", "maximum", "moyenne", "jitter", "_dernier_rtt")
+
+    def __init__(self, cible, capacite=3600):
+        self.cible = cible
+        self.fenetre = TamponCirculaire(capacite)
+        self.histogramme = array("I", bytes(4 * _HISTO_NB_CLASSES))
+        self.envoyes = 0
+        self.perdus = 0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.moyenne = 0.0
+        self.jitter = 0.0
+        self._dernier_rtt = None
+
+    def ajouter(self, rtt_ms):
+        """Ajoute un échantillon ; rtt_ms à None signifie une perte."""
+        self.envoyes += 1
+        if rtt_ms is None:
+            self.perdus += 1
+            self.fenetre.ajouter(math.nan)
+            return
+        self.fenetre.ajouter(rtt_ms)
+        recus = self.envoyes - self.perdus
+        self.moyenne += (rtt_ms - self.moyenne) / recus
+        self.minimum = min(self.minimum, rtt_ms)
+        self.maximum = max(self.maximum, rtt_ms)
+        # Gigue à la RFC 3550 : J += (|D| - J) / 16
+        if self._dernier_rtt is not None:
+            self.jitter += (abs(rtt_ms - self._dernier_rtt) - self.jitter) / 16
+        self._dernier_rtt = rtt_ms
+        self.histogramme[_classe_histogramme(rtt_ms)] += 1
+
+    def percentiles_session(self, ps=(50, 95, 99)):
+        """Percentiles approchés sur toute la session, depuis l'histogramme (bornés par le min et le max observés)."""
+        total = sum(self.histogramme)
+        resultat = {}
+        for p in ps:
+            if not total:
+                resultat[p] = None
+                continue
+            seuil = math.ceil(p / 100 * total)
+            cumul = 0
+            for classe, n in enumerate(self.histogramme):
+                cumul += n
+                if cumul >= seuil:
+                    resultat[p] = round(min(max(_borne_haute_classe(classe), self.minimum), self.maximum), 3)
+                    break
+        return resultat
+
+    def percentiles_fenetre(self, ps=(50, 95, 99)):
+        """Percentiles exacts sur les derniers échantillons du tampon."""
+        valeurs = sorted(v for v in self.fenetre.valeurs() if not math.isnan(v))
+        return {p: (round(percentile(valeurs, p), 3) if valeurs else None) for p in ps}
+
+    def pertes_fenetre(self):
+        """Taux de pertes (%) sur les derniers échantillons du tampon."""
+        valeurs = self.fenetre.valeurs()
+        if not valeurs:
+            return 0.0
+        return 100 * sum(1 for v in valeurs if math.isnan(v)) / len(valeurs)
+
+    def resume(self):
+        """Résumé des statistiques de la cible sur toute la session.
+
+        Percentiles exacts tant que le tampon contient toute la session, approchés par l'histogramme ensuite.
+        """
+        p = self.percentiles_fenetre() if self.envoyes <= self.fenetre.capacite else self.percentiles_session()
+        return {
+            "cible": self.cible,
+            "envoyes": self.envoyes,
+            "perdus": self.perdus,
+            "pertes_pct": round(100 * self.perdus / self.envoyes, 2) if self.envoyes else 0.0,
+            "min_ms": round(self.minimum, 3) if self.minimum != math.inf else None,
+            "moyenne_ms": round(self.moyenne, 3) if self.envoyes > self.perdus else None,
+            "p50_ms": p[50],
+            "p95_ms": p[95],
+            "p99_ms": p[99],
+            "max_ms": round(self.maximum, 3) if self.envoyes > self.perdus else None,
+            "jitter_ms": round(self.jitter, 3),
+        }
+
+
+def _classe_histogramme(rtt_ms):
+    if rtt_ms <= _HISTO_MIN_MS:
+        return 0
+    classe = int(math.log10(rtt_ms / _HISTO_MIN_MS) * _HISTO_CLASSES_PAR_DECADE) + 1
+    return min(classe, _HISTO_NB_CLASSES - 1)
+
+
+def _borne_haute_classe(classe):
+    return _HISTO_MIN_MS * 10 ** (classe / _HISTO_CLASSES_PAR_DECADE)
+
+
+class EchantillonneurLatence:
+    """Moteur d'échantillonnage parallèle du RTT de connexion TCP vers le port CI."""
+
+    def __init__(self, guide=None, intervalle=1.0, timeout=1.0, capacite=3600, concurrence=500):
+        self.guide = guide if guide is not None else GuideDiagnosticCI()
+        self.scanner = ScannerPortCI(self.guide, timeout=timeout)
+        self.intervalle = intervalle
+        self.capacite = capacite
+        self.concurrence = concurrence
+        self.statistiques = {}
+
+    def stats(self, cible):
+        """Retourne (en la créant si besoin) la structure de statistiques d'une cible."""
+        if cible not in self.statistiques:
+            self.statistiques[cible] = StatistiquesLatence(cible, self.capacite)
+        return self.statistiques[cible]
+
+    async def sonder(self, cible):
+        """Effectue une mesure ; un RST compte comme réponse (RTT valide), un timeout comme perte."""
+        resultat = await self.scanner.tester_hote(cible)
+        rtt = resultat["latence_ms"] if resultat["etat"] in (ETAT_OUVERT, ETAT_REFUSE) else None
+        self.stats(cible).ajouter(rtt)
+        return rtt
+
+    async def echantillonner_async(self, cibles, nb_echantillons=None, duree=None):
+        """Sonde toutes les cibles en parallèle, à intervalle régulier, jusqu'au nombre ou à la durée demandés."""
+        limite = asyncio.Semaphore(self.concurrence)
+        fin = time.monotonic() + duree if duree else None
+
+        async def boucle(cible):
+            n = 0
+            prochain = time.monotonic()
+            while (nb_echantillons is None or n < nb_echantillons) and (fin is None or time.monotonic() < fin):
+                async with limite:
+                    await self.sonder(cible)
+                n += 1
+                prochain += self.intervalle
+                await asyncio.sleep(max(0.0, prochain - time.monotonic()))
+
+        await asyncio.gather(*(boucle(c) for c in cibles))
+        return {c: self.stats(c).resume() for c in cibles}
+
+    def echantillonner(self, cibles, nb_echantillons=10, duree=None):
+        """Version synchrone de echantillonner_async."""
+        if isinstance(cibles, str):
+            cibles = cibles.replace(",", " ").split()
+        return asyncio.run(self.echantillonner_async(cibles, nb_echantillons, duree))
+
+
+def evaluer_reponses(resume, wan=False):
+    """Déduit les réponses aux questions q_latence et q_pertes depuis un résumé."""
+    seuil = SEUIL_LATENCE_WAN_MS if wan else SEUIL_LATENCE_LAN_MS
+    p95 = resume["p95_ms"]
+    return {
+        "q_latence": "Oui" if p95 is not None and p95 < seuil else "Non",
+        "q_pertes": "Oui" if resume["perdus"] else "Non",
+    }
+
+
+def enregistrer_dans_donnees(resume, donnees_collectees):
+    """Reporte un résumé de mesure dans le dictionnaire donnees_collectees de l'application."""
+    if resume["p50_ms"] is not None:
+        donnees_collectees['Latence p50/p95/p99 (ms)'] = f"{resume['p50_ms']} / {resume['p95_ms']} / {resume['p99_ms']}"
+        donnees_collectees['Jitter (ms)'] = resume["jitter_ms"]
+    donnees_collectees['Pertes (%)'] = resume["pertes_pct"]
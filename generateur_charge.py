@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Générateur de charge : parc de moniteurs simulés tenant des sessions sur le port CI
+Cadence de connexion et de messages réglables, rapport de percentiles et d'échecs
+"""
+
+import argparse
+import asyncio
+import errno
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from diagnostic_ci import GuideDiagnosticCI
+from echantillonneur_latence import percentile
+from scanner_ci import _limite_descripteurs
+
+# Issues d'une session
+ISSUE_OK = "ok"
+ISSUE_REFUS = "refusé"
+ISSUE_TIMEOUT = "timeout connexion"
+ISSUE_RESET = "reset"
+ISSUE_FERMEE = "fermée par la centrale"
+ISSUE_REJET = "rejet applicatif"
+ISSUE_SILENCE = "sans réponse"
+ISSUE_PORTS = "ports locaux épuisés"
+ISSUE_DESCRIPTEURS = "descripteurs épuisés"
+ISSUE_ERREUR = "erreur"
+
+_ISSUES_ERRNO = {
+    errno.ECONNREFUSED: ISSUE_REFUS,
+    errno.ECONNRESET: ISSUE_RESET,
+    errno.EADDRNOTAVAIL: ISSUE_PORTS,
+    errno.EMFILE: ISSUE_DESCRIPTEURS,
+    errno.ENFILE: ISSUE_DESCRIPTEURS,
+}
+
+PERCENTILES = (50, 90, 99, 99.9)
+MESSAGE_DEFAUT = b"PING\n"
+MARQUEUR_REJET = b"REJET"
+
+# Seuils de dégradation sous charge (q_perf_ci)
+SEUIL_ECHECS_PCT = 1.0
+SEUIL_TTFB_P99_MS = 500
+
+
+class _Session(asyncio.Protocol):
+    """Session d'un moniteur simulé : mesure du premier octet, envoi périodique de messages."""
+
+    __slots__ = ("intervalle", "message", "connecte", "premier_octet", "octets", "rejet", "perdue", "_minuterie", "transport")
+
+    def __init__(self, intervalle, message):
+        self.intervalle = intervalle
+        self.message = message
+        self.connecte = None
+        self.premier_octet = None
+        self.octets = 0
+        self.rejet = False
+        self.perdue = asyncio.get_running_loop().create_future()
+        self._minuterie = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.connecte = time.perf_counter()
+        if self.intervalle:
+            self._envoyer()
+
+    def _envoyer(self):
+        if self.transport.is_closing():
+            return
+        self.transport.write(self.message)
+        self._minuterie = asyncio.get_running_loop().call_later(self.intervalle, self._envoyer)
+
+    def data_received(self, donnees):
+        if self.premier_octet is None:
+            self.premier_octet = time.perf_counter()
+            self.rejet = donnees.startswith(MARQUEUR_REJET)
+        self.octets += len(donnees)
+
+    def connection_lost(self, exc):
+        if self._minuterie is not None:
+            self._minuterie.cancel()
+        if not self.perdue.done():
+            self.perdue.set_result(exc)
+
+
+class GenerateurCharge:
+    """Ouvre et tient `sessions` connexions vers la centrale, à `cadence` connexions par seconde."""
+
+    def __init__(self, cible, port=None, sessions=1000, cadence=500, tenue=30.0, intervalle=5.0,
+                 message=MESSAGE_DEFAUT, timeout=5.0, sources=(), guide=None):
+        self.guide = guide if guide is not None else GuideDiagnosticCI()
+        self.cible = cible
+        self.port = port or self.guide.get_ci_port()
+        self.sessions = sessions
+        self.cadence = cadence
+        self.tenue = tenue
+        self.intervalle = intervalle
+        self.message = message
+        self.timeout = timeout
+        # Adresses locales utilisées à tour de rôle : ~28k ports éphémères par (source, cible)
+        self.sources = list(sources)
+        self._reinitialiser()
+
+    def _reinitialiser(self):
+        self.connexion_ms = array("d")
+        self.ttfb_ms = array("d")
+        self.issues = Counter()
+        self.octets = 0
+        self.actives = 0
+        self.actives_max = 0
+
+    async def _session(self, numero):
+        loop = asyncio.get_running_loop()
+        source = (self.sources[numero % len(self.sources)], 0) if self.sources else None
+        debut = time.perf_counter()
+        try:
+            transport, session = await asyncio.wait_for(
+                loop.create_connection(lambda: _Session(self.intervalle, self.message),
+                                       self.cible, self.port, local_addr=source),
+                self.timeout)
+        except asyncio.TimeoutError:
+            self.issues[ISSUE_TIMEOUT] += 1
+            return
+        except OSError as e:
+            self.issues[_ISSUES_ERRNO.get(e.errno, ISSUE_ERREUR)] += 1
+            return
+        self.connexion_ms.append((session.connecte - debut) * 1000)
+        self.actives += 1
+        self.actives_max = max(self.actives_max, self.actives)
+        try:
+            exc = await asyncio.wait_for(asyncio.shield(session.perdue), self.tenue)
+            perdue = True
+        except asyncio.TimeoutError:
+            perdue = False
+        finally:
+            self.actives -= 1
+            transport.close()
+        if session.premier_octet is not None:
+            self.ttfb_ms.append((session.premier_octet - session.connecte) * 1000)
+        self.octets += session.octets
+        if session.rejet:
+            issue = ISSUE_REJET
+        elif perdue:
+            issue = ISSUE_RESET if isinstance(exc, ConnectionResetError) else ISSUE_FERMEE
+        elif session.premier_octet is None:
+            issue = ISSUE_SILENCE
+        else:
+            issue = ISSUE_OK
+        self.issues[issue] += 1
+
+    async def executer_async(self):
+        """Lance les sessions à la cadence demandée et attend leur fin ; retourne les mesures brutes."""
+        self._reinitialiser()
+        _limite_descripteurs(self.sessions)
+        taches = []
+        debut = time.perf_counter()
+        while len(taches) < self.sessions:
+            # Lancement par lots à chaque tick : cadence tenue sans un sleep par connexion
+            dues = min(self.sessions, int((time.perf_counter() - debut) * self.cadence) + 1)
+            while len(taches) < dues:
+                taches.append(asyncio.create_task(self._session(len(taches))))
+            await asyncio.sleep(0.005)
+        montee = time.perf_counter() - debut
+        await asyncio.gather(*taches)
+        return {
+            "sessions": self.sessions,
+            "connexion_ms": self.connexion_ms,
+            "ttfb_ms": self.ttfb_ms,
+            "issues": dict(self.issues),
+            "octets": self.octets,
+            "actives_max": self.actives_max,
+            "montee_s": montee,
+            "duree_s": time.perf_counter() - debut,
+        }
+
+    def executer(self, processus=1):
+        """Version synchrone, répartie sur `processus` processus ; journalisée dans le guide."""
+        if processus <= 1:
+            mesures = [asyncio.run(self.executer_async())]
+        else:
+            parts = [self.sessions // processus + (i < self.sessions % processus) for i in range(processus)]
+            with ProcessPoolExecutor(max_workers=processus) as pool:
+                mesures = list(pool.map(_executer_part, [
+                    (self.cible, self.port, n, self.cadence / processus, self.tenue, self.intervalle,
+                     self.message, self.timeout, self.sources[i::processus] or self.sources)
+                    for i, n in enumerate(parts) if n
+                ]))
+        resume = resumer_charge(mesures)
+        echecs = resume["sessions"] - resume["issues"].get(ISSUE_OK, 0)
+        self.guide.log_etape(
+            f"Charge port {self.port}",
+            f"{resume['sessions']} sessions, {resume['actives_max']} simultanées, {echecs} en échec, "
+            f"connexion p99 {resume['connexion_ms'][99]} ms, premier octet p99 {resume['ttfb_ms'][99]} ms",
+            "Vérifier dimensionnement de la centrale (backlog, workers, descripteurs)" if echecs else ""
+        )
+        return resume
+
+
+def _executer_part(parametres):
+    cible, port, sessions, cadence, tenue, intervalle, message, timeout, sources = parametres
+    generateur = GenerateurCharge(cible, port, sessions, cadence, tenue, intervalle, message, timeout, sources,
+                                  guide=GuideDiagnosticCI())
+    return asyncio.run(generateur.executer_async())
+
+
+def _percentiles(valeurs):
+    valeurs = sorted(valeurs)
+    resultat = {p: (round(percentile(valeurs, p), 3) if valeurs else None) for p in PERCENTILES}
+    resultat["max"] = round(valeurs[-1], 3) if valeurs else None
+    return resultat
+
+
+def resumer_charge(mesures):
+    """Fusionne les mesures d'un ou plusieurs processus en un rapport de percentiles."""
+    connexion, ttfb, issues = array("d"), array("d"), Counter()
+    for mesure in mesures:
+        connexion.extend(mesure["connexion_ms"])
+        ttfb.extend(mesure["ttfb_ms"])
+        issues.update(mesure["issues"])
+    sessions = sum(m["sessions"] for m in mesures)
+    return {
+        "sessions": sessions,
+        "actives_max": sum(m["actives_max"] for m in mesures),
+        "montee_s": round(max(m["montee_s"] for m in mesures), 2),
+        "duree_s": round(max(m["duree_s"] for m in mesures), 2),
+        "octets_recus": sum(m["octets"] for m in mesures),
+        "connexion_ms": _percentiles(connexion),
+        "ttfb_ms": _percentiles(ttfb),
+        "issues": dict(issues.most_common()),
+        "echecs_pct": round(100 * (sessions - issues.get(ISSUE_OK, 0)) / sessions, 2) if sessions else 0.0,
+    }
+
+
+def evaluer_reponses(resume):
+    """Réponse à q_perf_ci : dégradation si échecs ou premier octet trop lent sous charge."""
+    p99 = resume["ttfb_ms"][99]
+    degrade = resume["echecs_pct"] > SEUIL_ECHECS_PCT or (p99 is not None and p99 > SEUIL_TTFB_P99_MS)
+    return {"q_perf_ci": "Oui" if degrade else "Non"}
+
+
+def enregistrer_dans_donnees(resume, donnees_collectees):
+    """Reporte le résultat d'un test de charge dans donnees_collectees."""
+    donnees_collectees['Charge - sessions simultanées'] = resume["actives_max"]
+    donnees_collectees['Charge - échecs (%)'] = resume["echecs_pct"]
+    c, t = resume["connexion_ms"], resume["ttfb_ms"]
+    donnees_collectees['Charge - connexion p50/p99 (ms)'] = f"{c[50]} / {c[99]}"
+    donnees_collectees['Charge - premier octet p50/p99 (ms)'] = f"{t[50]} / {t[99]}"
+
+
+def main(argv=None):
+    """Point d'entrée : test de charge en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Générateur de charge : moniteurs simulés vers le port CI")
+    parser.add_argument("cible", help="IP de la centrale (ou du simulateur)")
+    parser.add_argument("--port", type=int, help="Port CI (24005 par défaut)")
+    parser.add_argument("-n", "--sessions", type=int, default=1000, help="Sessions à ouvrir et tenir")
+    parser.add_argument("--cadence", type=float, default=500, help="Connexions par seconde")
+    parser.add_argument("--tenue", type=float, default=30, help="Durée (s) de tenue de chaque session")
+    parser.add_argument("--intervalle", type=float, default=5, help="Intervalle (s) entre messages, 0 pour aucun")
+    parser.add_argument("--timeout", type=float, default=5, help="Timeout de connexion (s)")
+    parser.add_argument("--sources", default="", help="IP locales à alterner (ex: 127.0.0.2,127.0.0.3) au-delà de ~28k sessions")
+    parser.add_argument("-p", "--processus", type=int, default=1, help="Processus (un cœur chacun)")
+    args = parser.parse_args(argv)
+
+    generateur = GenerateurCharge(args.cible, args.port, args.sessions, args.cadence, args.tenue, args.intervalle,
+                                  timeout=args.timeout, sources=args.sources.replace(",", " ").split())
+    print(f"🔧 {args.sessions} sessions vers {args.cible}:{generateur.port} à {args.cadence:g}/s, "
+          f"tenue {args.tenue:g} s, {args.processus} processus")
+    resume = generateur.executer(args.processus)
+    print(f"📊 {resume['actives_max']} sessions simultanées (montée {resume['montee_s']} s, total {resume['duree_s']} s)")
+    for titre, cle in (("Connexion", "connexion_ms"), ("Premier octet", "ttfb_ms")):
+        valeurs = resume[cle]
+        print(f"   {titre:<14} " + "  ".join(f"p{p:g} {valeurs[p]}" for p in PERCENTILES) + f"  max {valeurs['max']} ms")
+    for issue, n in resume["issues"].items():
+        print(f"   {issue:<24} {n:>7}  ({100 * n / resume['sessions']:.2f} %)")
+    return 1 if resume["echecs_pct"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historique du parcours diagnostic en mémoire compacte : tableaux parallèles et chaînes internées
+Horodatages en secondes epoch, mode anneau à capacité fixe pour les processus de longue durée
+"""
+
+import json
+import time
+from array import array
+
+
+class HistoriqueCompact:
+    """Séquence d'entrées {timestamp, etape, reponse, action} stockées sous forme de codes.
+
+    Chaque entrée occupe 20 octets (horodatage + trois codes) ; les textes sont conservés
+    une seule fois dans une table et libérés quand plus aucune entrée ne les référence.
+    Avec `capacite`, les entrées les plus anciennes sont écrasées (anneau).
+    """
+
+    __slots__ = ("capacite", "horodatages", "etapes", "reponses", "actions",
+                 "_debut", "_taille", "_codes", "_valeurs", "_references", "_libres", "_json")
+
+    def __init__(self, capacite=None):
+        if capacite is not None and capacite < 1:
+            raise ValueError("capacite doit être positive")
+        self.capacite = capacite
+        taille = capacite or 0
+        self.horodatages = array("q", bytes(8 * taille))
+        self.etapes = array("I", bytes(4 * taille))
+        self.reponses = array("I", bytes(4 * taille))
+        self.actions = array("I", bytes(4 * taille))
+        self._debut = 0
+        self._taille = 0
+        self._codes = {}
+        self._valeurs = []
+        self._references = array("I")
+        self._libres = []
+        self._json = []
+
+    # Table des textes internés
+
+    def _interner(self, valeur):
+        # 1, 1.0 et True sont égaux pour un dict : le type fait partie de la clé hors chaînes
+        cle = valeur if type(valeur) is str else (type(valeur), valeur)
+        code = self._codes.get(cle)
+        if code is None:
+            ligne_json = json.dumps(valeur, ensure_ascii=False)
+            if self._libres:
+                code = self._libres.pop()
+                self._valeurs[code] = valeur
+                self._json[code] = ligne_json
+            else:
+                code = len(self._valeurs)
+                self._valeurs.append(valeur)
+                self._json.append(ligne_json)
+                self._references.append(0)
+            self._codes[cle] = code
+        self._references[code] += 1
+        return code
+
+    def _liberer(self, code):
+        self._references[code] -= 1
+        if not self._references[code]:
+            valeur = self._valeurs[code]
+            del self._codes[valeur if type(valeur) is str else (type(valeur), valeur)]
+            self._valeurs[code] = self._json[code] = None
+            self._libres.append(code)
+
+    # Ajout
+
+    def ajouter(self, etape, reponse, action="", horodatage=None):
+        """Ajoute une entrée ; en mode anneau, écrase la plus ancienne si la capacité est atteinte."""
+        horodatage = int(time.time()) if horodatage is None else int(horodatage)
+        codes = (self._interner(etape), self._interner(reponse), self._interner(action))
+        if self.capacite is None:
+            self.horodatages.append(horodatage)
+            self.etapes.append(codes[0])
+            self.reponses.append(codes[1])
+            self.actions.append(codes[2])
+            self._taille += 1
+            return
+        if self._taille < self.capacite:
+            position = self._taille
+            self._taille += 1
+        else:
+            position = self._debut
+            self._debut = (self._debut + 1) % self.capacite
+            for colonne in (self.etapes, self.reponses, self.actions):
+                self._liberer(colonne[position])
+        self.horodatages[position] = horodatage
+        self.etapes[position] = codes[0]
+        self.reponses[position] = codes[1]
+        self.actions[position] = codes[2]
+
+    def append(self, entree):
+        """Compatibilité avec l'ancienne liste de dicts."""
+        self.ajouter(entree.get("etape", ""), entree.get("reponse", ""), entree.get("action", ""))
+
+    def vider(self):
+        self.__init__(self.capacite)
+
+    # Vue paresseuse, compatible avec la liste de dicts d'origine
+
+    def _position(self, index):
+        return index if self.capacite is None else (self._debut + index) % self.capacite
+
+    def _entree(self, position):
+        return {
+            "timestamp": time.strftime("%H:%M:%S", time.localtime(self.horodatages[position])),
+            "etape": self._valeurs[self.etapes[position]],
+            "reponse": self._valeurs[self.reponses[position]],
+            "action": self._valeurs[self.actions[position]],
+        }
+
+    def __len__(self):
+        return self._taille
+
+    def __bool__(self):
+        return self._taille > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._taille))]
+        if index < 0:
+            index += self._taille
+        if not 0 <= index < self._taille:
+            raise IndexError("index d'historique hors limites")
+        return self._entree(self._position(index))
+
+    def __iter__(self):
+        for index in range(self._taille):
+            yield self._entree(self._position(index))
+
+    def __eq__(self, autre):
+        if isinstance(autre, (list, HistoriqueCompact)):
+            return len(self) == len(autre) and all(a == b for a, b in zip(self, autre))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"HistoriqueCompact({self._taille} entrées, capacite={self.capacite})"
+
+    def lignes(self):
+        """Lignes JSON identiques à json.dumps(entree, ensure_ascii=False), sans décoder les entrées."""
+        precedent, heure = None, None
+        for index in range(self._taille):
+            position = self._position(index)
+            horodatage = self.horodatages[position]
+            if horodatage != precedent:
+                precedent, heure = horodatage, time.strftime("%H:%M:%S", time.localtime(horodatage))
+            yield (f'{{"timestamp": "{heure}", "etape": {self._json[self.etapes[position]]}, '
+                   f'"reponse": {self._json[self.reponses[position]]}, "action": {self._json[self.actions[position]]}}}')
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Journal JSONL en ajout seul pour l'historique du parcours diagnostic
+Une ligne par étape, fsync par lots, index des positions pour relire sans tout charger
+"""
+
+import json
+import os
+import time
+from array import array
+
+
+class JournalDiagnostic:
+    """Journal append-only : les entrées sont écrites sur disque au fil de l'eau."""
+
+    def __init__(self, chemin, lot=32, delai=1.0):
+        self.chemin = chemin
+        self.lot = lot
+        self.delai = delai
+        self.positions = array("Q")
+        self._en_attente = 0
+        self._derniere_synchro = time.monotonic()
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        if os.path.exists(chemin):
+            self._indexer()
+        self._fichier = open(chemin, "ab")
+
+    def _indexer(self):
+        """Reconstruit l'index d'un journal existant (reprise de session)."""
+        position = 0
+        with open(self.chemin, "rb") as f:
+            for ligne in f:
+                if ligne.strip():
+                    self.positions.append(position)
+                position += len(ligne)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def ajouter(self, entree):
+        """Ajoute une entrée ; fsync tous les `lot` ajouts ou toutes les `delai` secondes."""
+        ligne = (json.dumps(entree, ensure_ascii=False) + "\n").encode("utf-8")
+        self.positions.append(self._fichier.tell())
+        self._fichier.write(ligne)
+        self._en_attente += 1
+        if self._en_attente >= self.lot or time.monotonic() - self._derniere_synchro >= self.delai:
+            self.synchroniser()
+
+    def synchroniser(self):
+        """Vide le tampon et force l'écriture sur disque."""
+        if self._fichier.closed:
+            return
+        self._fichier.flush()
+        if self._en_attente:
+            os.fsync(self._fichier.fileno())
+        self._en_attente = 0
+        self._derniere_synchro = time.monotonic()
+
+    def fermer(self):
+        """Synchronise et ferme le journal."""
+        self.synchroniser()
+        self._fichier.close()
+
+    def lignes(self, debut=0):
+        """Lignes JSON brutes (sans saut de ligne) à partir de l'entrée `debut`."""
+        if not self._fichier.closed:
+            self._fichier.flush()
+        if debut >= len(self.positions):
+            return
+        with open(self.chemin, "rb") as f:
+            f.seek(self.positions[debut])
+            for ligne in f:
+                ligne = ligne.rstrip(b"\n")
+                if ligne:
+                    yield ligne.decode("utf-8")
+
+    def lire(self, debut=0):
+        """Entrées décodées à partir de l'entrée `debut`."""
+        for ligne in self.lignes(debut):
+            yield json.loads(ligne)
+
+    def dernieres(self, nombre):
+        """Les `nombre` dernières entrées, sans relire le début du journal."""
+        return list(self.lire(max(0, len(self.positions) - nombre)))
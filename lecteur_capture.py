@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecteur de captures pcap/pcapng en pur Python
+Le fichier est projeté en mémoire (mmap) et parcouru en flux : aucun paquet n'est copié,
+les analyseurs reçoivent un décalage dans le tampon projeté.
+"""
+
+import mmap
+import socket
+import struct
+
+# Types de liens (LINKTYPE_*) pris en charge
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+_ETHERTYPES_VLAN = (0x8100, 0x88A8, 0x9100)
+
+PROTO_ICMP = 1
+PROTO_IGMP = 2
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+_PCAPNG_SHB = 0x0A0D0D0A
+_PCAPNG_IDB = 0x00000001
+_PCAPNG_OPB = 0x00000002
+_PCAPNG_SPB = 0x00000003
+_PCAPNG_EPB = 0x00000006
+
+_U16 = struct.Struct(">H")
+_TCP = struct.Struct(">HHIIBB")
+_UDP = struct.Struct(">HH")
+
+
+class ErreurCapture(Exception):
+    """Fichier de capture illisible ou format non reconnu."""
+
+
+class LecteurCapture:
+    """Lecteur en flux d'un fichier pcap ou pcapng projeté en mémoire.
+
+    Utilisation :
+        with LecteurCapture("capture.pcapng") as lecteur:
+            for ts, linktype, debut, longueur in lecteur.paquets():
+                ... lecteur.donnees[debut:debut + longueur] ...
+    """
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.donnees = None
+        self._fichier = None
+
+    def __enter__(self):
+        self._fichier = open(self.chemin, "rb")
+        try:
+            self.donnees = mmap.mmap(self._fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Fichier vide : mmap refuse une longueur nulle
+            self.donnees = b""
+        if hasattr(self.donnees, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self.donnees.madvise(mmap.MADV_SEQUENTIAL)
+        return self
+
+    def __exit__(self, *exc):
+        if isinstance(self.donnees, mmap.mmap):
+            self.donnees.close()
+        self._fichier.close()
+        self.donnees = None
+        return False
+
+    def taille(self):
+        """Taille du fichier en octets."""
+        return len(self.donnees)
+
+    def paquets(self):
+        """Itère sur les paquets : (timestamp_s, linktype, décalage, longueur capturée)."""
+        entete = self.donnees[:4]
+        if entete in _PCAP_MAGIC:
+            return self._paquets_pcap()
+        if len(entete) == 4 and struct.unpack("<I", entete)[0] == _PCAPNG_SHB:
+            return self._paquets_pcapng()
+        raise ErreurCapture(f"{self.chemin}: format de capture non reconnu (pcap/pcapng attendu)")
+
+    def _paquets_pcap(self):
+        donnees = self.donnees
+        ordre, resolution = _PCAP_MAGIC[donnees[:4]]
+        linktype = struct.unpack_from(ordre + "I", donnees, 20)[0] & 0xFFFF
+        enregistrement = struct.Struct(ordre + "IIII")
+        lire = enregistrement.unpack_from
+        taille = len(donnees)
+        pos = 24
+        while pos + 16 <= taille:
+            sec, frac, longueur, _ = lire(donnees, pos)
+            pos += 16
+            if pos + longueur > taille:
+                break
+            yield sec + frac * resolution, linktype, pos, longueur
+            pos += longueur
+
+    def _paquets_pcapng(self):
+        donnees = self.donnees
+        taille = len(donnees)
+        ordre = "<"
+        interfaces = []
+        pos = 0
+        while pos + 12 <= taille:
+            type_bloc = struct.unpack_from(ordre + "I", donnees, pos)[0]
+            if type_bloc == _PCAPNG_SHB:
+                magie = donnees[pos + 8:pos + 12]
+                ordre = "<" if magie == b"\x4d\x3c\x2b\x1a" else ">"
+                interfaces = []
+                lire_epb = struct.Struct(ordre + "IIIII").unpack_from
+            longueur_bloc = struct.unpack_from(ordre + "I", donnees, pos + 4)[0]
+            if longueur_bloc < 12 or pos + longueur_bloc > taille:
+                break
+
+            if type_bloc == _PCAPNG_EPB:
+                interface, ts_haut, ts_bas, capture, _ = lire_epb(donnees, pos + 8)
+                linktype, resolution = self._interface(interfaces, interface, pos)
+                yield ((ts_haut << 32) | ts_bas) * resolution, linktype, pos + 28, capture
+            elif type_bloc == _PCAPNG_IDB:
+                linktype = struct.unpack_from(ordre + "H", donnees, pos + 8)[0]
+                interfaces.append((linktype, _resolution_idb(donnees, pos, longueur_bloc, ordre)))
+            elif type_bloc == _PCAPNG_SPB:
+                origine = struct.unpack_from(ordre + "I", donnees, pos + 8)[0]
+                linktype, _ = self._interface(interfaces, 0, pos)
+                yield 0.0, linktype, pos + 12, min(origine, longueur_bloc - 16)
+            elif type_bloc == _PCAPNG_OPB:
+                interface = struct.unpack_from(ordre + "H", donnees, pos + 8)[0]
+                ts_haut, ts_bas, capture = struct.unpack_from(ordre + "III", donnees, pos + 12)
+                linktype, resolution = self._interface(interfaces, interface, pos)
+                yield ((ts_haut << 32) | ts_bas) * resolution, linktype, pos + 28, capture
+            pos += longueur_bloc
+
+    def _interface(self, interfaces, index, pos):
+        """(linktype, résolution) de l'interface d'un bloc paquet ; le bloc IDB doit la précéder."""
+        if index >= len(interfaces):
+            raise ErreurCapture(f"{self.chemin}: paquet à l'octet {pos} sur l'interface {index}, "
+                                f"{len(interfaces)} interface(s) décrite(s)")
+        return interfaces[index]
+
+
+def _resolution_idb(donnees, pos, longueur_bloc, ordre):
+    """Lit l'option if_tsresol d'un bloc IDB (défaut : microseconde)."""
+    opt = pos + 16
+    fin = pos + longueur_bloc - 4
+    while opt + 4 <= fin:
+        code, longueur = struct.unpack_from(ordre + "HH", donnees, opt)
+        if code == 0:
+            break
+        if code == 9 and longueur >= 1:
+            valeur = donnees[opt + 4]
+            if valeur & 0x80:
+                return 2.0 ** -(valeur & 0x7F)
+            return 10.0 ** -valeur
+        opt += 4 + ((longueur + 3) & ~3)
+    return 1e-6
+
+
+def localiser_ip(donnees, linktype, debut, longueur):
+    """Retourne (décalage de l'en-tête IP, version) ou (-1, 0) si le paquet n'est pas IP."""
+    if linktype == LINKTYPE_ETHERNET:
+        if longueur < 14:
+            return -1, 0
+        pos = debut + 12
+        ethertype = _U16.unpack_from(donnees, pos)[0]
+        while ethertype in _ETHERTYPES_VLAN and pos + 6 <= debut + longueur:
+            pos += 4
+            ethertype = _U16.unpack_from(donnees, pos)[0]
+        pos += 2
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if longueur < 16:
+            return -1, 0
+        ethertype = _U16.unpack_from(donnees, debut + 14)[0]
+        pos = debut + 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if longueur < 20:
+            return -1, 0
+        ethertype = _U16.unpack_from(donnees, debut)[0]
+        pos = debut + 20
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if longueur < 1:
+            return -1, 0
+        version = donnees[debut] >> 4
+        return (debut, version) if version in (4, 6) else (-1, 0)
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if longueur < 5:
+            return -1, 0
+        version = donnees[debut + 4] >> 4
+        return (debut + 4, version) if version in (4, 6) else (-1, 0)
+    else:
+        return -1, 0
+
+    if ethertype == ETHERTYPE_IPV4:
+        return pos, 4
+    if ethertype == ETHERTYPE_IPV6:
+        return pos, 6
+    return -1, 0
+
+
+def entete_ip(donnees, ip, version, fin):
+    """Décode l'en-tête IP : (protocole, src, dst, dscp, décalage L4, longueur L4) ou None.
+
+    Les adresses sont retournées sous forme d'octets bruts (voir adresse_texte).
+    """
+    if version == 4:
+        if ip + 20 > fin:
+            return None
+        ihl = (donnees[ip] & 0x0F) * 4
+        longueur_totale = _U16.unpack_from(donnees, ip + 2)[0]
+        # Fragments non initiaux : pas d'en-tête L4
+        if _U16.unpack_from(donnees, ip + 6)[0] & 0x1FFF:
+            return None
+        return (donnees[ip + 9], donnees[ip + 12:ip + 16], donnees[ip + 16:ip + 20],
+                donnees[ip + 1] >> 2, ip + ihl, longueur_totale - ihl)
+    if ip + 40 > fin:
+        return None
+    dscp = (_U16.unpack_from(donnees, ip)[0] >> 6) & 0x3F
+    return (donnees[ip + 6], donnees[ip + 8:ip + 24], donnees[ip + 24:ip + 40],
+            dscp, ip + 40, _U16.unpack_from(donnees, ip + 4)[0])
+
+
+def entete_tcp(donnees, l4, longueur_l4, fin):
+    """Décode l'en-tête TCP : (port src, port dst, seq, ack, flags, longueur données) ou None."""
+    if l4 + 14 > fin:
+        return None
+    sport, dport, seq, ack, decalage, flags = _TCP.unpack_from(donnees, l4)
+    return sport, dport, seq, ack, flags, longueur_l4 - (decalage >> 4) * 4
+
+
+def ports_udp(donnees, l4, fin):
+    """Retourne (port src, port dst) d'un datagramme UDP ou None."""
+    if l4 + 4 > fin:
+        return None
+    return _UDP.unpack_from(donnees, l4)
+
+
+_CACHE_ADRESSES = {}
+
+
+def adresse_texte(brute):
+    """Convertit une adresse IP brute (4 ou 16 octets) en texte, avec cache."""
+    texte = _CACHE_ADRESSES.get(brute)
+    if texte is None:
+        famille = socket.AF_INET if len(brute) == 4 else socket.AF_INET6
+        texte = socket.inet_ntop(famille, brute)
+        if len(_CACHE_ADRESSES) < 1_000_000:
+            _CACHE_ADRESSES[brute] = texte
+    return texte
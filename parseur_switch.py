@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analyse en masse des sorties CLI de switchs type Cisco (LLDP, interfaces, VLAN, ARP, DHCP)
+Grammaires précompilées décrites en tables ; accepte un copier-coller ou des fichiers show tech
+"""
+
+import re
+from functools import lru_cache
+
+_M = re.MULTILINE
+_MI = re.MULTILINE | re.IGNORECASE
+
+# Découpage d'une sortie en sections : invite "switch#show ..." ou en-tête de show tech
+DEBUT_SECTION = re.compile(
+    r"^(?:(?P<hote>[A-Za-z0-9][\w.\-]*)(?:\([\w\-]+\))?[#>][ \t]*(?P<commande>[^\n]*)"
+    r"|-{5,} (?P<commande_tech>show [^\n]*?) -{5,}[ \t]*)$",
+    _M
+)
+NOM_HOTE = re.compile(r"^hostname (\S+)", _M)
+
+# Commande -> grammaire ; les abréviations IOS sont acceptées (sh lldp nei det, sh int, sh vl br)
+COMMANDES = (
+    ("lldp", re.compile(r"^sh(?:o(?:w)?)?\s+lldp\s+nei\w*\s+det\w*\s*$", re.IGNORECASE)),
+    ("vlan", re.compile(r"^sh(?:o(?:w)?)?\s+vl(?:an?)?(?:\s+br\w*)?\s*$", re.IGNORECASE)),
+    ("interfaces", re.compile(r"^sh(?:o(?:w)?)?\s+int\w*(?:\s+[A-Za-z\-]+\s*\d[\d/.:]*)?\s*$", re.IGNORECASE)),
+    ("arp", re.compile(r"^sh(?:o(?:w)?)?\s+ip\s+arp\b", re.IGNORECASE)),
+    ("dhcp", re.compile(r"^sh(?:o(?:w)?)?\s+ip\s+dhcp\s+bind\w*", re.IGNORECASE)),
+)
+
+# Sortie collée sans invite : reconnaissance par le contenu
+SIGNATURES = (
+    ("lldp", re.compile(r"^Local Intf:", _M)),
+    ("vlan", re.compile(r"^VLAN\s+Name\s+Status\s+Ports", _M)),
+    ("interfaces", re.compile(r"^\S+ is (?:up|down|administratively down), line protocol is", _M)),
+    ("arp", re.compile(r"^Protocol\s+Address\s+Age", _M)),
+    ("dhcp", re.compile(r"^IP address\s+Client-ID/", _M)),
+)
+
+# Grammaires : (motif d'entrée, [(motif de champ, noms des groupes, conversion)])
+GRAMMAIRE_LLDP = (
+    re.compile(r"^Local Intf:\s*(?P<interface>\S+)", _M),
+    (
+        (re.compile(r"^Chassis id:\s*(.+?)\s*$", _M), ("chassis",), str),
+        (re.compile(r"^Port id:\s*(.+?)\s*$", _M), ("port_voisin",), str),
+        (re.compile(r"^Port Description:\s*(.+?)\s*$", _M), ("description_port",), str),
+        (re.compile(r"^System Name:\s*(.+?)\s*$", _M), ("voisin",), str),
+        (re.compile(r"^Enabled Capabilities:\s*(.+?)\s*$", _M), ("capacites",), str),
+        (re.compile(r"^\s+IP(?:v4)?(?: address)?:\s*(\d+\.\d+\.\d+\.\d+)", _M), ("ip_voisin",), str),
+        (re.compile(r"^Vlan ID:\s*(\d+)", _M), ("vlan",), str),
+    ),
+)
+
+GRAMMAIRE_INTERFACES = (
+    re.compile(
+        r"^(?P<interface>\S+) is (?P<etat>up|down|administratively down)"
+        r"(?:, line protocol is (?P<protocole>\w+)(?: \((?P<statut>[\w\-]+)\))?)?",
+        _M
+    ),
+    (
+        (re.compile(r"^\s+Description:\s*(.+?)\s*$", _M), ("description",), str),
+        (re.compile(r"address is ([0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4})", _M), ("mac",), str),
+        (re.compile(r"txload (\d+)/255, rxload (\d+)/255", _M), ("txload", "rxload"), int),
+        (re.compile(r"^\s+(\w+)-duplex, ([\w/\-]+)", _MI), ("duplex", "vitesse"), str),
+        (re.compile(r"input rate (\d+) bits/sec", _M), ("debit_entree_bps",), int),
+        (re.compile(r"output rate (\d+) bits/sec", _M), ("debit_sortie_bps",), int),
+        (re.compile(r"Input queue: \d+/\d+/(\d+)/", _M), ("drops_entree",), int),
+        (re.compile(r"Total output drops: (\d+)", _M), ("drops_sortie",), int),
+        (re.compile(r"^\s+(\d+) packets input", _M), ("paquets_entree",), int),
+        (re.compile(r"^\s+(\d+) packets output", _M), ("paquets_sortie",), int),
+        (re.compile(r"^\s+(\d+) runts, (\d+) giants", _M), ("runts", "giants"), int),
+        (re.compile(r"^\s+(\d+) input errors, (\d+) CRC", _M), ("erreurs_entree", "crc"), int),
+        (re.compile(r"^\s+(\d+) output errors,(?: (\d+) collisions,)? (\d+) interface resets", _M),
+         ("erreurs_sortie", "collisions", "resets"), int),
+    ),
+)
+
+# Tables ligne à ligne : une entrée par ligne, sans champ supplémentaire
+GRAMMAIRE_ARP = (
+    re.compile(
+        r"^Internet\s+(?P<ip>\d+\.\d+\.\d+\.\d+)\s+(?P<age>\S+)\s+"
+        r"(?P<mac>[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}|Incomplete)\s+\S+[ \t]*(?P<interface>\S*)",
+        _MI
+    ),
+    (),
+)
+
+GRAMMAIRE_DHCP = (
+    re.compile(
+        r"^(?P<ip>\d+\.\d+\.\d+\.\d+)\s+(?P<client>[0-9a-f.]+)\s+(?P<bail>\S.*?)\s+"
+        r"(?P<type>Automatic|Manual|Infinite)\b[ \t]*(?P<etat>[A-Za-z]*)[ \t]*(?P<interface>\S*)",
+        _MI
+    ),
+    (),
+)
+
+LIGNE_VLAN = re.compile(r"^(\d{1,4})\s+(\S+)\s+(active|suspended|act/\w+|sus/\w+)[ \t]*(.*)$")
+LLDP_INACTIF = re.compile(r"LLDP is not enabled", re.IGNORECASE)
+
+# Préfixes d'interfaces Cisco, du plus spécifique au plus général (forme longue, forme courte)
+TYPES_INTERFACE = (
+    ("twogigabitethernet", "Tw"),
+    ("twentyfivegige", "Twe"),
+    ("tengigabitethernet", "Te"),
+    ("gigabitethernet", "Gi"),
+    ("fastethernet", "Fa"),
+    ("fivegigabitethernet", "Fi"),
+    ("fortygigabitethernet", "Fo"),
+    ("hundredgige", "Hu"),
+    ("appgigabitethernet", "Ap"),
+    ("port-channel", "Po"),
+    ("ethernet", "Eth"),
+    ("vlan", "Vl"),
+)
+_NOM_INTERFACE = re.compile(r"^([A-Za-z\-]+)\s*(\d[\d/.:]*)$")
+
+
+@lru_cache(maxsize=4096)
+def normaliser_interface(nom):
+    """Forme courte canonique d'un nom d'interface (GigabitEthernet1/0/1 -> Gi1/0/1)."""
+    correspondance = _NOM_INTERFACE.match(nom.strip())
+    if not correspondance:
+        return nom.strip()
+    prefixe, numero = correspondance.groups()
+    prefixe = prefixe.lower()
+    for long, court in TYPES_INTERFACE:
+        if long.startswith(prefixe):
+            return court + numero
+    return correspondance.group(1) + numero
+
+
+def _entier_vitesse(vitesse):
+    """Débit en Mb/s depuis '1000Mb/s', '10Gb/s', 'a-100'... ; None si inconnu."""
+    chiffres = re.match(r"(?:a-)?(\d+)\s*([GM]?)", vitesse or "")
+    if not chiffres:
+        return None
+    return int(chiffres.group(1)) * (1000 if chiffres.group(2) == "G" else 1)
+
+
+def _appliquer(grammaire, texte, debut, fin, switch):
+    """Enregistrements d'une section : un par entrée, champs cherchés dans l'entrée seule."""
+    entree, champs = grammaire
+    positions = [(m.start(), m.groupdict()) for m in entree.finditer(texte, debut, fin)]
+    enregistrements = []
+    for i, (position, valeurs) in enumerate(positions):
+        limite = positions[i + 1][0] if i + 1 < len(positions) else fin
+        enregistrement = {"switch": switch, **valeurs}
+        for motif, noms, conversion in champs:
+            trouve = motif.search(texte, position, limite)
+            if trouve is None:
+                continue
+            for nom, valeur in zip(noms, trouve.groups()):
+                if valeur is not None and valeur != "Not advertised":
+                    enregistrement[nom] = conversion(valeur)
+        if enregistrement.get("interface"):
+            enregistrement["interface"] = normaliser_interface(enregistrement["interface"])
+        enregistrements.append(enregistrement)
+    return enregistrements
+
+
+def _analyser_vlans(texte, debut, fin, switch):
+    """Tableau 'show vlan brief' : les lignes de continuation prolongent la liste de ports."""
+    vlans = []
+    courant = None
+    for ligne in texte[debut:fin].splitlines():
+        correspondance = LIGNE_VLAN.match(ligne)
+        if correspondance:
+            numero, nom, etat, ports = correspondance.groups()
+            courant = {"switch": switch, "vlan": numero, "nom": nom, "etat": etat, "ports": []}
+            vlans.append(courant)
+        elif courant is not None and ligne[:1] in (" ", "\t") and ligne.strip():
+            ports = ligne
+        else:
+            courant = None
+            continue
+        courant["ports"].extend(normaliser_interface(p) for p in ports.split(",") if p.strip())
+    return vlans
+
+
+def _type_section(commande, texte, debut, fin):
+    if commande is not None:
+        commande = commande.split("|")[0].strip()
+        for nom, motif in COMMANDES:
+            if motif.match(commande):
+                return nom
+        return None
+    for nom, motif in SIGNATURES:
+        if motif.search(texte, debut, fin):
+            return nom
+    return None
+
+
+def _resultat_vide():
+    return {"lldp": [], "interfaces": [], "vlans": [], "arp": [], "dhcp": [], "commandes": set(), "lldp_inactif": set()}
+
+
+def analyser_sortie(texte, switch=None):
+    """Analyse une sortie CLI (un ou plusieurs switchs) ; retourne les enregistrements par type."""
+    resultat = _resultat_vide()
+    if switch is None:
+        hote = NOM_HOTE.search(texte)
+        switch = hote.group(1) if hote else None
+
+    sections = []
+    precedent = (0, None, switch)
+    for correspondance in DEBUT_SECTION.finditer(texte):
+        sections.append((precedent[0], correspondance.start(), precedent[1], precedent[2]))
+        commande = correspondance.group("commande")
+        if commande is None:
+            commande = correspondance.group("commande_tech")
+        precedent = (correspondance.end(), commande, correspondance.group("hote") or switch)
+    sections.append((precedent[0], len(texte), precedent[1], precedent[2]))
+
+    for debut, fin, commande, hote in sections:
+        if fin - debut < 2:
+            continue
+        type_section = _type_section(commande, texte, debut, fin)
+        if type_section is None:
+            continue
+        resultat["commandes"].add(type_section)
+        if type_section == "lldp":
+            if LLDP_INACTIF.search(texte, debut, fin):
+                resultat["lldp_inactif"].add(hote)
+            resultat["lldp"].extend(_appliquer(GRAMMAIRE_LLDP, texte, debut, fin, hote))
+        elif type_section == "interfaces":
+            resultat["interfaces"].extend(_appliquer(GRAMMAIRE_INTERFACES, texte, debut, fin, hote))
+        elif type_section == "arp":
+            resultat["arp"].extend(_appliquer(GRAMMAIRE_ARP, texte, debut, fin, hote))
+        elif type_section == "dhcp":
+            resultat["dhcp"].extend(_appliquer(GRAMMAIRE_DHCP, texte, debut, fin, hote))
+        else:
+            resultat["vlans"].extend(_analyser_vlans(texte, debut, fin, hote))
+    return resultat
+
+
+def analyser_fichiers(chemins):
+    """Analyse plusieurs fichiers de sorties CLI (un par switch en général) et fusionne les résultats."""
+    total = _resultat_vide()
+    for chemin in chemins:
+        with open(chemin, encoding="utf-8", errors="replace") as f:
+            resultat = analyser_sortie(f.read())
+        for cle, valeur in resultat.items():
+            if isinstance(valeur, set):
+                total[cle] |= valeur
+            else:
+                total[cle].extend(valeur)
+    return total
+
+
+def fiche_moniteur(resultat, ip_moniteur=None, nom=None):
+    """Voisin LLDP correspondant au moniteur, complété par l'interface et le VLAN du port switch.
+
+    Sans IP ni nom, le moniteur est retenu uniquement s'il est le seul voisin LLDP.
+    """
+    voisins = resultat["lldp"]
+    if ip_moniteur:
+        voisins = [v for v in voisins if v.get("ip_voisin") == ip_moniteur]
+    elif nom:
+        voisins = [v for v in voisins if (v.get("voisin") or "").lower().startswith(nom.lower())]
+    if len(voisins) != 1:
+        return None
+    voisin = voisins[0]
+    fiche = {
+        "switch": voisin["switch"],
+        "port_switch": voisin["interface"],
+        "voisin": voisin.get("voisin") or voisin.get("chassis"),
+        "capacites": voisin.get("capacites"),
+        "vlan": voisin.get("vlan"),
+    }
+    for interface in resultat["interfaces"]:
+        if interface["interface"] == fiche["port_switch"] and interface["switch"] in (fiche["switch"], None):
+            fiche.update({k: v for k, v in interface.items() if k not in ("switch", "interface")})
+            break
+    if fiche["vlan"] is None:
+        for vlan in resultat["vlans"]:
+            if fiche["port_switch"] in vlan["ports"] and vlan["switch"] in (fiche["switch"], None):
+                fiche["vlan"] = vlan["vlan"]
+                break
+    return fiche
+
+
+def evaluer_reponses(resultat, fiche):
+    """Déduit les réponses des étapes 1 (LLDP) et 2 (physique) depuis les sorties analysées."""
+    reponses = {}
+    if "lldp" in resultat["commandes"]:
+        reponses["q_lldp_active"] = "Non" if resultat["lldp_inactif"] and not resultat["lldp"] else "Oui"
+        if reponses["q_lldp_active"] == "Oui":
+            reponses["q_lldp_visible"] = "Oui" if fiche else "Non"
+    if fiche is None:
+        return reponses
+    for cle, champ in (("lldp_device", "voisin"), ("lldp_port", "port_switch"),
+                       ("lldp_vlan", "vlan"), ("lldp_cap", "capacites")):
+        if fiche.get(champ):
+            reponses[cle] = fiche[champ]
+    if "protocole" in fiche:
+        reponses["q_link_up"] = "Oui" if fiche["protocole"] == "up" else "Non"
+    if "erreurs_entree" in fiche or "erreurs_sortie" in fiche:
+        erreurs = fiche.get("erreurs_entree", 0) + fiche.get("crc", 0) + fiche.get("erreurs_sortie", 0)
+        reponses["q_erreurs_interface"] = "Oui" if erreurs else "Non"
+    vitesse = _entier_vitesse(fiche.get("vitesse"))
+    if vitesse is not None:
+        reponses["q_vitesse"] = "Oui" if vitesse >= 100 and fiche.get("duplex", "").lower() == "full" else "Non"
+    return reponses
+
+
+def enregistrer_dans_donnees(fiche, donnees_collectees):
+    """Reporte la fiche du port switch du moniteur dans donnees_collectees."""
+    if fiche is None:
+        return
+    for cle, champ in (("LLDP Device", "voisin"), ("Port Switch", "port_switch"),
+                       ("VLAN", "vlan"), ("Switch", "switch")):
+        if fiche.get(champ):
+            donnees_collectees[cle] = fiche[champ]
+    if "etat" in fiche:
+        donnees_collectees['Interface switch'] = (
+            f"{fiche['etat']}/{fiche.get('protocole', '?')}, {fiche.get('duplex', '?')} {fiche.get('vitesse', '?')}"
+        )
+    if "erreurs_entree" in fiche:
+        donnees_collectees['Erreurs interface'] = (
+            f"in {fiche['erreurs_entree']} (CRC {fiche.get('crc', 0)}), out {fiche.get('erreurs_sortie', 0)}"
+        )
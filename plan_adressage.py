@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation des moniteurs contre le plan d'adressage (sous-réseaux, masques, passerelles, VLAN)
+Arbre de préfixes binaire : recherche du préfixe le plus long en O(longueur du préfixe)
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+
+from conflits_ip import APIPA_DEBUT, APIPA_MASQUE, ip_entier, ip_texte, reseau_entier, reseau_texte
+
+# Colonnes du plan (alias acceptés → nom normalisé)
+COLONNES_PLAN = {
+    "reseau": ("reseau", "réseau", "sous_reseau", "sous-réseau", "subnet", "prefixe", "préfixe"),
+    "vlan": ("vlan",),
+    "passerelle": ("passerelle", "gateway"),
+    "nom": ("nom", "site", "description", "zone"),
+    "routes": ("routes", "destinations", "acces", "accès"),
+}
+
+NIVEAU_ERREUR = "error"
+NIVEAU_ALERTE = "warning"
+
+
+class ArbrePrefixes:
+    """Arbre binaire de préfixes IPv4 ; chaque nœud est [fils_0, fils_1, valeur]."""
+
+    __slots__ = ("racine", "taille")
+
+    def __init__(self):
+        self.racine = [None, None, None]
+        self.taille = 0
+
+    def inserer(self, debut, longueur, valeur):
+        noeud = self.racine
+        for rang in range(longueur):
+            bit = (debut >> (31 - rang)) & 1
+            fils = noeud[bit]
+            if fils is None:
+                fils = noeud[bit] = [None, None, None]
+            noeud = fils
+        if noeud[2] is None:
+            self.taille += 1
+        noeud[2] = valeur
+
+    def chercher(self, ip):
+        """Valeur du préfixe le plus long contenant l'IP entière, ou None."""
+        noeud = self.racine
+        trouve = noeud[2]
+        rang = 31
+        while rang >= 0:
+            noeud = noeud[(ip >> rang) & 1]
+            if noeud is None:
+                break
+            if noeud[2] is not None:
+                trouve = noeud[2]
+            rang -= 1
+        return trouve
+
+    def __len__(self):
+        return self.taille
+
+
+def charger_plan(chemin):
+    """Charge un plan d'adressage CSV ou JSON et normalise les noms de colonnes."""
+    if chemin.lower().endswith(".json"):
+        df = pd.read_json(chemin, dtype=str)
+    else:
+        df = pd.read_csv(chemin, dtype=str, sep=None, engine="python")
+    renommage = {}
+    for colonne in df.columns:
+        nom = colonne.strip().lower()
+        for normalise, alias in COLONNES_PLAN.items():
+            if nom in alias:
+                renommage[colonne] = normalise
+    df = df.rename(columns=renommage)
+    if "reseau" not in df.columns:
+        raise ValueError(f"{chemin}: colonne réseau absente (attendu : {', '.join(COLONNES_PLAN['reseau'])})")
+    df = df.fillna("")
+    return [{k: str(v).strip() for k, v in ligne.items()} for ligne in df.to_dict("records")]
+
+
+class PlanAdressage:
+    """Plan d'adressage indexé : un arbre pour les sous-réseaux, un par sous-réseau pour ses routes."""
+
+    def __init__(self, entrees):
+        self.arbre = ArbrePrefixes()
+        self.invalides = []
+        politiques = {}
+        for entree in entrees:
+            reseau = reseau_entier(entree.get("reseau"))
+            if reseau is None:
+                self.invalides.append(entree.get("reseau"))
+                continue
+            # Destinations autorisées depuis ce sous-réseau ; sans colonne routes : route par défaut.
+            # Les politiques identiques partagent le même arbre.
+            routes = None
+            if entree.get("routes"):
+                routes = politiques.get(entree["routes"])
+                if routes is None:
+                    routes = politiques[entree["routes"]] = ArbrePrefixes()
+                    for texte in entree["routes"].replace(";", " ").replace(",", " ").split():
+                        route = reseau_entier(texte)
+                        if route is not None:
+                            routes.inserer(route[0], route[1], route)
+            self.arbre.inserer(reseau[0], reseau[1], {
+                "reseau": reseau,
+                "texte": reseau_texte(reseau),
+                "vlan": entree.get("vlan") or None,
+                "passerelle": ip_entier(entree.get("passerelle") or ""),
+                "nom": entree.get("nom") or "",
+                "routes": routes,
+            })
+
+    @classmethod
+    def depuis_fichier(cls, chemin):
+        return cls(charger_plan(chemin))
+
+    def __len__(self):
+        return len(self.arbre)
+
+    def chercher(self, ip):
+        """Entrée du plan contenant l'IP (texte), ou None."""
+        ip = ip_entier(ip or "")
+        return None if ip is None else self.arbre.chercher(ip)
+
+    def valider_moniteur(self, ip_moniteur, sous_reseau=None, passerelle=None, vlan=None, ip_centrale=None):
+        """Constats (niveau, message) pour un moniteur ; liste vide si conforme au plan."""
+        constats = []
+        ip = ip_entier(ip_moniteur or "")
+        if ip is None:
+            return {"reseau": None, "constats": [(NIVEAU_ERREUR, f"IP moniteur invalide : {ip_moniteur}")]}
+        if ip & APIPA_MASQUE == APIPA_DEBUT:
+            constats.append((NIVEAU_ERREUR, "Adresse APIPA (169.254.x.x) : pas de bail DHCP"))
+        entree = self.arbre.chercher(ip)
+        if entree is None:
+            constats.append((NIVEAU_ERREUR, f"IP {ip_moniteur} hors du plan d'adressage"))
+            return {"reseau": None, "constats": constats}
+
+        debut, longueur = entree["reseau"]
+        diffusion = debut | (0xFFFFFFFF >> longueur)
+        if longueur < 31 and ip in (debut, diffusion):
+            constats.append((NIVEAU_ERREUR, f"IP {ip_moniteur} = adresse de réseau ou de diffusion de {entree['texte']}"))
+
+        if sous_reseau:
+            declare = reseau_entier(sous_reseau)
+            if declare is None:
+                constats.append((NIVEAU_ERREUR, f"Sous-réseau saisi invalide : {sous_reseau}"))
+            elif declare != entree["reseau"]:
+                constats.append((NIVEAU_ERREUR, f"Sous-réseau/masque {sous_reseau} différent du plan ({entree['texte']})"))
+
+        if passerelle:
+            gw = ip_entier(passerelle)
+            masque = (0xFFFFFFFF << (32 - longueur)) & 0xFFFFFFFF
+            if gw is None:
+                constats.append((NIVEAU_ERREUR, f"Passerelle invalide : {passerelle}"))
+            elif gw & masque != debut:
+                constats.append((NIVEAU_ERREUR, f"Passerelle {passerelle} hors du sous-réseau {entree['texte']}"))
+            elif gw == ip:
+                constats.append((NIVEAU_ERREUR, "La passerelle est l'adresse du moniteur"))
+            elif longueur < 31 and gw in (debut, diffusion):
+                constats.append((NIVEAU_ERREUR, f"Passerelle {passerelle} = adresse de réseau ou de diffusion de {entree['texte']}"))
+            elif entree["passerelle"] is not None and gw != entree["passerelle"]:
+                constats.append((NIVEAU_ALERTE, f"Passerelle {passerelle} différente du plan ({ip_texte(entree['passerelle'])})"))
+
+        if vlan and entree["vlan"] and str(vlan).strip() != entree["vlan"]:
+            constats.append((NIVEAU_ERREUR, f"VLAN {vlan} différent du plan (VLAN {entree['vlan']} pour {entree['texte']})"))
+
+        if ip_centrale:
+            constats.extend(self.verifier_route(entree, ip_centrale))
+        return {"reseau": entree["texte"], "nom": entree["nom"], "constats": constats}
+
+    def verifier_route(self, entree, ip_centrale):
+        """La centrale est-elle joignable depuis le sous-réseau selon la politique de routage du plan ?"""
+        centrale = ip_entier(ip_centrale)
+        if centrale is None:
+            return [(NIVEAU_ERREUR, f"IP centrale invalide : {ip_centrale}")]
+        constats = []
+        if self.arbre.chercher(centrale) is None:
+            constats.append((NIVEAU_ALERTE, f"Centrale {ip_centrale} hors du plan d'adressage"))
+        if entree["routes"] is not None and entree["routes"].chercher(centrale) is None:
+            constats.append((NIVEAU_ERREUR, f"Aucune route autorisée de {entree['texte']} vers la centrale {ip_centrale}"))
+        return constats
+
+    def valider_inventaire(self, moniteurs):
+        """Valide tous les moniteurs d'un inventaire ; retourne une ligne par moniteur."""
+        lignes = []
+        for moniteur in moniteurs:
+            validation = self.valider_moniteur(moniteur.get("ip_moniteur"), moniteur.get("sous_reseau"),
+                                               moniteur.get("passerelle"), moniteur.get("vlan"),
+                                               moniteur.get("ip_centrale"))
+            lignes.append({
+                "ip_moniteur": moniteur.get("ip_moniteur"),
+                "reseau_plan": validation["reseau"],
+                "conforme_plan": "Non" if any(n == NIVEAU_ERREUR for n, _ in validation["constats"]) else "Oui",
+                "ecarts_plan": "; ".join(message for _, message in validation["constats"]),
+            })
+        return lignes
+
+
+def enregistrer_dans_donnees(validation, donnees_collectees):
+    """Reporte le résultat de la validation du moniteur dans donnees_collectees."""
+    if validation["reseau"]:
+        donnees_collectees['Réseau (plan)'] = validation["reseau"]
+    erreurs = sum(1 for niveau, _ in validation["constats"] if niveau == NIVEAU_ERREUR)
+    donnees_collectees['Conformité plan'] = "conforme" if not validation["constats"] else f"{erreurs} erreur(s), {len(validation['constats']) - erreurs} alerte(s)"
+
+
+def main(argv=None):
+    """Point d'entrée : valide un inventaire de moniteurs contre un plan d'adressage."""
+    parser = argparse.ArgumentParser(description="Validation d'un inventaire de moniteurs contre le plan d'adressage")
+    parser.add_argument("plan", help="Plan CSV/JSON (reseau, vlan, passerelle, nom, routes)")
+    parser.add_argument("inventaire", help="Inventaire CSV/JSON des moniteurs")
+    parser.add_argument("-o", "--sortie", help="Rapport CSV des écarts")
+    args = parser.parse_args(argv)
+
+    from diagnostic_lot import charger_inventaire
+    plan = PlanAdressage.depuis_fichier(args.plan)
+    lignes = plan.valider_inventaire(charger_inventaire(args.inventaire))
+    ecarts = [ligne for ligne in lignes if ligne["ecarts_plan"]]
+    for ligne in ecarts:
+        print(f"{'🚨' if ligne['conforme_plan'] == 'Non' else '⚠️ '} {ligne['ip_moniteur']:<15} {ligne['ecarts_plan']}")
+    if args.sortie:
+        pd.DataFrame(lignes).to_csv(args.sortie, index=False)
+    print(f"📊 {len(lignes)} moniteurs, {len(ecarts)} avec écarts, plan de {len(plan)} sous-réseaux")
+    return 1 if ecarts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Détection des moniteurs qui se reconnectent en boucle sur le port CI (24005) et des tempêtes de reconnexions
+Différence d'instantanés de la table des sockets (chaque seconde) ou événements extraits d'une capture
+"""
+
+import argparse
+import socket
+import sys
+import time
+from collections import deque
+
+from analyse_handshake import EVENEMENT_CONNEXION, EVENEMENT_DECONNEXION
+from diagnostic_ci import GuideDiagnosticCI
+
+FENETRE_DEFAUT = 60.0          # fenêtre glissante des taux par moniteur (s)
+SEUIL_DEFAUT = 3               # connexions d'un même moniteur dans la fenêtre : moniteur instable
+FENETRE_TEMPETE_DEFAUT = 10.0  # fenêtre courte de détection des tempêtes (s)
+SEUIL_TEMPETE_DEFAUT = 10      # moniteurs distincts (re)connectés dans la fenêtre courte : tempête
+
+_PREFIXE_V4_MAPPE = bytes(10) + b"\xff\xff"
+
+
+def adresse_moniteur(brute):
+    """Adresse texte d'un moniteur ; une adresse IPv4 vue par une écoute IPv6 (::ffff:a.b.c.d) est ramenée en IPv4."""
+    if len(brute) == 16 and brute[:12] == _PREFIXE_V4_MAPPE:
+        brute = brute[12:]
+    return socket.inet_ntop(socket.AF_INET if len(brute) == 4 else socket.AF_INET6, brute)
+
+
+class _Moniteur:
+    """Connexions et déconnexions récentes d'un moniteur (horodatages dans la fenêtre)."""
+
+    __slots__ = ("connexions", "deconnexions", "total_connexions", "total_deconnexions", "signale")
+
+    def __init__(self):
+        self.connexions = deque()
+        self.deconnexions = deque()
+        self.total_connexions = 0
+        self.total_deconnexions = 0
+        self.signale = None
+
+
+class DetecteurReconnexions:
+    """Taux de connexion / déconnexion par moniteur en fenêtre glissante.
+
+    Alimenté soit par `observer()` avec l'ensemble des connexions établies (clés de
+    TableSockets.connexions()), soit par `evenement()` (capture, autre source).
+    Un instantané coûte O(connexions établies) : la différence symétrique parcourt les deux
+    ensembles (en C), comme la lecture de la table qui le produit ; seul le traitement
+    des événements est proportionnel au nombre de changements.
+    """
+
+    def __init__(self, fenetre=FENETRE_DEFAUT, seuil=SEUIL_DEFAUT,
+                 fenetre_tempete=FENETRE_TEMPETE_DEFAUT, seuil_tempete=SEUIL_TEMPETE_DEFAUT):
+        self.fenetre = fenetre
+        self.seuil = seuil
+        self.fenetre_tempete = fenetre_tempete
+        self.seuil_tempete = seuil_tempete
+        self.moniteurs = {}
+        self.precedentes = None
+        self.instantanes = 0
+        self.evenements = 0
+        self.dernier_ts = None
+        self.tempetes = 0
+        self.debut_tempete = None
+        self._recentes = deque()   # (ts, moniteur) des connexions de la fenêtre courte
+        self._recents = {}         # moniteur -> connexions dans la fenêtre courte
+
+    # Alimentation
+
+    def observer(self, connexions, horodatage=None):
+        """Compare l'instantané aux connexions précédentes (O(connexions)) ; retourne le nombre de changements.
+
+        Le premier instantané sert de référence : les connexions déjà ouvertes ne sont pas des événements.
+        """
+        ts = time.time() if horodatage is None else horodatage
+        precedentes, self.precedentes = self.precedentes, connexions
+        self.instantanes += 1
+        if precedentes is None:
+            return 0
+        changements = connexions ^ precedentes
+        for cle in changements:
+            self.evenement(ts, cle[18:], EVENEMENT_CONNEXION if cle in connexions else EVENEMENT_DECONNEXION)
+        if not changements:
+            self._elaguer_recentes(ts)
+        return len(changements)
+
+    def evenement(self, ts, moniteur, type_evenement):
+        """Connexion ou déconnexion d'un moniteur (adresse brute ou texte) à l'instant ts."""
+        suivi = self.moniteurs.get(moniteur)
+        if suivi is None:
+            suivi = self.moniteurs[moniteur] = _Moniteur()
+        self.evenements += 1
+        self.dernier_ts = ts
+        if type_evenement == EVENEMENT_CONNEXION:
+            suivi.connexions.append(ts)
+            suivi.total_connexions += 1
+            self._recentes.append((ts, moniteur))
+            self._recents[moniteur] = self._recents.get(moniteur, 0) + 1
+        else:
+            suivi.deconnexions.append(ts)
+            suivi.total_deconnexions += 1
+        self._elaguer(suivi, ts)
+        if suivi.signale is None and len(suivi.connexions) >= self.seuil:
+            suivi.signale = ts
+        self._elaguer_recentes(ts)
+
+    def ingerer_capture(self, chemin, port=None):
+        """Événements de connexion / clôture du port CI extraits d'une capture pcap/pcapng."""
+        from analyse_handshake import AnalyseurHandshake
+        analyseur = AnalyseurHandshake(port, rappel=self.evenement)
+        analyseur.analyser_fichier(chemin)
+        return analyseur.paquets_ci
+
+    # Fenêtres glissantes
+
+    def _elaguer(self, suivi, ts):
+        limite = ts - self.fenetre
+        for file in (suivi.connexions, suivi.deconnexions):
+            while file and file[0] < limite:
+                file.popleft()
+        if suivi.signale is not None and len(suivi.connexions) < self.seuil:
+            suivi.signale = None
+
+    def _elaguer_recentes(self, ts):
+        limite = ts - self.fenetre_tempete
+        recentes, recents = self._recentes, self._recents
+        while recentes and recentes[0][0] < limite:
+            moniteur = recentes.popleft()[1]
+            recents[moniteur] -= 1
+            if not recents[moniteur]:
+                del recents[moniteur]
+        if len(recents) >= self.seuil_tempete:
+            if self.debut_tempete is None:
+                self.debut_tempete = ts
+                self.tempetes += 1
+        else:
+            self.debut_tempete = None
+
+    # Restitution
+
+    def etat(self, horodatage=None):
+        """Taux par moniteur actif dans la fenêtre, moniteurs instables et tempête en cours."""
+        ts = horodatage if horodatage is not None else (
+            self.dernier_ts if self.precedentes is None else time.time())
+        moniteurs = []
+        if ts is not None:
+            self._elaguer_recentes(ts)
+            for moniteur in list(self.moniteurs):
+                suivi = self.moniteurs[moniteur]
+                self._elaguer(suivi, ts)
+                if not suivi.connexions and not suivi.deconnexions:
+                    # Moniteur stable : plus rien à suivre dans la fenêtre
+                    del self.moniteurs[moniteur]
+                    continue
+                moniteurs.append({
+                    "moniteur": moniteur if isinstance(moniteur, str) else adresse_moniteur(moniteur),
+                    "connexions": len(suivi.connexions),
+                    "deconnexions": len(suivi.deconnexions),
+                    "connexions_par_min": round(60 * len(suivi.connexions) / self.fenetre, 2),
+                    "total_connexions": suivi.total_connexions,
+                    "total_deconnexions": suivi.total_deconnexions,
+                    "instable": suivi.signale is not None,
+                    "instable_depuis": suivi.signale,
+                })
+        moniteurs.sort(key=lambda m: (m["connexions"], m["deconnexions"]), reverse=True)
+        connexions = sum(m["connexions"] for m in moniteurs)
+        return {
+            "fenetre_s": self.fenetre,
+            "seuil": self.seuil,
+            "instantanes": self.instantanes,
+            "evenements": self.evenements,
+            "connexions_actives": None if self.precedentes is None else len(self.precedentes),
+            "connexions_fenetre": connexions,
+            "deconnexions_fenetre": sum(m["deconnexions"] for m in moniteurs),
+            "connexions_par_min": round(60 * connexions / self.fenetre, 2),
+            "moniteurs_recents": len(self._recents),
+            "tempete": self.debut_tempete is not None,
+            "tempete_depuis": self.debut_tempete,
+            "tempetes": self.tempetes,
+            "moniteurs": moniteurs,
+            "instables": [m["moniteur"] for m in moniteurs if m["instable"]],
+        }
+
+
+def evaluer_reponses(etat, ip_moniteur=None):
+    """Réponse q_reconnexions (étape 5) : moniteur ciblé instable, ou n'importe lequel sans IP ciblée."""
+    if ip_moniteur:
+        ligne = next((m for m in etat["moniteurs"] if m["moniteur"] == ip_moniteur), None)
+        if ligne is None and not etat["evenements"]:
+            return {}
+        return {"q_reconnexions": "Oui" if ligne is not None and ligne["instable"] else "Non"}
+    if not etat["evenements"] and not etat["instantanes"]:
+        return {}
+    return {"q_reconnexions": "Oui" if etat["instables"] or etat["tempete"] else "Non"}
+
+
+def enregistrer_dans_donnees(etat, donnees_collectees, ip_moniteur=None):
+    """Reporte les taux de reconnexion dans donnees_collectees (moniteur ciblé ou parc)."""
+    donnees_collectees['Reconnexions 24005 - fenêtre'] = f"{etat['fenetre_s']:g} s"
+    if ip_moniteur:
+        ligne = next((m for m in etat["moniteurs"] if m["moniteur"] == ip_moniteur), None)
+        donnees_collectees['Reconnexions 24005'] = (
+            f"{ligne['connexions']} connexion(s), {ligne['deconnexions']} déconnexion(s)" if ligne else "aucune"
+        )
+    donnees_collectees['Reconnexions 24005 - moniteurs instables'] = ", ".join(etat["instables"]) or "aucun"
+    donnees_collectees['Reconnexions 24005 - connexions/min'] = etat["connexions_par_min"]
+    if etat["tempetes"]:
+        donnees_collectees['Reconnexions 24005 - tempêtes'] = etat["tempetes"]
+
+
+def _afficher(etat):
+    print(f"{time.strftime('%H:%M:%S')} {etat['connexions_actives'] if etat['connexions_actives'] is not None else '-'} "
+          f"connexions  {etat['connexions_par_min']} connexions/min  "
+          f"{len(etat['instables'])} instable(s){'  🌩️ TEMPÊTE' if etat['tempete'] else ''}")
+    for m in etat["moniteurs"]:
+        if m["instable"]:
+            print(f"   ⚠️  {m['moniteur']:<16} {m['connexions']} connexions / {m['deconnexions']} déconnexions "
+                  f"en {etat['fenetre_s']:g} s")
+
+
+def main(argv=None):
+    """Point d'entrée : suivi des reconnexions sur la centrale, ou analyse d'une capture."""
+    parser = argparse.ArgumentParser(description="Moniteurs qui se reconnectent en boucle sur le port CI")
+    parser.add_argument("--port", type=int, default=GuideDiagnosticCI().get_ci_port())
+    parser.add_argument("--capture", help="Capture pcap/pcapng à analyser au lieu de la table des sockets")
+    parser.add_argument("--intervalle", type=float, default=1.0, help="Période des instantanés (s)")
+    parser.add_argument("--duree", type=float, help="Durée du suivi (s) ; illimitée par défaut")
+    parser.add_argument("--fenetre", type=float, default=FENETRE_DEFAUT, help="Fenêtre glissante (s)")
+    parser.add_argument("--seuil", type=int, default=SEUIL_DEFAUT, help="Connexions dans la fenêtre pour signaler un moniteur")
+    parser.add_argument("--seuil-tempete", type=int, default=SEUIL_TEMPETE_DEFAUT,
+                        help=f"Moniteurs reconnectés en {FENETRE_TEMPETE_DEFAUT:g} s pour signaler une tempête")
+    args = parser.parse_args(argv)
+
+    detecteur = DetecteurReconnexions(args.fenetre, args.seuil, seuil_tempete=args.seuil_tempete)
+    if args.capture:
+        detecteur.ingerer_capture(args.capture, args.port)
+        etat = detecteur.etat()
+        print(f"📼 {detecteur.evenements} connexions/déconnexions dans {args.capture}, {detecteur.tempetes} tempête(s)")
+        _afficher(etat)
+        return 1 if etat["instables"] else 0
+
+    from table_sockets import TableSockets
+    table = TableSockets(args.port)
+    fin = time.monotonic() + args.duree if args.duree else None
+    prochain = time.monotonic()
+    try:
+        while fin is None or prochain < fin:
+            detecteur.observer(table.connexions())
+            if detecteur.instantanes > 1:
+                _afficher(detecteur.etat())
+            prochain += args.intervalle
+            time.sleep(max(0.0, prochain - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    return 1 if detecteur.etat()["instables"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scanner asynchrone du port CI (24005) sur un parc de moniteurs
+Connexions TCP concurrentes avec plafond de concurrence et timeout par hôte
+"""
+
+import asyncio
+import ipaddress
+import socket
+import time
+
+from diagnostic_ci import GuideDiagnosticCI
+
+ETAT_OUVERT = "ouvert"
+ETAT_REFUSE = "refusé"
+ETAT_TIMEOUT = "timeout"
+ETAT_ERREUR = "erreur"
+
+CONCURRENCE_DEFAUT = 2000
+TIMEOUT_DEFAUT = 1.0
+
+
+def _limite_descripteurs(concurrence):
+    """Borne la concurrence au nombre de descripteurs de fichiers disponibles."""
+    try:
+        import resource
+    except ImportError:
+        return concurrence
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < concurrence + 64:
+        cible = concurrence + 64 if hard == resource.RLIM_INFINITY else min(hard, concurrence + 64)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (cible, hard))
+            soft = cible
+        except (ValueError, OSError):
+            pass
+    return max(1, min(concurrence, soft - 64))
+
+
+def iterer_cibles(cibles, invalides=None):
+    """Développe une liste d'IP et de plages CIDR en adresses individuelles (générateur).
+
+    Toutes les entrées sont lues avant la première adresse : une entrée invalide est ajoutée à
+    `invalides` (liste fournie) et ignorée, sinon ValueError est levée avant tout sondage.
+    """
+    if isinstance(cibles, str):
+        cibles = cibles.replace(",", " ").split()
+    entrees, erreurs = [], []
+    for cible in cibles:
+        cible = str(cible).strip()
+        if not cible:
+            continue
+        try:
+            entrees.append(ipaddress.ip_network(cible, strict=False) if "/" in cible else ipaddress.ip_address(cible))
+        except ValueError:
+            erreurs.append(cible)
+    if erreurs:
+        if invalides is None:
+            raise ValueError(f"cible(s) invalide(s) : {', '.join(erreurs)}")
+        invalides.extend(erreurs)
+    deja_vus = set()
+    for entree in entrees:
+        if isinstance(entree, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            hotes = entree.hosts() if entree.num_addresses > 2 else iter(entree)
+        else:
+            hotes = (entree,)
+        for hote in hotes:
+            ip = str(hote)
+            if ip not in deja_vus:
+                deja_vus.add(ip)
+                yield ip
+
+
+class ScannerPortCI:
+    """Scanner TCP connect du port CI, construit sur GuideDiagnosticCI."""
+
+    def __init__(self, guide=None, concurrence=CONCURRENCE_DEFAUT, timeout=TIMEOUT_DEFAUT):
+        self.guide = guide if guide is not None else GuideDiagnosticCI()
+        self.port = self.guide.get_ci_port()
+        self.concurrence = concurrence
+        self.timeout = timeout
+
+    async def tester_hote(self, ip):
+        """Tente une connexion TCP sur le port CI et retourne le résultat de l'hôte."""
+        loop = asyncio.get_running_loop()
+        famille = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        sock = None
+        debut = time.perf_counter()
+        try:
+            # Création dans le try : EMFILE/ENFILE devient une erreur de l'hôte, pas du scan entier
+            sock = socket.socket(famille, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, self.port)), self.timeout)
+            etat, detail = ETAT_OUVERT, ""
+        except ConnectionRefusedError:
+            etat, detail = ETAT_REFUSE, "RST reçu"
+        except asyncio.TimeoutError:
+            etat, detail = ETAT_TIMEOUT, f"pas de réponse en {self.timeout}s"
+        except OSError as e:
+            etat, detail = ETAT_ERREUR, e.strerror or str(e)
+        finally:
+            if sock is not None:
+                sock.close()
+        latence = (time.perf_counter() - debut) * 1000
+        return {
+            "ip": ip,
+            "port": self.port,
+            "etat": etat,
+            "latence_ms": round(latence, 3) if etat in (ETAT_OUVERT, ETAT_REFUSE) else None,
+            "detail": detail,
+        }
+
+    async def scanner_async(self, cibles, progression=None):
+        """Scanne toutes les cibles avec un pool de workers de taille fixe."""
+        invalides = []
+        hotes = iterer_cibles(cibles, invalides)
+        resultats = []
+        concurrence = _limite_descripteurs(self.concurrence)
+
+        async def worker():
+            for ip in hotes:
+                resultats.append(await self.tester_hote(ip))
+                if progression is not None:
+                    progression(len(resultats))
+
+        await asyncio.gather(*(worker() for _ in range(concurrence)))
+        resultats.sort(key=lambda r: (ipaddress.ip_address(r["ip"]).version, ipaddress.ip_address(r["ip"])))
+        # Entrées invalides signalées comme verifier_ip le fait pour le lot, sans interrompre le scan
+        resultats += [{"ip": cible, "port": self.port, "etat": ETAT_ERREUR, "latence_ms": None,
+                       "detail": "adresse ou plage invalide"} for cible in invalides]
+        return resultats
+
+    def scanner(self, cibles, progression=None):
+        """Version synchrone de scanner_async, journalisée dans le guide."""
+        debut = time.perf_counter()
+        resultats = asyncio.run(self.scanner_async(cibles, progression))
+        resume = resumer_scan(resultats)
+        resume["duree_s"] = round(time.perf_counter() - debut, 2)
+        self.guide.log_etape(
+            f"Scan port {self.port}",
+            f"{resume['total']} hôtes - {resume[ETAT_OUVERT]} ouverts, "
+            f"{resume[ETAT_REFUSE]} refusés, {resume[ETAT_TIMEOUT]} timeouts",
+            "Vérifier firewall/ACL et service CI" if resume[ETAT_OUVERT] < resume["total"] else ""
+        )
+        return resultats
+
+
+def resumer_scan(resultats):
+    """Compte les résultats par état et calcule la latence médiane des connexions abouties."""
+    resume = {"total": len(resultats), ETAT_OUVERT: 0, ETAT_REFUSE: 0, ETAT_TIMEOUT: 0, ETAT_ERREUR: 0}
+    latences = []
+    for r in resultats:
+        resume[r["etat"]] += 1
+        if r["etat"] == ETAT_OUVERT:
+            latences.append(r["latence_ms"])
+    latences.sort()
+    resume["latence_mediane_ms"] = latences[len(latences) // 2] if latences else None
+    return resume
+
+
+def enregistrer_dans_donnees(resultats, donnees_collectees, max_details=10):
+    """Reporte le résumé d'un scan dans le dictionnaire donnees_collectees de l'application."""
+    resume = resumer_scan(resultats)
+    donnees_collectees['Scan 24005 - hôtes'] = resume["total"]
+    donnees_collectees['Scan 24005 - ouverts'] = resume[ETAT_OUVERT]
+    donnees_collectees['Scan 24005 - refusés'] = resume[ETAT_REFUSE]
+    donnees_collectees['Scan 24005 - timeouts'] = resume[ETAT_TIMEOUT]
+    if resume[ETAT_ERREUR]:
+        donnees_collectees['Scan 24005 - erreurs'] = resume[ETAT_ERREUR]
+    if resume["latence_mediane_ms"] is not None:
+        donnees_collectees['Latence connexion 24005 (ms)'] = resume["latence_mediane_ms"]
+
+    en_echec = [r["ip"] for r in resultats if r["etat"] != ETAT_OUVERT]
+    if en_echec:
+        apercu = ", ".join(en_echec[:max_details])
+        if len(en_echec) > max_details:
+            apercu += f" (+{len(en_echec) - max_details})"
+        donnees_collectees['Scan 24005 - en échec'] = apercu
+    else:
+        donnees_collectees.pop('Scan 24005 - en échec', None)
+    return resume
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulateur local de centrale CI (port 24005) avec injection de défauts
+Serveur asyncio pour tester scanners et analyseurs sans centrale réelle
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+from scanner_ci import _limite_descripteurs
+
+PORT_DEFAUT = 24005
+
+# État du point d'écoute (vu depuis le moniteur lors du connect)
+ETAT_OUVERT = "ouvert"          # handshake TCP accepté
+ETAT_FERME = "ferme"            # pas de socket en écoute : RST du noyau (connexion refusée)
+ETAT_TROU_NOIR = "trou_noir"    # file d'acceptation saturée, jamais vidée : SYN ignorés (timeout)
+
+# Défauts injectés après le handshake, tirés au hasard par connexion
+DEFAUT_RST = "rst"              # fermeture immédiate par RST
+DEFAUT_LENT = "lent"            # acceptation applicative retardée (bannière et réponses après `delai_lent`)
+DEFAUT_SILENCE = "silence"      # handshake puis plus rien : données lues et ignorées
+DEFAUT_REJET = "rejet"          # rejet applicatif puis fermeture
+DEFAUTS = (DEFAUT_RST, DEFAUT_LENT, DEFAUT_SILENCE, DEFAUT_REJET)
+NOMINAL = "nominal"
+
+# Protocole simulé, orienté ligne : bannière à l'acceptation, un accusé par ligne reçue
+BANNIERE = b"CI-SIM 1.0 PRET\n"
+ACCUSE = b"ACK %d\n"
+REJET = b"REJET %s\n"
+
+
+class _Connexion(asyncio.Protocol):
+    """Une connexion de moniteur simulée ; le comportement dépend du défaut tiré à l'acceptation."""
+
+    __slots__ = ("simulateur", "transport", "defaut", "pret", "lignes", "tampon")
+
+    def __init__(self, simulateur):
+        self.simulateur = simulateur
+        self.transport = None
+        self.defaut = NOMINAL
+        self.pret = False
+        self.lignes = 0
+        self.tampon = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        simulateur = self.simulateur
+        self.defaut = simulateur.tirer_defaut()
+        simulateur.ouvrir(self.defaut)
+        if self.defaut == DEFAUT_RST:
+            # SO_LINGER à 0 : close() émet un RST au lieu d'un FIN
+            transport.get_extra_info("socket").setsockopt(
+                socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            transport.abort()
+        elif self.defaut == DEFAUT_REJET:
+            transport.write(REJET % simulateur.motif_rejet.encode())
+            transport.close()
+        elif self.defaut == DEFAUT_LENT:
+            asyncio.get_running_loop().call_later(simulateur.delai_lent, self._accepter)
+        elif self.defaut == NOMINAL:
+            self._accepter()
+
+    def _accepter(self):
+        if self.transport.is_closing():
+            return
+        self.pret = True
+        if self.simulateur.banniere:
+            self.transport.write(self.simulateur.banniere)
+        if self.lignes:
+            self._accuser()
+
+    def data_received(self, donnees):
+        self.simulateur.octets_recus += len(donnees)
+        if self.defaut == DEFAUT_SILENCE:
+            return
+        self.tampon += donnees
+        if b"\n" not in self.tampon:
+            return
+        *completes, self.tampon = self.tampon.split(b"\n")
+        self.lignes += len(completes)
+        if self.pret:
+            self._accuser()
+
+    def _accuser(self):
+        self.transport.write(ACCUSE % self.lignes)
+        self.simulateur.messages += 1
+
+    def connection_lost(self, exc):
+        self.simulateur.fermer()
+
+
+class SimulateurCentrale:
+    """Centrale CI simulée : point d'écoute TCP et tirage des défauts par connexion.
+
+    defauts : proportions par défaut injecté, ex. {"rst": 0.05, "silence": 0.1} ;
+    le reste des connexions est nominal. Modifiable à chaud via configurer().
+    """
+
+    def __init__(self, hote="127.0.0.1", port=PORT_DEFAUT, etat=ETAT_OUVERT, defauts=None,
+                 delai_lent=2.0, banniere=BANNIERE, motif_rejet="authentification", graine=None,
+                 connexions_max=65536):
+        self.hote = hote
+        self.port = port
+        self.banniere = banniere
+        self.delai_lent = delai_lent
+        self.motif_rejet = motif_rejet
+        self.connexions_max = connexions_max
+        self.etat = None
+        self._etat_demande = etat
+        self._hasard = random.Random(graine)
+        self._seuils = ()
+        self.configurer(defauts or {})
+        self._serveur = None
+        self._trou_noir = None
+        self._boucle = None
+        self._thread = None
+        self._arret = None
+        self.reinitialiser_statistiques()
+
+    def configurer(self, defauts):
+        """Fixe les proportions de défauts injectés (cumul <= 1)."""
+        inconnus = set(defauts) - set(DEFAUTS)
+        if inconnus:
+            raise ValueError(f"Défauts inconnus : {', '.join(sorted(inconnus))} (attendu : {', '.join(DEFAUTS)})")
+        cumul, seuils = 0.0, []
+        for defaut in DEFAUTS:
+            if defauts.get(defaut):
+                cumul += defauts[defaut]
+                seuils.append((cumul, defaut))
+        if cumul > 1:
+            raise ValueError(f"Somme des proportions de défauts > 1 ({cumul})")
+        self._seuils = tuple(seuils)
+
+    def tirer_defaut(self):
+        tirage = self._hasard.random()
+        for seuil, defaut in self._seuils:
+            if tirage < seuil:
+                return defaut
+        return NOMINAL
+
+    def reinitialiser_statistiques(self):
+        self.acceptees = 0
+        self.actives = 0
+        self.actives_max = 0
+        self.messages = 0
+        self.octets_recus = 0
+        self.par_defaut = dict.fromkeys((NOMINAL,) + DEFAUTS, 0)
+
+    def ouvrir(self, defaut):
+        self.acceptees += 1
+        self.actives += 1
+        self.par_defaut[defaut] += 1
+        if self.actives > self.actives_max:
+            self.actives_max = self.actives
+
+    def fermer(self):
+        self.actives -= 1
+
+    def statistiques(self):
+        """Compteurs depuis le démarrage (ou la dernière réinitialisation)."""
+        return {
+            "etat": self.etat,
+            "acceptees": self.acceptees,
+            "actives": self.actives,
+            "actives_max": self.actives_max,
+            "messages": self.messages,
+            "octets_recus": self.octets_recus,
+            **{f"connexions_{defaut}": n for defaut, n in self.par_defaut.items()},
+        }
+
+    async def demarrer(self):
+        """Ouvre le point d'écoute selon l'état demandé."""
+        _limite_descripteurs(self.connexions_max)
+        await self.changer_etat(self._etat_demande)
+        return self
+
+    async def changer_etat(self, etat):
+        """Bascule le point d'écoute (ouvert, fermé, trou noir) sans redémarrer le simulateur."""
+        if etat not in (ETAT_OUVERT, ETAT_FERME, ETAT_TROU_NOIR):
+            raise ValueError(f"État inconnu : {etat}")
+        if etat == self.etat:
+            return
+        await self._liberer()
+        if etat == ETAT_OUVERT:
+            self._serveur = await asyncio.get_running_loop().create_server(
+                lambda: _Connexion(self), self.hote, self.port,
+                backlog=min(self.connexions_max, 65535), reuse_address=True)
+            if not self.port:
+                self.port = self._serveur.sockets[0].getsockname()[1]
+        elif etat == ETAT_TROU_NOIR:
+            # File d'attente minimale jamais acceptée, remplie par nos propres connexions :
+            # le noyau ignore ensuite les SYN des moniteurs (timeout côté client)
+            famille = socket.AF_INET6 if ":" in self.hote else socket.AF_INET
+            ecoute = socket.socket(famille, socket.SOCK_STREAM)
+            ecoute.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            ecoute.bind((self.hote, self.port))
+            ecoute.listen(0)
+            self.port = ecoute.getsockname()[1]
+            self._trou_noir = [ecoute]
+            cible = {"0.0.0.0": "127.0.0.1", "::": "::1", "": "127.0.0.1"}.get(self.hote, self.hote)
+            for _ in range(2):
+                remplissage = socket.socket(famille, socket.SOCK_STREAM)
+                remplissage.setblocking(False)
+                remplissage.connect_ex((cible, self.port))
+                self._trou_noir.append(remplissage)
+            await asyncio.sleep(0.05)
+        self.etat = etat
+
+    async def _liberer(self):
+        if self._serveur is not None:
+            self._serveur.close()
+            await self._serveur.wait_closed()
+            self._serveur = None
+        if self._trou_noir is not None:
+            for sock in self._trou_noir:
+                sock.close()
+            self._trou_noir = None
+
+    async def arreter_async(self):
+        await self._liberer()
+        self.etat = None
+
+    async def servir(self, duree=None):
+        """Démarre et sert jusqu'à annulation (ou pendant `duree` secondes)."""
+        await self.demarrer()
+        try:
+            if duree is None:
+                await asyncio.Event().wait()
+            else:
+                await asyncio.sleep(duree)
+        finally:
+            await self.arreter_async()
+
+    # Exécution dans un thread : pour piloter le simulateur depuis un test ou un script synchrone
+
+    def lancer(self):
+        """Démarre le simulateur dans un thread dédié ; retourne une fois en écoute."""
+        pret = threading.Event()
+        erreurs = []
+
+        def executer():
+            self._boucle = asyncio.new_event_loop()
+            self._arret = asyncio.Event()
+            try:
+                self._boucle.run_until_complete(self.demarrer())
+            except OSError as e:
+                erreurs.append(e)
+                pret.set()
+                self._boucle.close()
+                return
+            pret.set()
+            self._boucle.run_until_complete(self._arret.wait())
+            self._boucle.run_until_complete(self.arreter_async())
+            self._boucle.close()
+
+        self._thread = threading.Thread(target=executer, name=f"simulateur-centrale-{self.port}", daemon=True)
+        self._thread.start()
+        pret.wait()
+        if erreurs:
+            raise erreurs[0]
+        return self
+
+    def basculer(self, etat):
+        """Version synchrone de changer_etat pour un simulateur lancé en thread."""
+        asyncio.run_coroutine_threadsafe(self.changer_etat(etat), self._boucle).result()
+
+    def arreter(self):
+        if self._thread is not None:
+            self._boucle.call_soon_threadsafe(self._arret.set)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.lancer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+
+def main(argv=None):
+    """Point d'entrée : centrale simulée en avant-plan, statistiques périodiques."""
+    parser = argparse.ArgumentParser(description="Centrale CI simulée avec injection de défauts")
+    parser.add_argument("--hote", default="127.0.0.1", help="Adresse d'écoute")
+    parser.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parser.add_argument("--etat", choices=(ETAT_OUVERT, ETAT_FERME, ETAT_TROU_NOIR), default=ETAT_OUVERT,
+                        help="ferme : connexions refusées (RST) ; trou_noir : SYN sans réponse")
+    for defaut, aide in ((DEFAUT_RST, "RST juste après le handshake"),
+                         (DEFAUT_LENT, "acceptation applicative retardée"),
+                         (DEFAUT_SILENCE, "handshake puis silence"),
+                         (DEFAUT_REJET, "rejet applicatif")):
+        parser.add_argument(f"--{defaut}", type=float, default=0.0, metavar="PROPORTION", help=f"Part des connexions : {aide}")
+    parser.add_argument("--delai-lent", type=float, default=2.0, help="Retard (s) des connexions lentes")
+    parser.add_argument("--sans-banniere", action="store_true", help="Attendre le moniteur au lieu d'envoyer la bannière")
+    parser.add_argument("--graine", type=int, help="Graine du tirage des défauts (reproductible)")
+    parser.add_argument("--duree", type=float, help="Durée (s) ; infinie par défaut")
+    args = parser.parse_args(argv)
+
+    simulateur = SimulateurCentrale(
+        args.hote, args.port, args.etat,
+        {defaut: getattr(args, defaut) for defaut in DEFAUTS},
+        args.delai_lent, None if args.sans_banniere else BANNIERE, graine=args.graine,
+    )
+
+    async def executer():
+        await simulateur.demarrer()
+        print(f"🎯 Centrale simulée {simulateur.hote}:{simulateur.port} ({simulateur.etat})")
+        fin = time.monotonic() + args.duree if args.duree else None
+        try:
+            while fin is None or time.monotonic() < fin:
+                await asyncio.sleep(min(5, fin - time.monotonic()) if fin else 5)
+                stats = simulateur.statistiques()
+                print(f"{time.strftime('%H:%M:%S')} {stats['etat']} : {stats['actives']} actives "
+                      f"(max {stats['actives_max']}), {stats['acceptees']} acceptées, {stats['messages']} messages")
+        finally:
+            await simulateur.arreter_async()
+
+    try:
+        asyncio.run(executer())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sonde applicative du port CI : au-delà du handshake TCP, la centrale parle-t-elle ?
+Premier octet, octets échangés et réutilisation des connexions sur de nombreuses cibles
+"""
+
+import argparse
+import asyncio
+import errno
+import sys
+import time
+
+from diagnostic_ci import GuideDiagnosticCI
+from scanner_ci import ETAT_ERREUR, ETAT_REFUSE, ETAT_TIMEOUT
+
+ETAT_REPOND = "répond"
+ETAT_ACCEPTE = "accepte sans répondre"   # données envoyées, ni réponse ni fermeture dans le délai
+ETAT_SILENCE = "silence"                 # rien reçu dans le délai, rien envoyé
+ETAT_REJET = "rejet"
+ETAT_FERMEE = "fermée"                   # FIN ou RST juste après le handshake
+
+MARQUEURS_REJET = (b"rejet", b"reject", b"denied", b"refus", b"unauthorized")
+DELAI_COMPLEMENT = 0.05                  # collecte des octets qui suivent immédiatement le premier
+
+
+def decouper_cible(cible, port):
+    """'ip' ou 'ip:port' → (ip, port)."""
+    cible = cible.strip()
+    if cible.count(":") == 1:
+        ip, port_texte = cible.split(":")
+        return ip, int(port_texte)
+    return cible, port
+
+
+class SondeApplicative:
+    """Sonde TCP + applicative, avec un pool de connexions réutilisées par cible."""
+
+    def __init__(self, guide=None, delai=3.0, timeout=2.0, message=None, concurrence=500, reutiliser=True):
+        self.guide = guide if guide is not None else GuideDiagnosticCI()
+        self.port = self.guide.get_ci_port()
+        self.delai = delai
+        self.timeout = timeout
+        self.message = message
+        self.concurrence = concurrence
+        # Sans message à envoyer, une connexion réutilisée n'aurait rien à mesurer
+        self.reutiliser = reutiliser and bool(message)
+        self._pool = {}
+
+    async def _connecter(self, ip, port):
+        cle = (ip, port)
+        connexion = self._pool.pop(cle, None)
+        if connexion is not None:
+            lecteur, ecrivain = connexion
+            if not ecrivain.is_closing() and not lecteur.at_eof():
+                return lecteur, ecrivain, None
+            ecrivain.close()
+        debut = time.perf_counter()
+        lecteur, ecrivain = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+        return lecteur, ecrivain, (time.perf_counter() - debut) * 1000
+
+    async def sonder_async(self, cible, port=None):
+        """Une mesure sur une cible ('ip' ou 'ip:port')."""
+        ip, port = decouper_cible(cible, port or self.port)
+        resultat = {"cible": ip, "port": port, "etat": None, "connexion_ms": None, "ttfb_ms": None,
+                    "octets_envoyes": 0, "octets_recus": 0, "reutilisee": False, "detail": ""}
+        try:
+            lecteur, ecrivain, connexion_ms = await self._connecter(ip, port)
+        except ConnectionRefusedError:
+            resultat.update(etat=ETAT_REFUSE, detail="RST reçu")
+            return resultat
+        except asyncio.TimeoutError:
+            resultat.update(etat=ETAT_TIMEOUT, detail=f"pas de SYN-ACK en {self.timeout}s")
+            return resultat
+        except OSError as e:
+            if e.errno == errno.ECONNRESET:
+                resultat.update(etat=ETAT_FERMEE, detail="RST juste après le handshake")
+            else:
+                resultat.update(etat=ETAT_ERREUR, detail=e.strerror or str(e))
+            return resultat
+        resultat["connexion_ms"] = None if connexion_ms is None else round(connexion_ms, 3)
+        resultat["reutilisee"] = connexion_ms is None
+
+        debut = time.perf_counter()
+        garder = False
+        try:
+            if self.message:
+                ecrivain.write(self.message)
+                await ecrivain.drain()
+                resultat["octets_envoyes"] = len(self.message)
+            recu = await asyncio.wait_for(lecteur.read(65536), self.delai)
+            if not recu:
+                resultat.update(etat=ETAT_FERMEE, detail="FIN de la centrale")
+            else:
+                resultat["ttfb_ms"] = round((time.perf_counter() - debut) * 1000, 3)
+                try:
+                    while True:
+                        suite = await asyncio.wait_for(lecteur.read(65536), DELAI_COMPLEMENT)
+                        if not suite:
+                            break
+                        recu += suite
+                except (asyncio.TimeoutError, ConnectionResetError):
+                    pass
+                resultat["octets_recus"] = len(recu)
+                debut_reponse = recu[:64].lower()
+                if any(marqueur in debut_reponse for marqueur in MARQUEURS_REJET):
+                    resultat.update(etat=ETAT_REJET, detail=recu.split(b"\n")[0][:80].decode(errors="replace"))
+                else:
+                    resultat["etat"] = ETAT_REPOND
+                    garder = True
+        except asyncio.TimeoutError:
+            resultat["etat"] = ETAT_ACCEPTE if self.message else ETAT_SILENCE
+            resultat["detail"] = f"aucune donnée en {self.delai}s"
+            garder = bool(self.message)
+        except (ConnectionResetError, BrokenPipeError):
+            resultat.update(etat=ETAT_FERMEE, detail="RST de la centrale")
+        except OSError as e:
+            resultat.update(etat=ETAT_ERREUR, detail=e.strerror or str(e))
+
+        if garder and self.reutiliser:
+            self._pool[(ip, port)] = (lecteur, ecrivain)
+        else:
+            ecrivain.close()
+        return resultat
+
+    async def sonder_tout_async(self, cibles, repetitions=1):
+        """Sonde toutes les cibles ; les mesures d'une même cible sont séquentielles (connexion réutilisée)."""
+        if isinstance(cibles, str):
+            cibles = cibles.replace(",", " ").split()
+        par_cible = {}
+        for cible in cibles:
+            cle = decouper_cible(cible, self.port)
+            par_cible[cle] = par_cible.get(cle, 0) + repetitions
+        limite = asyncio.Semaphore(self.concurrence)
+        resultats = []
+
+        async def sonder_cible(ip, port, n):
+            async with limite:
+                for _ in range(n):
+                    resultats.append(await self.sonder_async(ip, port))
+
+        await asyncio.gather(*(sonder_cible(ip, port, n) for (ip, port), n in par_cible.items()))
+        return resultats
+
+    def fermer(self):
+        for _, ecrivain in self._pool.values():
+            ecrivain.close()
+        self._pool.clear()
+
+    def sonder(self, cibles, repetitions=1):
+        """Version synchrone de sonder_tout_async, journalisée dans le guide."""
+        async def executer():
+            try:
+                return await self.sonder_tout_async(cibles, repetitions)
+            finally:
+                self.fermer()
+
+        resultats = asyncio.run(executer())
+        resume = resumer_sondes(resultats)
+        self.guide.log_etape(
+            f"Sonde applicative port {self.port}",
+            f"{resume['total']} mesures - {resume[ETAT_REPOND]} réponses, premier octet p50 {resume['ttfb_mediane_ms']} ms",
+            "" if resume[ETAT_REPOND] == resume["total"] else "Vérifier service CI, authentification et logs applicatifs"
+        )
+        return resultats
+
+
+def resumer_sondes(resultats):
+    """Compte les mesures par état ; premier octet médian des réponses."""
+    resume = dict.fromkeys((ETAT_REPOND, ETAT_ACCEPTE, ETAT_SILENCE, ETAT_REJET, ETAT_FERMEE,
+                            ETAT_REFUSE, ETAT_TIMEOUT, ETAT_ERREUR), 0)
+    resume["total"] = len(resultats)
+    ttfb = []
+    for r in resultats:
+        resume[r["etat"]] += 1
+        if r["ttfb_ms"] is not None:
+            ttfb.append(r["ttfb_ms"])
+    ttfb.sort()
+    resume["ttfb_mediane_ms"] = ttfb[len(ttfb) // 2] if ttfb else None
+    resume["reutilisees"] = sum(1 for r in resultats if r["reutilisee"])
+    return resume
+
+
+def evaluer_reponses(resultats, ip_centrale=None):
+    """Réponses q_comm_app (étape 5) et q_service_repond (étape 6) pour la centrale sondée."""
+    if ip_centrale:
+        resultats = [r for r in resultats if r["cible"] == ip_centrale]
+    # Sans handshake, la question applicative ne se pose pas encore ; un silence sans message envoyé ne prouve rien
+    etats = {r["etat"] for r in resultats} - {ETAT_REFUSE, ETAT_TIMEOUT, ETAT_ERREUR, ETAT_SILENCE}
+    if not etats:
+        return {}
+    if etats & {ETAT_REJET, ETAT_FERMEE}:
+        return {"q_comm_app": "Non", "q_service_repond": "Non"}
+    # Données acceptées sans réponse : la session applicative tient, la réponse du service reste à voir
+    reponses = {"q_comm_app": "Oui"}
+    if etats == {ETAT_REPOND}:
+        reponses["q_service_repond"] = "Oui"
+    return reponses
+
+
+def enregistrer_dans_donnees(resultats, donnees_collectees):
+    """Reporte le résumé de la sonde applicative dans donnees_collectees."""
+    resume = resumer_sondes(resultats)
+    etats = [etat for etat in resume if etat not in ("total", "ttfb_mediane_ms", "reutilisees") and resume[etat]]
+    donnees_collectees['Sonde applicative 24005'] = ", ".join(f"{resume[etat]} {etat}" for etat in etats)
+    if resume["ttfb_mediane_ms"] is not None:
+        donnees_collectees['Premier octet 24005 (ms)'] = resume["ttfb_mediane_ms"]
+    donnees_collectees['Octets échangés (envoyés/reçus)'] = (
+        f"{sum(r['octets_envoyes'] for r in resultats)} / {sum(r['octets_recus'] for r in resultats)}"
+    )
+    return resume
+
+
+def main(argv=None):
+    """Point d'entrée : sonde applicative en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Sonde applicative du port CI (au-delà du handshake TCP)")
+    parser.add_argument("cibles", nargs="+", help="IP ou ip:port des centrales / moniteurs")
+    parser.add_argument("--message", help="Message envoyé après connexion (\\n ajouté)")
+    parser.add_argument("--delai", type=float, default=3.0, help="Délai (s) d'attente de données applicatives")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout de connexion TCP (s)")
+    parser.add_argument("--repetitions", type=int, default=1, help="Mesures par cible (connexion réutilisée)")
+    parser.add_argument("--concurrence", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    sonde = SondeApplicative(delai=args.delai, timeout=args.timeout, concurrence=args.concurrence,
+                             message=args.message.encode() + b"\n" if args.message else None)
+    resultats = sonde.sonder(args.cibles, args.repetitions)
+    for r in resultats:
+        print(f"{r['cible']}:{r['port']:<6} {r['etat']:<22} premier octet {r['ttfb_ms']} ms  "
+              f"{r['octets_envoyes']}/{r['octets_recus']} o{'  (réutilisée)' if r['reutilisee'] else ''}  {r['detail']}")
+    resume = resumer_sondes(resultats)
+    print(f"📊 {resume['total']} mesures, {resume[ETAT_REPOND]} réponses, {resume['reutilisees']} connexions réutilisées")
+    return 0 if resume[ETAT_REPOND] == resume["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
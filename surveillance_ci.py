@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Surveillance continue du port CI (24005) sur tout le parc, pour le suivi de stabilité sur 24-48h
+Ordonnanceur avec gigue et recul exponentiel, agrégats glissants en mémoire fixe, métriques Prometheus
+"""
+
+import argparse
+import asyncio
+import heapq
+import random
+import sys
+import time
+
+from diagnostic_ci import GuideDiagnosticCI
+from echantillonneur_latence import StatistiquesLatence, percentile
+from scanner_ci import ETAT_ERREUR, ETAT_OUVERT, ETAT_REFUSE, ScannerPortCI, _limite_descripteurs, iterer_cibles
+
+ROLE_MONITEUR = "moniteur"
+ROLE_CENTRALE = "centrale"
+
+INTERVALLE_DEFAUT = 10.0
+GIGUE_DEFAUT = 0.1            # ±10 % sur chaque intervalle
+INTERVALLE_MAX_DEFAUT = 300.0  # plafond du recul exponentiel après échecs consécutifs
+FENETRE_DEFAUT = 360          # échantillons par cible (1 h à 10 s)
+CAPACITE_HISTORIQUE = 10000   # changements d'état gardés en mémoire par le guide
+CACHE_METRIQUES_S = 2.0
+LOT_RENDU = 250              # cibles calculées entre deux retours à la boucle
+
+ACTIONS = {
+    ROLE_MONITEUR: "Lancer le diagnostic de ce moniteur (étapes 1 à 5)",
+    ROLE_CENTRALE: "Vérifier le service CI de la centrale (étape 6)",
+}
+
+TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Cible:
+    """État d'une cible surveillée ; taille fixe quelle que soit la durée de surveillance."""
+
+    __slots__ = ("ip", "role", "etiquettes", "stats", "echecs_consecutifs", "joignable", "changement", "derniere_ms",
+                 "somme_ms", "recues")
+
+    def __init__(self, ip, role, fenetre, centrale=None):
+        self.ip = ip
+        self.role = role
+        etiquettes = f'cible="{ip}",role="{role}"'
+        if centrale:
+            etiquettes += f',centrale="{centrale}"'
+        self.etiquettes = etiquettes
+        self.stats = StatistiquesLatence(ip, fenetre)
+        self.echecs_consecutifs = 0
+        self.joignable = None
+        self.changement = None
+        self.derniere_ms = None
+        # Totaux depuis le démarrage (somme et nombre du summary Prometheus, qui ne doivent jamais décroître)
+        self.somme_ms = 0.0
+        self.recues = 0
+
+
+def cibles_inventaire(moniteurs):
+    """(ip, rôle, centrale) : chaque moniteur, plus chaque centrale une seule fois."""
+    cibles, centrales = [], {}
+    for moniteur in moniteurs:
+        centrale = moniteur.get("ip_centrale") or None
+        if moniteur.get("ip_moniteur"):
+            cibles.append((moniteur["ip_moniteur"], ROLE_MONITEUR, centrale))
+        if centrale:
+            centrales[centrale] = None
+    return cibles + [(ip, ROLE_CENTRALE, None) for ip in centrales]
+
+
+class SurveillanceCI:
+    """Sondes périodiques TCP du port CI et agrégats glissants par cible, construits sur GuideDiagnosticCI."""
+
+    def __init__(self, cibles, guide=None, intervalle=INTERVALLE_DEFAUT, gigue=GIGUE_DEFAUT,
+                 intervalle_max=INTERVALLE_MAX_DEFAUT, timeout=1.0, fenetre=FENETRE_DEFAUT, concurrence=1000):
+        self.guide = guide if guide is not None else GuideDiagnosticCI(capacite_historique=CAPACITE_HISTORIQUE)
+        self.scanner = ScannerPortCI(self.guide, timeout=timeout)
+        self.intervalle = intervalle
+        self.gigue = gigue
+        self.intervalle_max = intervalle_max
+        self.concurrence = concurrence
+        self.cibles = [_Cible(ip, role, fenetre, centrale) for ip, role, centrale in cibles]
+        self.sondes = 0
+        self.en_vol = 0
+        self.retard_max_ms = 0.0
+        self.debut = None
+        self._tas = []
+        self._taches = set()   # sondes en cours : la boucle ne garde qu'une référence faible aux tâches
+        self._limite = None
+        self._arret = None
+        self._cache = (0.0, b"")
+
+    def _prochaine(self, cible, echeance, maintenant):
+        # Recul exponentiel tant que la cible échoue, gigue pour étaler les sondes
+        base = min(self.intervalle * 2 ** min(cible.echecs_consecutifs, 16), self.intervalle_max) \
+            if cible.echecs_consecutifs > 1 else self.intervalle
+        prochaine = echeance + base * (1 + random.uniform(-self.gigue, self.gigue))
+        return prochaine if prochaine > maintenant else maintenant + random.uniform(0, self.gigue * base)
+
+    async def _sonder(self, index, echeance):
+        cible = self.cibles[index]
+        self.en_vol += 1
+        try:
+            async with self._limite:
+                resultat = await self.scanner.tester_hote(cible.ip)
+        except Exception as e:
+            # Erreur inattendue de la sonde : comptée comme un échec
+            resultat = {"ip": cible.ip, "port": self.scanner.port, "etat": ETAT_ERREUR, "latence_ms": None, "detail": str(e)}
+        finally:
+            self.en_vol -= 1
+        try:
+            self.sondes += 1
+            # Un RST prouve que l'hôte répond (moniteur) ; pour une centrale, seul le port ouvert compte
+            joignable = resultat["etat"] == ETAT_OUVERT or (cible.role == ROLE_MONITEUR and resultat["etat"] == ETAT_REFUSE)
+            cible.derniere_ms = resultat["latence_ms"]
+            cible.stats.ajouter(resultat["latence_ms"] if joignable else None)
+            if joignable:
+                cible.somme_ms += resultat["latence_ms"]
+                cible.recues += 1
+            cible.echecs_consecutifs = 0 if joignable else cible.echecs_consecutifs + 1
+            if joignable != cible.joignable:
+                self._transition(cible, joignable, resultat)
+        finally:
+            # Replanifiée quoi qu'il arrive : une exception ne retire pas la cible de la surveillance
+            loop = asyncio.get_running_loop()
+            heapq.heappush(self._tas, (self._prochaine(cible, echeance, loop.time()), index))
+
+    def _transition(self, cible, joignable, resultat):
+        premiere = cible.joignable is None
+        cible.joignable = joignable
+        cible.changement = time.time()
+        if premiere and joignable:
+            return
+        etat = "joignable" if joignable else f"injoignable ({resultat['etat']})"
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {cible.role} {cible.ip} : {etat}")
+        # Historique non borné : les transitions d'une surveillance de plusieurs jours n'y ont pas leur place
+        if self.guide.journal is not None or self.guide.historique_parcours.capacite:
+            self.guide.log_etape(f"Surveillance {cible.role} {cible.ip}", etat,
+                                 "" if joignable else ACTIONS[cible.role])
+
+    async def _ordonnancer(self):
+        loop = asyncio.get_running_loop()
+        maintenant = loop.time()
+        # Premières sondes réparties sur un intervalle
+        self._tas = [(maintenant + random.uniform(0, self.intervalle), i) for i in range(len(self.cibles))]
+        heapq.heapify(self._tas)
+        while not self._arret.is_set():
+            if not self._tas:
+                await asyncio.sleep(0.1)
+                continue
+            echeance, index = self._tas[0]
+            attente = echeance - loop.time()
+            if attente > 0:
+                await asyncio.sleep(min(attente, 0.5))
+                continue
+            heapq.heappop(self._tas)
+            self.retard_max_ms = max(self.retard_max_ms, -attente * 1000)
+            tache = loop.create_task(self._sonder(index, echeance))
+            self._taches.add(tache)
+            tache.add_done_callback(self._taches.discard)
+
+    # Exposition Prometheus
+
+    def _rendre(self):
+        """Générateur du texte d'exposition ; rend la main tous les LOT_RENDU cibles (None), puis le texte."""
+        lignes = [
+            "# HELP ci_joignable Dernière sonde du port CI réussie (1) ou non (0).",
+            "# TYPE ci_joignable gauge",
+        ]
+        lignes += [f"ci_joignable{{{c.etiquettes}}} {int(bool(c.joignable))}" for c in self.cibles if c.joignable is not None]
+        lignes += ["# HELP ci_latence_connexion_secondes Temps de connexion TCP au port CI "
+                   "(quantiles sur la fenêtre glissante, somme et nombre depuis le démarrage).",
+                   "# TYPE ci_latence_connexion_secondes summary"]
+        pertes = ["# HELP ci_pertes_ratio Part des sondes en échec sur la fenêtre glissante.",
+                  "# TYPE ci_pertes_ratio gauge"]
+        sondes = ["# HELP ci_sondes_total Sondes effectuées depuis le démarrage.", "# TYPE ci_sondes_total counter"]
+        echecs = ["# HELP ci_echecs_total Sondes en échec depuis le démarrage.", "# TYPE ci_echecs_total counter"]
+        consecutifs = ["# HELP ci_echecs_consecutifs Échecs consécutifs en cours.", "# TYPE ci_echecs_consecutifs gauge"]
+        for i, c in enumerate(self.cibles):
+            if i % LOT_RENDU == LOT_RENDU - 1:
+                yield None
+            stats = c.stats
+            if not stats.envoyes:
+                continue
+            # NaN (perte) : v != v
+            valeurs = [v for v in stats.fenetre.valeurs() if v == v]
+            valeurs.sort()
+            n = len(valeurs)
+            if n:
+                for q in (50, 95, 99):
+                    lignes.append(f'ci_latence_connexion_secondes{{{c.etiquettes},quantile="{q / 100}"}} '
+                                  f'{percentile(valeurs, q) / 1000:.6f}')
+            lignes.append(f"ci_latence_connexion_secondes_sum{{{c.etiquettes}}} {c.somme_ms / 1000:.6f}")
+            lignes.append(f"ci_latence_connexion_secondes_count{{{c.etiquettes}}} {c.recues}")
+            pertes.append(f"ci_pertes_ratio{{{c.etiquettes}}} {1 - n / len(stats.fenetre):.4f}")
+            sondes.append(f"ci_sondes_total{{{c.etiquettes}}} {stats.envoyes}")
+            echecs.append(f"ci_echecs_total{{{c.etiquettes}}} {stats.perdus}")
+            consecutifs.append(f"ci_echecs_consecutifs{{{c.etiquettes}}} {c.echecs_consecutifs}")
+        joignables = sum(1 for c in self.cibles if c.joignable)
+        lignes += pertes + sondes + echecs + consecutifs + [
+            "# HELP ci_surveillance_cibles Cibles surveillées.", "# TYPE ci_surveillance_cibles gauge",
+            f"ci_surveillance_cibles {len(self.cibles)}",
+            "# HELP ci_surveillance_joignables Cibles joignables à la dernière sonde.", "# TYPE ci_surveillance_joignables gauge",
+            f"ci_surveillance_joignables {joignables}",
+            "# HELP ci_surveillance_en_vol Sondes en cours.", "# TYPE ci_surveillance_en_vol gauge",
+            f"ci_surveillance_en_vol {self.en_vol}",
+            "# HELP ci_surveillance_retard_max_secondes Retard maximal de l'ordonnanceur sur une échéance.",
+            "# TYPE ci_surveillance_retard_max_secondes gauge",
+            f"ci_surveillance_retard_max_secondes {self.retard_max_ms / 1000:.6f}",
+        ]
+        texte = ("\n".join(lignes) + "\n").encode()
+        self._cache = (time.monotonic(), texte)
+        yield texte
+
+    def metriques(self):
+        """Texte d'exposition Prometheus ; recalculé au plus toutes les CACHE_METRIQUES_S secondes."""
+        if time.monotonic() - self._cache[0] < CACHE_METRIQUES_S:
+            return self._cache[1]
+        for texte in self._rendre():
+            pass
+        return texte
+
+    async def metriques_async(self):
+        """Comme metriques(), en rendant la main à l'ordonnanceur pendant le calcul des fenêtres."""
+        if time.monotonic() - self._cache[0] < CACHE_METRIQUES_S:
+            return self._cache[1]
+        for texte in self._rendre():
+            if texte is None:
+                await asyncio.sleep(0)
+        return texte
+
+    async def _servir_http(self, lecteur, ecrivain):
+        try:
+            requete = await asyncio.wait_for(lecteur.readline(), 5)
+            while (await asyncio.wait_for(lecteur.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            chemin = requete.split()[1] if len(requete.split()) > 1 else b""
+            if chemin == b"/metrics":
+                statut, corps, type_contenu = "200 OK", await self.metriques_async(), TYPE_PROMETHEUS
+            elif chemin == b"/":
+                statut, corps, type_contenu = "200 OK", b"Surveillance CI : /metrics\n", "text/plain; charset=utf-8"
+            else:
+                statut, corps, type_contenu = "404 Not Found", b"introuvable\n", "text/plain; charset=utf-8"
+            ecrivain.write(f"HTTP/1.1 {statut}\r\nContent-Type: {type_contenu}\r\n"
+                           f"Content-Length: {len(corps)}\r\nConnection: close\r\n\r\n".encode() + corps)
+            await ecrivain.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            ecrivain.close()
+
+    async def executer_async(self, hote_metriques="127.0.0.1", port_metriques=9105, duree=None):
+        """Surveille jusqu'à arreter() (ou pendant `duree` secondes) ; métriques servies si port_metriques."""
+        _limite_descripteurs(self.concurrence)
+        self._limite = asyncio.Semaphore(self.concurrence)
+        self._arret = asyncio.Event()
+        self.debut = time.time()
+        serveur = None
+        if port_metriques:
+            serveur = await asyncio.start_server(self._servir_http, hote_metriques, port_metriques)
+        ordonnanceur = asyncio.create_task(self._ordonnancer())
+        try:
+            if duree is None:
+                await self._arret.wait()
+            else:
+                await asyncio.wait_for(self._arret.wait(), duree)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._arret.set()
+            await ordonnanceur
+            if self._taches:
+                await asyncio.gather(*self._taches, return_exceptions=True)
+            if serveur is not None:
+                serveur.close()
+                await serveur.wait_closed()
+
+    def arreter(self):
+        if self._arret is not None:
+            self._arret.set()
+
+    def resume(self):
+        """État synthétique par cible, pour un rapport de fin de surveillance."""
+        return [{"cible": c.ip, "role": c.role, "joignable": c.joignable, **c.stats.resume()} for c in self.cibles]
+
+
+def main(argv=None):
+    """Point d'entrée : surveillance en avant-plan d'un inventaire ou d'une liste d'IP."""
+    parser = argparse.ArgumentParser(description="Surveillance continue du port CI avec métriques Prometheus")
+    parser.add_argument("inventaire", nargs="?", help="Inventaire CSV/JSON (ip_moniteur, ip_centrale)")
+    parser.add_argument("--cibles", help="IP ou plages CIDR supplémentaires (moniteurs)")
+    parser.add_argument("--intervalle", type=float, default=INTERVALLE_DEFAUT, help="Intervalle entre sondes d'une cible (s)")
+    parser.add_argument("--gigue", type=float, default=GIGUE_DEFAUT, help="Gigue relative de l'intervalle")
+    parser.add_argument("--intervalle-max", type=float, default=INTERVALLE_MAX_DEFAUT, help="Plafond du recul après échecs (s)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Timeout de connexion (s)")
+    parser.add_argument("--fenetre", type=int, default=FENETRE_DEFAUT, help="Échantillons conservés par cible")
+    parser.add_argument("--concurrence", type=int, default=1000, help="Sondes simultanées au plus")
+    parser.add_argument("--hote-metriques", default="127.0.0.1", help="Adresse d'écoute HTTP des métriques")
+    parser.add_argument("--port-metriques", type=int, default=9105, help="Port HTTP des métriques (0 : désactivé)")
+    parser.add_argument("--journal", help="Journal JSONL des changements d'état (sinon les 10 000 derniers en mémoire)")
+    parser.add_argument("--duree", type=float, help="Durée de surveillance (s) ; infinie par défaut")
+    args = parser.parse_args(argv)
+
+    cibles = []
+    if args.inventaire:
+        from diagnostic_lot import charger_inventaire
+        cibles += cibles_inventaire(charger_inventaire(args.inventaire))
+    if args.cibles:
+        try:
+            cibles += [(ip, ROLE_MONITEUR, None) for ip in iterer_cibles(args.cibles)]
+        except ValueError as e:
+            parser.error(str(e))
+    if not cibles:
+        parser.error("aucune cible : inventaire ou --cibles requis")
+
+    guide = GuideDiagnosticCI(args.journal, capacite_historique=CAPACITE_HISTORIQUE)
+    surveillance = SurveillanceCI(cibles, guide, args.intervalle, args.gigue, args.intervalle_max,
+                                  args.timeout, args.fenetre, args.concurrence)
+    print(f"🔭 {len(cibles)} cibles toutes les {args.intervalle:g} s ; métriques "
+          f"{'http://%s:%d/metrics' % (args.hote_metriques, args.port_metriques) if args.port_metriques else 'désactivées'}")
+    try:
+        asyncio.run(surveillance.executer_async(args.hote_metriques, args.port_metriques, args.duree))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if guide.journal is not None:
+            guide.journal.fermer()
+    injoignables = [c for c in surveillance.cibles if c.joignable is False]
+    print(f"📊 {surveillance.sondes} sondes, {len(injoignables)} cible(s) injoignable(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Table des sockets TCP du port CI sur la centrale (Linux), sans netstat ni ss
+Netlink sock_diag filtré dans le noyau, repli sur /proc/net/tcp et tcp6 ; échantillonnable chaque seconde
+"""
+
+import argparse
+import os
+import re
+import socket
+import struct
+import sys
+import time
+
+from diagnostic_ci import GuideDiagnosticCI
+
+SOURCE_NETLINK = "netlink"
+SOURCE_PROC = "proc"
+
+ETATS_TCP = {
+    1: "ESTABLISHED", 2: "SYN_SENT", 3: "SYN_RECV", 4: "FIN_WAIT1", 5: "FIN_WAIT2", 6: "TIME_WAIT",
+    7: "CLOSE", 8: "CLOSE_WAIT", 9: "LAST_ACK", 10: "LISTEN", 11: "CLOSING", 12: "SYN_RECV",
+}
+ETAT_LISTEN = 10
+ETAT_ESTABLISHED = 1
+ETATS_SUIVIS = ("ESTABLISHED", "SYN_RECV", "TIME_WAIT")
+
+# Netlink sock_diag (linux/sock_diag.h, linux/inet_diag.h)
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+INET_DIAG_REQ_BYTECODE = 1
+INET_DIAG_BC_S_GE, INET_DIAG_BC_S_LE, INET_DIAG_BC_D_GE, INET_DIAG_BC_D_LE = 2, 3, 4, 5
+TOUS_ETATS = (1 << 13) - 1
+_ENTETE = struct.Struct("=IHHII")
+_ENTETE_COURT = struct.Struct("=IH")
+_DIAG_MSG = struct.Struct("=BBBB2H16s16sI8xIIIII")
+
+_ADRESSES_LOCALES = ("127.0.0.1", "::1")
+
+
+def _programme_port(port, local):
+    """Bytecode inet_diag « port == `port` » (local ou distant) : ≥ puis ≤, sinon rejet."""
+    ge, le = (INET_DIAG_BC_S_GE, INET_DIAG_BC_S_LE) if local else (INET_DIAG_BC_D_GE, INET_DIAG_BC_D_LE)
+    op = struct.Struct("=BBH")
+    # `no` au-delà de la fin du programme (longueur restante + 4) : socket rejetée
+    return op.pack(ge, 8, 20) + op.pack(0, 0, port) + op.pack(le, 8, 12) + op.pack(0, 0, port)
+
+
+class _Releve:
+    """Comptes par état des sockets du port (entrantes / sortantes), écoutes et moniteurs connectés."""
+
+    __slots__ = ("entrantes", "sortantes", "ecoute", "distants", "connexions")
+
+    def __init__(self, connexions=None):
+        self.entrantes = [0] * 13
+        self.sortantes = [0] * 13
+        self.ecoute = []        # (adresse brute, attente accept, backlog, inode)
+        self.distants = set()   # adresses distantes des connexions établies sur le port local
+        self.connexions = connexions  # clés des connexions établies (port distant + adresses), si demandé
+
+
+def _lire_netlink(famille, port, local, tampon, releve, etats=TOUS_ETATS):
+    """Sockets TCP de `famille` dont le port local (ou distant) vaut `port`, filtrées par le noyau."""
+    programme = _programme_port(port, local)
+    requete = struct.pack("=BBBBI", famille, socket.IPPROTO_TCP, 0, 0, etats) + bytes(48)
+    attribut = struct.pack("=HH", 4 + len(programme), INET_DIAG_REQ_BYTECODE) + programme
+    corps = requete + attribut
+    taille = 4 if famille == socket.AF_INET else 16
+    comptes = releve.entrantes if local else releve.sortantes
+    connexions = releve.connexions if local else None
+    entete = _ENTETE_COURT.unpack_from
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG) as s:
+        s.send(_ENTETE.pack(_ENTETE.size + len(corps), SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST | NLM_F_DUMP, 1, 0) + corps)
+        while True:
+            n = s.recv_into(tampon)
+            position = 0
+            # Une boucle minimale par message : des dizaines de milliers de sockets à chaque seconde
+            while position < n:
+                longueur, type_message = entete(tampon, position)
+                if type_message != SOCK_DIAG_BY_FAMILY:
+                    if type_message == NLMSG_DONE:
+                        return
+                    if type_message == NLMSG_ERROR:
+                        erreur = -struct.unpack_from("=i", tampon, position + _ENTETE.size)[0]
+                        raise OSError(erreur, os.strerror(erreur))
+                etat = tampon[position + 17]
+                comptes[etat] += 1
+                if etat == ETAT_ESTABLISHED:
+                    if connexions is not None:
+                        # Port distant, adresse locale (16 octets), adresse distante : une seule copie
+                        connexions.add(bytes(tampon[position + 22:position + 40 + taille]))
+                    elif local:
+                        releve.distants.add(bytes(tampon[position + 40:position + 40 + taille]))
+                elif etat == ETAT_LISTEN:
+                    champs = _DIAG_MSG.unpack_from(tampon, position + _ENTETE.size)
+                    releve.ecoute.append((champs[6][:taille], champs[10], champs[11], champs[13]))
+                position += (longueur + 3) & ~3
+
+
+def _motifs_proc(port):
+    hexa = f"{port:04X}".encode()
+    suite = rb" ([0-9A-F]{2}) [0-9A-F]{8}:([0-9A-F]{8}) \S+ \S+ +\d+ +\d+ (\d+)"
+    return (re.compile(rb"^ *\d+: ([0-9A-F]+):" + hexa + rb" ([0-9A-F]+):([0-9A-F]{4})" + suite, re.M),
+            re.compile(rb"^ *\d+: ([0-9A-F]+):[0-9A-F]{4} ([0-9A-F]+):" + hexa + suite, re.M))
+
+
+def _adresse_proc(hexa):
+    # /proc affiche l'adresse par mots de 32 bits dans l'ordre de l'hôte
+    brut = bytes.fromhex(hexa.decode())
+    if sys.byteorder == "little":
+        brut = b"".join(brut[i:i + 4][::-1] for i in range(0, len(brut), 4))
+    return brut
+
+
+def _lire_proc(chemin, motifs, releve):
+    """Sockets du port (local puis distant) dans /proc/net/tcp[6], filtrées par expression régulière."""
+    try:
+        with open(chemin, "rb") as f:
+            contenu = f.read()
+    except FileNotFoundError:
+        return
+    for local, motif in zip((True, False), motifs):
+        comptes = releve.entrantes if local else releve.sortantes
+        for groupes in motif.findall(contenu):
+            if local:
+                locale, distante, port_distant, etat, file_rx, inode = groupes
+            else:
+                locale, distante, etat, file_rx, inode = groupes
+            etat = int(etat, 16)
+            comptes[etat] += 1
+            if etat == ETAT_ESTABLISHED and local:
+                if releve.connexions is not None:
+                    # Même clé que netlink : port distant, adresse locale sur 16 octets, adresse distante
+                    releve.connexions.add(bytes.fromhex(port_distant.decode()) + _adresse_proc(locale).ljust(16, b"\0")
+                                          + _adresse_proc(distante))
+                else:
+                    releve.distants.add(distante)
+            elif etat == ETAT_LISTEN:
+                # /proc ne donne pas le backlog maximal d'une socket en écoute
+                releve.ecoute.append((_adresse_proc(locale), int(file_rx, 16), None, int(inode)))
+
+
+def _par_etat(comptes):
+    """Comptes par nom d'état (hors écoute) ; les états suivis figurent toujours, même à zéro."""
+    resultat = dict.fromkeys(ETATS_SUIVIS, 0)
+    for etat, n in enumerate(comptes):
+        if n and etat != ETAT_LISTEN:
+            nom = ETATS_TCP.get(etat, str(etat))
+            resultat[nom] = resultat.get(nom, 0) + n
+    return resultat
+
+
+def _texte_adresse(brut):
+    return socket.inet_ntop(socket.AF_INET if len(brut) == 4 else socket.AF_INET6, brut)
+
+
+class TableSockets:
+    """Lecture directe des sockets du port CI : écoute, états, moniteurs connectés, PID du service."""
+
+    def __init__(self, port=24005, source=None):
+        self.port = port
+        self.source = source
+        self._motifs = _motifs_proc(port)
+        self._proprietaires = {}
+
+    def _relever(self, connexions=None):
+        if self.source in (None, SOURCE_NETLINK):
+            releve = _Releve(connexions)
+            # Tampon propre à chaque relevé : un même lecteur peut servir plusieurs threads
+            tampon = bytearray(1 << 20)
+            try:
+                for famille in (socket.AF_INET, socket.AF_INET6):
+                    if connexions is not None:
+                        _lire_netlink(famille, self.port, True, tampon, releve, 1 << ETAT_ESTABLISHED)
+                        continue
+                    _lire_netlink(famille, self.port, True, tampon, releve)
+                    _lire_netlink(famille, self.port, False, tampon, releve)
+                self.source = SOURCE_NETLINK
+                return releve
+            except OSError:
+                # Noyau sans sock_diag, conteneur restreint... : /proc reste lisible
+                if self.source == SOURCE_NETLINK:
+                    raise
+                self.source = SOURCE_PROC
+        releve = _Releve(connexions)
+        _lire_proc("/proc/net/tcp", self._motifs, releve)
+        _lire_proc("/proc/net/tcp6", self._motifs, releve)
+        return releve
+
+    def proprietaire(self, inode):
+        """(pid, nom du processus) détenant la socket `inode`, ou (None, None) si introuvable."""
+        cible = f"socket:[{inode}]"
+        connu = self._proprietaires.get(inode)
+        if connu is not None:
+            try:
+                if os.readlink(connu[2]) == cible:
+                    return connu[:2]
+            except OSError:
+                pass
+        for pid in filter(str.isdigit, os.listdir("/proc")):
+            try:
+                with os.scandir(f"/proc/{pid}/fd") as descripteurs:
+                    for fd in descripteurs:
+                        try:
+                            if os.readlink(fd.path) == cible:
+                                with open(f"/proc/{pid}/comm") as f:
+                                    nom = f.read().strip()
+                                self._proprietaires[inode] = (int(pid), nom, fd.path)
+                                return int(pid), nom
+                        except OSError:
+                            continue
+            except OSError:
+                # Processus terminé ou d'un autre utilisateur (lancer en root pour tout voir)
+                continue
+        return None, None
+
+    def lire(self):
+        """Instantané du port : sockets en écoute, comptes par état (entrantes / sortantes), moniteurs connectés."""
+        debut = time.perf_counter()
+        releve = self._relever()
+        ecoute = []
+        for adresse, attente, backlog, inode in releve.ecoute:
+            pid, nom = self.proprietaire(inode) if inode else (None, None)
+            ecoute.append({"adresse": _texte_adresse(adresse), "attente_accept": attente, "backlog": backlog,
+                           "pid": pid, "processus": nom, "inode": inode})
+        return {
+            "port": self.port,
+            "source": self.source,
+            "ecoute": ecoute,
+            "entrantes": _par_etat(releve.entrantes),
+            "sortantes": _par_etat(releve.sortantes),
+            "moniteurs_connectes": len(releve.distants),
+            "sockets": sum(releve.entrantes) + sum(releve.sortantes),
+            "duree_ms": round((time.perf_counter() - debut) * 1000, 3),
+            "constats": constater(ecoute),
+        }
+
+    def connexions(self):
+        """Clés des connexions établies sur le port (port distant, adresse locale, adresse distante).
+
+        L'adresse du moniteur est cle[18:] (4 octets en IPv4, 16 en IPv6).
+        """
+        return self._relever(set()).connexions
+
+    def suivre(self, intervalle=1.0, nombre=None):
+        """Instantanés successifs toutes les `intervalle` secondes (indéfiniment si nombre est None)."""
+        prochain = time.monotonic()
+        n = 0
+        while nombre is None or n < nombre:
+            yield self.lire()
+            n += 1
+            prochain += intervalle
+            time.sleep(max(0.0, prochain - time.monotonic()))
+
+
+def constater(ecoute):
+    """Constats (niveau, message) sur les sockets en écoute du port."""
+    if not ecoute:
+        return [("error", "Aucun processus n'écoute sur le port : service CI arrêté ou port différent")]
+    constats = []
+    if all(e["adresse"] in _ADRESSES_LOCALES for e in ecoute):
+        constats.append(("warning", "Écoute limitée à la boucle locale : les moniteurs ne peuvent pas se connecter "
+                                    "(bind address à passer en 0.0.0.0 ou sur l'IP de la centrale)"))
+    for e in ecoute:
+        if e["backlog"] and e["attente_accept"] >= e["backlog"]:
+            constats.append(("warning", f"File d'accept() pleine sur {e['adresse']} ({e['attente_accept']}/{e['backlog']}) : "
+                                        "le service n'accepte plus assez vite, SYN ignorés"))
+    return constats
+
+
+def evaluer_reponses(table):
+    """Réponse q_service_ecoute (étape 5) : une socket en écoute sur le port, joignable hors boucle locale."""
+    ecoute = [e for e in table["ecoute"] if e["adresse"] not in _ADRESSES_LOCALES]
+    return {"q_service_ecoute": "Oui" if ecoute else "Non"}
+
+
+def enregistrer_dans_donnees(table, donnees_collectees):
+    """Reporte l'écoute et les comptes de connexions dans donnees_collectees."""
+    port = table["port"]
+    donnees_collectees[f'Écoute {port}'] = ", ".join(
+        f"{e['adresse']} (pid {e['pid']} {e['processus']})" if e["pid"] else e["adresse"] for e in table["ecoute"]
+    ) or "aucune"
+    donnees_collectees[f'Connexions {port}'] = ", ".join(f"{n} {etat}" for etat, n in table["entrantes"].items())
+    donnees_collectees['Moniteurs connectés'] = table["moniteurs_connectes"]
+
+
+def main(argv=None):
+    """Point d'entrée : instantané ou suivi de la table des sockets du port CI."""
+    parser = argparse.ArgumentParser(description="Sockets TCP du port CI sur la centrale (remplace netstat / ss)")
+    parser.add_argument("--port", type=int, default=GuideDiagnosticCI().get_ci_port())
+    parser.add_argument("--source", choices=(SOURCE_NETLINK, SOURCE_PROC), help="Forcer la source (auto par défaut)")
+    parser.add_argument("--suivre", type=float, metavar="SECONDES", help="Un instantané toutes les SECONDES")
+    parser.add_argument("--nombre", type=int, help="Nombre d'instantanés en mode suivi")
+    args = parser.parse_args(argv)
+
+    table = TableSockets(args.port, args.source)
+    if args.suivre:
+        try:
+            for instantane in table.suivre(args.suivre, args.nombre):
+                e = instantane["entrantes"]
+                print(f"{time.strftime('%H:%M:%S')} écoute {len(instantane['ecoute'])}  "
+                      + "  ".join(f"{etat} {e[etat]}" for etat in ETATS_SUIVIS)
+                      + f"  moniteurs {instantane['moniteurs_connectes']}  ({instantane['duree_ms']} ms)")
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    instantane = table.lire()
+    print(f"🔌 Port {args.port} ({instantane['source']}, {instantane['sockets']} sockets lues en {instantane['duree_ms']} ms)")
+    for e in instantane["ecoute"]:
+        print(f"   LISTEN {e['adresse']:<16} pid {e['pid']} {e['processus'] or ''}  accept {e['attente_accept']}/{e['backlog']}")
+    print("   Entrantes : " + ", ".join(f"{n} {etat}" for etat, n in instantane["entrantes"].items()))
+    print("   Sortantes : " + ", ".join(f"{n} {etat}" for etat, n in instantane["sortantes"].items()))
+    print(f"   Moniteurs connectés : {instantane['moniteurs_connectes']}")
+    for niveau, message in instantane["constats"]:
+        print(f"{'🚨' if niveau == 'error' else '⚠️ '} {message}")
+    return 0 if instantane["ecoute"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exécution en arrière-plan des vérifications automatiques (scan, latence, sonde, captures)
+Pool partagé par toutes les sessions, tâches identiques dédupliquées, résultats gardés en cache
+"""
+
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+TTL_DEFAUT = 15.0        # une mesure réseau vieillit vite
+TACHES_MAX = 128         # tâches terminées gardées en cache
+
+
+def _executer(fonction, args, kwargs):
+    """Exécute fonction(guide, *args) sur un guide neuf ; retourne le résultat et les étapes journalisées."""
+    from diagnostic_ci import GuideDiagnosticCI
+    guide = GuideDiagnosticCI()
+    resultat = fonction(guide, *args, **kwargs)
+    return resultat, list(guide.get_historique())
+
+
+class Tache:
+    """Vérification soumise au pool ; partagée par les sessions qui demandent la même clé."""
+
+    _compteur = itertools.count(1)
+
+    def __init__(self, cle, duree_estimee=None, ttl=TTL_DEFAUT):
+        self.id = next(Tache._compteur)
+        self.cle = cle
+        self.duree_estimee = duree_estimee
+        self.ttl = ttl
+        self.debut = time.time()
+        self.fin = None
+        self.resultat = None
+        self.historique = []
+        self.erreur = None
+        self.abonnes = 1
+        self.future = None
+
+    def terminee(self):
+        return self.fin is not None
+
+    def ecoule(self):
+        return (self.fin or time.time()) - self.debut
+
+    def progression(self):
+        """Avancement estimé entre 0 et 1 (None sans estimation)."""
+        if self.terminee():
+            return 1.0
+        if not self.duree_estimee:
+            return None
+        return min(0.99, self.ecoule() / self.duree_estimee)
+
+    def valide(self):
+        return not self.terminee() or (self.erreur is None and time.time() - self.fin < self.ttl)
+
+    def _terminer(self, future):
+        try:
+            self.resultat, self.historique = future.result()
+        except BaseException as e:
+            self.erreur = e
+        self.fin = time.time()
+
+
+class ExecuteurTaches:
+    """Pool de threads (sondes réseau) et de processus (analyses de capture) partagé par les sessions."""
+
+    def __init__(self, threads=8, processus=None, taches_max=TACHES_MAX):
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="tache_ci")
+        self.nb_processus = processus or multiprocessing.cpu_count()
+        self._processus = None
+        self.taches_max = taches_max
+        self._taches = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def _pool_processus(self):
+        # spawn : le processus Streamlit est multi-thread, un fork pourrait hériter d'un verrou pris
+        if self._processus is None:
+            self._processus = ProcessPoolExecutor(self.nb_processus, mp_context=multiprocessing.get_context("spawn"))
+        return self._processus
+
+    def soumettre(self, cle, fonction, *args, processus=False, duree_estimee=None, ttl=TTL_DEFAUT, **kwargs):
+        """Lance fonction(guide, *args, **kwargs), ou rejoint la tâche en cours / en cache de même clé."""
+        with self._verrou:
+            tache = self._taches.get(cle)
+            if tache is not None and tache.valide():
+                tache.abonnes += 1
+                self._taches.move_to_end(cle)
+                return tache
+            tache = Tache(cle, duree_estimee, ttl)
+            self._taches[cle] = tache
+            self._elaguer()
+        pool = self._pool_processus() if processus else self.threads
+        tache.future = pool.submit(_executer, fonction, args, kwargs)
+        tache.future.add_done_callback(tache._terminer)
+        return tache
+
+    def _elaguer(self):
+        # Seules les tâches terminées sont évincées ; les plus anciennes d'abord
+        for cle in [cle for cle, tache in self._taches.items() if tache.terminee()]:
+            if len(self._taches) <= self.taches_max:
+                break
+            del self._taches[cle]
+
+    def en_cours(self):
+        with self._verrou:
+            return [tache for tache in self._taches.values() if not tache.terminee()]
+
+    def arreter(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self._processus is not None:
+            self._processus.shutdown(wait=False, cancel_futures=True)
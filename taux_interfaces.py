@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Taux d'erreurs d'interfaces à partir de relevés successifs de 'show interface'
+Deltas et taux par port (CRC, runts, collisions, drops, charge), détection des erreurs en hausse
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from parseur_switch import analyser_sortie, normaliser_interface
+
+# Compteurs cumulés suivis (ordre des tuples de relevé)
+COMPTEURS = ("crc", "runts", "giants", "collisions", "erreurs_entree", "erreurs_sortie",
+             "drops_entree", "drops_sortie", "paquets_entree", "paquets_sortie")
+# Total des erreurs : IOS compte déjà CRC, runts et giants dans « input errors », ils n'y sont pas ajoutés
+COMPTEURS_ERREURS = ("collisions", "erreurs_entree", "erreurs_sortie", "drops_entree", "drops_sortie")
+COMPTEURS_DETAIL = ("crc", "runts", "giants") + COMPTEURS_ERREURS
+_INDEX_ERREURS = tuple(COMPTEURS.index(c) for c in COMPTEURS_ERREURS)
+_INDEX_DETAIL = tuple(COMPTEURS.index(c) for c in COMPTEURS_DETAIL)
+_INDEX_PAQUETS = (COMPTEURS.index("paquets_entree"), COMPTEURS.index("paquets_sortie"))
+
+TENDANCE_HAUSSE = "en hausse"
+TENDANCE_ACTIVE = "active"
+TENDANCE_STABLE = "stable"
+TENDANCE_REMISE = "remis à zéro"
+
+FACTEUR_HAUSSE = 1.5
+
+# Sortie de 'show clock' : *10:15:02.123 UTC Fri Oct 17 2025
+HORLOGE = re.compile(r"^\*?(\d{1,2}:\d{2}:\d{2})(?:\.\d+)? \S+ \w{3} (\w{3}) +(\d{1,2}) (\d{4})\s*$", re.MULTILINE)
+
+
+def horodatage_sortie(texte):
+    """Horodatage (epoch) lu dans une sortie 'show clock', ou None."""
+    horloge = HORLOGE.search(texte)
+    if horloge is None:
+        return None
+    heure, mois, jour, annee = horloge.groups()
+    return datetime.strptime(f"{annee} {mois} {jour} {heure}", "%Y %b %d %H:%M:%S").timestamp()
+
+
+class _Port:
+    """Relevés d'un port : derniers compteurs et fenêtre des relevés ayant changé."""
+
+    __slots__ = ("compteurs", "ts", "vu", "releves", "txload", "rxload", "tendance", "remises")
+
+    def __init__(self, ts, compteurs, fenetre):
+        self.compteurs = compteurs
+        self.ts = ts
+        self.vu = ts
+        self.releves = deque([(ts, compteurs)], maxlen=fenetre)
+        self.txload = None
+        self.rxload = None
+        self.tendance = TENDANCE_STABLE
+        self.remises = 0
+
+
+def _erreurs_par_min(debut, fin):
+    (t0, c0), (t1, c1) = debut, fin
+    duree = t1 - t0
+    if duree <= 0:
+        return 0.0
+    return sum(c1[i] - c0[i] for i in _INDEX_ERREURS) * 60 / duree
+
+
+class MoteurCompteurs:
+    """Moteur incrémental : chaque relevé ne coûte que pour les ports dont les compteurs ont changé."""
+
+    def __init__(self, fenetre=10, facteur_hausse=FACTEUR_HAUSSE):
+        self.fenetre = fenetre
+        self.facteur_hausse = facteur_hausse
+        self.ports = {}
+        self.alertes = set()
+        self.releves = 0
+
+    def ingerer(self, ts, enregistrements):
+        """Intègre un relevé horodaté (enregistrements 'interfaces' du parseur) ; retourne le nb de ports modifiés."""
+        self.releves += 1
+        modifies = 0
+        for enregistrement in enregistrements:
+            cle = (enregistrement["switch"], enregistrement["interface"])
+            compteurs = tuple(enregistrement.get(c, 0) for c in COMPTEURS)
+            port = self.ports.get(cle)
+            if port is None:
+                port = self.ports[cle] = _Port(ts, compteurs, self.fenetre)
+                port.txload = enregistrement.get("txload")
+                port.rxload = enregistrement.get("rxload")
+                continue
+            if ts <= port.vu:
+                continue
+            if compteurs == port.compteurs:
+                # Aucune nouvelle erreur depuis le dernier relevé : rien à recalculer
+                port.vu = ts
+                if cle in self.alertes:
+                    self.alertes.discard(cle)
+                continue
+            modifies += 1
+            self._mettre_a_jour(cle, port, ts, compteurs)
+            port.txload = enregistrement.get("txload", port.txload)
+            port.rxload = enregistrement.get("rxload", port.rxload)
+        return modifies
+
+    def _mettre_a_jour(self, cle, port, ts, compteurs):
+        if any(n < a for n, a in zip(compteurs, port.compteurs)):
+            # clear counters ou redémarrage : nouvelle référence
+            port.releves.clear()
+            port.remises += 1
+            port.tendance = TENDANCE_REMISE
+        port.releves.append((ts, compteurs))
+        port.compteurs = compteurs
+        port.ts = port.vu = ts
+        if len(port.releves) >= 2:
+            port.tendance = self._tendance(port)
+        if port.tendance == TENDANCE_HAUSSE:
+            self.alertes.add(cle)
+        else:
+            self.alertes.discard(cle)
+
+    def _tendance(self, port):
+        releves = port.releves
+        recent = _erreurs_par_min(releves[-2], releves[-1])
+        if recent <= 0:
+            return TENDANCE_STABLE
+        if len(releves) < 3:
+            return TENDANCE_ACTIVE
+        # Intervalle précédent contre dernier intervalle : un taux constant reste « active »
+        ancien = _erreurs_par_min(releves[-3], releves[-2])
+        return TENDANCE_HAUSSE if recent > self.facteur_hausse * ancien else TENDANCE_ACTIVE
+
+    def ingerer_sortie(self, texte, ts=None):
+        """Intègre une sortie CLI brute ; horodatage lu dans 'show clock' à défaut de ts."""
+        if ts is None:
+            ts = horodatage_sortie(texte) or time.time()
+        return self.ingerer(ts, analyser_sortie(texte)["interfaces"])
+
+    def ingerer_fichiers(self, chemins):
+        """Intègre des fichiers de relevés dans l'ordre chronologique (show clock, sinon date du fichier)."""
+        releves = []
+        for chemin in chemins:
+            with open(chemin, encoding="utf-8", errors="replace") as f:
+                texte = f.read()
+            releves.append((horodatage_sortie(texte) or os.path.getmtime(chemin), texte))
+        releves.sort(key=lambda releve: releve[0])
+        return sum(self.ingerer_sortie(texte, ts) for ts, texte in releves)
+
+    def etat_port(self, switch, interface):
+        """Deltas et taux d'un port sur le dernier intervalle et sur la fenêtre."""
+        port = self.ports.get((switch, interface))
+        if port is None:
+            return None
+        ligne = {"switch": switch, "interface": interface, "tendance": port.tendance, "remises": port.remises,
+                 "charge_tx_pct": None if port.txload is None else round(port.txload * 100 / 255, 1),
+                 "charge_rx_pct": None if port.rxload is None else round(port.rxload * 100 / 255, 1)}
+        if port.vu > port.ts and port.tendance != TENDANCE_REMISE:
+            # Relevé(s) identique(s) depuis le dernier changement : plus d'erreurs en cours
+            ligne["tendance"] = TENDANCE_STABLE
+        ta, ca = port.releves[0]
+        c1 = port.releves[-1][1]
+        ligne["fenetre_s"] = round(port.vu - ta, 1)
+        ligne["erreurs_fenetre"] = sum(c1[i] - ca[i] for i in _INDEX_ERREURS)
+        if len(port.releves) < 2:
+            return ligne
+        (t0, c0), (t1, c1) = port.releves[-2], port.releves[-1]
+        duree = t1 - t0
+        ligne["intervalle_s"] = round(duree, 1)
+        for i in _INDEX_DETAIL:
+            ligne[f"{COMPTEURS[i]}_par_min"] = round((c1[i] - c0[i]) * 60 / duree, 3)
+        paquets = sum(c1[i] - c0[i] for i in _INDEX_PAQUETS)
+        erreurs = sum(c1[i] - c0[i] for i in _INDEX_ERREURS)
+        ligne["erreurs_par_million"] = round(erreurs * 1e6 / paquets, 1) if paquets else None
+        return ligne
+
+    def chercher(self, interface, switch=None):
+        """État d'une interface ; sans switch, uniquement si le nom d'interface est unique."""
+        interface = normaliser_interface(interface)
+        if switch:
+            return self.etat_port(switch, interface)
+        cles = [cle for cle in self.ports if cle[1] == interface]
+        return self.etat_port(*cles[0]) if len(cles) == 1 else None
+
+    def ports_en_hausse(self):
+        """Ports dont le taux d'erreurs du dernier intervalle dépasse celui de l'intervalle précédent."""
+        return [self.etat_port(*cle) for cle in sorted(self.alertes, key=lambda c: (c[0] or "", c[1]))]
+
+    def rapport(self, tendances=(TENDANCE_HAUSSE, TENDANCE_ACTIVE)):
+        """États des ports dont la tendance figure dans `tendances` (tous si None)."""
+        lignes = (self.etat_port(*cle) for cle in self.ports)
+        return [ligne for ligne in lignes if tendances is None or ligne["tendance"] in tendances]
+
+
+def evaluer_reponses(etat):
+    """Réponse de l'étape 2 (erreurs d'interface) pour le port du moniteur."""
+    if etat is None or not etat["fenetre_s"]:
+        return {}
+    return {"q_erreurs_interface": "Oui" if etat["tendance"] in (TENDANCE_HAUSSE, TENDANCE_ACTIVE) else "Non"}
+
+
+def enregistrer_dans_donnees(etat, donnees_collectees):
+    """Reporte la tendance des erreurs du port du moniteur dans donnees_collectees."""
+    if etat is None or not etat["fenetre_s"]:
+        return
+    donnees_collectees['Erreurs interface (tendance)'] = (
+        f"{etat['tendance']}, {etat['erreurs_fenetre']} erreurs sur {etat['fenetre_s']:.0f} s"
+    )
+
+
+def main(argv=None):
+    """Point d'entrée : relevés successifs en argument, ports aux erreurs actives en sortie."""
+    parser = argparse.ArgumentParser(description="Taux d'erreurs d'interfaces depuis des relevés 'show interface'")
+    parser.add_argument("releves", nargs="+", help="Fichiers de relevés (un par passage)")
+    parser.add_argument("--fenetre", type=int, default=10, help="Nombre de relevés conservés par port")
+    parser.add_argument("--tous", action="store_true", help="Afficher aussi les ports sans erreur")
+    args = parser.parse_args(argv)
+
+    moteur = MoteurCompteurs(args.fenetre)
+    moteur.ingerer_fichiers(args.releves)
+    lignes = moteur.rapport(None if args.tous else (TENDANCE_HAUSSE, TENDANCE_ACTIVE))
+    for ligne in sorted(lignes, key=lambda l: (l["tendance"] != TENDANCE_HAUSSE, l["switch"] or "", l["interface"])):
+        print(f"{ligne['switch'] or '-'} {ligne['interface']:<12} {ligne['tendance']:<13} "
+              f"CRC/min {ligne.get('crc_par_min', 0):>8}  drops/min "
+              f"{ligne.get('drops_entree_par_min', 0) + ligne.get('drops_sortie_par_min', 0):>8}  "
+              f"charge tx/rx {ligne['charge_tx_pct']}/{ligne['charge_rx_pct']} %")
+    print(f"📊 {len(moteur.ports)} ports, {moteur.releves} relevés, {len(moteur.alertes)} en hausse")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
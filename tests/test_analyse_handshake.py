@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Suivi des handshakes : une ouverture suivie d'une clôture normale ne compte qu'une connexion."""
+
+from analyse_handshake import (EVENEMENT_CONNEXION, EVENEMENT_DECONNEXION, ISSUE_EN_COURS, ISSUE_ETABLIE,
+                               AnalyseurHandshake)
+from lecteur_capture import TCP_ACK, TCP_FIN, TCP_SYN
+
+MONITEUR = bytes([10, 1, 20, 50])
+CENTRALE = bytes([10, 1, 1, 10])
+PORT = 24005
+
+
+def rejouer(analyseur, ts, sport=40000):
+    """SYN, SYN-ACK, ACK, FIN (moniteur), FIN (centrale), ACK final."""
+    vers_centrale = (MONITEUR, CENTRALE, sport, PORT)
+    vers_moniteur = (CENTRALE, MONITEUR, PORT, sport)
+    for i, (sens, seq, flags) in enumerate((
+        (vers_centrale, 1000, TCP_SYN),
+        (vers_moniteur, 5000, TCP_SYN | TCP_ACK),
+        (vers_centrale, 1001, TCP_ACK),
+        (vers_centrale, 1001, TCP_FIN | TCP_ACK),
+        (vers_moniteur, 5001, TCP_FIN | TCP_ACK),
+        (vers_centrale, 1002, TCP_ACK),
+    )):
+        analyseur.traiter_segment(ts + i * 0.001, *sens, seq, flags, 0)
+
+
+def test_ouverture_et_cloture():
+    evenements = []
+    analyseur = AnalyseurHandshake(PORT, rappel=lambda ts, moniteur, evenement: evenements.append(evenement))
+    rejouer(analyseur, 1.0)
+    assert not analyseur.flux
+    stats = analyseur.rapport()["10.1.20.50"]
+    assert (stats["tentatives"], stats[ISSUE_ETABLIE], stats[ISSUE_EN_COURS]) == (1, 1, 0)
+    assert evenements == [EVENEMENT_CONNEXION, EVENEMENT_DECONNEXION]
+
+
+def test_reconnexion_meme_port_source():
+    analyseur = AnalyseurHandshake(PORT)
+    rejouer(analyseur, 1.0)
+    rejouer(analyseur, 2.0)
+    stats = analyseur.rapport()["10.1.20.50"]
+    assert (stats["tentatives"], stats[ISSUE_ETABLIE], stats[ISSUE_EN_COURS]) == (2, 2, 0)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Préfiltre de l'analyse des logs : chaque signature est reconnue, même sans mot de gravité dans la ligne."""
+
+import pytest
+
+from analyse_logs import SIGNATURES, AnalyseurLogs
+
+# Une ligne par signature, sans « error », « fail »... quand la signature le permet
+LIGNES = {
+    "connexion_refusee": "Connection refused by 10.1.2.3",
+    "timeout": "read timed out on 10.1.2.3",
+    "connexion_reinitialisee": "Connection reset by peer 10.1.2.3",
+    "hote_injoignable": "No route to host 10.1.2.3",
+    "authentification": "Unauthorized client 10.1.2.3",
+    "licence": "License limit reached (64 stations)",
+    "port_occupe": "bind 0.0.0.0:24005: Address already in use",
+    "ressources": "accept: Too many open files",
+    "protocole": "Malformed packet from 10.1.2.3",
+    "moniteur_inconnu": "Unknown device 10.1.2.3 not registered",
+    "file_saturee": "Send queue is full for 10.1.2.3",
+    "certificat_tls": "TLS handshake alert from 10.1.2.3",
+    "resolution_dns": "centrale.local: Name or service not known",
+    "plantage": "Segmentation fault (core dumped)",
+}
+
+
+def test_une_ligne_par_signature():
+    assert set(LIGNES) == {cle for cle, *_ in SIGNATURES}
+
+
+@pytest.mark.parametrize("cle", sorted(LIGNES))
+def test_signature_reconnue(tmp_path, cle):
+    chemin = tmp_path / "ci.log"
+    chemin.write_text(f"2026-10-17T08:00:00+0200 centrale ci[42]: {LIGNES[cle]}\nservice CI démarré\n", encoding="utf-8")
+    rapport = AnalyseurLogs().analyser_fichiers([str(chemin)])
+    assert rapport["lignes"] == 2
+    assert [s["signature"] for s in rapport["signatures"]] == [cle]
+
+
+def test_fichier_complet(tmp_path):
+    chemin = tmp_path / "ci.log"
+    chemin.write_text("".join(f"Oct 17 08:00:0{i % 10} centrale ci[42]: {ligne}\n"
+                              for i, ligne in enumerate(LIGNES.values())), encoding="utf-8")
+    rapport = AnalyseurLogs().analyser_fichiers([str(chemin)])
+    assert rapport["lignes_erreur"] == len(LIGNES)
+    assert {s["signature"]: s["occurrences"] for s in rapport["signatures"]} == dict.fromkeys(LIGNES, 1)
+
+
+def test_mots_de_gravite_entiers(tmp_path):
+    chemin = tmp_path / "ci.log"
+    ordinaires = ["heartbeat interrupted 10.1.2.3", "envoi deferred vers 10.1.2.4", "referrer: /supervision",
+                  "critère de tri appliqué"]
+    chemin.write_text("".join(f"2026-10-17T08:00:{i:02d}+0200 centrale ci[42]: {ligne}\n"
+                              for i, ligne in enumerate(ordinaires * 3 + ["ERROR: station 10.1.2.5 hors service"])),
+                      encoding="utf-8")
+    rapport = AnalyseurLogs().analyser_fichiers([str(chemin)])
+    assert rapport["lignes_erreur"] == 1
+    assert [s["signature"] for s in rapport["signatures"]] == ["modele"]
+    assert "interrupted" not in rapport["signatures"][0]["libelle"]